@@ -98,6 +98,6 @@ def debug_extrair_nome_do_pdf(pdf_path):
 
 if __name__ == "__main__":
     # Testa com um PDF específico
-    pdf_path = r"c:\Users\pique\OneDrive\Área de Trabalho\qr\Alicia_Araujo.pdf"
+    pdf_path = sys.argv[1] if len(sys.argv) > 1 else r"c:\Users\pique\OneDrive\Área de Trabalho\qr\Alicia_Araujo.pdf"
     resultado = debug_extrair_nome_do_pdf(pdf_path)
     print(f"\nResultado final: {resultado}")
@@ -0,0 +1,242 @@
+#!/usr/bin/env python3
+"""
+Benchmark do pipeline de QR codes em PDFs.
+
+Mede, sobre um corpus sintético (benchmarks/corpus.py), o tempo, a vazão
+(documentos/segundo) e o pico de memória de:
+- extrair_nome_do_pdf
+- detectar_qr_code_na_imagem (apenas a detecção; a renderização fica fora)
+- detectar_qr_quadro_inteiro (o mesmo, sem o pré-filtro de localizadores)
+- /api/upload-pdf (uma requisição por documento)
+- /api/extract-qr (todos os documentos em uma requisição)
+- /api/batch-process (todos os documentos em uma requisição)
+
+Os resultados podem ser gravados como baseline JSON e comparados em
+execuções futuras para detectar regressões de desempenho.
+
+Uso:
+    python benchmarks/bench.py
+    python benchmarks/bench.py --tamanhos 10 100 --salvar-baseline benchmarks/baseline.json
+    python benchmarks/bench.py --tamanhos 10 100 --comparar benchmarks/baseline.json
+"""
+
+import argparse
+import io
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+import tracemalloc
+
+PASTA_BENCHMARKS = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(PASTA_BENCHMARKS))
+sys.path.insert(0, PASTA_BENCHMARKS)
+
+from corpus import gerar_corpus, posicao_qr, LAYOUTS, TAMANHOS
+from memoria import AmostradorRSS
+
+CASOS = ['extrair_nome_do_pdf', 'detectar_qr_code_na_imagem', 'detectar_qr_quadro_inteiro',
+         'upload_pdf', 'extract_qr', 'batch_process']
+
+def preparar_app(extracao_processos=0):
+    """Importa a aplicação com uma pasta de dados temporária e isolada."""
+    os.environ['QR_DATA_DIR'] = tempfile.mkdtemp(prefix='qr_bench_')
+    # O log do servidor por documento não entra na medição (QR_LOG_NIVEL=INFO para vê-lo)
+    os.environ.setdefault('QR_LOG_NIVEL', 'WARNING')
+    from src.main import create_app
+    return create_app({
+        'MAX_CONTENT_LENGTH': None,  # lotes de 1000 diplomas passam de 50MB
+        'EXTRACAO_PROCESSOS': extracao_processos,
+    })
+
+# ====================================================================
+# CASOS DE BENCHMARK
+# ====================================================================
+# Cada caso recebe o corpus e retorna (segundos medidos, documentos com sucesso).
+
+def caso_extrair_nome(corpus, contexto):
+    from src.routes.pdf_qr import extrair_nome_do_pdf
+    inicio = time.perf_counter()
+    sucesso = sum(1 for item in corpus if extrair_nome_do_pdf(item['assinado']))
+    return time.perf_counter() - inicio, sucesso
+
+def caso_detectar_qr(corpus, contexto, prefiltro=None):
+    import fitz
+    import numpy as np
+    from PIL import Image
+    from src.routes.pdf_qr import detectar_qr_code_na_imagem
+
+    medido = 0.0
+    sucesso = 0
+    for item in corpus:
+        # Renderiza como o /extract-qr faz, mas fora da medição
+        doc = fitz.open(stream=item['assinado'], filetype='pdf')
+        pix = doc[0].get_pixmap(matrix=fitz.Matrix(3.0, 3.0))
+        img_array = np.array(Image.open(io.BytesIO(pix.tobytes('ppm'))))
+        doc.close()
+
+        inicio = time.perf_counter()
+        if detectar_qr_code_na_imagem(img_array, prefiltro=prefiltro):
+            sucesso += 1
+        medido += time.perf_counter() - inicio
+    return medido, sucesso
+
+def caso_detectar_qr_quadro_inteiro(corpus, contexto):
+    # Caminho anterior ao pré-filtro: OpenCV (e threshold) sempre na página inteira
+    return caso_detectar_qr(corpus, contexto, prefiltro=False)
+
+def caso_upload_pdf(corpus, contexto):
+    cliente = contexto['app'].test_client()
+    inicio = time.perf_counter()
+    sucesso = 0
+    for item in corpus:
+        resposta = cliente.post('/api/upload-pdf', data={'pdf': (io.BytesIO(item['em_branco']), 'diploma.pdf')},
+                                content_type='multipart/form-data')
+        sucesso += resposta.status_code == 200
+    return time.perf_counter() - inicio, sucesso
+
+def caso_extract_qr(corpus, contexto):
+    cliente = contexto['app'].test_client()
+    dados = {'pdfs': [(io.BytesIO(item['assinado']), f"{item['nome']}.pdf") for item in corpus]}
+    inicio = time.perf_counter()
+    resposta = cliente.post('/api/extract-qr', data=dados, content_type='multipart/form-data')
+    duracao = time.perf_counter() - inicio
+    return duracao, resposta.get_json().get('total_extracted', 0)
+
+def caso_batch_process(corpus, contexto):
+    cliente = contexto['app'].test_client()
+    x, y, lado = posicao_qr(contexto['layout_posicao'], contexto['tamanho'])
+    dados = {
+        'pdfs': [(io.BytesIO(item['em_branco']), f"{item['nome'].replace(' ', '_')}.pdf") for item in corpus],
+        'qrs': [(io.BytesIO(item['qr_png']), f"{item['nome']}.png") for item in corpus],
+        'qr_position': json.dumps({'x': x, 'y': y, 'size': lado})
+    }
+    inicio = time.perf_counter()
+    resposta = cliente.post('/api/batch-process', data=dados, content_type='multipart/form-data')
+    duracao = time.perf_counter() - inicio
+    return duracao, resposta.get_json().get('total_processed', 0)
+
+FUNCOES_CASOS = {
+    'extrair_nome_do_pdf': caso_extrair_nome,
+    'detectar_qr_code_na_imagem': caso_detectar_qr,
+    'detectar_qr_quadro_inteiro': caso_detectar_qr_quadro_inteiro,
+    'upload_pdf': caso_upload_pdf,
+    'extract_qr': caso_extract_qr,
+    'batch_process': caso_batch_process,
+}
+
+# ====================================================================
+# EXECUÇÃO E COMPARAÇÃO
+# ====================================================================
+
+def medir_caso(nome, corpus, contexto, usar_tracemalloc):
+    """Executa um caso medindo tempo, vazão e memória."""
+    if usar_tracemalloc:
+        tracemalloc.start()
+    with AmostradorRSS() as amostrador:
+        segundos, sucesso = FUNCOES_CASOS[nome](corpus, contexto)
+    pico_python = None
+    if usar_tracemalloc:
+        pico_python = tracemalloc.get_traced_memory()[1] / (1024 * 1024)
+        tracemalloc.stop()
+
+    return {
+        'documentos': len(corpus),
+        'sucesso': sucesso,
+        'segundos': round(segundos, 4),
+        'docs_por_segundo': round(len(corpus) / segundos, 2) if segundos > 0 else None,
+        'pico_rss_mb': round(amostrador.pico_mb, 1) if amostrador.pico_mb is not None else None,
+        'incremento_rss_mb': (round(amostrador.pico_mb - amostrador.inicial_mb, 1)
+                              if amostrador.pico_mb is not None else None),
+        'pico_python_mb': round(pico_python, 1) if pico_python is not None else None,
+    }
+
+def comparar(resultados, baseline, tolerancia):
+    """
+    Compara os resultados com a baseline.
+
+    Returns:
+        list: Mensagens de regressão (vazia se nada piorou além da tolerância)
+    """
+    regressoes = []
+    for caso, por_tamanho in resultados['resultados'].items():
+        for tamanho, atual in por_tamanho.items():
+            anterior = baseline.get('resultados', {}).get(caso, {}).get(tamanho)
+            if not anterior:
+                continue
+            if anterior['docs_por_segundo'] and atual['docs_por_segundo']:
+                variacao = atual['docs_por_segundo'] / anterior['docs_por_segundo'] - 1
+                status = '❌' if variacao < -tolerancia else '✅'
+                print(f"{status} {caso} [{tamanho}]: {anterior['docs_por_segundo']} → "
+                      f"{atual['docs_por_segundo']} docs/s ({variacao:+.1%})")
+                if variacao < -tolerancia:
+                    regressoes.append(f'{caso} [{tamanho}]: vazão caiu {-variacao:.1%}')
+            if anterior.get('incremento_rss_mb') and atual.get('incremento_rss_mb'):
+                variacao = atual['incremento_rss_mb'] / anterior['incremento_rss_mb'] - 1
+                if variacao > tolerancia and atual['incremento_rss_mb'] - anterior['incremento_rss_mb'] > 5:
+                    regressoes.append(f'{caso} [{tamanho}]: memória subiu {variacao:.1%}')
+    return regressoes
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark do pipeline de QR codes em PDFs')
+    parser.add_argument('--tamanhos', type=int, nargs='+', default=[10, 100, 1000],
+                        help='Quantidades de documentos a medir')
+    parser.add_argument('--casos', nargs='+', default=CASOS, choices=CASOS)
+    parser.add_argument('--layout', default='bacharelado', choices=sorted(LAYOUTS))
+    parser.add_argument('--paginas', type=int, default=1)
+    parser.add_argument('--tamanho-pagina', default='a4', choices=sorted(TAMANHOS))
+    parser.add_argument('--extracao-processos', type=int, default=0,
+                        help='Processos detectores do extract_qr (memória compartilhada); 0 = no próprio processo')
+    parser.add_argument('--tracemalloc', action='store_true',
+                        help='Mede também o pico de alocações Python (mais lento)')
+    parser.add_argument('--salvar-baseline', metavar='ARQUIVO', help='Grava os resultados como baseline JSON')
+    parser.add_argument('--comparar', metavar='ARQUIVO', help='Compara com uma baseline JSON')
+    parser.add_argument('--tolerancia', type=float, default=0.15,
+                        help='Piora relativa aceita antes de acusar regressão (padrão 15%%)')
+    args = parser.parse_args()
+
+    print(f'🧪 Gerando corpus sintético ({max(args.tamanhos)} diplomas)...')
+    corpus_completo = gerar_corpus(max(args.tamanhos), layout=args.layout,
+                                   paginas=args.paginas, tamanho=args.tamanho_pagina)
+    contexto = {'app': preparar_app(args.extracao_processos), 'layout_posicao': args.layout, 'tamanho': args.tamanho_pagina}
+
+    resultados = {
+        'gerado_em': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': platform.python_version(),
+        'plataforma': platform.platform(),
+        'parametros': {'layout': args.layout, 'paginas': args.paginas, 'tamanho_pagina': args.tamanho_pagina,
+                       'extracao_processos': args.extracao_processos},
+        'resultados': {}
+    }
+
+    for caso in args.casos:
+        # Aquecimento: inicializações preguiçosas (banco, detector, fontes) ficam fora da medição
+        FUNCOES_CASOS[caso](corpus_completo[:1], contexto)
+
+        for tamanho in sorted(args.tamanhos):
+            medicao = medir_caso(caso, corpus_completo[:tamanho], contexto, args.tracemalloc)
+            resultados['resultados'].setdefault(caso, {})[str(tamanho)] = medicao
+            print(f"⏱ {caso:28s} {tamanho:5d} docs: {medicao['segundos']:8.3f}s "
+                  f"{medicao['docs_por_segundo'] or 0:8.2f} docs/s  pico RSS {medicao['pico_rss_mb']} MB  "
+                  f"sucesso {medicao['sucesso']}/{tamanho}")
+
+    if args.salvar_baseline:
+        with open(args.salvar_baseline, 'w', encoding='utf-8') as arquivo:
+            json.dump(resultados, arquivo, ensure_ascii=False, indent=2)
+        print(f'💾 Baseline gravada em {args.salvar_baseline}')
+
+    if args.comparar:
+        with open(args.comparar, encoding='utf-8') as arquivo:
+            baseline = json.load(arquivo)
+        regressoes = comparar(resultados, baseline, args.tolerancia)
+        if regressoes:
+            print('❌ Regressões de desempenho:')
+            for regressao in regressoes:
+                print(f'   - {regressao}')
+            sys.exit(1)
+        print('✅ Nenhuma regressão além da tolerância')
+
+if __name__ == '__main__':
+    main()
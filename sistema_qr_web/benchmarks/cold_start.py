@@ -0,0 +1,155 @@
+#!/usr/bin/env python3
+"""
+Tempo de inicialização a frio (cold start) da aplicação.
+
+Cada medição roda em um processo Python novo, como um worker recém-criado
+por escalonamento sob demanda:
+- nomes: importar src.services.nomes (matching de nomes, sem bibliotecas pesadas)
+- app: importar src.main e executar create_app()
+- primeira_requisicao: primeiro /api/upload-pdf após create_app() (paga a
+  importação preguiçosa do PyMuPDF)
+- wsgi: importar src.wsgi (pré-carregamento do processo mestre do gunicorn)
+
+Também lista quais bibliotecas pesadas já estão carregadas após create_app().
+Os resultados (mediana de N execuções) podem ser gravados como baseline e
+comparados em execuções futuras, como em bench.py.
+
+Uso:
+    python benchmarks/cold_start.py
+    python benchmarks/cold_start.py --execucoes 10 --salvar-baseline benchmarks/cold_start.json
+    python benchmarks/cold_start.py --comparar benchmarks/cold_start.json
+"""
+
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+PASTA_BENCHMARKS = os.path.dirname(os.path.abspath(__file__))
+PASTA_APP = os.path.dirname(PASTA_BENCHMARKS)
+sys.path.insert(0, PASTA_BENCHMARKS)
+
+BIBLIOTECAS_PESADAS = ['fitz', 'cv2', 'numpy', 'PIL.Image']
+
+# Código executado no processo novo; imprime um JSON com os tempos em segundos
+_CODIGO_FILHO = r'''
+import io, json, sys, time
+inicio = time.perf_counter()
+sys.path.insert(0, '.')
+medicao = sys.argv[1]
+resultado = {}
+if medicao == 'nomes':
+    import src.services.nomes
+    resultado['nomes'] = time.perf_counter() - inicio
+elif medicao == 'app':
+    from src.main import create_app
+    app = create_app()
+    resultado['app'] = time.perf_counter() - inicio
+    resultado['carregadas'] = [nome for nome in %(bibliotecas)r if nome in sys.modules]
+    with open(sys.argv[2], 'rb') as arquivo:
+        pdf = arquivo.read()
+    antes = time.perf_counter()
+    resposta = app.test_client().post('/api/upload-pdf', data={'pdf': (io.BytesIO(pdf), 'diploma.pdf')},
+                                      content_type='multipart/form-data')
+    assert resposta.status_code == 200, resposta.status_code
+    resultado['primeira_requisicao'] = time.perf_counter() - antes
+elif medicao == 'wsgi':
+    import src.wsgi
+    resultado['wsgi'] = time.perf_counter() - inicio
+print(json.dumps(resultado))
+''' % {'bibliotecas': BIBLIOTECAS_PESADAS}
+
+MEDICOES = ['nomes', 'app', 'wsgi']
+
+def executar_filho(medicao, caminho_pdf, pasta_dados):
+    """Roda uma medição em um interpretador novo e retorna o dicionário de tempos."""
+    ambiente = dict(os.environ, QR_DATA_DIR=pasta_dados)
+    inicio = time.perf_counter()
+    saida = subprocess.run([sys.executable, '-c', _CODIGO_FILHO, medicao, caminho_pdf], cwd=PASTA_APP,
+                           env=ambiente, capture_output=True, text=True, check=True).stdout
+    resultado = json.loads(saida.strip().splitlines()[-1])
+    resultado[f'{medicao}_processo'] = time.perf_counter() - inicio
+    return resultado
+
+def comparar(resultados, baseline, tolerancia):
+    """Retorna as regressões (tempo mediano acima da tolerância) em relação à baseline."""
+    regressoes = []
+    for nome, atual in resultados['resultados'].items():
+        anterior = baseline.get('resultados', {}).get(nome)
+        if not anterior:
+            continue
+        variacao = atual['mediana_ms'] / anterior['mediana_ms'] - 1
+        status = '❌' if variacao > tolerancia else '✅'
+        print(f"{status} {nome}: {anterior['mediana_ms']} → {atual['mediana_ms']} ms ({variacao:+.1%})")
+        # Variações de poucos milissegundos são ruído do sistema de arquivos
+        if variacao > tolerancia and atual['mediana_ms'] - anterior['mediana_ms'] > 20:
+            regressoes.append(f'{nome}: inicialização {variacao:.1%} mais lenta')
+    return regressoes
+
+def main():
+    parser = argparse.ArgumentParser(description='Tempo de inicialização a frio da aplicação')
+    parser.add_argument('--execucoes', type=int, default=5, help='Processos por medição (usa a mediana)')
+    parser.add_argument('--medicoes', nargs='+', default=MEDICOES, choices=MEDICOES)
+    parser.add_argument('--salvar-baseline', metavar='ARQUIVO', help='Grava os resultados como baseline JSON')
+    parser.add_argument('--comparar', metavar='ARQUIVO', help='Compara com uma baseline JSON')
+    parser.add_argument('--tolerancia', type=float, default=0.25,
+                        help='Piora relativa aceita antes de acusar regressão (padrão 25%%)')
+    args = parser.parse_args()
+
+    from corpus import gerar_diploma
+    pasta_dados = tempfile.mkdtemp(prefix='qr_cold_')
+    caminho_pdf = os.path.join(pasta_dados, 'diploma.pdf')
+    with open(caminho_pdf, 'wb') as arquivo:
+        arquivo.write(gerar_diploma('Maria da Silva', '202400001'))
+
+    # Uma execução descartada aquece o cache de arquivos do sistema operacional
+    executar_filho('app', caminho_pdf, pasta_dados)
+
+    tempos = {}
+    carregadas = None
+    for medicao in args.medicoes:
+        for _ in range(args.execucoes):
+            resultado = executar_filho(medicao, caminho_pdf, pasta_dados)
+            carregadas = resultado.pop('carregadas', carregadas)
+            for nome, segundos in resultado.items():
+                tempos.setdefault(nome, []).append(segundos * 1000)
+
+    resultados = {
+        'gerado_em': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': platform.python_version(),
+        'plataforma': platform.platform(),
+        'bibliotecas_apos_create_app': carregadas,
+        'resultados': {
+            nome: {'mediana_ms': round(statistics.median(valores), 1), 'max_ms': round(max(valores), 1)}
+            for nome, valores in tempos.items()
+        }
+    }
+
+    for nome, item in resultados['resultados'].items():
+        print(f"⏱ {nome:28s} mediana {item['mediana_ms']:8.1f} ms   máx {item['max_ms']:8.1f} ms")
+    if carregadas is not None:
+        print(f"📦 Bibliotecas pesadas carregadas após create_app(): {', '.join(carregadas) or 'nenhuma'}")
+
+    if args.salvar_baseline:
+        with open(args.salvar_baseline, 'w', encoding='utf-8') as arquivo:
+            json.dump(resultados, arquivo, ensure_ascii=False, indent=2)
+        print(f'💾 Baseline gravada em {args.salvar_baseline}')
+
+    if args.comparar:
+        with open(args.comparar, encoding='utf-8') as arquivo:
+            baseline = json.load(arquivo)
+        regressoes = comparar(resultados, baseline, args.tolerancia)
+        if regressoes:
+            print('❌ Regressões de inicialização:')
+            for regressao in regressoes:
+                print(f'   - {regressao}')
+            sys.exit(1)
+        print('✅ Nenhuma regressão além da tolerância')
+
+if __name__ == '__main__':
+    main()
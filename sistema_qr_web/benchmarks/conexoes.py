@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+"""
+Concorrência de conexões: servidor WSGI (gunicorn) x ASGI (uvicorn).
+
+Simula muitos clientes lentos (uploads enviados aos poucos, como em uma
+rede ruim) disputando o servidor com alguns clientes rápidos, e mede:
+- latência p50/p95 e vazão dos clientes rápidos enquanto os lentos ocupam conexões
+- quantos uploads lentos terminaram e com que latência
+- erros (status != 200 ou falha de conexão)
+
+Os dois servidores recebem o mesmo número de threads: no WSGI cada upload
+lento prende uma thread; no ASGI a leitura do corpo fica no event loop.
+
+Uso:
+    python benchmarks/conexoes.py --lentos 32 --rapidos 4 --threads 4 --duracao 20
+    python benchmarks/conexoes.py --servidores asgi --kbps 16
+"""
+
+import argparse
+import http.client
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+
+PASTA_BENCHMARKS = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, PASTA_BENCHMARKS)
+
+from corpus import gerar_corpus
+from load_test import montar_multipart, percentil, porta_livre, aguardar_servidor, iniciar_servidor
+
+SERVIDORES = {
+    'wsgi': 'gunicorn -c gunicorn.conf.py --bind 127.0.0.1:{porta} --workers 1 --threads {threads}',
+    'asgi': 'uvicorn src.asgi:app --host 127.0.0.1 --port {porta} --log-level warning',
+}
+
+TAMANHO_BLOCO = 1024
+
+def enviar_upload(porta, corpo, content_type, kbps, timeout):
+    """
+    Envia um POST /api/upload-pdf; com kbps > 0 o corpo sai em blocos espaçados.
+
+    Returns:
+        tuple: (status, segundos); status 0 indica falha de conexão
+    """
+    inicio = time.perf_counter()
+    try:
+        conexao = http.client.HTTPConnection('127.0.0.1', porta, timeout=timeout)
+        conexao.putrequest('POST', '/api/upload-pdf')
+        conexao.putheader('Content-Type', content_type)
+        conexao.putheader('Content-Length', str(len(corpo)))
+        conexao.endheaders()
+        intervalo = TAMANHO_BLOCO / (kbps * 1024) if kbps else 0
+        for posicao in range(0, len(corpo), TAMANHO_BLOCO):
+            # A pausa vem antes do bloco: o servidor fica esperando o resto do corpo
+            if intervalo:
+                time.sleep(intervalo)
+            conexao.send(corpo[posicao:posicao + TAMANHO_BLOCO])
+        resposta = conexao.getresponse()
+        resposta.read()
+        status = resposta.status
+        conexao.close()
+    except (OSError, http.client.HTTPException):
+        status = 0
+    return status, time.perf_counter() - inicio
+
+def medir_servidor(nome, args, corpos):
+    """Sobe o servidor, aplica a carga mista e retorna o resumo."""
+    porta = porta_livre()
+    os.environ['QR_ASGI_THREADS'] = str(args.threads)
+    os.environ['QR_ASGI_CPU'] = str(args.threads)
+    processo = iniciar_servidor(SERVIDORES[nome].replace('{threads}', str(args.threads)),
+                                porta, tempfile.mkdtemp(prefix='qr_conexoes_'))
+    resultados = {'lento': [], 'rapido': []}
+    lock = threading.Lock()
+    try:
+        aguardar_servidor(f'http://127.0.0.1:{porta}', processo)
+        # Aquecimento: importações preguiçosas ficam fora da medição
+        enviar_upload(porta, *corpos[0], 0, args.timeout)
+
+        fim = time.perf_counter() + args.duracao
+
+        def cliente(tipo, indice):
+            rng = random.Random(indice)
+            kbps = args.kbps if tipo == 'lento' else 0
+            while time.perf_counter() < fim:
+                status, segundos = enviar_upload(porta, *rng.choice(corpos), kbps, args.timeout)
+                with lock:
+                    resultados[tipo].append((status, segundos))
+
+        threads = [threading.Thread(target=cliente, args=('lento', indice)) for indice in range(args.lentos)]
+        threads += [threading.Thread(target=cliente, args=('rapido', 1000 + indice)) for indice in range(args.rapidos)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    finally:
+        processo.terminate()
+        processo.wait(timeout=30)
+
+    resumo = {}
+    for tipo, registros in resultados.items():
+        latencias = [segundos for status, segundos in registros if status == 200]
+        resumo[tipo] = {
+            'concluidas': len(latencias),
+            'erros': len(registros) - len(latencias),
+            'vazao_rps': round(len(latencias) / args.duracao, 2),
+            'p50_ms': round(percentil(latencias, 50) * 1000, 1) if latencias else None,
+            'p95_ms': round(percentil(latencias, 95) * 1000, 1) if latencias else None,
+        }
+    return resumo
+
+def main():
+    parser = argparse.ArgumentParser(description='Concorrência de conexões: WSGI x ASGI')
+    parser.add_argument('--servidores', nargs='+', default=list(SERVIDORES), choices=list(SERVIDORES))
+    parser.add_argument('--lentos', type=int, default=32, help='Clientes com upload lento')
+    parser.add_argument('--rapidos', type=int, default=4, help='Clientes com upload rápido')
+    parser.add_argument('--kbps', type=float, default=4, help='Velocidade de envio dos clientes lentos (KB/s)')
+    parser.add_argument('--threads', type=int, default=4, help='Threads do servidor (WSGI) / executores (ASGI)')
+    parser.add_argument('--duracao', type=float, default=20, help='Duração da carga em segundos')
+    parser.add_argument('--timeout', type=float, default=120)
+    args = parser.parse_args()
+
+    print('🧪 Gerando corpus sintético...')
+    corpos = [montar_multipart({}, [('pdf', 'diploma.pdf', item['em_branco'], 'application/pdf')])
+              for item in gerar_corpus(5)]
+
+    print(f"\n{'servidor':8s} {'cliente':8s} {'ok':>6s} {'erros':>6s} {'rps':>7s} {'p50 ms':>9s} {'p95 ms':>9s}")
+    for nome in args.servidores:
+        resumo = medir_servidor(nome, args, corpos)
+        for tipo, item in resumo.items():
+            print(f"{nome:8s} {tipo:8s} {item['concluidas']:6d} {item['erros']:6d} {item['vazao_rps']:7.2f} "
+                  f"{item['p50_ms'] or 0:9.1f} {item['p95_ms'] or 0:9.1f}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,210 @@
+#!/usr/bin/env python3
+"""
+Gerador de corpus sintético de diplomas para benchmarks.
+
+Gera, com PyMuPDF e o codificador de QR do OpenCV:
+- diplomas assinados (com QR embutido), usados por /extract-qr
+- diplomas em branco (sem QR), usados por /batch-process
+- PNGs dos QRs nomeados pelo aluno, usados por /batch-process
+- roster.csv com nome e matrícula, usado por /roster
+
+Uso:
+    python benchmarks/corpus.py --quantidade 100 --saida /tmp/corpus
+    python benchmarks/corpus.py --quantidade 10 --layout licenciatura --paginas 3 --tamanho a4-paisagem
+"""
+
+import argparse
+import os
+import random
+
+import cv2
+import fitz
+
+PRENOMES = [
+    'João', 'José', 'Antônio', 'Márcia', 'Lúcia', 'Conceição', 'Inês', 'Sebastião',
+    'Patrícia', 'Flávia', 'Vinícius', 'Cauã', 'Luís', 'Mônica', 'Débora', 'Fábio',
+    'Cláudia', 'Tânia', 'Alícia', 'Letícia', 'Otávio', 'Júlia', 'Caio', 'Beatriz',
+    'Renê', 'Amélia', 'Estêvão', 'Raíssa', 'Lívia', 'Simão'
+]
+
+SOBRENOMES = [
+    'Araújo', 'Gonçalves', 'Magalhães', 'Simões', 'Brandão', 'Guimarães', 'Assunção',
+    'Lemos', 'Falcão', 'Peixoto', 'Rodrigues', 'Sá', 'Pereira', 'Mendonça', 'Conceição',
+    'Antunes', 'Damião', 'Fontes', 'Lopes', 'Nóbrega', 'Cordeiro', 'Queiroz', 'Romão'
+]
+
+# Conectores aceitos no meio do nome ('de' encerra o nome na extração por padrão)
+CONECTORES = ['da', 'dos', 'das']
+
+# Tamanhos de página em pontos
+TAMANHOS = {
+    'a4': (595, 842),
+    'a4-paisagem': (842, 595),
+    'a3': (842, 1191),
+    'carta': (612, 792),
+}
+
+# Layouts de modelo: posição relativa do nome e do QR em cada tipo de diploma
+LAYOUTS = {
+    'bacharelado': {
+        'titulo': 'DIPLOMA DE BACHARELADO',
+        'frase_nome': 'Certificamos que {nome}, portador(a) do registro {matricula},',
+        'frase_curso': 'concluiu o curso de Bacharelado em Administração.',
+        'nome_rel': (0.12, 0.30),
+        'qr_rel': (0.75, 0.78, 0.14),
+    },
+    'licenciatura': {
+        'titulo': 'DIPLOMA DE LICENCIATURA',
+        'frase_nome': 'Nome do aluno: {nome}',
+        'frase_curso': 'Curso: Licenciatura em Letras - Registro {matricula}',
+        'nome_rel': (0.10, 0.40),
+        'qr_rel': (0.08, 0.80, 0.12),
+    },
+    'pos_graduacao': {
+        'titulo': 'CERTIFICADO DE ESPECIALIZAÇÃO',
+        'frase_nome': 'Aluno: {nome}',
+        'frase_curso': 'Especialização em Gestão Pública - Registro {matricula}',
+        'nome_rel': (0.15, 0.25),
+        'qr_rel': (0.80, 0.06, 0.12),
+    },
+}
+
+def gerar_nome(rng):
+    """Gera um nome brasileiro aleatório com acentos (2 a 5 palavras)."""
+    partes = [rng.choice(PRENOMES)]
+    if rng.random() < 0.3:
+        partes.append(rng.choice(PRENOMES))
+    if rng.random() < 0.4:
+        partes.append(rng.choice(CONECTORES))
+    partes.append(rng.choice(SOBRENOMES))
+    if rng.random() < 0.5:
+        partes.append(rng.choice(SOBRENOMES))
+    return ' '.join(partes)
+
+def gerar_qr_png(conteudo, escala=8, borda=4):
+    """Gera o PNG de um QR code com o codificador do OpenCV."""
+    codificador = cv2.QRCodeEncoder.create()
+    matriz = codificador.encode(conteudo)
+    matriz = cv2.resize(matriz, None, fx=escala, fy=escala, interpolation=cv2.INTER_NEAREST)
+    margem = borda * escala
+    matriz = cv2.copyMakeBorder(matriz, margem, margem, margem, margem, cv2.BORDER_CONSTANT, value=255)
+    _, buffer = cv2.imencode('.png', matriz)
+    return buffer.tobytes()
+
+def posicao_qr(layout, tamanho='a4'):
+    """Retorna (x, y, size) em pontos da posição do QR no modelo."""
+    largura, altura = TAMANHOS[tamanho]
+    rel_x, rel_y, rel_tamanho = LAYOUTS[layout]['qr_rel']
+    lado = rel_tamanho * min(largura, altura)
+    return (rel_x * largura, min(rel_y * altura, altura - lado), lado)
+
+def gerar_diploma(nome, matricula, layout='bacharelado', paginas=1, tamanho='a4', qr_png=None):
+    """
+    Gera o PDF de um diploma.
+
+    Args:
+        nome (str): Nome do aluno
+        matricula (str): Matrícula impressa no diploma
+        layout (str): Chave de LAYOUTS
+        paginas (int): Total de páginas (as extras simulam verso/histórico)
+        tamanho (str): Chave de TAMANHOS
+        qr_png (bytes or None): QR a embutir na primeira página (diploma assinado)
+
+    Returns:
+        bytes: Conteúdo do PDF
+    """
+    modelo = LAYOUTS[layout]
+    largura, altura = TAMANHOS[tamanho]
+    doc = fitz.open()
+
+    pagina = doc.new_page(width=largura, height=altura)
+    pagina.draw_rect(fitz.Rect(20, 20, largura - 20, altura - 20), color=(0.2, 0.2, 0.5), width=3)
+    pagina.insert_text((largura * 0.12, altura * 0.12), 'UNIVERSIDADE FEDERAL DE EXEMPLO', fontsize=14)
+    pagina.insert_text((largura * 0.12, altura * 0.18), modelo['titulo'], fontsize=20)
+    nome_x, nome_y = modelo['nome_rel']
+    pagina.insert_text((largura * nome_x, altura * nome_y),
+                       modelo['frase_nome'].format(nome=nome, matricula=matricula), fontsize=12)
+    pagina.insert_text((largura * nome_x, altura * nome_y + 20),
+                       modelo['frase_curso'].format(nome=nome, matricula=matricula), fontsize=11)
+    pagina.insert_text((largura * 0.12, altura * 0.62), 'Data de conclusão: 15 de dezembro de 2024', fontsize=10)
+
+    if qr_png is not None:
+        x, y, lado = posicao_qr(layout, tamanho)
+        pagina.insert_image(fitz.Rect(x, y, x + lado, y + lado), stream=qr_png)
+
+    for numero in range(1, paginas):
+        extra = doc.new_page(width=largura, height=altura)
+        extra.insert_text((72, 72), f'Histórico escolar - página {numero + 1}', fontsize=12)
+        for linha in range(30):
+            extra.insert_text((72, 110 + linha * 18), f'Disciplina {linha + 1:02d} ........ 60h ........ 9,{linha % 10}',
+                              fontsize=9)
+
+    dados = doc.tobytes(garbage=3, deflate=True)
+    doc.close()
+    return dados
+
+def gerar_corpus(quantidade, semente=42, layout='bacharelado', paginas=1, tamanho='a4'):
+    """
+    Gera em memória um corpus de diplomas.
+
+    Args:
+        layout (str): Chave de LAYOUTS ou 'misto' (sorteia o layout por aluno)
+
+    Returns:
+        list: [{'nome', 'matricula', 'layout', 'assinado', 'em_branco', 'qr_png'}]
+    """
+    rng = random.Random(semente)
+    corpus = []
+    nomes_usados = set()
+    for indice in range(quantidade):
+        nome = gerar_nome(rng)
+        while nome in nomes_usados:
+            nome = gerar_nome(rng)
+        nomes_usados.add(nome)
+
+        matricula = f'2024{indice:05d}'
+        layout_aluno = rng.choice(sorted(LAYOUTS)) if layout == 'misto' else layout
+        qr_png = gerar_qr_png(f'https://diplomas.exemplo.edu.br/validar/{matricula}')
+        corpus.append({
+            'nome': nome,
+            'matricula': matricula,
+            'layout': layout_aluno,
+            'assinado': gerar_diploma(nome, matricula, layout_aluno, paginas, tamanho, qr_png),
+            'em_branco': gerar_diploma(nome, matricula, layout_aluno, paginas, tamanho),
+            'qr_png': qr_png,
+        })
+    return corpus
+
+def salvar_corpus(corpus, pasta):
+    """Grava o corpus em pasta/assinados, pasta/em_branco, pasta/qrs e pasta/roster.csv."""
+    for subpasta in ('assinados', 'em_branco', 'qrs'):
+        os.makedirs(os.path.join(pasta, subpasta), exist_ok=True)
+
+    with open(os.path.join(pasta, 'roster.csv'), 'w', encoding='utf-8') as roster:
+        roster.write('matricula;nome\n')
+        for item in corpus:
+            arquivo = item['nome'].replace(' ', '_')
+            with open(os.path.join(pasta, 'assinados', f'{arquivo}.pdf'), 'wb') as saida:
+                saida.write(item['assinado'])
+            with open(os.path.join(pasta, 'em_branco', f'{arquivo}.pdf'), 'wb') as saida:
+                saida.write(item['em_branco'])
+            with open(os.path.join(pasta, 'qrs', f"{item['nome']}.png"), 'wb') as saida:
+                saida.write(item['qr_png'])
+            roster.write(f"{item['matricula']};{item['nome']}\n")
+
+def main():
+    parser = argparse.ArgumentParser(description='Gera um corpus sintético de diplomas com QR codes')
+    parser.add_argument('--quantidade', type=int, default=10, help='Número de alunos/diplomas')
+    parser.add_argument('--saida', required=True, help='Pasta de saída')
+    parser.add_argument('--layout', default='bacharelado', choices=sorted(LAYOUTS) + ['misto'])
+    parser.add_argument('--paginas', type=int, default=1, help='Páginas por diploma')
+    parser.add_argument('--tamanho', default='a4', choices=sorted(TAMANHOS))
+    parser.add_argument('--semente', type=int, default=42)
+    args = parser.parse_args()
+
+    corpus = gerar_corpus(args.quantidade, args.semente, args.layout, args.paginas, args.tamanho)
+    salvar_corpus(corpus, args.saida)
+    print(f'✅ {len(corpus)} diplomas gerados em {args.saida}')
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,317 @@
+#!/usr/bin/env python3
+"""
+Teste de carga HTTP da API de QR codes.
+
+Dispara requisições concorrentes contra /api/upload-pdf, /api/extract-qr,
+/api/insert-qr e /api/batch-process usando o corpus sintético, com mistura
+de endpoints configurável, e reporta latência p50/p95/p99, vazão, taxa de
+erros e o RSS do servidor ao longo do tempo.
+
+O servidor pode ser um já em execução (--url) ou iniciado pelo próprio
+teste (--comando), o que permite comparar configurações de servidor.
+
+Uso:
+    # Sobe o servidor de desenvolvimento de main.py e testa
+    python benchmarks/load_test.py --concorrencia 8 --duracao 30
+
+    # Servidor já em execução, mistura personalizada
+    python benchmarks/load_test.py --url http://localhost:5000 --pid 1234 \\
+        --mix upload-pdf=5,insert-qr=3,extract-qr=1,batch-process=1
+
+    # Modo de produção com gunicorn (a porta é passada em {porta})
+    python benchmarks/load_test.py --comando "gunicorn -c gunicorn.conf.py --bind 127.0.0.1:{porta}"
+"""
+
+import argparse
+import base64
+import json
+import os
+import random
+import shlex
+import socket
+import subprocess
+import sys
+import threading
+import time
+import urllib.error
+import urllib.request
+import uuid
+
+PASTA_BENCHMARKS = os.path.dirname(os.path.abspath(__file__))
+PASTA_APP = os.path.dirname(PASTA_BENCHMARKS)
+sys.path.insert(0, PASTA_BENCHMARKS)
+
+from corpus import gerar_corpus, posicao_qr
+from memoria import AmostradorRSS
+
+COMANDO_PADRAO = f'"{sys.executable}" src/main.py --host 127.0.0.1 --port {{porta}}'
+
+MIX_PADRAO = 'upload-pdf=4,insert-qr=3,extract-qr=1,batch-process=1'
+
+# ====================================================================
+# REQUISIÇÕES
+# ====================================================================
+
+def montar_multipart(campos, arquivos):
+    """
+    Monta um corpo multipart/form-data.
+
+    Args:
+        campos (dict): {nome: valor} de campos de texto
+        arquivos (list): [(campo, nome_arquivo, bytes, content_type)]
+
+    Returns:
+        tuple: (corpo, content_type)
+    """
+    fronteira = uuid.uuid4().hex
+    partes = []
+    for nome, valor in campos.items():
+        partes.append(f'--{fronteira}\r\nContent-Disposition: form-data; name="{nome}"\r\n\r\n{valor}\r\n'.encode())
+    for campo, nome_arquivo, dados, content_type in arquivos:
+        partes.append(f'--{fronteira}\r\nContent-Disposition: form-data; name="{campo}"; '
+                      f'filename="{nome_arquivo}"\r\nContent-Type: {content_type}\r\n\r\n'.encode())
+        partes.append(dados)
+        partes.append(b'\r\n')
+    partes.append(f'--{fronteira}--\r\n'.encode())
+    return b''.join(partes), f'multipart/form-data; boundary={fronteira}'
+
+class GeradorRequisicoes:
+    """Monta as requisições de cada endpoint a partir do corpus."""
+
+    def __init__(self, corpus, tamanho_lote, layout='bacharelado'):
+        self.corpus = corpus
+        self.tamanho_lote = tamanho_lote
+        self.posicao = posicao_qr(layout)
+
+    def _amostra(self, rng, quantidade):
+        return rng.sample(self.corpus, min(quantidade, len(self.corpus)))
+
+    def upload_pdf(self, rng):
+        item = rng.choice(self.corpus)
+        corpo, tipo = montar_multipart({}, [('pdf', 'diploma.pdf', item['em_branco'], 'application/pdf')])
+        return '/api/upload-pdf', corpo, tipo
+
+    def extract_qr(self, rng):
+        arquivos = [('pdfs', f"{item['nome']}.pdf", item['assinado'], 'application/pdf')
+                    for item in self._amostra(rng, max(1, self.tamanho_lote // 5))]
+        corpo, tipo = montar_multipart({}, arquivos)
+        return '/api/extract-qr', corpo, tipo
+
+    def insert_qr(self, rng):
+        item = rng.choice(self.corpus)
+        x, y, lado = self.posicao
+        corpo = json.dumps({
+            'pdf_base64': 'data:application/pdf;base64,' + base64.b64encode(item['em_branco']).decode(),
+            'qr_base64': 'data:image/png;base64,' + base64.b64encode(item['qr_png']).decode(),
+            'qr_positions': [{'page': 0, 'x': x, 'y': y, 'size': lado, 'real_width': 1, 'real_height': 1}]
+        }).encode()
+        return '/api/insert-qr', corpo, 'application/json'
+
+    def batch_process(self, rng):
+        amostra = self._amostra(rng, self.tamanho_lote)
+        x, y, lado = self.posicao
+        arquivos = [('pdfs', f"{item['nome'].replace(' ', '_')}.pdf", item['em_branco'], 'application/pdf')
+                    for item in amostra]
+        arquivos += [('qrs', f"{item['nome']}.png", item['qr_png'], 'image/png') for item in amostra]
+        corpo, tipo = montar_multipart({'qr_position': json.dumps({'x': x, 'y': y, 'size': lado})}, arquivos)
+        return '/api/batch-process', corpo, tipo
+
+    def montar(self, endpoint, rng):
+        return getattr(self, endpoint.replace('-', '_'))(rng)
+
+def enviar(url_base, caminho, corpo, content_type, timeout):
+    """Envia a requisição e retorna (status, segundos). Status 0 = falha de conexão."""
+    requisicao = urllib.request.Request(url_base + caminho, data=corpo, method='POST',
+                                        headers={'Content-Type': content_type})
+    inicio = time.perf_counter()
+    try:
+        with urllib.request.urlopen(requisicao, timeout=timeout) as resposta:
+            resposta.read()
+            status = resposta.status
+    except urllib.error.HTTPError as erro:
+        erro.read()
+        status = erro.code
+    except (urllib.error.URLError, OSError):
+        status = 0
+    return status, time.perf_counter() - inicio
+
+# ====================================================================
+# EXECUÇÃO DA CARGA
+# ====================================================================
+
+def interpretar_mix(texto):
+    """'upload-pdf=4,insert-qr=1' → ([endpoints], [pesos])"""
+    endpoints, pesos = [], []
+    for parte in texto.split(','):
+        endpoint, peso = parte.split('=')
+        if endpoint not in ('upload-pdf', 'extract-qr', 'insert-qr', 'batch-process'):
+            raise ValueError(f'Endpoint desconhecido no mix: {endpoint}')
+        endpoints.append(endpoint)
+        pesos.append(float(peso))
+    return endpoints, pesos
+
+def executar_carga(url_base, gerador, endpoints, pesos, concorrencia, duracao, total_requisicoes, timeout, semente):
+    """
+    Executa a carga com N clientes concorrentes (cada um em sua thread).
+
+    Returns:
+        list: [(endpoint, status, segundos, instante_fim)]
+    """
+    resultados = []
+    lock = threading.Lock()
+    inicio = time.perf_counter()
+    contador = {'enviadas': 0}
+
+    def cliente(indice):
+        rng = random.Random(semente + indice)
+        while True:
+            with lock:
+                if total_requisicoes and contador['enviadas'] >= total_requisicoes:
+                    return
+                contador['enviadas'] += 1
+            if not total_requisicoes and time.perf_counter() - inicio >= duracao:
+                return
+            endpoint = rng.choices(endpoints, pesos)[0]
+            caminho, corpo, content_type = gerador.montar(endpoint, rng)
+            status, segundos = enviar(url_base, caminho, corpo, content_type, timeout)
+            with lock:
+                resultados.append((endpoint, status, segundos, time.perf_counter() - inicio))
+
+    threads = [threading.Thread(target=cliente, args=(indice,)) for indice in range(concorrencia)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return resultados, time.perf_counter() - inicio
+
+def percentil(valores, p):
+    if not valores:
+        return None
+    ordenados = sorted(valores)
+    posicao = min(len(ordenados) - 1, max(0, int(round(p / 100 * len(ordenados) + 0.5)) - 1))
+    return ordenados[posicao]
+
+def resumir(resultados, duracao_total):
+    """Agrega latência, vazão e erros por endpoint e no total."""
+    grupos = {'total': resultados}
+    for registro in resultados:
+        grupos.setdefault(registro[0], []).append(registro)
+
+    resumo = {}
+    for nome, registros in grupos.items():
+        latencias = [segundos for _, status, segundos, _ in registros if 200 <= status < 300]
+        erros = sum(1 for _, status, _, _ in registros if not 200 <= status < 300)
+        por_status = {}
+        for _, status, _, _ in registros:
+            por_status[str(status)] = por_status.get(str(status), 0) + 1
+        resumo[nome] = {
+            'requisicoes': len(registros),
+            'vazao_rps': round(len(registros) / duracao_total, 2) if duracao_total else None,
+            'taxa_erro': round(erros / len(registros), 4) if registros else 0,
+            'p50_ms': round(percentil(latencias, 50) * 1000, 1) if latencias else None,
+            'p95_ms': round(percentil(latencias, 95) * 1000, 1) if latencias else None,
+            'p99_ms': round(percentil(latencias, 99) * 1000, 1) if latencias else None,
+            'status': por_status,
+        }
+    return resumo
+
+# ====================================================================
+# SERVIDOR
+# ====================================================================
+
+def porta_livre():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+def aguardar_servidor(url_base, processo, limite=60):
+    fim = time.time() + limite
+    while time.time() < fim:
+        if processo is not None and processo.poll() is not None:
+            raise RuntimeError('O servidor terminou antes de ficar pronto')
+        try:
+            urllib.request.urlopen(url_base + '/metrics', timeout=2).read()
+            return
+        except (urllib.error.URLError, OSError):
+            time.sleep(0.3)
+    raise RuntimeError('Tempo esgotado aguardando o servidor')
+
+def iniciar_servidor(comando, porta, pasta_dados):
+    ambiente = dict(os.environ, QR_DATA_DIR=pasta_dados)
+    comando = comando.format(porta=porta)
+    return subprocess.Popen(shlex.split(comando), cwd=PASTA_APP, env=ambiente,
+                            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+def main():
+    parser = argparse.ArgumentParser(description='Teste de carga HTTP da API de QR codes')
+    parser.add_argument('--url', help='URL de um servidor já em execução (ex: http://localhost:5000)')
+    parser.add_argument('--pid', type=int, help='PID do servidor já em execução, para medir o RSS')
+    parser.add_argument('--comando', default=COMANDO_PADRAO,
+                        help='Comando para iniciar o servidor ({porta} é substituído)')
+    parser.add_argument('--concorrencia', type=int, default=4, help='Clientes simultâneos')
+    parser.add_argument('--duracao', type=float, default=20, help='Duração da carga em segundos')
+    parser.add_argument('--requisicoes', type=int, default=0,
+                        help='Total de requisições (substitui --duracao quando > 0)')
+    parser.add_argument('--mix', default=MIX_PADRAO, help='Pesos por endpoint, ex: upload-pdf=4,batch-process=1')
+    parser.add_argument('--tamanho-lote', type=int, default=10, help='Diplomas por requisição de lote')
+    parser.add_argument('--corpus', type=int, default=30, help='Diplomas no corpus sintético')
+    parser.add_argument('--timeout', type=float, default=300)
+    parser.add_argument('--semente', type=int, default=42)
+    parser.add_argument('--saida', help='Grava o relatório completo em JSON')
+    args = parser.parse_args()
+
+    endpoints, pesos = interpretar_mix(args.mix)
+    print(f'🧪 Gerando corpus sintético ({args.corpus} diplomas)...')
+    gerador = GeradorRequisicoes(gerar_corpus(args.corpus, args.semente), args.tamanho_lote)
+
+    processo = None
+    if args.url:
+        url_base, pid = args.url.rstrip('/'), args.pid
+    else:
+        import tempfile
+        porta = porta_livre()
+        url_base = f'http://127.0.0.1:{porta}'
+        processo = iniciar_servidor(args.comando, porta, tempfile.mkdtemp(prefix='qr_load_'))
+        pid = processo.pid
+
+    try:
+        aguardar_servidor(url_base, processo)
+        print(f'🚀 Carga em {url_base}: {args.concorrencia} clientes, mix {args.mix}')
+        amostrador = AmostradorRSS(pid, intervalo=0.5, incluir_filhos=True) if pid else None
+        if amostrador:
+            amostrador.__enter__()
+        try:
+            resultados, duracao_total = executar_carga(url_base, gerador, endpoints, pesos, args.concorrencia,
+                                                       args.duracao, args.requisicoes, args.timeout, args.semente)
+        finally:
+            if amostrador:
+                amostrador.__exit__(None, None, None)
+    finally:
+        if processo is not None:
+            processo.terminate()
+            processo.wait(timeout=30)
+
+    resumo = resumir(resultados, duracao_total)
+    print(f"\n{'endpoint':16s} {'reqs':>6s} {'rps':>8s} {'erro':>7s} {'p50 ms':>9s} {'p95 ms':>9s} {'p99 ms':>9s}")
+    for nome, item in sorted(resumo.items(), key=lambda par: par[0] == 'total'):
+        print(f"{nome:16s} {item['requisicoes']:6d} {item['vazao_rps']:8.2f} {item['taxa_erro']:7.2%} "
+              f"{item['p50_ms'] or 0:9.1f} {item['p95_ms'] or 0:9.1f} {item['p99_ms'] or 0:9.1f}")
+
+    rss = [(round(instante, 1), round(valor, 1)) for instante, valor in amostrador.amostras] if amostrador else []
+    if rss:
+        print(f'\n💾 RSS do servidor: inicial {rss[0][1]} MB, pico {max(valor for _, valor in rss)} MB, '
+              f'final {rss[-1][1]} MB')
+
+    if args.saida:
+        relatorio = {
+            'parametros': vars(args),
+            'duracao_s': round(duracao_total, 2),
+            'resumo': resumo,
+            'rss_mb': rss,
+        }
+        with open(args.saida, 'w', encoding='utf-8') as arquivo:
+            json.dump(relatorio, arquivo, ensure_ascii=False, indent=2)
+        print(f'📄 Relatório gravado em {args.saida}')
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,105 @@
+"""
+Medição de memória residente (RSS) para os benchmarks.
+
+Lê /proc/<pid>/statm no Linux; em outros sistemas usa o pico do
+resource.getrusage (apenas para o próprio processo) ou retorna None.
+"""
+
+import os
+import threading
+import time
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+_TAMANHO_PAGINA = os.sysconf('SC_PAGE_SIZE') if hasattr(os, 'sysconf') else 4096
+
+def ler_rss_mb(pid=None):
+    """Retorna o RSS atual do processo em MB, ou None se indisponível."""
+    caminho = f"/proc/{pid or 'self'}/statm"
+    try:
+        with open(caminho) as arquivo:
+            paginas_residentes = int(arquivo.read().split()[1])
+        return paginas_residentes * _TAMANHO_PAGINA / (1024 * 1024)
+    except (OSError, ValueError, IndexError):
+        if pid is None and resource is not None:
+            return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+        return None
+
+def _filhos(pid):
+    """Retorna os pids dos processos filhos diretos (Linux)."""
+    try:
+        with open(f'/proc/{pid}/task/{pid}/children') as arquivo:
+            return [int(filho) for filho in arquivo.read().split()]
+    except OSError:
+        return []
+
+def ler_rss_arvore_mb(pid):
+    """
+    Retorna o RSS somado do processo e de todos os seus descendentes.
+
+    Útil para servidores com workers (ex: gunicorn), em que a memória
+    fica nos processos filhos.
+    """
+    total = ler_rss_mb(pid)
+    if total is None:
+        return None
+    pendentes = _filhos(pid)
+    while pendentes:
+        filho = pendentes.pop()
+        rss = ler_rss_mb(filho)
+        if rss is not None:
+            total += rss
+        pendentes.extend(_filhos(filho))
+    return total
+
+class AmostradorRSS:
+    """
+    Amostra o RSS de um processo em segundo plano.
+
+    Exemplo:
+        with AmostradorRSS() as amostrador:
+            executar_benchmark()
+        print(amostrador.pico_mb)
+    """
+
+    def __init__(self, pid=None, intervalo=0.01, incluir_filhos=False):
+        self.pid = pid
+        self.intervalo = intervalo
+        self.incluir_filhos = incluir_filhos
+        self.amostras = []  # [(segundos desde o início, rss_mb)]
+        self._parar = threading.Event()
+        self._thread = None
+        self._inicio = None
+
+    def __enter__(self):
+        self._inicio = time.perf_counter()
+        self._amostrar()
+        self._thread = threading.Thread(target=self._executar, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._parar.set()
+        self._thread.join()
+        self._amostrar()
+        return False
+
+    def _amostrar(self):
+        rss = ler_rss_arvore_mb(self.pid) if self.incluir_filhos else ler_rss_mb(self.pid)
+        if rss is not None:
+            self.amostras.append((time.perf_counter() - self._inicio, rss))
+
+    def _executar(self):
+        while not self._parar.wait(self.intervalo):
+            self._amostrar()
+
+    @property
+    def inicial_mb(self):
+        return self.amostras[0][1] if self.amostras else None
+
+    @property
+    def pico_mb(self):
+        return max(rss for _, rss in self.amostras) if self.amostras else None
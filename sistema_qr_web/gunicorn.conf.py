@@ -0,0 +1,50 @@
+# ====================================================================
+# CONFIGURAÇÃO DO GUNICORN (MODO DE PRODUÇÃO)
+# ====================================================================
+# Uso (dentro de sistema_qr_web):
+#     gunicorn -c gunicorn.conf.py
+#
+# Variáveis de ambiente:
+#     QR_BIND                 endereço de escuta (padrão 0.0.0.0:5000)
+#     QR_WORKERS              processos worker (padrão: número de CPUs); use esta variável
+#                             em vez de -w: o app divide os limites globais por ela
+#     QR_THREADS              threads por worker (padrão: vagas e fila do controle de
+#                             admissão de cada worker, mais uma; mínimo 2)
+#     QR_MAX_REQUESTS         requisições até reciclar o worker (padrão 500, 0 desativa)
+#     QR_MAX_REQUESTS_JITTER  variação aleatória do limite acima (padrão 50)
+#     QR_TIMEOUT              segundos até um worker travado ser reiniciado (padrão 300)
+# ====================================================================
+
+import math
+import multiprocessing
+import os
+
+wsgi_app = 'src.wsgi:app'
+bind = os.environ.get('QR_BIND', '0.0.0.0:5000')
+
+# Bibliotecas pesadas e app carregados no mestre antes do fork (copy-on-write)
+preload_app = True
+
+workers = int(os.environ.get('QR_WORKERS', multiprocessing.cpu_count()))
+# Lido por create_app (src/main.py), carregado depois desta configuração: os limites de
+# admissão e as vagas de CPU são globais e cada worker aplica a sua parte
+os.environ['QR_WORKERS'] = str(workers)
+
+# Uma requisição só chega ao controle de admissão com uma thread livre: com menos threads que
+# as vagas mais a fila do worker (ver limites_por_processo em src/services/admissao.py), a
+# fila ficaria no backlog do socket, onde nenhum 503 com Retry-After é devolvido
+_vagas_admissao = max(1, int(os.environ.get('QR_ADMISSAO_CONCORRENCIA', 2)) // workers)
+_fila_admissao = max(1, math.ceil(int(os.environ.get('QR_ADMISSAO_FILA', 8)) / workers))
+threads = int(os.environ.get('QR_THREADS', max(2, _vagas_admissao + _fila_admissao + 1)))
+
+# Reciclagem: limita o crescimento de memória por fragmentação do heap
+# (PyMuPDF/OpenCV alocam buffers grandes); o jitter evita que todos os
+# workers reiniciem ao mesmo tempo
+max_requests = int(os.environ.get('QR_MAX_REQUESTS', 500))
+max_requests_jitter = int(os.environ.get('QR_MAX_REQUESTS_JITTER', 50))
+
+# Lotes grandes levam minutos: o timeout padrão do gunicorn (30s) mataria o worker
+timeout = int(os.environ.get('QR_TIMEOUT', 300))
+graceful_timeout = 30
+
+accesslog = '-'
@@ -0,0 +1,312 @@
+# ====================================================================
+# PONTO DE ENTRADA ASGI (UVICORN) - VARIANTE ASSÍNCRONA DA API
+# ====================================================================
+# No modo WSGI cada requisição ocupa uma thread do worker do início ao
+# fim, inclusive enquanto o upload de um cliente lento ainda está
+# chegando. Aqui a rede fica em um event loop e só o trabalho de CPU
+# ocupa threads:
+#
+# - /api/upload-pdf e /api/insert-qr são nativamente assíncronos: o
+#   corpo é lido e interpretado no event loop e a renderização, a
+#   inserção e o doc.save rodam no executor de CPU, com prioridade
+#   interativa sobre os documentos de lote (src/services/prioridade.py)
+# - As demais rotas (extract-qr, batch-process, jobs, cadastro, métricas,
+#   frontend) são o próprio app Flask: o corpo inteiro é recebido no
+#   event loop (até o MAX_CONTENT_LENGTH; acima dele, 413 sem gravar o
+#   resto) e só então a view roda em uma thread do executor WSGI, com os
+#   mesmos jobs, controle de admissão e métricas do modo WSGI; enquanto a
+#   view roda, um http.disconnect do cliente cancela o lote ou a extração
+#   em andamento (src/services/cancelamento.py). A resposta é enviada em
+#   blocos, lidos um de cada vez no executor (o ZIP de um job não passa
+#   inteiro pela memória)
+#
+# Uso (dentro de sistema_qr_web):
+#     uvicorn src.asgi:app --host 0.0.0.0 --port 5000
+#
+# Variáveis de ambiente:
+#     QR_ASGI_EXECUTOR   'thread' (padrão) ou 'processo' para o executor de CPU
+#     QR_ASGI_CPU        workers do executor de CPU (padrão: número de CPUs)
+#     QR_ASGI_THREADS    threads do executor das views Flask (padrão 4)
+# ====================================================================
+
+import asyncio
+import base64
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from contextlib import asynccontextmanager
+import json
+import multiprocessing
+import os
+import sys
+import threading
+import time
+from tempfile import SpooledTemporaryFile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+from starlette.applications import Starlette
+from starlette.responses import JSONResponse
+from starlette.routing import Mount, Route
+from werkzeug.wsgi import FileWrapper
+
+from src.main import create_app, precarregar_dependencias
+from src.routes.pdf_qr import renderizar_paginas_preview, inserir_qr_nas_posicoes
+from src.services.cancelamento import CHAVE_DESCONEXAO
+from src.services.linearizacao import ResumoLinearizacao, interpretar_opcao, linearizar
+from src.services.metrics import REQUISICOES, DURACAO_REQUISICAO
+from src.services.prioridade import obter_escalonador
+
+# Corpos maiores que isso vão para um arquivo temporário em vez da memória
+TAMANHO_BUFFER_CORPO = 1024 * 1024
+# Bloco de leitura dos arquivos enviados por send_file (wsgi.file_wrapper):
+# cada bloco é uma ida ao executor WSGI
+TAMANHO_BLOCO_RESPOSTA = 256 * 1024
+
+def _criar_executor_cpu():
+    trabalhadores = int(os.environ.get('QR_ASGI_CPU', os.cpu_count() or 2))
+    if os.environ.get('QR_ASGI_EXECUTOR') == 'processo':
+        # 'spawn': processos criados com fork a partir de um processo com
+        # event loop e threads podem herdar locks em estado inconsistente.
+        # Os tempos por etapa medidos nesses processos não chegam ao /metrics.
+        return ProcessPoolExecutor(trabalhadores, mp_context=multiprocessing.get_context('spawn'))
+    return ThreadPoolExecutor(trabalhadores, thread_name_prefix='qr-cpu')
+
+flask_app = create_app()
+_executor_cpu = _criar_executor_cpu()
+_executor_wsgi = ThreadPoolExecutor(int(os.environ.get('QR_ASGI_THREADS', 4)), thread_name_prefix='qr-wsgi')
+
+_escalonador = obter_escalonador(flask_app.config)
+
+async def _em_executor(funcao, *args):
+    # Vaga interativa do escalonador, aguardada em uma thread para não parar o event loop
+    loop = asyncio.get_running_loop()
+    vaga = loop.run_in_executor(None, _escalonador.entrar, 'interativa')
+    try:
+        await asyncio.shield(vaga)
+    except asyncio.CancelledError:
+        # Requisição cancelada durante a espera: a vaga é devolvida assim que for obtida
+        vaga.add_done_callback(lambda _: _escalonador.sair('interativa'))
+        raise
+    try:
+        return await loop.run_in_executor(_executor_cpu, funcao, *args)
+    finally:
+        _escalonador.sair('interativa')
+
+def _registrar(endpoint, inicio, resposta):
+    REQUISICOES.inc(endpoint=endpoint, status=resposta.status_code)
+    DURACAO_REQUISICAO.observe(time.perf_counter() - inicio, endpoint=endpoint)
+    return resposta
+
+def _corpo_excede_limite(request):
+    limite = flask_app.config.get('MAX_CONTENT_LENGTH')
+    tamanho = request.headers.get('content-length')
+    return limite is not None and tamanho is not None and tamanho.isdigit() and int(tamanho) > limite
+
+# ====================================================================
+# ENDPOINTS ASSÍNCRONOS
+# ====================================================================
+
+async def upload_pdf(request):
+    """Versão assíncrona de /api/upload-pdf (mesma entrada e resposta)."""
+    inicio = time.perf_counter()
+    endpoint = 'pdf_qr.upload_pdf'
+    if _corpo_excede_limite(request):
+        return _registrar(endpoint, inicio, JSONResponse({'error': 'Arquivo muito grande'}, status_code=413))
+    try:
+        form = await request.form()
+        pdf_file = form.get('pdf')
+        if pdf_file is None or isinstance(pdf_file, str):
+            return _registrar(endpoint, inicio, JSONResponse({'error': 'Nenhum arquivo PDF enviado'}, status_code=400))
+        if pdf_file.filename == '':
+            return _registrar(endpoint, inicio, JSONResponse({'error': 'Nenhum arquivo selecionado'}, status_code=400))
+
+        pdf_bytes = await pdf_file.read()
+        pages = await _em_executor(renderizar_paginas_preview, pdf_bytes)
+        resposta = JSONResponse({
+            'success': True,
+            'total_pages': len(pages),
+            'pages': pages,
+            'filename': pdf_file.filename
+        })
+    except Exception as e:
+        resposta = JSONResponse({'error': f'Erro ao processar PDF: {str(e)}'}, status_code=500)
+    return _registrar(endpoint, inicio, resposta)
+
+async def insert_qr(request):
+    """Versão assíncrona de /api/insert-qr (mesma entrada e resposta)."""
+    inicio = time.perf_counter()
+    endpoint = 'pdf_qr.insert_qr'
+    if _corpo_excede_limite(request):
+        return _registrar(endpoint, inicio, JSONResponse({'error': 'Arquivo muito grande'}, status_code=413))
+    try:
+        data = json.loads(await request.body())
+        if not data or 'pdf_base64' not in data or 'qr_base64' not in data:
+            return _registrar(endpoint, inicio, JSONResponse({'error': 'Dados incompletos'}, status_code=400))
+
+        pdf_data = base64.b64decode(data['pdf_base64'].split(',')[1])
+        qr_data = base64.b64decode(data['qr_base64'].split(',')[1])
+        pdf_saida = await _em_executor(inserir_qr_nas_posicoes, pdf_data, qr_data, data.get('qr_positions', []))
+        linearizacao = ResumoLinearizacao(interpretar_opcao(data.get('linearize'), flask_app.config.get('LINEARIZAR')),
+                                          flask_app.config.get('QPDF', 'qpdf'))
+        if linearizacao.disponivel:
+            pdf_saida, _ = linearizacao.registrar(
+                pdf_saida, await _em_executor(linearizar, pdf_saida, linearizacao.executavel))
+        resposta = JSONResponse({
+            'success': True,
+            'pdf_base64': f"data:application/pdf;base64,{base64.b64encode(pdf_saida).decode('utf-8')}",
+            'linearization': linearizacao.to_dict()
+        })
+    except Exception as e:
+        resposta = JSONResponse({'error': f'Erro ao inserir QR code: {str(e)}'}, status_code=500)
+    return _registrar(endpoint, inicio, resposta)
+
+# ====================================================================
+# PONTE PARA AS VIEWS FLASK
+# ====================================================================
+
+class PonteWSGI:
+    """
+    Executa o app Flask a partir do ASGI sem prender threads na rede.
+
+    O corpo da requisição é recebido por completo no event loop (limitado
+    ao MAX_CONTENT_LENGTH do app); a view roda no executor WSGI com o corpo
+    já disponível; a resposta é lida bloco a bloco no executor e cada bloco
+    é enviado ao cliente pelo event loop. Enquanto a view roda, o event
+    loop continua escutando o cliente: a desconexão acende o Event do
+    environ que o Cancelamento da view consulta.
+    """
+
+    def __init__(self, app_wsgi, executor):
+        self.app_wsgi = app_wsgi
+        self.executor = executor
+        self.limite = app_wsgi.config.get('MAX_CONTENT_LENGTH')
+
+    async def __call__(self, scope, receive, send):
+        if self._excede_limite(scope):
+            # Content-Length acima do limite: recusado antes de receber o corpo
+            await self._recusar(send)
+            return
+        with SpooledTemporaryFile(max_size=TAMANHO_BUFFER_CORPO) as corpo:
+            while True:
+                mensagem = await receive()
+                if mensagem['type'] == 'http.disconnect':
+                    return
+                corpo.write(mensagem.get('body', b''))
+                if self.limite is not None and corpo.tell() > self.limite:
+                    # Sem Content-Length (chunked) ou com um valor falso: para de gravar
+                    await self._recusar(send)
+                    return
+                if not mensagem.get('more_body'):
+                    break
+            tamanho = corpo.tell()
+            corpo.seek(0)
+            environ = self._montar_environ(scope, corpo, tamanho)
+            desconectado = threading.Event()
+            environ[CHAVE_DESCONEXAO] = desconectado
+            vigia = asyncio.ensure_future(self._vigiar_desconexao(receive, desconectado))
+            loop = asyncio.get_running_loop()
+            try:
+                status, cabecalhos, resultado = await loop.run_in_executor(self.executor, self._executar, environ)
+                try:
+                    await send({'type': 'http.response.start', 'status': status, 'headers': cabecalhos})
+                    blocos = iter(resultado)
+                    while not desconectado.is_set():
+                        parte = await loop.run_in_executor(self.executor, next, blocos, None)
+                        if parte is None:
+                            break
+                        if parte:
+                            await send({'type': 'http.response.body', 'body': parte, 'more_body': True})
+                    await send({'type': 'http.response.body', 'body': b''})
+                finally:
+                    if hasattr(resultado, 'close'):
+                        await loop.run_in_executor(self.executor, resultado.close)
+            finally:
+                vigia.cancel()
+
+    def _excede_limite(self, scope):
+        if self.limite is None:
+            return False
+        for nome, valor in scope['headers']:
+            if nome == b'content-length':
+                return valor.isdigit() and int(valor) > self.limite
+        return False
+
+    @staticmethod
+    async def _recusar(send):
+        await send({'type': 'http.response.start', 'status': 413,
+                    'headers': [(b'content-type', b'application/json'), (b'connection', b'close')]})
+        await send({'type': 'http.response.body', 'body': json.dumps({'error': 'Arquivo muito grande'}).encode('utf-8')})
+
+    @staticmethod
+    async def _vigiar_desconexao(receive, desconectado):
+        # Depois do corpo, o próximo receive() só volta com http.disconnect
+        while True:
+            mensagem = await receive()
+            if mensagem['type'] == 'http.disconnect':
+                desconectado.set()
+                return
+
+    def _executar(self, environ):
+        resposta = {}
+
+        def start_response(status, headers, exc_info=None):
+            resposta['status'] = int(status.split(' ', 1)[0])
+            resposta['cabecalhos'] = [(nome.lower().encode('latin-1'), valor.encode('latin-1'))
+                                      for nome, valor in headers]
+
+        # Só a view roda aqui; o corpo da resposta é lido depois, um bloco por vez
+        resultado = self.app_wsgi(environ, start_response)
+        return resposta['status'], resposta['cabecalhos'], resultado
+
+    @staticmethod
+    def _montar_environ(scope, corpo, tamanho):
+        servidor = scope.get('server') or ('localhost', 80)
+        cliente = scope.get('client') or ('', 0)
+        environ = {
+            'REQUEST_METHOD': scope['method'],
+            'SCRIPT_NAME': '',
+            'PATH_INFO': scope['path'].encode('utf-8').decode('latin-1'),
+            'QUERY_STRING': scope['query_string'].decode('latin-1'),
+            'SERVER_NAME': servidor[0],
+            'SERVER_PORT': str(servidor[1]),
+            'SERVER_PROTOCOL': f"HTTP/{scope.get('http_version', '1.1')}",
+            'REMOTE_ADDR': cliente[0],
+            'CONTENT_LENGTH': str(tamanho),
+            'wsgi.version': (1, 0),
+            'wsgi.url_scheme': scope.get('scheme', 'http'),
+            'wsgi.input': corpo,
+            'wsgi.file_wrapper': lambda arquivo, tamanho=TAMANHO_BLOCO_RESPOSTA: FileWrapper(
+                arquivo, max(tamanho, TAMANHO_BLOCO_RESPOSTA)),
+            'wsgi.errors': sys.stderr,
+            'wsgi.multithread': True,
+            'wsgi.multiprocess': False,
+            'wsgi.run_once': False,
+        }
+        for nome, valor in scope['headers']:
+            nome = nome.decode('latin-1').upper().replace('-', '_')
+            valor = valor.decode('latin-1')
+            if nome == 'CONTENT_TYPE':
+                environ['CONTENT_TYPE'] = valor
+            elif nome != 'CONTENT_LENGTH':
+                chave = f'HTTP_{nome}'
+                environ[chave] = f'{environ[chave]},{valor}' if chave in environ else valor
+        return environ
+
+# ====================================================================
+# APLICAÇÃO
+# ====================================================================
+
+@asynccontextmanager
+async def _ciclo_de_vida(app):
+    precarregar_dependencias()
+    yield
+    _executor_cpu.shutdown(wait=False, cancel_futures=True)
+    _executor_wsgi.shutdown(wait=False, cancel_futures=True)
+
+app = Starlette(
+    routes=[
+        Route('/api/upload-pdf', upload_pdf, methods=['POST']),
+        Route('/api/insert-qr', insert_qr, methods=['POST']),
+        Mount('/', app=PonteWSGI(flask_app, _executor_wsgi)),
+    ],
+    lifespan=_ciclo_de_vida,
+)
@@ -5,34 +5,184 @@ sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
 
 from flask import Flask, send_from_directory
 from flask_cors import CORS
+from src.models.user import db
+from src.models.job import atualizar_esquema
 from src.routes.pdf_qr import pdf_qr_bp
+from src.routes.roster import roster_bp
+from src.routes.jobs import jobs_bp
+from src.routes.sessoes import sessoes_bp
+from src.routes.metrics import metrics_bp
+from src.services.admissao import limites_por_processo
+from src.services.retencao import iniciar_limpeza
+from src.services.registro import configurar_logs
 
-app = Flask(__name__, static_folder=os.path.join(os.path.dirname(__file__), 'static'))
-app.config['SECRET_KEY'] = 'asdf#FGSgvasgf$5$WGT'
-app.config['MAX_CONTENT_LENGTH'] = 50 * 1024 * 1024  # 50MB max file size
+def precarregar_dependencias():
+    """
+    Importa as bibliotecas pesadas do processamento de PDFs e imagens.
 
-# Enable CORS for all routes
-CORS(app)
+    As rotas as importam só no primeiro uso; os pontos de entrada de
+    produção (src/wsgi.py, src/asgi.py) chamam esta função na subida para
+    que a primeira requisição não pague a importação.
+    """
+    import cv2
+    import fitz
+    import numpy
+    from PIL import Image
 
-app.register_blueprint(pdf_qr_bp, url_prefix='/api')
+    Image.init()
+    # O paralelismo vem dos workers/executores, e o pool de threads do
+    # OpenCV em cada um deles só disputaria os mesmos núcleos
+    cv2.setNumThreads(int(os.environ.get('QR_CV2_THREADS', 1)))
 
-@app.route('/', defaults={'path': ''})
-@app.route('/<path:path>')
-def serve(path):
-    static_folder_path = app.static_folder
-    if static_folder_path is None:
-            return "Static folder not configured", 404
+def create_app(config=None):
+    """
+    Cria e configura a aplicação Flask.
 
-    if path != "" and os.path.exists(os.path.join(static_folder_path, path)):
-        return send_from_directory(static_folder_path, path)
-    else:
-        index_path = os.path.join(static_folder_path, 'index.html')
-        if os.path.exists(index_path):
-            return send_from_directory(static_folder_path, 'index.html')
+    Args:
+        config (dict or None): Valores que sobrescrevem a configuração padrão
+                               (aplicados antes de inicializar o banco)
+
+    Returns:
+        Flask: Aplicação pronta para o servidor de desenvolvimento ou WSGI
+    """
+    # Pasta de dados (banco, arquivos de saída, relatórios); QR_DATA_DIR permite isolar execuções
+    data_dir = os.environ.get('QR_DATA_DIR') or os.path.join(os.path.dirname(__file__), 'database')
+
+    app = Flask(__name__, static_folder=os.path.join(os.path.dirname(__file__), 'static'))
+    app.config['SECRET_KEY'] = os.environ.get('QR_SECRET_KEY', 'asdf#FGSgvasgf$5$WGT')
+    app.config['MAX_CONTENT_LENGTH'] = 50 * 1024 * 1024  # 50MB max file size
+
+    # Perfilamento de requisições (ver src/services/profiler.py): desativado sem token de administrador
+    app.config['ADMIN_TOKEN'] = os.environ.get('QR_ADMIN_TOKEN')
+    app.config['PROFILE_REQUESTS'] = os.environ.get('QR_PROFILE_REQUESTS') == '1'
+    app.config['PROFILE_DIR'] = os.path.join(data_dir, 'profiles')
+    app.config['PROFILE_MAX_RELATORIOS'] = int(os.environ.get('QR_PROFILE_MAX', 200))
+
+    # Processos que atendem requisições: gunicorn.conf.py exporta QR_WORKERS; servidor de
+    # desenvolvimento e uvicorn rodam em um processo só
+    app.config['PROCESSOS'] = max(1, int(os.environ.get('QR_WORKERS', 1)))
+
+    # Controle de admissão dos endpoints pesados (ver src/services/admissao.py): limites
+    # globais, divididos entre os processos (cada worker aplica a sua parte)
+    limites_admissao = limites_por_processo({
+        'max_concorrentes': int(os.environ.get('QR_ADMISSAO_CONCORRENCIA', 2)),
+        'max_fila': int(os.environ.get('QR_ADMISSAO_FILA', 8)),
+        'espera_maxima': float(os.environ.get('QR_ADMISSAO_ESPERA', 60)),
+        'orcamento_mb': float(os.environ.get('QR_ADMISSAO_MEMORIA_MB', 1024)),
+    }, app.config['PROCESSOS'])
+    app.config['ADMISSAO'] = {
+        'pdf_qr.extract_qr': dict(limites_admissao),
+        'pdf_qr.batch_process': dict(limites_admissao),
+        'pdf_qr.batch_preview': dict(limites_admissao),
+        'pdf_qr.batch_restamp': dict(limites_admissao),
+    }
+
+    # Escalonamento por prioridade do trabalho de CPU (ver src/services/prioridade.py), por processo:
+    # vagas de CPU (as do servidor divididas entre os workers), limite de cada classe (o lote deixa
+    # uma vaga para as prévias) e espera a partir da qual um documento de lote deixa de ceder a vez
+    vagas_cpu = max(1, int(os.environ.get('QR_PRIORIDADE_VAGAS', os.cpu_count() or 1)) // app.config['PROCESSOS'])
+    app.config['PRIORIDADE'] = {
+        'vagas': vagas_cpu,
+        'limites': {
+            'interativa': int(os.environ.get('QR_PRIORIDADE_INTERATIVA', vagas_cpu)),
+            'lote': int(os.environ.get('QR_PRIORIDADE_LOTE', max(1, vagas_cpu - 1))),
+        },
+        'promocao': float(os.environ.get('QR_PRIORIDADE_PROMOCAO', 2.0)),
+    }
+
+    # PDFs de saída linearizados ("fast web view", ver src/services/linearizacao.py): padrão quando o
+    # cliente não envia 'linearize' e o qpdf usado (o PyMuPDF não lineariza mais)
+    app.config['LINEARIZAR'] = os.environ.get('QR_LINEARIZAR') == '1'
+    app.config['QPDF'] = os.environ.get('QR_QPDF', 'qpdf')
+
+    # Extração de QRs: processos detectores com páginas em memória compartilhada (0 = no próprio processo)
+    app.config['EXTRACAO_PROCESSOS'] = int(os.environ.get('QR_EXTRACAO_PROCESSOS', 0))
+
+    # Verificação dos QRs inseridos no lote (ver src/services/verificacao.py): fração verificada
+    # quando o cliente não envia 'verify', processos verificadores e zoom da renderização do recorte
+    app.config['VERIFICACAO_AMOSTRA'] = float(os.environ.get('QR_VERIFICACAO_AMOSTRA', 0))
+    app.config['VERIFICACAO_PROCESSOS'] = int(os.environ.get('QR_VERIFICACAO_PROCESSOS', 0))
+    app.config['VERIFICACAO_ESCALA'] = float(os.environ.get('QR_VERIFICACAO_ESCALA', 2.0))
+
+    # Banco SQLite local (cadastro de alunos e jobs) e pasta dos arquivos de saída
+    app.config['STORAGE_DIR'] = os.path.join(data_dir, 'storage')
+    app.config['SQLALCHEMY_DATABASE_URI'] = f"sqlite:///{os.path.join(data_dir, 'app.db')}"
+    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+
+    # Retenção dos arquivos de saída (ver src/services/retencao.py): prazo padrão de cada job,
+    # cota global do STORAGE_DIR com remoção LRU e intervalo da limpeza (0 desativa)
+    app.config['RETENCAO_TTL_HORAS'] = float(os.environ.get('QR_RETENCAO_TTL_HORAS', 72))
+    app.config['RETENCAO_COTA_MB'] = float(os.environ.get('QR_RETENCAO_COTA_MB', 2048))
+    app.config['RETENCAO_INTERVALO'] = float(os.environ.get('QR_RETENCAO_INTERVALO', 300))
+
+    # Envio em partes (ver src/routes/sessoes.py): cada parte respeita o MAX_CONTENT_LENGTH,
+    # o arquivo montado tem limite próprio; threads que processam diplomas enquanto o envio continua
+    app.config['UPLOAD_PARTE_MB'] = float(os.environ.get('QR_UPLOAD_PARTE_MB', 8))
+    app.config['UPLOAD_ARQUIVO_MAX_MB'] = float(os.environ.get('QR_UPLOAD_ARQUIVO_MAX_MB', 200))
+    app.config['UPLOAD_THREADS'] = int(os.environ.get('QR_UPLOAD_THREADS', 1))
+    app.config['UPLOAD_STAGING_DIR'] = os.path.join(data_dir, 'staging')
+
+    # Impressões dos modelos de layout (ver src/services/modelos.py): as chaves de
+    # /api/batch-templates valem em qualquer requisição e worker
+    app.config['MODELOS_DIR'] = os.path.join(data_dir, 'modelos')
+
+    # Logs (ver src/services/registro.py): nível e formato ('texto' ou 'json') do log do servidor
+    # e linhas do processing_log devolvidas por job (as mais antigas viram contadores no log_summary)
+    app.config['LOG_NIVEL'] = os.environ.get('QR_LOG_NIVEL', 'INFO')
+    app.config['LOG_FORMATO'] = os.environ.get('QR_LOG_FORMATO', 'texto')
+    app.config['LOG_LINHAS_JOB'] = int(os.environ.get('QR_LOG_LINHAS_JOB', 500))
+
+    if config:
+        app.config.update(config)
+
+    configurar_logs(app.config['LOG_NIVEL'], app.config['LOG_FORMATO'])
+
+    # Enable CORS for all routes
+    CORS(app)
+
+    app.register_blueprint(pdf_qr_bp, url_prefix='/api')
+    app.register_blueprint(roster_bp, url_prefix='/api')
+    app.register_blueprint(jobs_bp, url_prefix='/api')
+    app.register_blueprint(sessoes_bp, url_prefix='/api')
+    app.register_blueprint(metrics_bp)
+
+    os.makedirs(data_dir, exist_ok=True)
+    db.init_app(app)
+    with app.app_context():
+        db.create_all()
+        atualizar_esquema()
+        # Nenhuma conexão aberta deve ser herdada pelos workers após o fork
+        db.engine.dispose()
+    iniciar_limpeza(app)
+
+    @app.route('/', defaults={'path': ''})
+    @app.route('/<path:path>')
+    def serve(path):
+        static_folder_path = app.static_folder
+        if static_folder_path is None:
+                return "Static folder not configured", 404
+
+        if path != "" and os.path.exists(os.path.join(static_folder_path, path)):
+            return send_from_directory(static_folder_path, path)
         else:
-            return "index.html not found", 404
+            index_path = os.path.join(static_folder_path, 'index.html')
+            if os.path.exists(index_path):
+                return send_from_directory(static_folder_path, 'index.html')
+            else:
+                return "index.html not found", 404
+
+    return app
 
 
 if __name__ == '__main__':
-    app.run(host='0.0.0.0', port=5000, debug=True)
+    import argparse
+
+    # Servidor de desenvolvimento (um processo). Em produção use o gunicorn: ver gunicorn.conf.py
+    parser = argparse.ArgumentParser(description='Servidor de desenvolvimento do Sistema QR')
+    parser.add_argument('--host', default='0.0.0.0')
+    parser.add_argument('--port', type=int, default=int(os.environ.get('QR_PORT', 5000)))
+    parser.add_argument('--debug', action='store_true', default=os.environ.get('QR_DEBUG') == '1',
+                        help='Ativa o modo debug com reloader (ou QR_DEBUG=1)')
+    args = parser.parse_args()
 
+    create_app().run(host=args.host, port=args.port, debug=args.debug, threaded=True)
@@ -0,0 +1,129 @@
+from datetime import datetime, timezone
+import json
+import uuid
+from src.models.user import db
+
+def _agora():
+    return datetime.now(timezone.utc)
+
+class Job(db.Model):
+    """
+    Execução de um lote (/batch-process) ou de uma extração (/extract-qr).
+
+    O job guarda os parâmetros da execução para que uma reenvio com o mesmo
+    job_id retome o trabalho pulando os documentos já concluídos.
+    """
+    __tablename__ = 'job'
+
+    id = db.Column(db.String(32), primary_key=True, default=lambda: uuid.uuid4().hex)
+    tipo = db.Column(db.String(20), nullable=False)  # 'lote', 'extracao' ou 'pasta'
+    status = db.Column(db.String(20), nullable=False, default='em_andamento')
+    parametros = db.Column(db.Text, nullable=False, default='{}')
+    criado_em = db.Column(db.DateTime(timezone=True), nullable=False, default=_agora)
+    atualizado_em = db.Column(db.DateTime(timezone=True), nullable=False, default=_agora, onupdate=_agora)
+    # Após essa data os arquivos de saída são removidos (src/services/retencao.py); None = sem prazo
+    expira_em = db.Column(db.DateTime(timezone=True), index=True)
+
+    documentos = db.relationship('Documento', backref='job', lazy='dynamic')
+
+    def __repr__(self):
+        return f'<Job {self.id} {self.tipo}>'
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'tipo': self.tipo,
+            'status': self.status,
+            'parametros': json.loads(self.parametros),
+            'criado_em': self.criado_em.isoformat(),
+            'atualizado_em': self.atualizado_em.isoformat(),
+            'expira_em': self.expira_em.isoformat() if self.expira_em else None
+        }
+
+class Documento(db.Model):
+    """
+    Documento de entrada de um job, identificado pelo hash do conteúdo.
+
+    O índice único (job_id, input_hash) permite carregar com uma única
+    consulta indexada tudo o que já foi concluído ao retomar o job.
+    """
+    __tablename__ = 'documento'
+    __table_args__ = (
+        db.UniqueConstraint('job_id', 'input_hash', name='uq_documento_job_hash'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    job_id = db.Column(db.String(32), db.ForeignKey('job.id'), nullable=False, index=True)
+    input_hash = db.Column(db.String(64), nullable=False, index=True)
+    filename = db.Column(db.String(255), nullable=False)
+    status = db.Column(db.String(20), nullable=False)  # 'concluido', 'erro', 'sem_qr', 'sem_nome', 'sem_modelo'
+    nome_extraido = db.Column(db.String(200))
+    matricula = db.Column(db.String(64))
+    qr_hash = db.Column(db.String(64))
+    qr_localizacao = db.Column(db.Text)  # JSON {'page', 'x', 'y', 'width', 'height'} em pontos
+    erro = db.Column(db.Text)
+    atualizado_em = db.Column(db.DateTime(timezone=True), nullable=False, default=_agora, onupdate=_agora)
+
+    artefatos = db.relationship('Artefato', backref='documento', lazy='select')
+
+    def __repr__(self):
+        return f'<Documento {self.filename} {self.status}>'
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'filename': self.filename,
+            'input_hash': self.input_hash,
+            'status': self.status,
+            'nome_extraido': self.nome_extraido,
+            'matricula': self.matricula,
+            'qr_hash': self.qr_hash,
+            'qr_localizacao': json.loads(self.qr_localizacao) if self.qr_localizacao else None,
+            'erro': self.erro,
+            'artefatos': [artefato.to_dict() for artefato in self.artefatos]
+        }
+
+class Artefato(db.Model):
+    """
+    Arquivo de saída gravado em disco (PDF com QR ou PNG do QR extraído).
+    """
+    __tablename__ = 'artefato'
+
+    id = db.Column(db.Integer, primary_key=True)
+    job_id = db.Column(db.String(32), db.ForeignKey('job.id'), nullable=False, index=True)
+    documento_id = db.Column(db.Integer, db.ForeignKey('documento.id'), nullable=False, index=True)
+    tipo = db.Column(db.String(20), nullable=False)  # 'pdf' ou 'qr_png'
+    filename = db.Column(db.String(255), nullable=False)
+    caminho = db.Column(db.String(500), nullable=False)
+    tamanho = db.Column(db.Integer, nullable=False)
+    criado_em = db.Column(db.DateTime(timezone=True), nullable=False, default=_agora)
+
+    def __repr__(self):
+        return f'<Artefato {self.filename}>'
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'tipo': self.tipo,
+            'filename': self.filename,
+            'tamanho': self.tamanho,
+            'url': f'/api/jobs/{self.job_id}/artifacts/{self.id}'
+        }
+
+# Colunas adicionadas depois que as tabelas já existiam: db.create_all() não
+# altera tabelas existentes, então bancos antigos as recebem via ALTER TABLE
+COLUNAS_ADICIONADAS = {
+    'job': {'expira_em': 'DATETIME'},
+}
+
+def atualizar_esquema():
+    """Adiciona aos bancos existentes as colunas criadas em versões posteriores."""
+    from sqlalchemy import inspect, text
+
+    inspetor = inspect(db.engine)
+    with db.engine.begin() as conexao:
+        for tabela, colunas in COLUNAS_ADICIONADAS.items():
+            existentes = {coluna['name'] for coluna in inspetor.get_columns(tabela)}
+            for nome, tipo in colunas.items():
+                if nome not in existentes:
+                    conexao.execute(text(f'ALTER TABLE {tabela} ADD COLUMN {nome} {tipo}'))
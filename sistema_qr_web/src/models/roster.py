@@ -0,0 +1,42 @@
+from src.models.user import db
+
+class Aluno(db.Model):
+    """
+    Entrada do cadastro oficial de alunos (roster) importado da secretaria.
+
+    As chaves normalizadas são calculadas uma única vez na importação e
+    persistidas com índice, para que o matching não precise refazer a
+    normalização Unicode/regex de todo o cadastro a cada lote.
+    """
+    __tablename__ = 'aluno'
+
+    id = db.Column(db.Integer, primary_key=True)
+    matricula = db.Column(db.String(64), unique=True, nullable=False)
+    nome = db.Column(db.String(200), nullable=False)
+    nome_normalizado = db.Column(db.String(200), nullable=False, index=True)
+    nome_sem_espacos = db.Column(db.String(200), nullable=False, index=True)
+
+    def __repr__(self):
+        return f'<Aluno {self.matricula} {self.nome}>'
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'matricula': self.matricula,
+            'nome': self.nome,
+            'nome_normalizado': self.nome_normalizado
+        }
+
+class VersaoRoster(db.Model):
+    """
+    Versão do cadastro importado (linha única, id=1).
+
+    Cada importação incrementa a versão na mesma transação que troca os
+    alunos. Os ids dos alunos não servem de assinatura: sem AUTOINCREMENT,
+    o SQLite reaproveita os rowids depois de apagar o cadastro anterior.
+    """
+    __tablename__ = 'roster_versao'
+
+    id = db.Column(db.Integer, primary_key=True)
+    versao = db.Column(db.Integer, nullable=False, default=0)
+    total_alunos = db.Column(db.Integer, nullable=False, default=0)
@@ -0,0 +1,508 @@
+# ====================================================================
+# MONITOR DE PASTA (HOT FOLDER) - INGESTÃO CONTÍNUA DE PDFs ASSINADOS
+# ====================================================================
+# As secretarias salvam os diplomas assinados em uma pasta de rede ao
+# longo do dia. Este processo de longa duração vigia essa pasta e, para
+# cada PDF novo, usa as mesmas funções de src/routes/pdf_qr.py:
+#
+# 1. extrair_nome_do_pdf + localizar_qr_no_pdf no PDF assinado
+# 2. casamento com o diploma em branco do aluno (--em-branco), por
+#    matrícula do cadastro ou pelo nome normalizado
+# 3. inserir_qr_na_posicao no diploma em branco, na posição unificada
+#
+# Sem --em-branco, só o PNG do QR é gravado (entrada para /batch-process).
+#
+# - Arquivos ainda sendo copiados são ignorados até o tamanho e a data de
+#   modificação ficarem estáveis por --estabilidade segundos e o PDF
+#   terminar com o marcador %%EOF
+# - A pasta é varrida por polling: eventos do sistema de arquivos (inotify)
+#   não chegam de forma confiável por compartilhamentos SMB/NFS
+# - Extração e inserção rodam em processos de trabalho; o processo
+#   principal só varre as pastas, faz o casamento e grava os resultados
+# - O checkpoint é um job persistente (tabelas job/documento, como em
+#   /batch-process), identificado pelas pastas e pela posição: cada PDF é
+#   reconhecido pelo hash do conteúdo, e reiniciar o monitor não reprocessa
+#   o que já foi tratado (apenas documentos com erro ou ainda sem diploma
+#   em branco correspondente são tentados de novo)
+# - Com --verificar, o QR inserido de uma amostra dos diplomas é lido de
+#   volta do PDF (src/services/verificacao.py) e as falhas vão para o log
+# - Saídas e o log (monitor.log) vão para a pasta --saida
+#
+# Uso (dentro de sistema_qr_web):
+#     python src/monitor.py --entrada /mnt/secretaria/assinados --saida /mnt/secretaria/saida \
+#         --em-branco /mnt/secretaria/em_branco --posicao '{"x": 460, "y": 700, "size": 90}'
+# ====================================================================
+
+import argparse
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+import hashlib
+import json
+import logging
+import multiprocessing
+import os
+import signal
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.services.nomes import limpar_nome_arquivo, mapear_por_nome, buscar_por_nome
+
+# Arquivos temporários de cópia (Office, navegadores, rsync) nunca são processados
+PREFIXOS_IGNORADOS = ('.', '~$')
+SUFIXOS_IGNORADOS = ('.tmp', '.part', '.crdownload')
+
+# Status que não são tentados de novo quando o monitor é reiniciado
+STATUS_FINAIS = ('concluido', 'sem_qr')
+
+# ====================================================================
+# TAREFAS DOS PROCESSOS DE TRABALHO
+# ====================================================================
+
+def _iniciar_trabalhador():
+    from src.main import precarregar_dependencias
+    # Ctrl+C chega a todo o grupo de processos; quem decide a parada é o processo principal
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    precarregar_dependencias()
+
+def _processar_assinado(pdf_bytes):
+    """Extrai o nome do aluno e o QR de um PDF assinado."""
+    from src.routes.pdf_qr import extrair_nome_do_pdf, localizar_qr_no_pdf
+    return extrair_nome_do_pdf(pdf_bytes), localizar_qr_no_pdf(pdf_bytes)
+
+def _ler_nome_modelo(caminho):
+    """Extrai o nome do aluno de um diploma em branco."""
+    from src.routes.pdf_qr import extrair_nome_do_pdf
+    with open(caminho, 'rb') as arquivo:
+        return extrair_nome_do_pdf(arquivo.read())
+
+def _inserir_no_modelo(caminho_modelo, qr_png, qr_position, verificar=False):
+    """
+    Insere o QR no diploma em branco e, se pedido, lê o QR de volta do PDF.
+
+    Returns:
+        tuple: (pdf de saída, localização, verificação ou None)
+    """
+    from src.routes.pdf_qr import inserir_qr_na_posicao, verificar_qr_inserido
+    with open(caminho_modelo, 'rb') as arquivo:
+        pdf_saida, localizacao = inserir_qr_na_posicao(arquivo.read(), qr_png, qr_position)
+    verificacao = verificar_qr_inserido(pdf_saida, localizacao, qr_png) if verificar and localizacao else None
+    return pdf_saida, localizacao, verificacao
+
+# ====================================================================
+# VARREDURA COM ESPERA DE ESTABILIDADE (DEBOUNCE)
+# ====================================================================
+
+def pdf_completo(caminho):
+    """Confere se o PDF termina com %%EOF (cópias interrompidas não terminam)."""
+    with open(caminho, 'rb') as arquivo:
+        arquivo.seek(0, os.SEEK_END)
+        arquivo.seek(max(0, arquivo.tell() - 2048))
+        return b'%%EOF' in arquivo.read()
+
+class PastaObservada:
+    """
+    Lista os PDFs de uma pasta que já terminaram de ser escritos.
+
+    Cada arquivo só é entregue depois que tamanho e data de modificação
+    ficam iguais por 'estabilidade' segundos, e é entregue de novo se
+    mudar depois disso (um novo conteúdo é um novo documento).
+    """
+
+    def __init__(self, pasta, estabilidade):
+        self.pasta = pasta
+        self.estabilidade = estabilidade
+        self._vistos = {}      # caminho: (tamanho, mtime_ns, visto_desde)
+        self._entregues = {}   # caminho: (tamanho, mtime_ns)
+        self._instaveis = 0
+
+    def em_escrita(self):
+        """Arquivos que mudaram há menos de 'estabilidade' segundos na última varredura."""
+        return self._instaveis
+
+    def varrer(self):
+        """
+        Returns:
+            tuple: (prontos, removidos) com os caminhos estáveis ainda não
+                   entregues e os caminhos que sumiram desde a última varredura
+        """
+        agora = time.monotonic()
+        encontrados = set()
+        prontos = []
+        with os.scandir(self.pasta) as entradas:
+            for entrada in entradas:
+                nome = entrada.name
+                if (not nome.lower().endswith('.pdf') or nome.startswith(PREFIXOS_IGNORADOS)
+                        or nome.lower().endswith(SUFIXOS_IGNORADOS) or not entrada.is_file()):
+                    continue
+                try:
+                    stat = entrada.stat()
+                except FileNotFoundError:
+                    continue
+                caminho = entrada.path
+                encontrados.add(caminho)
+                estado = (stat.st_size, stat.st_mtime_ns)
+
+                visto = self._vistos.get(caminho)
+                if visto is None or visto[:2] != estado:
+                    self._vistos[caminho] = (*estado, agora)
+                    continue
+                if (stat.st_size == 0 or agora - visto[2] < self.estabilidade
+                        or self._entregues.get(caminho) == estado):
+                    continue
+                if not pdf_completo(caminho):
+                    continue
+                self._entregues[caminho] = estado
+                prontos.append(caminho)
+
+        self._instaveis = sum(1 for caminho, visto in self._vistos.items()
+                              if caminho in encontrados and agora - visto[2] < self.estabilidade)
+        removidos = [caminho for caminho in self._vistos if caminho not in encontrados]
+        for caminho in removidos:
+            self._vistos.pop(caminho, None)
+            self._entregues.pop(caminho, None)
+        return sorted(prontos), removidos
+
+# ====================================================================
+# MONITOR
+# ====================================================================
+
+class MonitorPasta:
+    """Laço principal: varre as pastas, distribui o trabalho e grava os resultados."""
+
+    def __init__(self, entrada, saida, em_branco=None, qr_position=None, processos=None,
+                 intervalo=2.0, estabilidade=5.0, amostra_verificacao=0.0):
+        self.entrada = os.path.abspath(entrada)
+        self.saida = os.path.abspath(saida)
+        self.em_branco = os.path.abspath(em_branco) if em_branco else None
+        self.qr_position = qr_position
+        self.processos = processos or os.cpu_count() or 2
+        self.intervalo = intervalo
+        self.amostra_verificacao = amostra_verificacao
+        self.log = logging.getLogger('monitor')
+
+        self._assinados = PastaObservada(self.entrada, estabilidade)
+        self._modelos = PastaObservada(self.em_branco, estabilidade) if self.em_branco else None
+        self._fila = deque()            # caminhos de PDFs assinados prontos
+        self._em_voo = {}               # futuro: (tipo, contexto)
+        self._tratados = set()          # hashes já tratados nesta execução
+        self._aguardando_modelo = {}    # hash: documento extraído sem diploma em branco
+        self._nomes_modelos = {}        # caminho do diploma em branco: nome extraído
+        self._indice_modelos = None     # (chave de validade, mapa por nome, mapa por matrícula)
+        self._parar = False
+        self.job = None
+
+    def parametros(self):
+        return {'entrada': self.entrada, 'em_branco': self.em_branco, 'qr_position': self.qr_position}
+
+    def preparar_job(self):
+        """Retoma (ou cria) o job que serve de checkpoint deste monitor."""
+        from src.models.job import Documento
+        from src.routes.jobs import obter_ou_criar_job
+
+        parametros = self.parametros()
+        assinatura = hashlib.sha256(json.dumps(parametros, sort_keys=True).encode('utf-8')).hexdigest()
+        # Sem prazo de retenção: o job guarda o checkpoint, e as saídas ficam na pasta --saida.
+        # Não exclusivo: após uma queda (kill -9) o job ficou em andamento e precisa ser retomado
+        self.job, erro = obter_ou_criar_job(f"pasta_{assinatura[:26]}", 'pasta', parametros, ttl_horas=0,
+                                            exclusivo=False)
+        if erro:
+            raise RuntimeError(erro)
+        consulta = Documento.query.filter(Documento.job_id == self.job.id, Documento.status.in_(STATUS_FINAIS))
+        self._tratados = {documento.input_hash for documento in consulta}
+        self.log.info(f"📌 Job {self.job.id}: {len(self._tratados)} documentos já tratados serão pulados")
+
+    # ----------------------------------------------------------------
+    # Laço principal
+    # ----------------------------------------------------------------
+
+    def executar(self, uma_vez=False):
+        """
+        Roda até receber SIGINT/SIGTERM (ou, com uma_vez, até esvaziar a pasta).
+
+        Ao parar, os documentos em processamento são concluídos antes de sair.
+        """
+        os.makedirs(self.saida, exist_ok=True)
+        self.preparar_job()
+        signal.signal(signal.SIGTERM, self._pedir_parada)
+        signal.signal(signal.SIGINT, self._pedir_parada)
+
+        # 'spawn': processos novos, sem herdar a conexão SQLite do processo principal
+        self._executor = ProcessPoolExecutor(self.processos, mp_context=multiprocessing.get_context('spawn'),
+                                             initializer=_iniciar_trabalhador)
+        limite_em_voo = self.processos * 2
+        self.log.info(f"👀 Monitorando {self.entrada} com {self.processos} processos"
+                      f"{f' (diplomas em branco: {self.em_branco})' if self.em_branco else ' (somente extração)'}")
+        try:
+            proxima_varredura = 0.0
+            while not self._parar:
+                if time.monotonic() >= proxima_varredura:
+                    self._varrer()
+                    proxima_varredura = time.monotonic() + self.intervalo
+                while self._fila and len(self._em_voo) < limite_em_voo:
+                    self._enviar_assinado(self._fila.popleft())
+
+                if self._em_voo:
+                    espera = max(0.0, proxima_varredura - time.monotonic())
+                    concluidos, _ = wait(list(self._em_voo), timeout=espera, return_when=FIRST_COMPLETED)
+                    for futuro in concluidos:
+                        self._tratar(futuro)
+                elif uma_vez and not self._fila and not self._assinados.em_escrita():
+                    break
+                else:
+                    time.sleep(max(0.0, proxima_varredura - time.monotonic()))
+
+            # Parada: termina o que já foi enviado aos processos de trabalho
+            while self._em_voo:
+                concluidos, _ = wait(list(self._em_voo), return_when=FIRST_COMPLETED)
+                for futuro in concluidos:
+                    self._tratar(futuro)
+        finally:
+            self._executor.shutdown(wait=True, cancel_futures=True)
+            from src.routes.jobs import finalizar_job
+            finalizar_job(self.job)
+            self.log.info("🛑 Monitor encerrado")
+
+    def _pedir_parada(self, signum, frame):
+        self.log.info("⏹ Parada solicitada, concluindo documentos em processamento...")
+        self._parar = True
+
+    def _varrer(self):
+        if self._modelos:
+            prontos, removidos = self._modelos.varrer()
+            for caminho in removidos:
+                if self._nomes_modelos.pop(caminho, None) is not None:
+                    self._indice_modelos = None
+            for caminho in prontos:
+                futuro = self._executor.submit(_ler_nome_modelo, caminho)
+                self._em_voo[futuro] = ('modelo', caminho)
+
+        prontos, _ = self._assinados.varrer()
+        self._fila.extend(prontos)
+
+    def _enviar_assinado(self, caminho):
+        from src.routes.jobs import calcular_hash
+        try:
+            with open(caminho, 'rb') as arquivo:
+                pdf_bytes = arquivo.read()
+        except OSError as e:
+            self.log.warning(f"⚠️ Não foi possível ler {caminho}: {e}")
+            return
+        input_hash = calcular_hash(pdf_bytes)
+        filename = os.path.basename(caminho)
+        if input_hash in self._tratados or input_hash in self._aguardando_modelo:
+            self.log.info(f"⏭ {filename} já tratado (mesmo conteúdo), ignorado")
+            return
+        self._tratados.add(input_hash)
+        futuro = self._executor.submit(_processar_assinado, pdf_bytes)
+        self._em_voo[futuro] = ('assinado', {'filename': filename, 'input_hash': input_hash})
+
+    # ----------------------------------------------------------------
+    # Resultados (executados no processo principal)
+    # ----------------------------------------------------------------
+
+    def _tratar(self, futuro):
+        from src.routes.jobs import registrar_falha
+
+        tipo, contexto = self._em_voo.pop(futuro)
+        try:
+            resultado = futuro.result()
+            if tipo == 'modelo':
+                self._registrar_modelo(contexto, resultado)
+            elif tipo == 'assinado':
+                self._registrar_assinado(contexto, *resultado)
+            else:
+                self._registrar_insercao(contexto, *resultado)
+        except Exception as e:
+            if tipo == 'modelo':
+                self.log.error(f"❌ Erro ao ler o diploma em branco {contexto}: {e}")
+                self._recasar_aguardando()
+                return
+            self.log.error(f"❌ Erro ao processar '{contexto['filename']}': {e}")
+            registrar_falha(self.job, contexto['input_hash'], contexto['filename'], str(e))
+
+    def _registrar_modelo(self, caminho, nome):
+        self._nomes_modelos[caminho] = nome
+        self._indice_modelos = None
+        self.log.info(f"📄 Diploma em branco {os.path.basename(caminho)}: '{nome or 'nome não encontrado'}'")
+        self._recasar_aguardando()
+
+    def _recasar_aguardando(self):
+        # Documentos que esperavam por um diploma em branco podem casar agora
+        for documento in list(self._aguardando_modelo.values()):
+            self._casar(documento)
+
+    def _lendo_modelos(self):
+        return any(tipo == 'modelo' for tipo, _ in self._em_voo.values())
+
+    def _registrar_assinado(self, documento, nome_aluno, localizado):
+        from src.routes.jobs import calcular_hash, registrar_documento
+        from src.routes.roster import obter_indice_roster, resolver_aluno
+
+        filename = documento['filename']
+        base = os.path.splitext(filename)[0]
+        if not nome_aluno:
+            # Fallback: usa o nome do arquivo se não conseguir extrair do PDF
+            nome_aluno = limpar_nome_arquivo(base)
+        indice_roster = obter_indice_roster()
+        aluno = resolver_aluno(indice_roster, nome_aluno) or resolver_aluno(indice_roster, base)
+        documento.update(nome_aluno=aluno['nome'] if aluno else nome_aluno, nome_pdf=nome_aluno, base=base,
+                         matricula=aluno['matricula'] if aluno else None)
+
+        if not localizado:
+            self.log.warning(f"❌ Nenhum QR encontrado em {filename}")
+            registrar_documento(self.job, documento['input_hash'], filename, 'sem_qr',
+                                nome_extraido=documento['nome_aluno'], matricula=documento['matricula'])
+            return
+
+        page_num, (x, y, w, h), qr_png = localizado
+        documento['qr_png'] = qr_png
+        self.log.info(f"🔍 QR extraído de {filename} página {page_num + 1} ('{documento['nome_aluno']}')")
+
+        if not self.em_branco:
+            # Somente extração: o PNG leva o nome do aluno, como em /extract-qr
+            gravado = self._gravar(f"{documento['nome_aluno']}.png", qr_png)
+            registrar_documento(self.job, documento['input_hash'], filename, 'concluido',
+                                nome_extraido=documento['nome_aluno'], matricula=documento['matricula'],
+                                qr_hash=calcular_hash(qr_png),
+                                qr_localizacao={'page': page_num + 1, 'x': x / 3.0, 'y': y / 3.0,
+                                                'width': w / 3.0, 'height': h / 3.0})
+            self.log.info(f"✅ {filename} → {gravado}")
+            return
+
+        self._casar(documento)
+
+    def _obter_indice_modelos(self):
+        """Mapas dos diplomas em branco por nome e por matrícula (refeitos quando a pasta ou o cadastro mudam)."""
+        from src.routes.roster import obter_indice_roster, resolver_aluno
+
+        indice_roster = obter_indice_roster()
+        if self._indice_modelos is None or self._indice_modelos[0] is not indice_roster:
+            por_nome = {}
+            por_matricula = {}
+            for caminho, nome in sorted(self._nomes_modelos.items()):
+                base = os.path.splitext(os.path.basename(caminho))[0]
+                for chave in filter(None, (nome, base)):
+                    mapear_por_nome(por_nome, chave, caminho)
+                aluno = resolver_aluno(indice_roster, nome) or resolver_aluno(indice_roster, base)
+                if aluno:
+                    por_matricula[aluno['matricula']] = caminho
+            self._indice_modelos = (indice_roster, por_nome, por_matricula)
+        return self._indice_modelos[1:]
+
+    def _casar(self, documento):
+        from src.routes.jobs import registrar_documento
+
+        por_nome, por_matricula = self._obter_indice_modelos()
+        modelo = por_matricula.get(documento['matricula']) if documento['matricula'] else None
+        for chave in (documento['nome_pdf'], documento['base']):
+            modelo = modelo or buscar_por_nome(por_nome, chave)
+
+        if not modelo:
+            self._aguardando_modelo[documento['input_hash']] = documento
+            # Enquanto diplomas em branco ainda estão sendo lidos, o casamento pode dar certo
+            if not self._lendo_modelos() and not documento.get('aguardando'):
+                documento['aguardando'] = True
+                self.log.warning(f"⏳ Diploma em branco de '{documento['nome_aluno']}' ainda não encontrado; "
+                                 f"{documento['filename']} aguarda")
+                registrar_documento(self.job, documento['input_hash'], documento['filename'], 'sem_modelo',
+                                    nome_extraido=documento['nome_aluno'], matricula=documento['matricula'])
+            return
+
+        self._aguardando_modelo.pop(documento['input_hash'], None)
+        documento['modelo'] = modelo
+        from src.services.verificacao import deve_verificar
+        verificar = deve_verificar(documento['input_hash'], self.amostra_verificacao)
+        futuro = self._executor.submit(_inserir_no_modelo, modelo, documento['qr_png'], self.qr_position, verificar)
+        self._em_voo[futuro] = ('insercao', documento)
+
+    def _registrar_insercao(self, documento, pdf_saida, localizacao, verificacao):
+        from src.routes.jobs import calcular_hash, registrar_documento
+
+        base_modelo, ext = os.path.splitext(os.path.basename(documento['modelo']))
+        new_filename = self._gravar(f"{base_modelo}_com_qr{ext}", pdf_saida)
+        registrar_documento(self.job, documento['input_hash'], documento['filename'], 'concluido',
+                            nome_extraido=documento['nome_aluno'], matricula=documento['matricula'],
+                            qr_hash=calcular_hash(documento['qr_png']), qr_localizacao=localizacao)
+        self.log.info(f"✅ {documento['filename']} → {new_filename}")
+        if verificacao and verificacao['status'] != 'ok':
+            self.log.warning(f"⚠️ VERIFICAÇÃO FALHOU em {new_filename} ({verificacao['status']}): "
+                             f"QR de {localizacao['width']:.0f}pt pode não ser legível impresso")
+
+    def _gravar(self, filename, dados):
+        """Grava na pasta de saída de forma atômica (nunca deixa um arquivo pela metade)."""
+        from werkzeug.utils import secure_filename
+
+        filename = secure_filename(filename) or 'saida'
+        destino = os.path.join(self.saida, filename)
+        temporario = f"{destino}.tmp"
+        with open(temporario, 'wb') as arquivo:
+            arquivo.write(dados)
+        os.replace(temporario, destino)
+        return filename
+
+# ====================================================================
+# LINHA DE COMANDO
+# ====================================================================
+
+def ler_posicao(valor):
+    """
+    Aceita a posição como JSON ({"x", "y", "size"} ou {"auto": true, "size"})
+    ou como caminho de um arquivo JSON.
+    """
+    from src.services.posicionamento import validar_posicao
+    if os.path.isfile(valor):
+        with open(valor, encoding='utf-8') as arquivo:
+            valor = arquivo.read()
+    posicao = json.loads(valor)
+    erro = validar_posicao(posicao)
+    if erro:
+        raise argparse.ArgumentTypeError(erro)
+    return posicao
+
+def configurar_log(saida):
+    log = logging.getLogger('monitor')
+    log.setLevel(logging.INFO)
+    formato = logging.Formatter('%(asctime)s %(message)s')
+    for handler in (logging.StreamHandler(), logging.FileHandler(os.path.join(saida, 'monitor.log'), encoding='utf-8')):
+        handler.setFormatter(formato)
+        log.addHandler(handler)
+    return log
+
+def main():
+    parser = argparse.ArgumentParser(description='Monitora uma pasta de PDFs assinados e processa os novos arquivos')
+    parser.add_argument('--entrada', required=True, help='Pasta onde os PDFs assinados são salvos')
+    parser.add_argument('--saida', required=True, help='Pasta dos resultados e do monitor.log')
+    parser.add_argument('--em-branco', help='Pasta dos diplomas em branco (sem ela, só extrai os QRs)')
+    parser.add_argument('--posicao', type=ler_posicao,
+                        help='Posição unificada do QR: JSON {"x", "y", "size"}, {"auto": true, "size"} '
+                             '(espaço livre de cada diploma) ou arquivo JSON')
+    parser.add_argument('--processos', type=int, default=int(os.environ.get('QR_MONITOR_PROCESSOS', 0)) or None,
+                        help='Processos de trabalho (padrão: número de CPUs)')
+    parser.add_argument('--intervalo', type=float, default=2.0, help='Segundos entre varreduras')
+    parser.add_argument('--estabilidade', type=float, default=5.0,
+                        help='Segundos sem mudança de tamanho antes de processar um arquivo')
+    parser.add_argument('--verificar', default=None,
+                        help="Fração dos diplomas cujo QR inserido é lido de volta ('all', 'none' ou 0 a 1; "
+                             "padrão QR_VERIFICACAO_AMOSTRA)")
+    parser.add_argument('--uma-vez', action='store_true', help='Processa o que estiver na pasta e encerra')
+    args = parser.parse_args()
+
+    if args.em_branco and not args.posicao:
+        parser.error('--posicao é necessária com --em-branco')
+
+    os.makedirs(args.saida, exist_ok=True)
+    configurar_log(args.saida)
+
+    from src.main import create_app
+    from src.services.verificacao import interpretar_amostra
+    app = create_app()
+    amostra = interpretar_amostra(args.verificar, app.config['VERIFICACAO_AMOSTRA'])
+    with app.app_context():
+        MonitorPasta(args.entrada, args.saida, em_branco=args.em_branco, qr_position=args.posicao,
+                     processos=args.processos, intervalo=args.intervalo, estabilidade=args.estabilidade,
+                     amostra_verificacao=amostra).executar(uma_vez=args.uma_vez)
+
+if __name__ == '__main__':
+    main()
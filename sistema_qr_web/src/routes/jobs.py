@@ -0,0 +1,386 @@
+# ====================================================================
+# PERSISTÊNCIA DE JOBS, DOCUMENTOS E ARTEFATOS
+# ====================================================================
+# Este módulo registra no SQLite cada execução de lote/extração, o hash
+# de cada documento de entrada e os arquivos de saída gravados em disco.
+# Reenviar um lote com o mesmo job_id retoma o trabalho: documentos já
+# concluídos são pulados e seus resultados são lidos do disco.
+# Prazo, cota e limpeza dos arquivos: src/services/retencao.py.
+# ====================================================================
+
+from flask import Blueprint, jsonify, send_file, current_app
+import hashlib
+import json
+import os
+import re
+import tempfile
+import zipfile
+from src.models.user import db
+from src.models.job import Job, Documento, Artefato
+from src.services.retencao import prazo_job, marcar_uso
+from src.services.cancelamento import Cancelamento
+
+jobs_bp = Blueprint('jobs', __name__)
+
+# Identificadores aceitos quando gerados pelo cliente (também usados como nome de pasta)
+JOB_ID_VALIDO = re.compile(r'^[A-Za-z0-9_-]{8,32}$')
+
+# Marcador de pedido de cancelamento, na pasta do job (ver src/services/cancelamento.py)
+ARQUIVO_CANCELAMENTO = 'cancelar'
+
+# Artefatos de entrada do plano do lote (diploma e QR casados), guardados para
+# /api/batch-restamp: não são arquivos de saída e ficam fora do ZIP do job
+TIPOS_PLANO = ('diploma', 'qr_lote')
+
+# ====================================================================
+# SEÇÃO 1: FUNÇÕES DE APOIO USADAS PELOS ENDPOINTS DE PROCESSAMENTO
+# ====================================================================
+
+def calcular_hash(dados):
+    """Retorna o SHA-256 (hex) do conteúdo binário."""
+    return hashlib.sha256(dados).hexdigest()
+
+def obter_ou_criar_job(job_id, tipo, parametros, ttl_horas=None, exclusivo=True):
+    """
+    Retoma um job existente ou cria um novo.
+
+    O cliente pode gerar o próprio job_id antes de enviar o lote: assim,
+    se a conexão cair antes da resposta, o reenvio com o mesmo id retoma
+    o job mesmo sem o cliente ter recebido nenhuma resposta.
+
+    Retomar reserva o job (reservar_job): se o pedido anterior ainda está
+    processando o mesmo job, o reenvio recebe um erro em vez de rodar junto.
+
+    Args:
+        job_id (str or None): Identificador enviado pelo cliente
+        tipo (str): 'lote' ou 'extracao'
+        parametros (dict): Parâmetros da execução (ex: qr_position)
+        ttl_horas (str, float or None): Horas que os arquivos de saída ficam
+            guardados (padrão RETENCAO_TTL_HORAS; 0 = sem prazo). Retomar o
+            job renova o prazo.
+        exclusivo (bool): False retoma o job mesmo em andamento (o monitor de
+            pasta, cujo job pode ter ficado em andamento após uma queda)
+
+    Returns:
+        tuple: (job, erro) onde erro é uma mensagem se o job não puder
+               ser retomado com esses parâmetros
+    """
+    if job_id and not JOB_ID_VALIDO.match(job_id):
+        return None, f"job_id inválido: '{job_id}'"
+    if ttl_horas in (None, ''):
+        ttl_horas = current_app.config.get('RETENCAO_TTL_HORAS')
+    try:
+        expira_em = prazo_job(float(ttl_horas) if ttl_horas is not None else None)
+    except ValueError:
+        return None, f"ttl_hours inválido: '{ttl_horas}'"
+
+    job = db.session.get(Job, job_id) if job_id else None
+    if job is not None:
+        if job.tipo != tipo:
+            return None, f"Job '{job_id}' não é do tipo '{tipo}'"
+        if json.loads(job.parametros) != parametros:
+            return None, f"Job '{job_id}' foi criado com parâmetros diferentes"
+        if not exclusivo:
+            job.status = 'em_andamento'
+        elif not reservar_job(job.id, expirado=True):
+            return None, f"Job '{job_id}' ainda está em andamento"
+        job.expira_em = expira_em
+        db.session.commit()
+        return job, None
+
+    job = Job(id=job_id or None, tipo=tipo, parametros=json.dumps(parametros, sort_keys=True), expira_em=expira_em)
+    db.session.add(job)
+    db.session.commit()
+    return job, None
+
+def reservar_job(job_id, expirado=False):
+    """
+    Marca o job como em andamento, se ninguém o está processando, com um
+    único UPDATE condicional: de dois pedidos simultâneos, só um reserva.
+
+    Args:
+        job_id (str): Identificador do job
+        expirado (bool): Também reserva jobs expirados (retomar refaz as saídas)
+
+    Returns:
+        bool: True se o job foi reservado
+    """
+    bloqueados = ('em_andamento',) if expirado else ('em_andamento', 'expirado')
+    resultado = db.session.execute(
+        db.update(Job)
+        .where(Job.id == job_id, Job.status.notin_(bloqueados))
+        .values(status='em_andamento')
+    )
+    db.session.commit()
+    return resultado.rowcount == 1
+
+def liberar_job(job_id, status='interrompido'):
+    """
+    Devolve a `status` um job que o pedido deixou em andamento: um erro ou
+    um retorno antecipado antes de finalizar_job não deixa o job
+    respondendo 409 a toda retomada.
+    """
+    db.session.rollback()
+    db.session.execute(
+        db.update(Job)
+        .where(Job.id == job_id, Job.status == 'em_andamento')
+        .values(status=status)
+    )
+    db.session.commit()
+
+def documentos_concluidos(job):
+    """
+    Carrega com uma única consulta indexada os documentos concluídos do job.
+
+    Returns:
+        dict: {input_hash: Documento}
+    """
+    consulta = Documento.query.filter_by(job_id=job.id, status='concluido')
+    return {documento.input_hash: documento for documento in consulta}
+
+def registrar_documento(job, input_hash, filename, status, **campos):
+    """
+    Cria ou atualiza o registro do documento e confirma a transação.
+
+    A confirmação por documento garante que uma conexão derrubada no meio
+    do lote não perca o que já foi processado.
+    """
+    documento = Documento.query.filter_by(job_id=job.id, input_hash=input_hash).first()
+    if documento is None:
+        documento = Documento(job_id=job.id, input_hash=input_hash)
+        db.session.add(documento)
+
+    documento.filename = filename
+    documento.status = status
+    if 'qr_localizacao' in campos and campos['qr_localizacao'] is not None:
+        campos['qr_localizacao'] = json.dumps(campos['qr_localizacao'])
+    for campo, valor in campos.items():
+        setattr(documento, campo, valor)
+
+    db.session.commit()
+    return documento
+
+def registrar_falha(job, input_hash, filename, erro):
+    """
+    Registra um documento com erro, descartando a transação interrompida.
+
+    Documentos com erro não são considerados concluídos e serão
+    reprocessados quando o job for retomado.
+    """
+    db.session.rollback()
+    return registrar_documento(job, input_hash, filename, 'erro', erro=erro)
+
+def salvar_artefato(job, documento, tipo, filename, dados, confirmar=True):
+    """
+    Grava o arquivo de saída em disco e registra o artefato.
+
+    Os arquivos ficam em STORAGE_DIR/<job_id>/, prefixados pelo hash da
+    entrada para que diplomas com o mesmo nome não se sobrescrevam. Com
+    confirmar=False, o registro entra na próxima confirmação da sessão
+    (vários artefatos do mesmo documento em uma só transação).
+    """
+    pasta_job = os.path.join(current_app.config['STORAGE_DIR'], job.id)
+    os.makedirs(pasta_job, exist_ok=True)
+    caminho = os.path.join(pasta_job, f"{documento.input_hash[:16]}_{filename}")
+    # Grava ao lado e troca de uma vez: um download em andamento do arquivo
+    # substituído (substituir_artefato) continua lendo o conteúdo antigo
+    temporario = f"{caminho}.tmp"
+    with open(temporario, 'wb') as arquivo:
+        arquivo.write(dados)
+    os.replace(temporario, caminho)
+
+    artefato = Artefato(job_id=job.id, documento_id=documento.id, tipo=tipo,
+                        filename=filename, caminho=caminho, tamanho=len(dados))
+    db.session.add(artefato)
+    if confirmar:
+        db.session.commit()
+    return artefato
+
+def substituir_artefato(job, documento, tipo, filename, dados, confirmar=True):
+    """
+    Troca o artefato do documento por um novo conteúdo (ex: o PDF
+    reposicionado por /api/batch-restamp).
+
+    O artefato novo tem outro id, então ETags e o ZIP do job mudam junto.
+    """
+    caminhos_antigos = set()
+    for artefato in list(documento.artefatos):
+        if artefato.tipo == tipo:
+            caminhos_antigos.add(artefato.caminho)
+            db.session.delete(artefato)
+    novo = salvar_artefato(job, documento, tipo, filename, dados, confirmar)
+    for caminho in caminhos_antigos - {novo.caminho}:
+        try:
+            os.remove(caminho)
+        except FileNotFoundError:
+            pass
+    return novo
+
+def ler_artefato(documento, tipo):
+    """
+    Lê do disco o artefato de um documento já concluído.
+
+    Returns:
+        tuple or None: (Artefato, bytes) ou None se o arquivo não existir mais
+    """
+    for artefato in documento.artefatos:
+        if artefato.tipo == tipo and os.path.exists(artefato.caminho):
+            with open(artefato.caminho, 'rb') as arquivo:
+                dados = arquivo.read()
+            marcar_uso(artefato.caminho)
+            return artefato, dados
+    return None
+
+def _marcador_cancelamento(job_id):
+    return os.path.join(current_app.config['STORAGE_DIR'], job_id, ARQUIVO_CANCELAMENTO)
+
+def cancelamento_do_job(job_id, environ=None):
+    """
+    Cancelamento do job (marcador na pasta do job e, com 'environ', a
+    conexão do cliente), sem descartar um pedido já feito.
+    """
+    return Cancelamento(_marcador_cancelamento(job_id), environ)
+
+def iniciar_cancelamento(job, environ=None):
+    """
+    Cancelamento do job para esta execução; um pedido de cancelamento de
+    uma execução anterior (já atendido) é descartado.
+
+    Args:
+        job (Job): Job em andamento
+        environ (dict or None): Environ WSGI da requisição (detecta a desconexão do cliente)
+
+    Returns:
+        Cancelamento
+    """
+    cancelamento = cancelamento_do_job(job.id, environ)
+    try:
+        os.remove(cancelamento.marcador)
+    except FileNotFoundError:
+        pass
+    return cancelamento
+
+def finalizar_job(job, cancelamento=None):
+    """Marca o job como concluído (ou cancelado, se o trabalho foi interrompido)."""
+    if cancelamento is not None and cancelamento.motivo:
+        job.status = 'cancelado'
+        try:
+            os.remove(cancelamento.marcador)
+        except (FileNotFoundError, TypeError):
+            pass
+    else:
+        job.status = 'concluido'
+    db.session.commit()
+
+# ====================================================================
+# SEÇÃO 2: ENDPOINTS DE CONSULTA
+# ====================================================================
+
+@jobs_bp.route('/jobs/<job_id>', methods=['GET'])
+def get_job(job_id):
+    """
+    Retorna o job com seus documentos, status e artefatos.
+    """
+    job = db.get_or_404(Job, job_id)
+    resultado = job.to_dict()
+    resultado['documentos'] = [documento.to_dict() for documento in job.documentos.order_by(Documento.id)]
+    return jsonify(resultado)
+
+@jobs_bp.route('/jobs/<job_id>/cancel', methods=['POST'])
+def cancelar_job(job_id):
+    """
+    Pede o cancelamento de um job em andamento (lote, extração ou sessão
+    de envio). O trabalho para antes do próximo documento (ou página) e a
+    requisição que o executa responde com o resumo parcial; o que já foi
+    concluído continua no job e pode ser retomado com o mesmo job_id.
+    """
+    job = db.get_or_404(Job, job_id)
+    if job.status != 'em_andamento':
+        return jsonify({'error': f"Job '{job_id}' não está em andamento ({job.status})"}), 409
+    marcador = _marcador_cancelamento(job.id)
+    os.makedirs(os.path.dirname(marcador), exist_ok=True)
+    with open(marcador, 'w', encoding='utf-8'):
+        pass
+    return jsonify({'success': True, 'job_id': job.id, 'status': 'cancelando'}), 202
+
+def _etag_artefato(artefato):
+    # Artefatos nunca são reescritos: id e tamanho identificam o conteúdo
+    return f"{artefato.job_id}-{artefato.id}-{artefato.tamanho}"
+
+@jobs_bp.route('/jobs/<job_id>/artifacts/<int:artefato_id>', methods=['GET'])
+def download_artefato(job_id, artefato_id):
+    """
+    Faz o download de um arquivo de saída gravado pelo job.
+
+    Responde com ETag e Last-Modified (If-None-Match → 304) e aceita
+    Range para downloads parciais e retomados. Arquivos removidos pela
+    retenção respondem 410.
+    """
+    artefato = db.session.get(Artefato, artefato_id)
+    if artefato is None or artefato.job_id != job_id:
+        job = db.session.get(Job, job_id)
+        if job is not None and job.status == 'expirado':
+            return jsonify({'error': 'Arquivos do job expirados'}), 410
+        return jsonify({'error': 'Artefato não encontrado'}), 404
+    if not os.path.exists(artefato.caminho):
+        return jsonify({'error': 'Artefato removido pela retenção'}), 410
+
+    marcar_uso(artefato.caminho)
+    mimetype = 'image/png' if artefato.tipo in ('qr_png', 'qr_lote') else 'application/pdf'
+    return send_file(artefato.caminho, mimetype=mimetype, as_attachment=True, download_name=artefato.filename,
+                     conditional=True, etag=_etag_artefato(artefato), last_modified=artefato.criado_em)
+
+@jobs_bp.route('/jobs/<job_id>/archive', methods=['GET'])
+def download_zip(job_id):
+    """
+    Faz o download de um ZIP com todos os arquivos de saída do job (sem o
+    plano do lote, TIPOS_PLANO).
+
+    O ZIP é montado na primeira chamada e guardado na pasta do job; as
+    próximas chamadas (e downloads retomados com Range) são servidas do
+    disco até o conjunto de artefatos mudar.
+    """
+    job = db.get_or_404(Job, job_id)
+    artefatos = [artefato for artefato in Artefato.query.filter_by(job_id=job.id).order_by(Artefato.id)
+                 if artefato.tipo not in TIPOS_PLANO and os.path.exists(artefato.caminho)]
+    if not artefatos:
+        if job.status == 'expirado':
+            return jsonify({'error': 'Arquivos do job expirados'}), 410
+        return jsonify({'error': 'O job não tem arquivos de saída'}), 404
+
+    assinatura = calcular_hash(','.join(_etag_artefato(artefato) for artefato in artefatos).encode('utf-8'))[:16]
+    pasta_job = os.path.join(current_app.config['STORAGE_DIR'], job.id)
+    caminho = os.path.join(pasta_job, f"resultados_{assinatura}.zip")
+    if not os.path.exists(caminho):
+        # ZIPs de conjuntos anteriores não servem mais (outro download pode já tê-los removido)
+        for nome in os.listdir(pasta_job):
+            if nome.startswith('resultados_') and nome.endswith('.zip') and nome != os.path.basename(caminho):
+                try:
+                    os.remove(os.path.join(pasta_job, nome))
+                except FileNotFoundError:
+                    pass
+        # Temporário exclusivo: dois primeiros downloads simultâneos montam cada um o
+        # seu ZIP e o último os.replace vence, com o mesmo conteúdo
+        descritor, temporario = tempfile.mkstemp(dir=pasta_job, prefix='resultados_', suffix='.tmp')
+        try:
+            nomes_usados = set()
+            # PDFs e PNGs já são comprimidos: ZIP_STORED evita gastar CPU à toa
+            with os.fdopen(descritor, 'wb') as destino, \
+                    zipfile.ZipFile(destino, 'w', zipfile.ZIP_STORED) as arquivo_zip:
+                for artefato in artefatos:
+                    nome = artefato.filename
+                    if nome in nomes_usados:
+                        nome = f"{os.path.splitext(nome)[0]}_{artefato.id}{os.path.splitext(nome)[1]}"
+                    nomes_usados.add(nome)
+                    arquivo_zip.write(artefato.caminho, nome)
+            os.replace(temporario, caminho)
+        except BaseException:
+            try:
+                os.remove(temporario)
+            except FileNotFoundError:
+                pass
+            raise
+
+    marcar_uso(caminho)
+    return send_file(caminho, mimetype='application/zip', as_attachment=True,
+                     download_name=f"job_{job.id}.zip", conditional=True, etag=f"{job.id}-{assinatura}")
@@ -0,0 +1,47 @@
+from flask import Blueprint, Response, jsonify, request, current_app
+from src.services.metrics import exportar_prometheus
+from src.services.profiler import token_admin_valido, listar_relatorios, carregar_relatorio
+from src.services.admissao import estado_controles
+from src.services.prioridade import estado_escalonador
+
+metrics_bp = Blueprint('metrics', __name__)
+
+@metrics_bp.route('/metrics', methods=['GET'])
+def metrics():
+    """
+    Expõe as métricas do processo no formato texto do Prometheus.
+
+    Inclui histogramas de duração por etapa (qr_etapa_duracao_segundos) e
+    por endpoint, além de contadores de requisições, documentos e detecções.
+    """
+    return Response(exportar_prometheus(), mimetype='text/plain; version=0.0.4; charset=utf-8')
+
+@metrics_bp.route('/api/admission', methods=['GET'])
+def admission():
+    """
+    Estado do controle de admissão deste processo: requisições em execução,
+    fila, memória reservada, limites e tempo médio de espera por endpoint,
+    além das vagas de CPU por classe de prioridade.
+    """
+    return jsonify({'endpoints': estado_controles(), 'prioridades': estado_escalonador()})
+
+@metrics_bp.route('/api/profiles', methods=['GET'])
+def list_profiles():
+    """
+    Lista os relatórios de perfilamento gravados (somente administradores).
+    """
+    if not token_admin_valido(request.headers.get('X-Admin-Token'), current_app.config):
+        return jsonify({'error': 'Acesso restrito a administradores'}), 403
+    return jsonify({'profiles': listar_relatorios(current_app.config['PROFILE_DIR'])})
+
+@metrics_bp.route('/api/profiles/<profile_id>', methods=['GET'])
+def get_profile(profile_id):
+    """
+    Retorna um relatório de perfilamento (somente administradores).
+    """
+    if not token_admin_valido(request.headers.get('X-Admin-Token'), current_app.config):
+        return jsonify({'error': 'Acesso restrito a administradores'}), 403
+    relatorio = carregar_relatorio(current_app.config['PROFILE_DIR'], profile_id)
+    if relatorio is None:
+        return jsonify({'error': 'Relatório não encontrado'}), 404
+    return jsonify(relatorio)
@@ -8,23 +8,133 @@
 # 4. Processamento em lote com posicionamento unificado
 # ====================================================================
 
-from flask import Blueprint, request, jsonify, send_file
-import fitz  # PyMuPDF - Manipulação de documentos PDF
-from PIL import Image  # Processamento de imagens
-import cv2  # OpenCV - Detecção de QR codes
-import numpy as np  # Operações matemáticas
+# PyMuPDF (fitz), OpenCV (cv2), NumPy e Pillow são importados dentro das
+# funções que os usam: importar este módulo (ou só as funções de nomes)
+# não paga o custo de inicialização dessas bibliotecas. Em produção o
+# src/wsgi.py as pré-carrega antes do fork dos workers.
+from flask import Blueprint, request, jsonify, send_file, g, current_app
 import io
+import logging
 import os
 import zipfile
 import tempfile
 import base64
+import json
 import re
-import unicodedata
+import time
 from werkzeug.utils import secure_filename
+from src.services.metrics import (medir_etapa, iniciar_resumo, encerrar_resumo,
+                                  REQUISICOES, DURACAO_REQUISICAO, DOCUMENTOS, DETECCOES, VERIFICACOES)
+from src.services.profiler import PerfilRequisicao, modo_perfil, salvar_relatorio
+from src.services.admissao import obter_controle, Sobrecarga
+from src.services.prioridade import obter_escalonador
+from src.services.registro import LogJob
+
+logger = logging.getLogger(__name__)
 
 # Blueprint para organizar as rotas do sistema
 pdf_qr_bp = Blueprint('pdf_qr', __name__)
 
+# Instrumentação: cada requisição da API acumula os tempos de suas etapas
+@pdf_qr_bp.before_request
+def _iniciar_metricas():
+    g.inicio_requisicao = time.perf_counter()
+    g.resumo_tempos = iniciar_resumo()
+
+@pdf_qr_bp.after_request
+def _registrar_metricas(response):
+    endpoint = request.endpoint or 'desconhecido'
+    REQUISICOES.inc(endpoint=endpoint, status=response.status_code)
+    DURACAO_REQUISICAO.observe(time.perf_counter() - g.inicio_requisicao, endpoint=endpoint)
+    return response
+
+@pdf_qr_bp.teardown_request
+def _encerrar_metricas(exc):
+    encerrar_resumo()
+
+# Controle de admissão (ver src/services/admissao.py): limita as requisições
+# simultâneas e a memória dos endpoints pesados; sobrecarga vira 503 rápido
+@pdf_qr_bp.before_request
+def _admitir_requisicao():
+    g.admissao = None
+    controle = obter_controle(request.endpoint, current_app.config)
+    if controle is None:
+        return None
+    
+    custo_mb = controle.estimar_memoria_mb(request.content_length)
+    try:
+        g.espera_admissao = controle.admitir(custo_mb)
+    except Sobrecarga as erro:
+        response = jsonify({
+            'error': 'Servidor ocupado no momento, tente novamente em instantes',
+            'motivo': erro.motivo,
+            'retry_after': erro.retry_after
+        })
+        response.status_code = 503
+        response.headers['Retry-After'] = str(erro.retry_after)
+        return response
+    g.admissao = (controle, custo_mb, time.perf_counter())
+
+@pdf_qr_bp.after_request
+def _informar_espera(response):
+    if g.get('admissao') is not None:
+        response.headers['X-Queue-Wait-Ms'] = f'{g.espera_admissao * 1000:.0f}'
+    return response
+
+@pdf_qr_bp.teardown_request
+def _liberar_admissao(exc):
+    admissao = g.pop('admissao', None)
+    if admissao is not None:
+        controle, custo_mb, inicio = admissao
+        controle.liberar(custo_mb, time.perf_counter() - inicio)
+
+# Perfilamento opcional (ver src/services/profiler.py): restrito a administradores
+@pdf_qr_bp.before_request
+def _iniciar_perfil():
+    g.perfil = None
+    modo = modo_perfil(request.headers, current_app.config)
+    if modo:
+        perfil = PerfilRequisicao(request.endpoint, modo)
+        if perfil.iniciar():
+            g.perfil = perfil
+
+@pdf_qr_bp.after_request
+def _finalizar_perfil(response):
+    perfil = g.pop('perfil', None)
+    if perfil is None:
+        return response
+    
+    relatorio = perfil.finalizar()
+    salvar_relatorio(relatorio, current_app.config['PROFILE_DIR'],
+                     current_app.config['PROFILE_MAX_RELATORIOS'])
+    response.headers['X-Profile-Id'] = relatorio['id']
+    
+    # No modo por cabeçalho o relatório também volta junto da resposta JSON
+    if perfil.modo == 'inline' and response.is_json:
+        dados = response.get_json()
+        dados['profile'] = relatorio
+        response.set_data(current_app.json.dumps(dados))
+    return response
+
+@pdf_qr_bp.teardown_request
+def _descartar_perfil(exc):
+    # Garante a liberação do perfilador se a requisição terminou com exceção
+    perfil = g.pop('perfil', None)
+    if perfil is not None:
+        perfil.finalizar()
+
+# Job reservado pelo pedido (g.job_reservado): se a requisição termina sem
+# finalizar_job (erro ou retorno antecipado), o job não fica em andamento
+@pdf_qr_bp.teardown_request
+def _liberar_job(exc):
+    job_id = g.pop('job_reservado', None)
+    if job_id is not None:
+        from src.routes.jobs import liberar_job
+        try:
+            liberar_job(job_id)
+        except Exception:
+            logger.exception("❌ Não foi possível liberar o job %s", job_id)
+
 # ====================================================================
 # SEÇÃO 1: FUNÇÕES DE NORMALIZAÇÃO E LIMPEZA DE NOMES
 # ====================================================================
@@ -32,86 +142,9 @@ pdf_qr_bp = Blueprint('pdf_qr', __name__)
 # extraídos de PDFs e nomes de arquivos para permitir matching
 # inteligente mesmo com pequenas diferenças de formatação.
 
-def limpar_nome_arquivo(nome):
-    """
-    Limpa e padroniza nomes de arquivos removendo acentos e caracteres especiais.
-    
-    Funcionalidades:
-    - Remove quebras de linha e espaços extras
-    - Normaliza acentos (á → a, ç → c, etc.)
-    - Remove caracteres especiais mantendo letras, números e espaços
-    - Remove extensão .pdf se presente
-    
-    Args:
-        nome (str): Nome original do arquivo ou texto
-        
-    Returns:
-        str: Nome limpo e padronizado
-        
-    Exemplo:
-        "José da Silva.pdf" → "Jose da Silva"
-        "María_López" → "Maria Lopez"
-    """
-    if not nome:
-        return ""
-    
-    # Remove quebras de linha e espaços extras
-    nome = re.sub(r'\s+', ' ', nome.strip())
-    
-    # Normaliza acentos (NFD = separa caracteres e acentos)
-    nome_normalizado = unicodedata.normalize('NFD', nome)
-    
-    # Remove apenas os acentos, mantendo letras
-    nome_sem_acento = ''.join(char for char in nome_normalizado if unicodedata.category(char) != 'Mn')
-    
-    # Remove caracteres especiais, mas mantém letras, números e espaços
-    nome_limpo = re.sub(r'[^\w\s]', '', nome_sem_acento)
-    
-    # Substitui múltiplos espaços por um único espaço
-    nome_limpo = re.sub(r'\s+', ' ', nome_limpo)
-    
-    # Remove .pdf se existir
-    if nome_limpo.lower().endswith('.pdf'):
-        nome_limpo = nome_limpo[:-4]
-    
-    return nome_limpo.strip()
-
-def normalizar_para_matching(nome):
-    """
-    Prepara nomes para matching inteligente com múltiplas variações.
-    
-    Funcionalidades:
-    - Aplica limpeza básica de caracteres
-    - Substitui underscores por espaços
-    - Converte para minúsculas
-    - Cria versão sem espaços para matching flexível
-    
-    Args:
-        nome (str): Nome a ser normalizado
-        
-    Returns:
-        tuple: (nome_com_espacos, nome_sem_espacos) para matching
-        
-    Exemplo:
-        "João_Silva" → ("joao silva", "joaosilva")
-        "Ana Costa" → ("ana costa", "anacosta")
-    """
-    if not nome:
-        return ""
-    
-    # Aplica limpeza básica
-    nome_limpo = limpar_nome_arquivo(nome)
-    
-    # Remove underscores e substitui por espaços
-    nome_limpo = nome_limpo.replace('_', ' ')
-    
-    # Converte para minúsculas para matching case-insensitive
-    nome_limpo = nome_limpo.lower()
-    
-    # Remove espaços para matching mais flexível
-    nome_sem_espacos = nome_limpo.replace(' ', '')
-    
-    return nome_limpo, nome_sem_espacos
+# Implementadas em src/services/nomes.py (sem dependências pesadas) e
+# reexportadas aqui para manter a interface do módulo.
+from src.services.nomes import limpar_nome_arquivo, normalizar_para_matching, mapear_por_nome, buscar_por_nome
 
 # ====================================================================
 # SEÇÃO 2: EXTRAÇÃO DE NOMES DE DOCUMENTOS PDF
@@ -119,7 +152,7 @@ def normalizar_para_matching(nome):
 # Esta função extrai automaticamente o nome do aluno de documentos
 # PDF usando padrões específicos de diplomas e certificados.
 
-def extrair_nome_do_pdf(pdf_bytes):
+def extrair_nome_do_pdf(pdf_bytes, regiao=None):
     """
     Extrai inteligentemente o nome do aluno de documentos PDF.
     
@@ -130,6 +163,8 @@ def extrair_nome_do_pdf(pdf_bytes):
     
     Args:
         pdf_bytes (bytes): Conteúdo binário do arquivo PDF
+        regiao (tuple or None): (x0, y0, x1, y1) em pontos; só o texto dessa
+            região da primeira página é lido (região do nome do modelo de layout)
         
     Returns:
         str or None: Nome do aluno extraído ou None se não encontrado
@@ -140,13 +175,16 @@ def extrair_nome_do_pdf(pdf_bytes):
         - "Nome: Ana Costa"
         - "Formando: Carlos Oliveira"
     """
+    import fitz  # PyMuPDF - Manipulação de documentos PDF
     try:
-        doc = fitz.open(stream=pdf_bytes, filetype="pdf")
-        page = doc[0]
-        text = page.get_text()
+        with medir_etapa('abrir_pdf'):
+            doc = fitz.open(stream=pdf_bytes, filetype="pdf")
+        with medir_etapa('extrair_texto'):
+            page = doc[0]
+            text = page.get_text(clip=regiao) if regiao else page.get_text()
         doc.close()
         
-        print(f"Texto extraído do PDF:\n{text}")
+        logger.debug("Texto extraído do PDF:\n%s", text)
         
         # ESTRATÉGIA 1: Padrões específicos para diplomas/certificados
         patterns = [
@@ -178,7 +216,7 @@ def extrair_nome_do_pdf(pdf_bytes):
                 
                 nome_final = ' '.join(nome_limpo_palavras)
                 nome_limpo = limpar_nome_arquivo(nome_final)
-                print(f"Nome extraído por padrão '{pattern}': '{nome}' -> '{nome_limpo}'")
+                logger.debug("Nome extraído por padrão '%s': '%s' -> '%s'", pattern, nome, nome_limpo)
                 return nome_limpo
         
         # ESTRATÉGIA 2: Detecção automática de nomes próprios
@@ -213,41 +251,89 @@ def extrair_nome_do_pdf(pdf_bytes):
                         
                         if not any(palavra in line.lower() for palavra in palavras_ignorar):
                             nome_limpo = limpar_nome_arquivo(line)
-                            print(f"Nome extraído por detecção automática: '{line}' -> '{nome_limpo}'")
+                            logger.debug("Nome extraído por detecção automática: '%s' -> '%s'", line, nome_limpo)
                             return nome_limpo
         
-        print("Nenhum nome encontrado no PDF")
+        logger.debug("Nenhum nome encontrado no PDF")
         return None
     except Exception as e:
-        print(f"Erro ao extrair nome do PDF: {e}")
+        logger.warning("Erro ao extrair nome do PDF: %s", e)
         return None
 
+def extrair_nome_com_modelo(pdf_bytes, modelo):
+    """
+    Extrai o nome usando a região do nome aprendida no modelo de layout
+    (src/services/modelos.py); no primeiro diploma do modelo, aprende-a.
+    
+    Args:
+        pdf_bytes (bytes): Conteúdo do PDF
+        modelo (Modelo or None): Modelo do diploma (None = página inteira)
+        
+    Returns:
+        str or None: Nome do aluno
+    """
+    if modelo is None:
+        return extrair_nome_do_pdf(pdf_bytes)
+    regiao = modelo.dados.get('regiao_nome')
+    nome = extrair_nome_do_pdf(pdf_bytes, regiao) if regiao else None
+    if nome:
+        return nome
+    # Região ainda desconhecida (ou sem nome neste diploma): página inteira
+    nome = extrair_nome_do_pdf(pdf_bytes)
+    if nome and 'regiao_nome' not in modelo.dados:
+        from src.services.modelos import regiao_do_nome
+        modelo.dados['regiao_nome'] = regiao_do_nome(pdf_bytes, nome)
+    return nome
+
 # ====================================================================
 # SEÇÃO 3: DETECÇÃO DE QR CODES EM IMAGENS
 # ====================================================================
 # Esta função utiliza OpenCV para detectar automaticamente a posição
 # de códigos QR em imagens, essencial para extração de QRs existentes.
 
-def detectar_qr_code_na_imagem(img_array):
+# Pré-filtro de padrões localizadores (src/services/prefiltro.py): QR_PREFILTRO=0
+# desativa e volta à detecção sempre na página inteira
+PREFILTRO_ATIVO = os.environ.get('QR_PREFILTRO', '1') != '0'
+
+def _caixa_do_qr(points, forma, deslocamento=(0, 0)):
+    """Retângulo (x, y, w, h) dos cantos detectados, com margem de segurança."""
+    points = points[0]
+    x = int(min(points[:, 0])) + deslocamento[0]
+    y = int(min(points[:, 1])) + deslocamento[1]
+    w = int(max(points[:, 0]) - min(points[:, 0]))
+    h = int(max(points[:, 1]) - min(points[:, 1]))
+    # Adiciona margem de segurança
+    margin = 10
+    x = max(0, x - margin)
+    y = max(0, y - margin)
+    w = min(forma[1] - x, w + 2 * margin)
+    h = min(forma[0] - y, h + 2 * margin)
+    return (x, y, w, h)
+
+def detectar_qr_code_na_imagem(img_array, prefiltro=None):
     """
     Detecta automaticamente a posição e dimensões de QR codes em imagens.
     
     Funcionalidades:
     - Converte imagem para escala de cinza
+    - Procura janelas candidatas pelos padrões localizadores do QR
     - Utiliza detector OpenCV com múltiplas estratégias
     - Aplica threshold adaptivo quando necessário
     - Adiciona margem de segurança ao QR detectado
     
     Args:
         img_array (numpy.ndarray): Array da imagem em formato RGB
+        prefiltro (bool or None): Usa o pré-filtro (padrão: PREFILTRO_ATIVO)
         
     Returns:
         tuple or None: (x, y, width, height) do QR ou None se não encontrado
         
     Estratégias de detecção:
+    0. Detecção (direta e com threshold) só nas janelas candidatas do pré-filtro
     1. Detecção direta na imagem original
     2. Aplicação de threshold adaptivo para melhorar contraste
     """
+    import cv2  # OpenCV - Detecção de QR codes
     try:
         # Converte para escala de cinza se necessário
         if len(img_array.shape) == 3:
@@ -255,55 +341,140 @@ def detectar_qr_code_na_imagem(img_array):
         else:
             gray = img_array
         
-        # ESTRATÉGIA 1: Detecção direta
         detector = cv2.QRCodeDetector()
-        data, points, _ = detector.detectAndDecode(gray)
+        
+        # ESTRATÉGIA 0: Janelas candidatas (alguns % da página)
+        if PREFILTRO_ATIVO if prefiltro is None else prefiltro:
+            from src.services.prefiltro import janelas_candidatas
+            with medir_etapa('detectar_qr_prefiltro'):
+                janelas = janelas_candidatas(gray)
+            if janelas:
+                with medir_etapa('detectar_qr_janela'):
+                    for jx, jy, jw, jh in janelas:
+                        recorte = gray[jy:jy + jh, jx:jx + jw]
+                        data, points, _ = detector.detectAndDecode(recorte)
+                        if points is None or len(points) == 0:
+                            thresh = cv2.adaptiveThreshold(recorte, 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C,
+                                                           cv2.THRESH_BINARY, 11, 2)
+                            data, points, _ = detector.detectAndDecode(thresh)
+                        if points is not None and len(points) > 0:
+                            DETECCOES.inc(estrategia='janela', resultado='encontrado')
+                            x, y, w, h = _caixa_do_qr(points, img_array.shape, (jx, jy))
+                            logger.debug("QR Code detectado na janela candidata em: x=%d, y=%d, w=%d, h=%d", x, y, w, h)
+                            return (x, y, w, h)
+                DETECCOES.inc(estrategia='janela', resultado='falhou')
+            else:
+                DETECCOES.inc(estrategia='janela', resultado='sem_candidato')
+        
+        # ESTRATÉGIA 1: Detecção direta
+        with medir_etapa('detectar_qr_direto'):
+            data, points, _ = detector.detectAndDecode(gray)
         
         if points is not None and len(points) > 0:
-            points = points[0]
-            x = int(min(points[:, 0]))
-            y = int(min(points[:, 1]))
-            w = int(max(points[:, 0]) - x)
-            h = int(max(points[:, 1]) - y)
-            # Adiciona margem de segurança
-            margin = 10
-            x = max(0, x - margin)
-            y = max(0, y - margin)
-            w = min(img_array.shape[1] - x, w + 2 * margin)
-            h = min(img_array.shape[0] - y, h + 2 * margin)
-            print(f"QR Code detectado em: x={x}, y={y}, w={w}, h={h}")
+            DETECCOES.inc(estrategia='direta', resultado='encontrado')
+            x, y, w, h = _caixa_do_qr(points, img_array.shape)
+            logger.debug("QR Code detectado em: x=%d, y=%d, w=%d, h=%d", x, y, w, h)
             return (x, y, w, h)
         
+        DETECCOES.inc(estrategia='direta', resultado='falhou')
+        
         # ESTRATÉGIA 2: Threshold adaptivo para melhorar contraste
-        thresh = cv2.adaptiveThreshold(gray, 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C, cv2.THRESH_BINARY, 11, 2)
-        data, points, _ = detector.detectAndDecode(thresh)
+        with medir_etapa('detectar_qr_threshold'):
+            thresh = cv2.adaptiveThreshold(gray, 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C, cv2.THRESH_BINARY, 11, 2)
+            data, points, _ = detector.detectAndDecode(thresh)
         
         if points is not None and len(points) > 0:
-            points = points[0]
-            x = int(min(points[:, 0]))
-            y = int(min(points[:, 1]))
-            w = int(max(points[:, 0]) - x)
-            h = int(max(points[:, 1]) - y)
-            # Adiciona margem de segurança
-            margin = 10
-            x = max(0, x - margin)
-            y = max(0, y - margin)
-            w = min(img_array.shape[1] - x, w + 2 * margin)
-            h = min(img_array.shape[0] - y, h + 2 * margin)
-            print(f"QR Code detectado com threshold em: x={x}, y={y}, w={w}, h={h}")
+            DETECCOES.inc(estrategia='threshold', resultado='encontrado')
+            x, y, w, h = _caixa_do_qr(points, img_array.shape)
+            logger.debug("QR Code detectado com threshold em: x=%d, y=%d, w=%d, h=%d", x, y, w, h)
             return (x, y, w, h)
             
-        print("Nenhum QR Code detectado na imagem")
+        DETECCOES.inc(estrategia='threshold', resultado='falhou')
+        logger.debug("Nenhum QR Code detectado na imagem")
         
     except Exception as e:
-        print(f"Erro na detecção do QR code: {e}")
+        logger.warning("Erro na detecção do QR code: %s", e)
     return None
 
+def decodificar_qr_na_imagem(img_array):
+    """
+    Lê o conteúdo do QR code de uma imagem com o mesmo detector OpenCV.
+    
+    Usa as mesmas estratégias de detectar_qr_code_na_imagem (direta e com
+    threshold adaptivo), mas retorna o texto decodificado em vez da posição.
+    
+    Args:
+        img_array (numpy.ndarray): Array da imagem (RGB ou escala de cinza)
+        
+    Returns:
+        str or None: Conteúdo do QR ou None se nenhum QR pôde ser lido
+    """
+    import cv2
+    if len(img_array.shape) == 3:
+        gray = cv2.cvtColor(img_array, cv2.COLOR_RGB2GRAY)
+    else:
+        gray = img_array
+    
+    detector = cv2.QRCodeDetector()
+    with medir_etapa('decodificar_qr'):
+        data, _, _ = detector.detectAndDecode(gray)
+        if not data:
+            thresh = cv2.adaptiveThreshold(gray, 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C, cv2.THRESH_BINARY, 11, 2)
+            data, _, _ = detector.detectAndDecode(thresh)
+    return data or None
+
 # ====================================================================
 # SEÇÃO 4: ENDPOINTS DA API - UPLOAD E RENDERIZAÇÃO DE PDFs
 # ====================================================================
 # Estes endpoints lidam com o carregamento e exibição de documentos PDF.
 
+def renderizar_paginas_preview(pdf_bytes):
+    """
+    Renderiza todas as páginas de um PDF como PNG base64 para o frontend.
+    
+    Função pura (só bytes de entrada e saída): usada por /upload-pdf e
+    pela variante assíncrona (src/asgi.py), que a executa em um executor.
+    
+    Args:
+        pdf_bytes (bytes): Conteúdo do PDF
+        
+    Returns:
+        list: [{'page_num', 'image', 'width', 'height', 'display_width', 'display_height'}]
+        
+    Escalas utilizadas:
+        - Matrix(1.5, 1.5): Boa qualidade para visualização web
+        - Preserva proporções originais do documento
+    """
+    import fitz
+    with medir_etapa('abrir_pdf'):
+        doc = fitz.open(stream=pdf_bytes, filetype="pdf")
+    
+    pages = []
+    for page_num in range(len(doc)):
+        page = doc[page_num]
+        mat = fitz.Matrix(1.5, 1.5)  # Escala para boa qualidade
+        with medir_etapa('renderizar'):
+            pix = page.get_pixmap(matrix=mat)
+        with medir_etapa('codificar_imagem'):
+            img_data = pix.tobytes("png")
+        with medir_etapa('base64'):
+            img_base64 = base64.b64encode(img_data).decode('utf-8')
+        
+        # Obtém as dimensões reais da página em pontos
+        page_rect = page.rect
+        
+        pages.append({
+            'page_num': page_num,
+            'image': f"data:image/png;base64,{img_base64}",
+            'width': page_rect.width,    # Largura real em pontos
+            'height': page_rect.height,  # Altura real em pontos
+            'display_width': pix.width,  # Largura da imagem renderizada
+            'display_height': pix.height # Altura da imagem renderizada
+        })
+    
+    doc.close()
+    return pages
+
 @pdf_qr_bp.route('/upload-pdf', methods=['POST'])
 def upload_pdf():
     """
@@ -322,10 +493,6 @@ def upload_pdf():
             'pages': [{'page_num', 'image', 'width', 'height', 'display_width', 'display_height'}],
             'filename': str
         }
-        
-    Escalas utilizadas:
-        - Matrix(1.5, 1.5): Boa qualidade para visualização web
-        - Preserva proporções originais do documento
     """
     try:
         if 'pdf' not in request.files:
@@ -335,30 +502,9 @@ def upload_pdf():
         if pdf_file.filename == '':
             return jsonify({'error': 'Nenhum arquivo selecionado'}), 400
         
-        pdf_bytes = pdf_file.read()
-        doc = fitz.open(stream=pdf_bytes, filetype="pdf")
-        
-        pages = []
-        for page_num in range(len(doc)):
-            page = doc[page_num]
-            mat = fitz.Matrix(1.5, 1.5)  # Escala para boa qualidade
-            pix = page.get_pixmap(matrix=mat)
-            img_data = pix.tobytes("png")
-            img_base64 = base64.b64encode(img_data).decode('utf-8')
-            
-            # Obtém as dimensões reais da página em pontos
-            page_rect = page.rect
-            
-            pages.append({
-                'page_num': page_num,
-                'image': f"data:image/png;base64,{img_base64}",
-                'width': page_rect.width,    # Largura real em pontos
-                'height': page_rect.height,  # Altura real em pontos
-                'display_width': pix.width,  # Largura da imagem renderizada
-                'display_height': pix.height # Altura da imagem renderizada
-            })
-        
-        doc.close()
+        # Prévia interativa: passa à frente dos documentos de lote na fila da CPU
+        with obter_escalonador(current_app.config).vez('interativa'):
+            pages = renderizar_paginas_preview(pdf_file.read())
         
         return jsonify({
             'success': True,
@@ -375,6 +521,107 @@ def upload_pdf():
 # ====================================================================
 # Este endpoint extrai QR codes de PDFs já processados (ex: diplomas assinados).
 
+def localizar_qr_no_pdf(pdf_bytes, regiao=None, cancelamento=None):
+    """
+    Procura o primeiro QR code do PDF, página a página, e recorta-o.
+    
+    Renderiza cada página em alta resolução (Matrix 3.0) e aplica
+    detectar_qr_code_na_imagem até encontrar um QR. Com 'regiao' (onde o
+    QR estava nos outros diplomas do mesmo modelo de layout), renderiza
+    antes só essa região, com folga; se não houver QR nela, segue como antes.
+    
+    Args:
+        pdf_bytes (bytes): Conteúdo do PDF
+        regiao (tuple or None): (página, (x0, y0, x1, y1) em pontos)
+        cancelamento (Cancelamento or None): Conferido antes de cada página
+        
+    Returns:
+        tuple or None: (page_num, (x, y, w, h), png do QR) em pixels da
+                       renderização 3x, ou None se nenhuma página tem QR
+        
+    Raises:
+        Cancelado: O trabalho foi cancelado entre duas páginas
+    """
+    import fitz
+    import numpy as np  # Operações matemáticas
+    from PIL import Image  # Processamento de imagens
+    
+    with medir_etapa('abrir_pdf'):
+        doc = fitz.open(stream=pdf_bytes, filetype="pdf")
+    try:
+        if cancelamento is not None:
+            cancelamento.verificar()
+        if regiao and regiao[0] < len(doc):
+            localizado = _localizar_qr_na_regiao(doc, *regiao)
+            if localizado:
+                return localizado
+        
+        # Procura QR em todas as páginas do documento
+        for page_num in range(len(doc)):
+            if cancelamento is not None and page_num > 0:
+                cancelamento.verificar()
+            logger.debug("Analisando página %d de %d", page_num + 1, len(doc))
+            page = doc[page_num]
+            
+            # Aumenta a resolução para melhor detecção
+            mat = fitz.Matrix(3.0, 3.0)
+            with medir_etapa('renderizar'):
+                pix = page.get_pixmap(matrix=mat)
+            
+            # Converte para numpy array
+            with medir_etapa('converter_imagem'):
+                img_data = pix.tobytes("ppm")
+                img = Image.open(io.BytesIO(img_data))
+                img_array = np.array(img)
+            
+            qr_coords = detectar_qr_code_na_imagem(img_array)
+            if qr_coords:
+                x, y, w, h = qr_coords
+                qr_img = img.crop((x, y, x + w, y + h))
+                with medir_etapa('codificar_imagem'):
+                    buffer = io.BytesIO()
+                    qr_img.save(buffer, format='PNG')
+                return page_num, qr_coords, buffer.getvalue()
+        return None
+    finally:
+        doc.close()
+
+def _localizar_qr_na_regiao(doc, page_num, caixa, escala=3.0):
+    """
+    Detecta o QR só na região do modelo de layout, com folga de meio QR em
+    volta (o QR de outro aluno pode estar alguns pontos deslocado).
+    
+    Returns:
+        tuple or None: (page_num, (x, y, w, h) em pixels da página inteira
+                       na escala 3x, png do QR)
+    """
+    import fitz
+    import numpy as np
+    from PIL import Image
+    
+    page = doc[page_num]
+    rect = fitz.Rect(caixa)
+    folga = max(rect.width, rect.height) / 2
+    clip = (rect + (-folga, -folga, folga, folga)) & page.rect
+    with medir_etapa('renderizar'):
+        pix = page.get_pixmap(matrix=fitz.Matrix(escala, escala), clip=clip, alpha=False)
+    with medir_etapa('converter_imagem'):
+        img = Image.frombytes('RGB', (pix.width, pix.height), pix.samples)
+        img_array = np.array(img)
+    with medir_etapa('detectar_qr_modelo'):
+        qr_coords = detectar_qr_code_na_imagem(img_array)
+    DETECCOES.inc(estrategia='modelo', resultado='encontrado' if qr_coords else 'falhou')
+    if not qr_coords:
+        return None
+    x, y, w, h = qr_coords
+    qr_img = img.crop((x, y, x + w, y + h))
+    with medir_etapa('codificar_imagem'):
+        buffer = io.BytesIO()
+        qr_img.save(buffer, format='PNG')
+    # Coordenadas na página inteira, como as da busca sem região
+    deslocamento_x, deslocamento_y = int(round(clip.x0 * escala)), int(round(clip.y0 * escala))
+    return page_num, (x + deslocamento_x, y + deslocamento_y, w, h), buffer.getvalue()
+
 @pdf_qr_bp.route('/extract-qr', methods=['POST'])
 def extract_qr():
     """
@@ -395,11 +642,24 @@ def extract_qr():
     Returns:
         JSON: {
             'success': bool,
-            'extracted_qrs': [{'nome_aluno', 'filename', 'image', 'page_num', 'original_pdf'}],
+            'extracted_qrs': [{'nome_aluno', 'filename', 'image', 'page_num', 'original_pdf', 'template'}],
             'total_extracted': int,
-            'processing_log': [str]
+            'processing_log': [str],  # últimas LOG_LINHAS_JOB linhas
+            'log_summary': {'linhas', 'omitidas', 'por_nivel', 'eventos'},
+            'job_id': str,
+            'timing_summary': {etapa: {'count', 'total_ms', 'mean_ms', 'max_ms'}},
+            'templates': [{'template', 'documents', 'examples', 'page_size', 'learned'}]
         }
         
+    Modelos de layout:
+        - Os PDFs são agrupados pela impressão de layout (src/services/modelos.py);
+          depois do primeiro QR de um modelo, os demais PDFs do modelo são
+          procurados antes só naquela região
+        
+    Retomada:
+        - Enviar o mesmo 'job_id' (form) reaproveita os PDFs já extraídos,
+          identificados pelo hash do conteúdo, sem renderizá-los de novo
+        
     Resolução de extração:
         - Matrix(3.0, 3.0): Alta resolução para melhor detecção de QRs
     """
@@ -409,85 +669,193 @@ def extract_qr():
         
         pdf_files = request.files.getlist('pdfs')
         extracted_qrs = []
-        processing_log = []
-        
-        for pdf_file in pdf_files:
+        processing_log = LogJob(current_app.config.get('LOG_LINHAS_JOB'), logger)
+        
+        # Cadastro oficial (opcional): vincula cada QR à matrícula do aluno
+        from src.routes.roster import obter_indice_roster, resolver_aluno
+        indice_roster = obter_indice_roster()
+        
+        # Modelos de layout: a região do nome e a região onde o QR foi
+        # encontrado valem para os outros PDFs do mesmo modelo
+        from src.services.modelos import CatalogoModelos
+        catalogo = CatalogoModelos(current_app.config['MODELOS_DIR'])
+        
+        # Job persistente: permite retomar a extração sem refazer PDFs já concluídos
+        from src.routes.jobs import (calcular_hash, obter_ou_criar_job, documentos_concluidos,
+                                     registrar_documento, salvar_artefato, ler_artefato, finalizar_job,
+                                     iniciar_cancelamento)
+        from src.services.cancelamento import Cancelado
+        job, erro_job = obter_ou_criar_job(request.form.get('job_id'), 'extracao', {}, request.form.get('ttl_hours'))
+        if erro_job:
+            return jsonify({'error': erro_job}), 409
+        g.job_reservado = job.id
+        processing_log.job_id = job.id
+        concluidos = documentos_concluidos(job)
+        # Cancelamento (POST /api/jobs/<job_id>/cancel ou cliente desconectado), conferido entre PDFs e páginas
+        cancelamento = iniciar_cancelamento(job, request.environ)
+        restantes = 0
+        
+        # ETAPA 1: PREPARAÇÃO (hash, reaproveitamento do job e nome do aluno)
+        itens = []
+        for posicao_lote, pdf_file in enumerate(pdf_files):
+            if cancelamento.cancelado():
+                restantes = sum(1 for arquivo in pdf_files[posicao_lote:] if arquivo.filename != '')
+                break
             if pdf_file.filename == '':
                 continue
             
-            print(f"Processando arquivo: {pdf_file.filename}")
-            processing_log.append(f"Processando: {pdf_file.filename}")
+            # Log de cada PDF à parte: entra no log do job na ordem de envio
+            item = {'filename': pdf_file.filename, 'log': LogJob(logger=logger, job_id=job.id), 'qr': None}
+            item['log'].info("Processando: %s", pdf_file.filename)
+            itens.append(item)
             
             pdf_bytes = pdf_file.read()
-            nome_aluno = extrair_nome_do_pdf(pdf_bytes)
+            item['input_hash'] = calcular_hash(pdf_bytes)
+            
+            # Reaproveita o QR já extraído em uma execução anterior do job
+            documento = concluidos.get(item['input_hash'])
+            armazenado = ler_artefato(documento, 'qr_png') if documento else None
+            if armazenado:
+                artefato, qr_png = armazenado
+                localizacao = json.loads(documento.qr_localizacao)
+                item['qr'] = {
+                    'nome_aluno': documento.nome_extraido,
+                    'filename': f"{documento.nome_extraido}.png",
+                    'image': f"data:image/png;base64,{base64.b64encode(qr_png).decode('utf-8')}",
+                    'url': artefato.to_dict()['url'],
+                    'page_num': localizacao['page'],
+                    'original_pdf': pdf_file.filename,
+                    'matricula': documento.matricula
+                }
+                item['log'].info("⏭ %s já extraído neste job, resultado reaproveitado", pdf_file.filename,
+                                 evento='reaproveitado')
+                DOCUMENTOS.inc(endpoint='extract_qr', resultado='reaproveitado')
+                continue
+            
+            modelo, novo = catalogo.classificar_pdf(pdf_bytes, pdf_file.filename)
+            if novo:
+                item['log'].info("🧩 Novo modelo de layout %s (%s)", modelo.chave, pdf_file.filename,
+                                 evento='modelo_novo')
+            item['modelo'] = modelo
+            nome_aluno = extrair_nome_com_modelo(pdf_bytes, modelo)
             
             if not nome_aluno:
-                msg = f"Nome não encontrado em {pdf_file.filename}"
-                print(msg)
-                processing_log.append(msg)
+                item['log'].aviso("Nome não encontrado em %s", pdf_file.filename, evento='sem_nome')
+                DOCUMENTOS.inc(endpoint='extract_qr', resultado='sem_nome')
+                registrar_documento(job, item['input_hash'], pdf_file.filename, 'sem_nome')
                 continue
             
-            print(f"Nome extraído: {nome_aluno}")
-            processing_log.append(f"Nome encontrado: {nome_aluno}")
+            item['log'].info("Nome encontrado: %s", nome_aluno)
+            item['nome_aluno'] = nome_aluno
+            item['aluno'] = resolver_aluno(indice_roster, nome_aluno)
+            item['pdf_bytes'] = pdf_bytes
+        
+        # ETAPA 2: LOCALIZAÇÃO DO QR (renderização + detecção)
+        # Com EXTRACAO_PROCESSOS > 0 a detecção roda em processos separados e as
+        # páginas trafegam em memória compartilhada (src/services/memoria_compartilhada.py)
+        a_detectar = [item for item in itens if 'pdf_bytes' in item]
+        from src.services.memoria_compartilhada import obter_pipeline
+        pipeline = obter_pipeline(current_app.config.get('EXTRACAO_PROCESSOS', 0))
+        if pipeline:
+            resultados = pipeline.localizar_em_lote([item['pdf_bytes'] for item in a_detectar],
+                                                    cancelamento=cancelamento)
+        else:
+            escalonador = obter_escalonador(current_app.config)
             
-            doc = fitz.open(stream=pdf_bytes, filetype="pdf")
-            qr_found = False
+            def localizar(item):
+                # Uma vaga de CPU por PDF: prévias interativas passam à frente entre um PDF e outro
+                with escalonador.vez('lote'):
+                    return localizar_qr_no_pdf(item['pdf_bytes'],
+                                               item['modelo'] and item['modelo'].dados.get('regiao_qr'),
+                                               cancelamento)
             
-            # Procura QR em todas as páginas do documento
-            for page_num in range(len(doc)):
-                print(f"Analisando página {page_num + 1} de {len(doc)}")
-                page = doc[page_num]
+            # Gerador: a região do QR registrada na ETAPA 3 já vale para o próximo PDF do modelo
+            resultados = ((indice, localizar(item)) for indice, item in enumerate(a_detectar))
+        
+        # ETAPA 3: REGISTRO DOS RESULTADOS (enquanto os próximos PDFs são detectados)
+        # Cancelado sai da ETAPA 2 (conferido antes de cada PDF e entre páginas)
+        try:
+            for indice, localizado in resultados:
+                item = a_detectar[indice]
+                del item['pdf_bytes']
+                nome_aluno = item['nome_aluno']
+                aluno = item['aluno']
                 
-                # Aumenta a resolução para melhor detecção
-                mat = fitz.Matrix(3.0, 3.0)
-                pix = page.get_pixmap(matrix=mat)
+                if not localizado:
+                    item['log'].aviso("Nenhum QR encontrado em %s", item['filename'], evento='sem_qr')
+                    DOCUMENTOS.inc(endpoint='extract_qr', resultado='sem_qr')
+                    registrar_documento(job, item['input_hash'], item['filename'], 'sem_qr', nome_extraido=nome_aluno)
+                    continue
                 
-                # Converte para numpy array
-                img_data = pix.tobytes("ppm")
-                img = Image.open(io.BytesIO(img_data))
-                img_array = np.array(img)
+                page_num, (x, y, w, h), qr_png = localizado
+                if item['modelo']:
+                    item['modelo'].dados.setdefault('regiao_qr', (page_num, (x / 3.0, y / 3.0, (x + w) / 3.0, (y + h) / 3.0)))
+                with medir_etapa('base64'):
+                    qr_base64 = base64.b64encode(qr_png).decode('utf-8')
                 
-                qr_coords = detectar_qr_code_na_imagem(img_array)
-                if qr_coords:
-                    x, y, w, h = qr_coords
-                    qr_img = img.crop((x, y, x + w, y + h))
-                    
-                    # Converte para base64
-                    buffer = io.BytesIO()
-                    qr_img.save(buffer, format='PNG')
-                    qr_base64 = base64.b64encode(buffer.getvalue()).decode('utf-8')
-                    
-                    extracted_qrs.append({
-                        'nome_aluno': nome_aluno,
-                        'filename': f"{nome_aluno}.png",
-                        'image': f"data:image/png;base64,{qr_base64}",
-                        'page_num': page_num + 1,
-                        'original_pdf': pdf_file.filename
-                    })
-                    
-                    msg = f"QR extraído de {pdf_file.filename} página {page_num + 1}"
-                    print(msg)
-                    processing_log.append(msg)
-                    qr_found = True
-                    break
-            
-            if not qr_found:
-                msg = f"Nenhum QR encontrado em {pdf_file.filename}"
-                print(msg)
-                processing_log.append(msg)
-            
-            doc.close()
+                # Registra o documento e grava o PNG do QR em disco
+                documento = registrar_documento(
+                    job, item['input_hash'], item['filename'], 'concluido',
+                    nome_extraido=nome_aluno,
+                    matricula=aluno['matricula'] if aluno else None,
+                    qr_hash=calcular_hash(qr_png),
+                    qr_localizacao={'page': page_num + 1, 'x': x / 3.0, 'y': y / 3.0,
+                                    'width': w / 3.0, 'height': h / 3.0}
+                )
+                artefato = salvar_artefato(job, documento, 'qr_png', f"{nome_aluno}.png", qr_png)
+                
+                item['qr'] = {
+                    'nome_aluno': nome_aluno,
+                    'filename': f"{nome_aluno}.png",
+                    'image': f"data:image/png;base64,{qr_base64}",
+                    'url': artefato.to_dict()['url'],
+                    'page_num': page_num + 1,
+                    'original_pdf': item['filename'],
+                    'matricula': aluno['matricula'] if aluno else None,
+                    'template': item['modelo'] and item['modelo'].chave
+                }
+                
+                item['log'].info("QR extraído de %s página %d", item['filename'], page_num + 1, evento='concluido')
+                DOCUMENTOS.inc(endpoint='extract_qr', resultado='concluido')
+        
+        except Cancelado:
+            pass
+        finally:
+            # Fecha o gerador: o pipeline descarta as páginas em voo
+            resultados.close()
+        if cancelamento.motivo:
+            # PDFs que não chegaram a ser detectados saem da memória
+            nao_detectados = [item for item in a_detectar if 'pdf_bytes' in item]
+            for item in nao_detectados:
+                del item['pdf_bytes']
+            restantes += len(nao_detectados)
+            processing_log.aviso("⛔ Extração cancelada (%s): %d PDFs não processados", cancelamento.motivo,
+                                 restantes, evento='cancelado')
+        
+        # Resposta na ordem em que os PDFs foram enviados
+        for item in itens:
+            processing_log.anexar(item['log'], emitir=False)
+            if item['qr']:
+                extracted_qrs.append(item['qr'])
+        
+        finalizar_job(job, cancelamento)
         
         return jsonify({
             'success': True,
             'extracted_qrs': extracted_qrs,
             'total_extracted': len(extracted_qrs),
-            'processing_log': processing_log
+            'processing_log': processing_log.linhas(),
+            'log_summary': processing_log.resumo(),
+            'job_id': job.id,
+            'timing_summary': g.resumo_tempos.resumo(),
+            'templates': catalogo.resumo(),
+            'cancelled': cancelamento.motivo,
+            'remaining': restantes
         })
         
     except Exception as e:
         error_msg = f'Erro ao extrair QR codes: {str(e)}'
-        print(error_msg)
+        logger.exception(error_msg)
         return jsonify({'error': error_msg}), 500
 
 # ====================================================================
@@ -495,6 +863,83 @@ def extract_qr():
 # ====================================================================
 # Este endpoint insere QR codes em PDFs em posições específicas.
 
+def inserir_qr_nas_posicoes(pdf_data, qr_data, qr_positions):
+    """
+    Insere o QR em cada posição pedida e retorna o PDF resultante.
+    
+    Função pura (só bytes de entrada e saída): usada por /insert-qr e
+    pela variante assíncrona (src/asgi.py), que a executa em um executor.
+    
+    Args:
+        pdf_data (bytes): PDF original
+        qr_data (bytes): Imagem do QR
+        qr_positions (list): [{'page', 'x', 'y', 'size', 'canvas_width', 'canvas_height'}]
+            ou {'page', 'auto': True, 'size'} (espaço livre da página, size em pontos)
+        
+    Returns:
+        bytes: PDF com os QRs inseridos
+    """
+    import fitz
+    from PIL import Image
+    with medir_etapa('abrir_pdf'):
+        doc = fitz.open(stream=pdf_data, filetype="pdf")
+    
+    qr_image = Image.open(io.BytesIO(qr_data))
+    
+    # Processa cada posição de QR solicitada
+    for position in qr_positions:
+        page_num = position['page']
+        x = position.get('x')
+        y = position.get('y')
+        size = position['size']
+    
+        if page_num < len(doc):
+            page = doc[page_num]
+            page_rect = page.rect
+    
+            # SISTEMA DE COORDENADAS: Compatibilidade com diferentes sistemas
+            if position.get('auto'):
+                # Posição automática: espaço livre da página, tamanho em pontos
+                rect, _ = retangulo_na_pagina(page, position)
+                pdf_x, pdf_y, pdf_size = rect.x0, rect.y0, size
+            elif 'real_width' in position and 'real_height' in position:
+                # Coordenadas já são reais (sistema novo), usa diretamente
+                pdf_x = x
+                pdf_y = y
+                pdf_size = size
+            else:
+                # Sistema legado - converte coordenadas da tela para coordenadas do PDF
+                scale_x = page_rect.width / position['canvas_width']
+                scale_y = page_rect.height / position['canvas_height']
+    
+                pdf_x = x * scale_x
+                pdf_y = y * scale_y
+                pdf_size = size * min(scale_x, scale_y)
+    
+            # VALIDAÇÃO: Garante que o QR fique dentro dos limites da página
+            pdf_x = max(0, min(pdf_x, page_rect.width - pdf_size))
+            pdf_y = max(0, min(pdf_y, page_rect.height - pdf_size))
+    
+            # Redimensiona QR mantendo qualidade
+            with medir_etapa('codificar_imagem'):
+                qr_resized = qr_image.resize((int(pdf_size), int(pdf_size)), Image.Resampling.LANCZOS)
+    
+                # Converte para bytes e insere no PDF
+                qr_bytes = io.BytesIO()
+                qr_resized.save(qr_bytes, format='PNG')
+                qr_bytes.seek(0)
+    
+            rect = fitz.Rect(pdf_x, pdf_y, pdf_x + pdf_size, pdf_y + pdf_size)
+            with medir_etapa('inserir_qr'):
+                page.insert_image(rect, stream=qr_bytes.getvalue())
+    
+    # Salva PDF modificado em memória
+    output_buffer = io.BytesIO()
+    with medir_etapa('salvar_pdf'):
+        doc.save(output_buffer)
+    doc.close()
+    return output_buffer.getvalue()
+
 @pdf_qr_bp.route('/insert-qr', methods=['POST'])
 def insert_qr():
     """
@@ -511,11 +956,12 @@ def insert_qr():
         {
             'pdf_base64': str,
             'qr_base64': str,
-            'qr_positions': [{'page', 'x', 'y', 'size', 'canvas_width', 'canvas_height'}]
+            'qr_positions': [{'page', 'x', 'y', 'size', 'canvas_width', 'canvas_height'}],
+            'linearize': bool (opcional, padrão LINEARIZAR: PDF "fast web view")
         }
         
     Returns:
-        JSON: {'success': bool, 'pdf_base64': str}
+        JSON: {'success': bool, 'pdf_base64': str, 'linearization': {...}}
         
     Sistema de coordenadas:
         - Converte coordenadas de interface para coordenadas PDF reais
@@ -527,69 +973,22 @@ def insert_qr():
         if not data or 'pdf_base64' not in data or 'qr_base64' not in data:
             return jsonify({'error': 'Dados incompletos'}), 400
         
-        # Decodifica PDF
         pdf_data = base64.b64decode(data['pdf_base64'].split(',')[1])
-        doc = fitz.open(stream=pdf_data, filetype="pdf")
-        
-        # Decodifica QR
         qr_data = base64.b64decode(data['qr_base64'].split(',')[1])
-        qr_image = Image.open(io.BytesIO(qr_data))
+        from src.services.linearizacao import ResumoLinearizacao, interpretar_opcao
+        linearizacao = ResumoLinearizacao(interpretar_opcao(data.get('linearize'), current_app.config.get('LINEARIZAR')),
+                                          current_app.config.get('QPDF', 'qpdf'))
+        with obter_escalonador(current_app.config).vez('interativa'):
+            pdf_saida = inserir_qr_nas_posicoes(pdf_data, qr_data, data.get('qr_positions', []))
+            pdf_saida, _ = linearizacao.aplicar(pdf_saida)
         
-        # Processa posições dos QR codes
-        qr_positions = data.get('qr_positions', [])
-        
-        # Processa cada posição de QR solicitada
-        for position in qr_positions:
-            page_num = position['page']
-            x = position['x']
-            y = position['y']
-            size = position['size']
-            
-            if page_num < len(doc):
-                page = doc[page_num]
-                page_rect = page.rect
-                
-                # SISTEMA DE COORDENADAS: Compatibilidade com diferentes sistemas
-                if 'real_width' in position and 'real_height' in position:
-                    # Coordenadas já são reais (sistema novo), usa diretamente
-                    pdf_x = x
-                    pdf_y = y
-                    pdf_size = size
-                else:
-                    # Sistema legado - converte coordenadas da tela para coordenadas do PDF
-                    scale_x = page_rect.width / position['canvas_width']
-                    scale_y = page_rect.height / position['canvas_height']
-                    
-                    pdf_x = x * scale_x
-                    pdf_y = y * scale_y
-                    pdf_size = size * min(scale_x, scale_y)
-                
-                # VALIDAÇÃO: Garante que o QR fique dentro dos limites da página
-                pdf_x = max(0, min(pdf_x, page_rect.width - pdf_size))
-                pdf_y = max(0, min(pdf_y, page_rect.height - pdf_size))
-                
-                # Redimensiona QR mantendo qualidade
-                qr_resized = qr_image.resize((int(pdf_size), int(pdf_size)), Image.Resampling.LANCZOS)
-                
-                # Converte para bytes e insere no PDF
-                qr_bytes = io.BytesIO()
-                qr_resized.save(qr_bytes, format='PNG')
-                qr_bytes.seek(0)
-                
-                rect = fitz.Rect(pdf_x, pdf_y, pdf_x + pdf_size, pdf_y + pdf_size)
-                page.insert_image(rect, stream=qr_bytes.getvalue())
-        
-        # Salva PDF modificado em memória
-        output_buffer = io.BytesIO()
-        doc.save(output_buffer)
-        doc.close()
-        
-        output_buffer.seek(0)
-        pdf_base64 = base64.b64encode(output_buffer.getvalue()).decode('utf-8')
+        with medir_etapa('base64'):
+            pdf_base64 = base64.b64encode(pdf_saida).decode('utf-8')
         
         return jsonify({
             'success': True,
-            'pdf_base64': f"data:application/pdf;base64,{pdf_base64}"
+            'pdf_base64': f"data:application/pdf;base64,{pdf_base64}",
+            'linearization': linearizacao.to_dict()
         })
         
     except Exception as e:
@@ -601,6 +1000,594 @@ def insert_qr():
 # Este é o endpoint principal para processamento em lote, associando
 # cada QR ao seu respectivo aluno através de matching inteligente.
 
+def retangulo_qr(page_rect, qr_position):
+    """
+    Retângulo do QR na página para a posição unificada {x, y, size} em pontos,
+    deslocado para dentro dos limites da página quando necessário.
+    
+    Returns:
+        fitz.Rect: Retângulo em pontos do PDF
+    """
+    import fitz
+    x, y, size = qr_position['x'], qr_position['y'], qr_position['size']
+    pdf_x = max(0, min(x, page_rect.width - size))
+    pdf_y = max(0, min(y, page_rect.height - size))
+    return fitz.Rect(pdf_x, pdf_y, pdf_x + size, pdf_y + size)
+
+def retangulo_na_pagina(page, qr_position, preferida=None):
+    """
+    Retângulo do QR em uma página, para a posição manual {x, y, size} ou
+    automática {auto: true, size, regions?, margin?} (ver
+    src/services/posicionamento.py). Sem espaço livre nas regiões, a
+    posição automática usa x e y, se vierem, como plano B.
+    
+    Na posição automática, 'preferida' ({x, y, size, regiao}, a posição
+    já calculada para o modelo de layout) é usada se nada ocupa o
+    retângulo nesta página, sem refazer a busca.
+    
+    Returns:
+        tuple: (fitz.Rect, região escolhida; None na posição manual e
+               'manual' quando a automática caiu no plano B)
+        
+    Raises:
+        ValueError: Posição automática sem espaço livre e sem x, y
+    """
+    if not qr_position.get('auto'):
+        return retangulo_qr(page.rect, qr_position), None
+    
+    import fitz
+    from src.services.posicionamento import MARGEM_PADRAO, conteudo_no_retangulo, posicao_automatica
+    margem = qr_position.get('margin', MARGEM_PADRAO)
+    with medir_etapa('posicionar_qr'):
+        if preferida and preferida['size'] == qr_position['size']:
+            rect = fitz.Rect(preferida['x'], preferida['y'], preferida['x'] + preferida['size'],
+                             preferida['y'] + preferida['size'])
+            palavras, imagens = conteudo_no_retangulo(page, rect + (-margem, -margem, margem, margem))
+            if not palavras and not imagens and rect in page.rect:
+                return rect, preferida['regiao']
+        livre = posicao_automatica(page, qr_position['size'], qr_position.get('regions'), margem)
+    if livre:
+        return fitz.Rect(livre['x'], livre['y'], livre['x'] + livre['size'], livre['y'] + livre['size']), livre['regiao']
+    if 'x' in qr_position and 'y' in qr_position:
+        return retangulo_qr(page.rect, qr_position), 'manual'
+    raise ValueError(f"Sem espaço livre para um QR de {qr_position['size']}pt nas regiões pedidas")
+
+def ler_posicoes_modelo(valor):
+    """
+    Lê o campo template_positions: {chave do modelo: posição}, em JSON
+    (formulário) ou já decodificado (corpo JSON das sessões de envio).
+    
+    Returns:
+        tuple: (dict ou None, mensagem de erro ou None)
+    """
+    from src.services.posicionamento import validar_posicao
+    if not valor:
+        return None, None
+    try:
+        posicoes = json.loads(valor) if isinstance(valor, str) else valor
+    except ValueError:
+        return None, 'template_positions deve ser um JSON {modelo: {x, y, size}}'
+    if not isinstance(posicoes, dict):
+        return None, 'template_positions deve ser um JSON {modelo: {x, y, size}}'
+    for chave, posicao in posicoes.items():
+        erro = validar_posicao(posicao)
+        if erro:
+            return None, f"Modelo {chave}: {erro}"
+    return posicoes, None
+
+def ler_modelos_conhecidos(valor):
+    """
+    Lê o campo templates: JSON com a lista de chaves de modelo já vistas
+    nas partes anteriores do lote.
+    
+    Returns:
+        tuple: (list ou None, mensagem de erro ou None)
+    """
+    if not valor:
+        return None, None
+    try:
+        chaves = json.loads(valor)
+    except ValueError:
+        chaves = None
+    if not isinstance(chaves, list) or not all(isinstance(chave, str) for chave in chaves):
+        return None, 'templates deve ser uma lista JSON de chaves de modelo'
+    return chaves, None
+
+def criar_catalogo(posicoes_modelo=None, processing_log=None, conhecidas=None):
+    """
+    Catálogo de modelos de layout do lote, com as chaves de template_positions
+    já semeadas a partir das impressões registradas em MODELOS_DIR: os
+    diplomas do modelo entram na chave enviada mesmo que este envio os
+    traga em outra ordem ou só uma parte deles.
+    
+    Args:
+        conhecidas (list or None): Chaves já vistas em outras partes do
+            mesmo lote (campo 'templates'), semeadas sem aviso
+    
+    Returns:
+        CatalogoModelos: Catálogo do lote
+    """
+    from src.services.modelos import CatalogoModelos
+    catalogo = CatalogoModelos(current_app.config['MODELOS_DIR'])
+    catalogo.semear(conhecidas)
+    for chave in catalogo.semear(posicoes_modelo):
+        mensagem = "⚠️ Modelo %s de template_positions desconhecido (chaves em /api/batch-templates)"
+        if processing_log is not None:
+            processing_log.aviso(mensagem, chave, evento='modelo_desconhecido')
+        else:
+            logger.warning(mensagem, chave)
+    return catalogo
+
+def modelos_sem_documentos(catalogo, posicoes_modelo, processing_log=None):
+    """
+    Chaves de template_positions que não ficaram com nenhum diploma do envio
+    (desconhecidas ou de um modelo ausente): as posições delas não foram usadas.
+    
+    Returns:
+        list: Chaves sem diplomas
+    """
+    chaves = catalogo.sem_documentos(posicoes_modelo)
+    # As desconhecidas já foram avisadas em criar_catalogo
+    ausentes = [chave for chave in chaves if chave not in catalogo.desconhecidas]
+    if ausentes and processing_log is not None:
+        processing_log.aviso("⚠️ Posição de modelo sem nenhum diploma neste envio: %s", ', '.join(ausentes),
+                             evento='modelo_sem_documentos')
+    return chaves
+
+def inserir_qr_na_posicao(diploma_bytes, qr_bytes, qr_position, preferida=None):
+    """
+    Insere o QR do aluno na posição unificada da primeira página.
+    
+    Função pura usada por /batch-process e pelo monitor de pasta
+    (src/monitor.py), que a executa nos processos de trabalho.
+    
+    Args:
+        diploma_bytes (bytes): PDF do diploma
+        qr_bytes (bytes): PNG do QR do aluno
+        qr_position (dict): Posição em pontos do PDF {x, y, size} ou
+            automática {auto: true, size} (ver retangulo_na_pagina)
+        preferida (dict or None): Posição automática já calculada para o
+            modelo de layout do diploma
+        
+    Returns:
+        tuple: (bytes do PDF de saída, localização {'page', 'x', 'y', 'width',
+               'height'} ou None se o PDF não tem páginas; na posição
+               automática, também 'regiao')
+    """
+    import fitz
+    with medir_etapa('abrir_pdf'):
+        doc = fitz.open(stream=diploma_bytes, filetype="pdf")
+    try:
+        localizacao = None
+        if len(doc) > 0:
+            page = doc[0]  # Sempre insere na primeira página
+            
+            # Posição unificada dentro dos limites da página, ou o espaço livre deste diploma
+            rect, regiao = retangulo_na_pagina(page, qr_position, preferida)
+            
+            # Insere o QR individual do aluno na posição unificada
+            with medir_etapa('inserir_qr'):
+                page.insert_image(rect, stream=qr_bytes)
+            localizacao = {'page': 1, 'x': rect.x0, 'y': rect.y0, 'width': rect.width, 'height': rect.height}
+            if regiao:
+                localizacao['regiao'] = regiao
+        
+        output_buffer = io.BytesIO()
+        with medir_etapa('salvar_pdf'):
+            doc.save(output_buffer)
+        return output_buffer.getvalue(), localizacao
+    finally:
+        doc.close()
+
+def verificar_qr_inserido(pdf_bytes, localizacao, qr_bytes, escala=2.0):
+    """
+    Confere se o QR inserido pode ser lido e tem o mesmo conteúdo do original.
+    
+    Renderiza só o retângulo do QR (com uma margem para a zona de silêncio)
+    em escala moderada, em vez da página inteira, e decodifica os dois QRs
+    com decodificar_qr_na_imagem.
+    
+    Args:
+        pdf_bytes (bytes): PDF de saída
+        localizacao (dict): {'page', 'x', 'y', 'width', 'height'} em pontos (page começa em 1)
+        qr_bytes (bytes): PNG do QR que foi inserido
+        escala (float): Zoom da renderização do recorte
+        
+    Returns:
+        dict: {'status': 'ok' | 'ilegivel' | 'divergente' | 'origem_ilegivel',
+               'conteudo': texto lido no PDF ou None}
+    """
+    import fitz
+    import numpy as np
+    from PIL import Image
+    
+    with medir_etapa('codificar_imagem'):
+        origem = np.array(Image.open(io.BytesIO(qr_bytes)).convert('L'))
+    esperado = decodificar_qr_na_imagem(origem)
+    
+    doc = fitz.open(stream=pdf_bytes, filetype="pdf")
+    try:
+        page = doc[localizacao['page'] - 1]
+        margem = max(localizacao['width'], localizacao['height']) * 0.1
+        clip = fitz.Rect(localizacao['x'] - margem, localizacao['y'] - margem,
+                         localizacao['x'] + localizacao['width'] + margem,
+                         localizacao['y'] + localizacao['height'] + margem) & page.rect
+        with medir_etapa('renderizar'):
+            pix = page.get_pixmap(matrix=fitz.Matrix(escala, escala), clip=clip, colorspace=fitz.csGRAY)
+    finally:
+        doc.close()
+    
+    recorte = np.frombuffer(pix.samples, dtype=np.uint8).reshape(pix.height, pix.width)
+    conteudo = decodificar_qr_na_imagem(recorte)
+    if esperado is None:
+        status = 'origem_ilegivel'
+    elif conteudo is None:
+        status = 'ilegivel'
+    elif conteudo != esperado:
+        status = 'divergente'
+    else:
+        status = 'ok'
+    return {'status': status, 'conteudo': conteudo}
+
+def mapear_qrs(qr_arquivos, indice_roster, processing_log):
+    """
+    Mapeia os QRs extraídos pelo nome do arquivo (e pela matrícula, com cadastro).
+    
+    Args:
+        qr_arquivos (iterable): Pares (nome do arquivo .png, bytes do PNG)
+        indice_roster (dict or None): Índice de obter_indice_roster()
+        processing_log (LogJob): Log do processamento (recebe uma linha por QR)
+        
+    Returns:
+        tuple: (qr_map por nome normalizado, {matrícula: bytes do QR})
+    """
+    from src.routes.roster import resolver_aluno
+    qr_map = {}
+    qr_por_matricula = {}
+    for qr_filename, qr_bytes in qr_arquivos:
+        # Remove extensão .png e normaliza o nome
+        nome_qr = os.path.splitext(qr_filename)[0]
+        
+        # Mapeia por ambas as versões do nome para matching flexível
+        mapear_por_nome(qr_map, nome_qr, qr_bytes)
+        
+        aluno_qr = resolver_aluno(indice_roster, nome_qr)
+        if aluno_qr:
+            qr_por_matricula[aluno_qr['matricula']] = qr_bytes
+            processing_log.info("✅ QR '%s' mapeado para '%s' (matrícula %s)",
+                                qr_filename, aluno_qr['nome'], aluno_qr['matricula'])
+        else:
+            processing_log.info("✅ QR '%s' mapeado para '%s'", qr_filename, nome_qr)
+    return qr_map, qr_por_matricula
+
+def inserir_qr_do_modelo(diploma_bytes, qr_bytes, qr_position, modelo, posicoes_modelo, filename,
+                         processing_log):
+    """
+    Insere o QR na posição do modelo de layout do diploma (ou na unificada).
+    
+    Na posição automática, a primeira posição encontrada em um modelo fica
+    guardada nele e os próximos diplomas do mesmo modelo a reaproveitam.
+    Usada por processar_diploma e por /batch-restamp.
+    
+    Returns:
+        tuple: (bytes do PDF de saída, localização) como inserir_qr_na_posicao
+    """
+    posicao = qr_position
+    if modelo and posicoes_modelo and modelo.chave in posicoes_modelo:
+        posicao = posicoes_modelo[modelo.chave]
+    preferida = modelo.dados.get('posicao') if modelo and posicao.get('auto') else None
+    pdf_saida, localizacao = inserir_qr_na_posicao(diploma_bytes, qr_bytes, posicao, preferida)
+    if modelo and localizacao and localizacao.get('regiao') not in (None, 'manual'):
+        # Primeira posição automática do modelo: os próximos diplomas a reaproveitam
+        modelo.dados.setdefault('posicao', {'x': localizacao['x'], 'y': localizacao['y'],
+                                            'size': posicao['size'], 'regiao': localizacao['regiao']})
+    if localizacao and localizacao.get('regiao') == 'manual':
+        processing_log.aviso("⚠️ Sem espaço livre em %s: QR na posição manual", filename)
+    elif localizacao and localizacao.get('regiao'):
+        processing_log.info("📍 Posição automática em %s: %s (x=%.0f, y=%.0f)", filename,
+                            localizacao['regiao'], localizacao['x'], localizacao['y'])
+    return pdf_saida, localizacao
+
+def processar_diploma(job, diploma_bytes, original_filename, qr_map, qr_por_matricula, indice_roster,
+                      qr_position, concluidos, processing_log, endpoint='batch_process', registrar_sem_qr=True,
+                      catalogo=None, posicoes_modelo=None, linearizacao=None):
+    """
+    Processa um diploma do lote: nome do aluno, QR correspondente, inserção e registro no job.
+    
+    Usada por /batch-process e pelas sessões de envio em partes
+    (src/routes/sessoes.py), que processam cada diploma assim que ele
+    termina de chegar.
+    
+    Args:
+        job (Job): Job do lote
+        diploma_bytes (bytes): PDF do diploma
+        original_filename (str): Nome (já sanitizado) do arquivo enviado
+        qr_map, qr_por_matricula: Mapas de mapear_qrs()
+        indice_roster (dict or None): Índice do cadastro
+        qr_position (dict): Posição unificada {x, y, size}
+        concluidos (dict): Documentos já concluídos no job ({input_hash: Documento})
+        processing_log (LogJob): Log do processamento
+        endpoint (str): Rótulo do contador de documentos em /metrics
+        registrar_sem_qr (bool): False deixa um diploma sem QR sem registro,
+            para ser tentado de novo quando mais QRs chegarem
+        catalogo (CatalogoModelos or None): Modelos de layout do lote; cada
+            modelo guarda a região do nome e a posição automática do QR
+        posicoes_modelo (dict or None): {chave do modelo: {x, y, size}}, a
+            posição do QR de cada modelo (os demais usam qr_position)
+        linearizacao (ResumoLinearizacao or None): Lineariza o PDF de saída
+            ("fast web view") e acumula o custo (ver src/services/linearizacao.py)
+        
+    Returns:
+        dict: 'status' ('concluido', 'reaproveitado', 'sem_qr' ou 'erro'),
+              'input_hash', 'modelo' (chave do modelo de layout ou None) e,
+              com sucesso, 'pdf', 'artefato', 'nome_aluno', 'matricula',
+              'localizacao' e 'qr_bytes'
+    """
+    from src.routes.jobs import (calcular_hash, registrar_documento, registrar_falha, substituir_artefato,
+                                 ler_artefato)
+    from src.routes.roster import resolver_aluno
+    
+    processing_log.info("📄 Processando diploma: %s", original_filename)
+    
+    input_hash = calcular_hash(diploma_bytes)
+    
+    # Reaproveita o PDF gravado por uma execução anterior do job
+    documento = concluidos.get(input_hash)
+    armazenado = ler_artefato(documento, 'pdf') if documento else None
+    if armazenado:
+        artefato, pdf_salvo = armazenado
+        DOCUMENTOS.inc(endpoint=endpoint, resultado='reaproveitado')
+        processing_log.info("⏭ %s já processado neste job, resultado reaproveitado", original_filename,
+                            evento='reaproveitado')
+        return {'status': 'reaproveitado', 'input_hash': input_hash, 'pdf': pdf_salvo, 'artefato': artefato,
+                'nome_aluno': documento.nome_extraido, 'matricula': documento.matricula, 'modelo': None}
+    
+    modelo = None
+    try:
+        # Uma vaga de CPU por diploma: entre um diploma e outro, prévias e
+        # inserções interativas passam à frente (ver src/services/prioridade.py)
+        with obter_escalonador(current_app.config).vez('lote'):
+            # ETAPA 2A: MODELO DE LAYOUT (sem renderizar) E NOME DO ALUNO
+            if catalogo is not None:
+                modelo, novo = catalogo.classificar_pdf(diploma_bytes, original_filename)
+                if novo:
+                    processing_log.info("🧩 Novo modelo de layout %s (%s)", modelo.chave, original_filename,
+                                        evento='modelo_novo')
+            nome_aluno_diploma = extrair_nome_com_modelo(diploma_bytes, modelo)
+            if not nome_aluno_diploma:
+                # Fallback: usa o nome do arquivo se não conseguir extrair do PDF
+                nome_arquivo = os.path.splitext(original_filename)[0]
+                nome_aluno_diploma = limpar_nome_arquivo(nome_arquivo)
+                processing_log.info("📝 Nome extraído do arquivo: '%s'", nome_aluno_diploma)
+            else:
+                processing_log.info("📝 Nome extraído do PDF: '%s'", nome_aluno_diploma)
+            
+            # ETAPA 2B: BUSCA DO QR CORRESPONDENTE
+            # Primeiro pela matrícula do cadastro (nome do PDF ou do arquivo)
+            matched_qr_bytes = None
+            aluno = resolver_aluno(indice_roster, nome_aluno_diploma)
+            if not aluno:
+                aluno = resolver_aluno(indice_roster, os.path.splitext(original_filename)[0])
+            if aluno:
+                matched_qr_bytes = qr_por_matricula.get(aluno['matricula'])
+
+            if not matched_qr_bytes:
+                # Tenta encontrar o QR usando as duas versões normalizadas do nome
+                matched_qr_bytes = buscar_por_nome(qr_map, nome_aluno_diploma)
+
+            if not matched_qr_bytes:
+                if registrar_sem_qr:
+                    processing_log.erro("❌ ERRO: QR para '%s' não encontrado", nome_aluno_diploma, evento='sem_qr')
+                    DOCUMENTOS.inc(endpoint=endpoint, resultado='sem_qr')
+                    registrar_documento(job, input_hash, original_filename, 'sem_qr',
+                                        nome_extraido=nome_aluno_diploma,
+                                        matricula=aluno['matricula'] if aluno else None)
+                return {'status': 'sem_qr', 'input_hash': input_hash, 'modelo': modelo and modelo.chave}
+            
+            # ETAPA 2C: INSERÇÃO DO QR NA POSIÇÃO DO MODELO (OU UNIFICADA) E GERAÇÃO DO PDF
+            pdf_saida, localizacao = inserir_qr_do_modelo(diploma_bytes, matched_qr_bytes, qr_position, modelo,
+                                                          posicoes_modelo, original_filename, processing_log)
+            if linearizacao is not None:
+                pdf_saida, _ = linearizacao.aplicar(pdf_saida)
+        if localizacao:
+            processing_log.info("✅ QR inserido em %s", original_filename, evento='concluido')
+        
+        # Gera nome do arquivo de saída
+        base_name, ext = os.path.splitext(original_filename)
+        new_filename = f"{base_name}_com_qr{ext}"
+        
+        # Registra o documento e grava o PDF de saída em disco
+        documento = registrar_documento(
+            job, input_hash, original_filename, 'concluido',
+            nome_extraido=aluno['nome'] if aluno else nome_aluno_diploma,
+            matricula=aluno['matricula'] if aluno else None,
+            qr_hash=calcular_hash(matched_qr_bytes),
+            qr_localizacao=localizacao
+        )
+        # Plano do lote: diploma de entrada e QR casado, para /api/batch-restamp
+        # trocar a posição sem reenvio, extração de nome nem matching
+        # (substituídos se o diploma já teve saída, ex: marcado sem plano por /batch-restamp)
+        substituir_artefato(job, documento, 'diploma', original_filename, diploma_bytes, confirmar=False)
+        substituir_artefato(job, documento, 'qr_lote', f"{base_name}_qr.png", matched_qr_bytes, confirmar=False)
+        artefato = substituir_artefato(job, documento, 'pdf', new_filename, pdf_saida)
+        DOCUMENTOS.inc(endpoint=endpoint, resultado='concluido')
+        return {'status': 'concluido', 'input_hash': input_hash, 'pdf': pdf_saida, 'artefato': artefato,
+                'nome_aluno': aluno['nome'] if aluno else nome_aluno_diploma,
+                'matricula': aluno['matricula'] if aluno else None,
+                'localizacao': localizacao, 'qr_bytes': matched_qr_bytes, 'modelo': modelo and modelo.chave}
+
+    except Exception as e:
+        processing_log.erro("❌ Erro ao processar '%s': %s", original_filename, e, evento='erro')
+        DOCUMENTOS.inc(endpoint=endpoint, resultado='erro')
+        registrar_falha(job, input_hash, original_filename, str(e))
+        return {'status': 'erro', 'input_hash': input_hash, 'modelo': modelo and modelo.chave}
+
+@pdf_qr_bp.route('/batch-templates', methods=['POST'])
+def batch_templates():
+    """
+    Agrupa os diplomas do lote por modelo de layout, sem renderizar.
+    
+    A impressão de layout de cada PDF (tamanho da página, blocos de texto
+    e imagens; ver src/services/modelos.py) separa os modelos misturados
+    no lote. As chaves devolvidas são as de template_positions em
+    /api/batch-preview, /api/batch-process, nas sessões de envio e em
+    /api/batch-restamp: a impressão de cada modelo fica registrada em
+    MODELOS_DIR e os diplomas do modelo caem na mesma chave em qualquer
+    ordem ou divisão do lote.
+    
+    ENTRADA:
+        - pdfs: Lista de arquivos PDF
+        - templates (opcional): JSON com as chaves de modelo das partes
+          anteriores, quando o lote é agrupado em partes (ver /batch-preview)
+        - offset (opcional): Posição do primeiro PDF no lote, para 'index'
+        
+    SAÍDA (JSON):
+        - templates: [{template, documents, examples, page_size}]
+        - documents: [{index, filename, template}] (template None: PDF sem páginas ou inválido)
+    """
+    if 'pdfs' not in request.files:
+        return jsonify({'error': 'Nenhum arquivo PDF enviado'}), 400
+    conhecidas, erro = ler_modelos_conhecidos(request.form.get('templates'))
+    try:
+        deslocamento = max(0, int(request.form.get('offset') or 0))
+    except ValueError:
+        erro = erro or 'offset deve ser um número'
+    if erro:
+        return jsonify({'error': erro}), 400
+    
+    catalogo = criar_catalogo(conhecidas=conhecidas)
+    documentos = []
+    for indice, pdf_file in enumerate(request.files.getlist('pdfs'), start=deslocamento):
+        modelo, _ = catalogo.classificar_pdf(pdf_file.read(), pdf_file.filename)
+        documentos.append({'index': indice, 'filename': pdf_file.filename, 'template': modelo and modelo.chave})
+    
+    logger.info("🧩 %d diplomas em %d modelos de layout", len(documentos), len(catalogo.modelos()))
+    return jsonify({
+        'success': True,
+        'templates': catalogo.resumo(),
+        'documents': documentos,
+        'timing_summary': g.resumo_tempos.resumo()
+    })
+
+@pdf_qr_bp.route('/batch-preview', methods=['POST'])
+def batch_preview():
+    """
+    Prévia da posição unificada em todos os diplomas antes do lote.
+    
+    Renderiza só a primeira página de cada diploma em baixa resolução (ou
+    só a região em volta do QR), desenha o retângulo do QR e monta uma
+    folha de contato. Cada diploma também é conferido pelo texto e pelas
+    imagens que já ocupam o retângulo (ex: nomes longos).
+    
+    ENTRADA:
+        - pdfs: Lista de arquivos PDF (diplomas)
+        - qr_position: JSON com posição unificada {x, y, size} ou automática
+          {auto: true, size, regions?} (o retângulo de cada diploma é calculado)
+        - template_positions (opcional): JSON {modelo: {x, y, size}}, como no lote
+        - mode (opcional): 'recorte' (padrão, região do QR) ou 'pagina'
+        - dpi (opcional): Resolução das miniaturas (padrão 48 no recorte, 18 na página)
+        - columns (opcional): Colunas da folha
+        - offset (opcional): Posição do primeiro PDF no lote, quando o lote
+          passa do MAX_CONTENT_LENGTH e a prévia é pedida em partes (o
+          frontend junta as folhas); 'index' e os rótulos seguem a numeração
+        - templates (opcional): JSON com as chaves de modelo devolvidas pelas
+          partes anteriores; os diplomas desta parte entram nos mesmos modelos
+        - format (opcional): 'json' (padrão) ou 'png' (só a imagem da folha)
+        
+    SAÍDA (JSON):
+        - sheet: Folha de contato (PNG em base64)
+        - documents: [{index, filename, collision, words, images, adjusted, page_size, template}]
+        - collisions: Diplomas com texto ou imagem sob o QR
+        - templates: Modelos de layout do lote
+        - unmatched_templates: Chaves de template_positions sem nenhum diploma
+          nesta prévia (desconhecidas ou de um modelo ausente)
+        - columns, total, timing_summary
+    """
+    from src.services.folha_contato import MODOS, DPI_MAXIMO, conferir_diploma, montar_folha
+    try:
+        if 'pdfs' not in request.files:
+            return jsonify({'error': 'Nenhum arquivo PDF enviado'}), 400
+        if 'qr_position' not in request.form:
+            return jsonify({'error': 'A posição do QR Code é necessária'}), 400
+        
+        qr_position = json.loads(request.form['qr_position'])
+        from src.services.posicionamento import validar_posicao
+        erro_posicao = validar_posicao(qr_position)
+        posicoes_modelo, erro_modelos = ler_posicoes_modelo(request.form.get('template_positions'))
+        conhecidas, erro_conhecidas = ler_modelos_conhecidos(request.form.get('templates'))
+        if erro_posicao or erro_modelos or erro_conhecidas:
+            return jsonify({'error': erro_posicao or erro_modelos or erro_conhecidas}), 400
+        modo = request.form.get('mode', 'recorte')
+        if modo not in MODOS:
+            return jsonify({'error': f"mode deve ser um de {', '.join(MODOS)}"}), 400
+        try:
+            dpi = min(DPI_MAXIMO, float(request.form['dpi'])) if request.form.get('dpi') else None
+            colunas = int(request.form['columns']) if request.form.get('columns') else None
+            deslocamento = max(0, int(request.form.get('offset') or 0))
+        except ValueError:
+            return jsonify({'error': 'dpi, columns e offset devem ser números'}), 400
+        
+        # Partes do mesmo lote: modelos das partes anteriores semeados antes desta
+        catalogo = criar_catalogo(posicoes_modelo, conhecidas=conhecidas)
+        
+        miniaturas, rotulos, destaques, documentos = [], [], [], []
+        for indice, pdf_file in enumerate(request.files.getlist('pdfs'), start=deslocamento):
+            documento = {'index': indice, 'filename': pdf_file.filename}
+            try:
+                conferido = conferir_diploma(pdf_file.read(), qr_position, modo, dpi, catalogo, posicoes_modelo)
+            except Exception as e:
+                logger.warning("Prévia de %s falhou: %s", pdf_file.filename, e)
+                conferido = {'imagem': None, 'palavras': [], 'imagens': 0, 'ajustada': False, 'pagina': None,
+                             'modelo': None}
+                documento['error'] = str(e)
+            documento.update({
+                'collision': bool(conferido['palavras'] or conferido['imagens']),
+                'words': conferido['palavras'],
+                'images': conferido['imagens'],
+                'adjusted': conferido['ajustada'],
+                'page_size': conferido['pagina'],
+                'template': conferido['modelo']
+            })
+            documentos.append(documento)
+            miniaturas.append(conferido['imagem'])
+            rotulos.append(f"{indice + 1}. {pdf_file.filename}")
+            destaques.append(documento['collision'] or documento['adjusted'])
+        
+        if not documentos:
+            return jsonify({'error': 'Nenhum arquivo PDF enviado'}), 400
+        
+        folha, colunas = montar_folha(miniaturas, rotulos, destaques, colunas)
+        buffer = io.BytesIO()
+        with medir_etapa('codificar_imagem'):
+            folha.save(buffer, format='PNG', optimize=False, compress_level=1)
+        colisoes = sum(1 for documento in documentos if documento['collision'])
+        logger.info("🖼 Prévia do lote: %d diplomas, %d com colisão no retângulo do QR", len(documentos), colisoes)
+        
+        if request.form.get('format') == 'png':
+            buffer.seek(0)
+            response = send_file(buffer, mimetype='image/png', download_name='previa_lote.png')
+            response.headers['X-Collisions'] = str(colisoes)
+            return response
+        
+        with medir_etapa('base64'):
+            folha_base64 = base64.b64encode(buffer.getvalue()).decode('utf-8')
+        return jsonify({
+            'success': True,
+            'sheet': f"data:image/png;base64,{folha_base64}",
+            'documents': documentos,
+            'collisions': colisoes,
+            'templates': catalogo.resumo(),
+            'unmatched_templates': modelos_sem_documentos(catalogo, posicoes_modelo),
+            'columns': colunas,
+            'total': len(documentos),
+            'timing_summary': g.resumo_tempos.resumo()
+        })
+        
+    except Exception as e:
+        error_msg = f'Erro ao gerar a prévia do lote: {str(e)}'
+        logger.exception(error_msg)
+        return jsonify({'error': error_msg}), 500
+
 @pdf_qr_bp.route('/batch-process', methods=['POST'])
 def batch_process():
     """
@@ -622,17 +1609,57 @@ def batch_process():
     ENTRADA:
         - pdfs: Lista de arquivos PDF (diplomas)
         - qrs: Lista de arquivos PNG (QRs extraídos)  
-        - qr_position: JSON com posição unificada {x, y, size}
+        - qr_position: JSON com posição unificada {x, y, size} ou automática
+          {auto: true, size, regions?, margin?}: cada diploma recebe o QR no
+          maior espaço livre das regiões (x e y, se vierem, são o plano B)
+        - template_positions (opcional): JSON {modelo: {x, y, size}} com a
+          posição de cada modelo de layout (chaves de /api/batch-templates);
+          diplomas de outros modelos usam qr_position
+        - job_id (opcional): Identificador do job; reenviar o mesmo id
+          retoma um lote anterior interrompido
+        - verify (opcional): Fração dos diplomas cujo QR inserido é lido de
+          volta e comparado ao original ('all', 'none' ou 0 a 1; padrão
+          VERIFICACAO_AMOSTRA)
+        - ttl_hours (opcional): Horas que os PDFs de saída ficam guardados
+          no servidor (padrão RETENCAO_TTL_HORAS)
+        - inline (opcional): '0' omite o pdf_base64 da resposta; os PDFs
+          são baixados pela 'url' de cada item ou em /api/jobs/<job_id>/archive
+        - linearize (opcional): '1' grava os PDFs linearizados ("fast web
+          view", a primeira página abre antes do download terminar), inclusive
+          os do ZIP do job; padrão LINEARIZAR
         
     SAÍDA:
-        - processed_pdfs: Lista de PDFs com QRs inseridos
-        - processing_log: Log detalhado do processamento
+        - processed_pdfs: Lista de PDFs com QRs inseridos (base64 e 'url' de download)
+        - processing_log: Log do processamento (últimas LOG_LINHAS_JOB linhas)
+        - log_summary: Total de linhas, omitidas e contagens por nível e
+          por evento (concluido, reaproveitado, sem_qr, erro...)
         - total_processed: Contador de sucessos
+        - job_id: Identificador do job para retomada (/api/jobs/<job_id>)
+        - timing_summary: Tempo por etapa (abrir, extrair texto, inserir,
+          salvar, base64) agregado no lote; histogramas em /metrics
+        - verification: Resumo da verificação (verificados, legíveis e
+          diplomas com falha); cada PDF verificado traz 'verificacao'
+        - templates: Modelos de layout do lote (cada PDF traz 'template')
+        - unmatched_templates: Chaves de template_positions sem nenhum
+          diploma neste envio (também avisadas no processing_log)
+        - linearization: Pedida, qpdf disponível, documentos linearizados e
+          bytes antes/depois (cada PDF traz 'linearized'); o tempo fica na
+          etapa 'linearizar' do timing_summary
+        - cancelled: None, ou o motivo do cancelamento ('pedido' por
+          POST /api/jobs/<job_id>/cancel ou 'desconectado'); com ele, a
+          resposta é o resumo parcial e 'remaining' conta os não processados
+        
+    RETOMADA:
+        - Cada diploma é identificado pelo hash do conteúdo e o PDF de saída
+          é gravado em disco; ao reenviar o lote com o mesmo job_id, os
+          diplomas já concluídos são pulados e lidos do disco
         
     MATCHING INTELIGENTE:
         - "Maria_Silva.pdf" ↔ "Maria Silva.png"
         - "joao-santos.pdf" ↔ "João Santos.png"
         - Remove acentos, ignora case, trata separadores
+        - Com cadastro importado (/api/roster), resolve por matrícula
+          (QRs podem ser nomeados pela matrícula, ex: "20231234.png")
     """
     try:
         # VALIDAÇÃO DOS DADOS DE ENTRADA
@@ -645,135 +1672,361 @@ def batch_process():
         diploma_files = request.files.getlist('pdfs')  # PDFs dos diplomas
         qr_files = request.files.getlist('qrs')        # PNGs dos QRs extraídos
         qr_position_str = request.form['qr_position']
-        
-        import json
         qr_position = json.loads(qr_position_str)
+        from src.services.posicionamento import validar_posicao
+        erro_posicao = validar_posicao(qr_position)
+        posicoes_modelo, erro_modelos = ler_posicoes_modelo(request.form.get('template_positions'))
+        if erro_posicao or erro_modelos:
+            return jsonify({'error': erro_posicao or erro_modelos}), 400
         
-        processing_log = []
-        log_msg = "🚀 Iniciando processamento em lote com posição unificada..."
-        print(log_msg)
-        processing_log.append(log_msg)
+        processing_log = LogJob(current_app.config.get('LOG_LINHAS_JOB'), logger)
+        processing_log.info("🚀 Iniciando processamento em lote com posição unificada...")
+        
+        # Modelos de layout do lote: região do nome e posição automática aprendidas por modelo
+        catalogo = criar_catalogo(posicoes_modelo, processing_log)
+
+        # Job persistente: diplomas já concluídos neste job não são reprocessados
+        from src.routes.jobs import obter_ou_criar_job, documentos_concluidos, finalizar_job, iniciar_cancelamento
+        job, erro_job = obter_ou_criar_job(request.form.get('job_id'), 'lote', {'qr_position': qr_position},
+                                           request.form.get('ttl_hours'))
+        if erro_job:
+            return jsonify({'error': erro_job}), 409
+        g.job_reservado = job.id
+        processing_log.job_id = job.id
+        # Cancelamento (POST /api/jobs/<job_id>/cancel ou cliente desconectado), conferido entre diplomas
+        cancelamento = iniciar_cancelamento(job, request.environ)
+        concluidos = documentos_concluidos(job)
+        if concluidos:
+            processing_log.info("⏯ Retomando job %s: %d diplomas já concluídos", job.id, len(concluidos))
+
+        # Verificação pós-inserção (opcional): lê de volta o QR de uma amostra dos diplomas
+        from src.services.verificacao import interpretar_amostra, deve_verificar, obter_verificador
+        try:
+            amostra = interpretar_amostra(request.form.get('verify'), current_app.config.get('VERIFICACAO_AMOSTRA', 0.0))
+        except ValueError:
+            return jsonify({'error': "verify deve ser 'all', 'none' ou um número entre 0 e 1"}), 400
+        verificador = None
+        if amostra > 0:
+            verificador = obter_verificador(current_app.config.get('VERIFICACAO_PROCESSOS', 0),
+                                            current_app.config.get('VERIFICACAO_ESCALA', 2.0))
+        verificacoes = []
+
+        # inline=0: os PDFs não vão em base64 na resposta, só as URLs de download do disco
+        inline = request.form.get('inline', '1') != '0'
+        
+        # Linearização ("fast web view") dos PDFs de saída, feita pelo qpdf quando instalado
+        from src.services.linearizacao import ResumoLinearizacao, interpretar_opcao, linearizado
+        linearizacao = ResumoLinearizacao(interpretar_opcao(request.form.get('linearize'),
+                                                            current_app.config.get('LINEARIZAR')),
+                                          current_app.config.get('QPDF', 'qpdf'))
+        if linearizacao.pedida and not linearizacao.disponivel:
+            processing_log.aviso("⚠️ qpdf não encontrado: PDFs gravados sem linearização")
+
+        # Cadastro oficial (opcional): quando importado, QRs e diplomas são
+        # resolvidos para a matrícula do aluno em O(1) pelo índice persistido
+        from src.routes.roster import obter_indice_roster
+        indice_roster = obter_indice_roster()
+        if indice_roster:
+            processing_log.info("📚 Cadastro de alunos carregado: matching por matrícula ativado")
 
         # ETAPA 1: MAPEAMENTO DE QRs POR NOME
         # Cria um dicionário que associa nomes normalizados aos bytes dos QRs
-        qr_map = {}
-        for qr_file in qr_files:
-            qr_filename = qr_file.filename
-            if qr_filename.lower().endswith('.png'):
-                # Remove extensão .png e normaliza o nome
-                nome_qr = os.path.splitext(qr_filename)[0]
-                nome_normalizado, nome_sem_espacos = normalizar_para_matching(nome_qr)
-                
-                # Lê os bytes da imagem QR
-                qr_bytes = qr_file.read()
-                
-                # Mapeia por ambas as versões do nome para matching flexível
-                qr_map[nome_normalizado] = qr_bytes
-                qr_map[nome_sem_espacos] = qr_bytes
-                
-                log_msg = f"✅ QR '{qr_filename}' mapeado para '{nome_qr}'"
-                print(log_msg)
-                processing_log.append(log_msg)
+        qr_map, qr_por_matricula = mapear_qrs(
+            ((qr_file.filename, qr_file.read()) for qr_file in qr_files if qr_file.filename.lower().endswith('.png')),
+            indice_roster, processing_log)
 
         # ETAPA 2: PROCESSAMENTO DE CADA DIPLOMA
         processed_pdfs = []
         success_count = 0
-        
-        for diploma_file in diploma_files:
-            original_filename = secure_filename(diploma_file.filename)
-            log_msg = f"📄 Processando diploma: {original_filename}"
-            print(log_msg)
-            processing_log.append(log_msg)
+        restantes = 0
+        
+        for posicao_lote, diploma_file in enumerate(diploma_files):
+            if cancelamento.cancelado():
+                restantes = len(diploma_files) - posicao_lote
+                processing_log.aviso("⛔ Lote cancelado (%s): %d diplomas não processados", cancelamento.motivo,
+                                     restantes, evento='cancelado')
+                break
+            resultado = processar_diploma(job, diploma_file.read(), secure_filename(diploma_file.filename),
+                                          qr_map, qr_por_matricula, indice_roster, qr_position,
+                                          concluidos, processing_log, catalogo=catalogo,
+                                          posicoes_modelo=posicoes_modelo, linearizacao=linearizacao)
+            if resultado['status'] not in ('concluido', 'reaproveitado'):
+                continue
             
-            diploma_bytes = diploma_file.read()
+            pdf_base64 = None
+            if inline:
+                with medir_etapa('base64'):
+                    pdf_base64 = f"data:application/pdf;base64,{base64.b64encode(resultado['pdf']).decode('utf-8')}"
+            processed_pdfs.append({
+                'filename': resultado['artefato'].filename,
+                'pdf_base64': pdf_base64,
+                'url': resultado['artefato'].to_dict()['url'],
+                'nome_aluno': resultado['nome_aluno'],
+                'matricula': resultado['matricula'],
+                'template': resultado['modelo'],
+                'linearized': linearizado(resultado['pdf'])
+            })
+            success_count += 1
             
-            try:
-                # ETAPA 2A: EXTRAÇÃO DO NOME DO ALUNO
-                nome_aluno_diploma = extrair_nome_do_pdf(diploma_bytes)
-                if not nome_aluno_diploma:
-                    # Fallback: usa o nome do arquivo se não conseguir extrair do PDF
-                    nome_arquivo = os.path.splitext(original_filename)[0]
-                    nome_aluno_diploma = limpar_nome_arquivo(nome_arquivo)
-                    log_msg = f"📝 Nome extraído do arquivo: '{nome_aluno_diploma}'"
-                else:
-                    log_msg = f"📝 Nome extraído do PDF: '{nome_aluno_diploma}'"
-                
-                print(log_msg)
-                processing_log.append(log_msg)
-                
-                # Normaliza nome do diploma para matching
-                nome_normalizado_diploma, nome_sem_espacos_diploma = normalizar_para_matching(nome_aluno_diploma)
-
-                # ETAPA 2B: BUSCA DO QR CORRESPONDENTE
-                # Tenta encontrar o QR usando as duas versões normalizadas do nome
-                matched_qr_bytes = qr_map.get(nome_normalizado_diploma) or qr_map.get(nome_sem_espacos_diploma)
-
-                if not matched_qr_bytes:
-                    log_msg = f"❌ ERRO: QR para '{nome_aluno_diploma}' não encontrado"
-                    print(log_msg)
-                    processing_log.append(log_msg)
-                    continue
-                
-                # ETAPA 2C: INSERÇÃO DO QR NA POSIÇÃO UNIFICADA
-                doc = fitz.open(stream=diploma_bytes, filetype="pdf")
-                if len(doc) > 0:
-                    page = doc[0]  # Sempre insere na primeira página
-                    x, y, size = qr_position['x'], qr_position['y'], qr_position['size']
-                    page_rect = page.rect
-                    
-                    # Validação: Garante que o QR fique dentro dos limites da página
-                    pdf_x = max(0, min(x, page_rect.width - size))
-                    pdf_y = max(0, min(y, page_rect.height - size))
-                    
-                    # Insere o QR individual do aluno na posição unificada
-                    rect = fitz.Rect(pdf_x, pdf_y, pdf_x + size, pdf_y + size)
-                    page.insert_image(rect, stream=matched_qr_bytes)
-                    
-                    log_msg = f"✅ QR inserido em {original_filename}"
-                    print(log_msg)
-                    processing_log.append(log_msg)
-
-                # ETAPA 2D: SALVA O PDF PROCESSADO
-                output_buffer = io.BytesIO()
-                doc.save(output_buffer)
-                doc.close()
-                
-                output_buffer.seek(0)
-                pdf_base64 = base64.b64encode(output_buffer.getvalue()).decode('utf-8')
-                
-                # Gera nome do arquivo de saída
-                base_name, ext = os.path.splitext(original_filename)
-                new_filename = f"{base_name}_com_qr{ext}"
-                
-                processed_pdfs.append({
-                    'filename': new_filename,
-                    'pdf_base64': f"data:application/pdf;base64,{pdf_base64}"
-                })
-                
-                success_count += 1
+            # ETAPA 2D: VERIFICAÇÃO (em paralelo com os próximos diplomas)
+            localizacao = resultado.get('localizacao')
+            if (verificador and resultado['status'] == 'concluido' and localizacao
+                    and deve_verificar(resultado['input_hash'], amostra)):
+                verificacoes.append((processed_pdfs[-1], localizacao,
+                                     verificador.enviar(resultado['pdf'], localizacao, resultado['qr_bytes'])))
 
+        # ETAPA 3: RESULTADO DAS VERIFICAÇÕES
+        if cancelamento.motivo:
+            # Cancelado: verificações ainda na fila não rodam (as em andamento terminam)
+            for _, _, futuro in verificacoes:
+                futuro.cancel()
+            verificacoes = [verificacao for verificacao in verificacoes if not verificacao[2].cancelled()]
+        falhas_verificacao = []
+        for entrada, localizacao, futuro in verificacoes:
+            try:
+                status = futuro.result()['status']
             except Exception as e:
-                error_msg = f"❌ Erro ao processar '{original_filename}': {str(e)}"
-                print(error_msg)
-                processing_log.append(error_msg)
+                logger.warning("Erro na verificação de %s: %s", entrada['filename'], e)
+                status = 'erro'
+            entrada['verificacao'] = status
+            VERIFICACOES.inc(resultado=status)
+            if status == 'ok':
+                processing_log.info("🔎 QR verificado em %s: legível e com o conteúdo original", entrada['filename'],
+                                    evento='verificacao_ok')
+            elif status == 'erro':
+                falhas_verificacao.append(entrada['filename'])
+                processing_log.aviso("⚠️ Não foi possível verificar o QR de %s", entrada['filename'],
+                                     evento='verificacao_erro')
+            else:
+                falhas_verificacao.append(entrada['filename'])
+                processing_log.aviso("⚠️ VERIFICAÇÃO FALHOU em %s (%s): QR de %.0fpt pode não ser legível impresso",
+                                     entrada['filename'], status, localizacao['width'], evento='verificacao_falhou')
 
         # RESULTADO FINAL
-        result_msg = f"🎯 Processamento concluído: {success_count} de {len(diploma_files)} PDFs processados"
-        print(result_msg)
-        processing_log.append(result_msg)
+        if linearizacao.documentos:
+            processing_log.info("🌐 %d PDFs linearizados (%d → %d bytes)", linearizacao.documentos,
+                                linearizacao.bytes_antes, linearizacao.bytes_depois)
+        sem_documentos = modelos_sem_documentos(catalogo, posicoes_modelo, processing_log)
+        finalizar_job(job, cancelamento)
+        processing_log.info("🎯 Processamento concluído: %d de %d PDFs processados", success_count, len(diploma_files))
         
         return jsonify({
             'success': True,
             'processed_pdfs': processed_pdfs,
             'total_processed': success_count,
-            'processing_log': processing_log
+            'processing_log': processing_log.linhas(),
+            'log_summary': processing_log.resumo(),
+            'job_id': job.id,
+            'timing_summary': g.resumo_tempos.resumo(),
+            'templates': catalogo.resumo(),
+            'unmatched_templates': sem_documentos,
+            'linearization': linearizacao.to_dict(),
+            'cancelled': cancelamento.motivo,
+            'remaining': restantes,
+            'verification': {
+                'sampled': len(verificacoes),
+                'ok': len(verificacoes) - len(falhas_verificacao),
+                'failed': falhas_verificacao
+            }
         })
         
     except Exception as e:
         error_msg = f'❌ Erro geral no processamento em lote: {str(e)}'
-        print(error_msg)
+        logger.exception(error_msg)
+        return jsonify({'error': error_msg}), 500
+
+@pdf_qr_bp.route('/batch-restamp', methods=['POST'])
+def batch_restamp():
+    """
+    Reposiciona o QR de um lote já processado, sem reenviar os arquivos.
+    
+    Cada diploma concluído guarda no job o plano do lote: o diploma de
+    entrada e o QR casado com ele (artefatos 'diploma' e 'qr_lote'), além
+    do nome, da matrícula e do hash da entrada no documento. O
+    reposicionamento repete só a inserção e a gravação de cada PDF: sem
+    upload, sem extração de nome e sem matching.
+    
+    ENTRADA (JSON):
+        - job_id: Job do lote (/api/batch-process ou sessão de envio)
+        - qr_position: Nova posição unificada {x, y, size} ou automática
+          {auto: true, size, regions?}
+        - template_positions (opcional): {modelo: {x, y, size}}, como no lote
+        - linearize (opcional): Lineariza os PDFs reposicionados; padrão LINEARIZAR
+        - inline (opcional): false omite o pdf_base64 (os PDFs ficam nas URLs)
+        
+    SAÍDA (JSON):
+        - processed_pdfs: PDFs reposicionados (base64, 'url', 'localizacao')
+        - missing_plan: Diplomas concluídos sem plano guardado (processados
+          antes do plano existir ou removidos pela retenção); ficam com erro
+          no job e são reprocessados ao reenviá-los ao lote com o mesmo job_id
+        - skipped: Diplomas sem QR ou com erro no lote (nada a reposicionar)
+        - archive_url: ZIP do job, já com os PDFs novos
+        - timing_summary, processing_log, log_summary, linearization,
+          unmatched_templates, cancelled e remaining, como em /api/batch-process
+        
+    O job passa a ter a nova posição como parâmetro: retomar o lote com o
+    mesmo job_id usa a posição nova. O job é reservado durante o
+    reposicionamento: outro pedido para o mesmo job responde 409.
+    """
+    from src.routes.jobs import reservar_job
+    from src.models.job import Job
+    from src.models.user import db
+    from src.services.posicionamento import validar_posicao
+    try:
+        data = request.get_json(silent=True) or {}
+        qr_position = data.get('qr_position')
+        if not data.get('job_id'):
+            return jsonify({'error': 'O job_id do lote é necessário'}), 400
+        if qr_position is None:
+            return jsonify({'error': 'A posição do QR Code é necessária'}), 400
+        erro_posicao = validar_posicao(qr_position)
+        posicoes_modelo, erro_modelos = ler_posicoes_modelo(data.get('template_positions'))
+        if erro_posicao or erro_modelos:
+            return jsonify({'error': erro_posicao or erro_modelos}), 400
+        
+        job = db.session.get(Job, str(data['job_id']))
+        if job is None:
+            return jsonify({'error': 'Job não encontrado'}), 404
+        if job.tipo != 'lote':
+            return jsonify({'error': f"Job '{job.id}' não é do tipo 'lote'"}), 409
+        if job.status == 'expirado':
+            return jsonify({'error': 'Arquivos do job expirados'}), 410
+        # Reserva atômica: dois reposicionamentos ao mesmo tempo (ex: clique
+        # duplo) não passam os dois nem sobrescrevem os PDFs um do outro
+        status_anterior = job.status
+        if not reservar_job(job.id):
+            return jsonify({'error': f"Job '{job.id}' ainda está em andamento"}), 409
+        try:
+            return _reposicionar_lote(job, data, qr_position, posicoes_modelo)
+        finally:
+            # Erro no meio (finalizar_job não chegou a rodar): o job volta ao
+            # status anterior e aceita um novo reposicionamento
+            db.session.rollback()
+            if job.status == 'em_andamento':
+                job.status = status_anterior
+                db.session.commit()
+        
+    except Exception as e:
+        error_msg = f'❌ Erro geral no reposicionamento do lote: {str(e)}'
+        logger.exception(error_msg)
         return jsonify({'error': error_msg}), 500
 
+def _reposicionar_lote(job, data, qr_position, posicoes_modelo):
+    """
+    Reinsere o QR de cada diploma concluído do job (já reservado) a partir
+    do plano do lote e finaliza o job. Corpo de /batch-restamp.
+    """
+    from src.routes.jobs import (iniciar_cancelamento, finalizar_job, ler_artefato, registrar_documento,
+                                 substituir_artefato)
+    from src.models.job import Documento
+    from src.models.user import db
+    from src.services.linearizacao import ResumoLinearizacao, interpretar_opcao, linearizado
+    
+    processing_log = LogJob(current_app.config.get('LOG_LINHAS_JOB'), logger)
+    processing_log.job_id = job.id
+    processing_log.info("↺ Reposicionando o QR no lote %s", job.id)
+    
+    # A posição nova passa a ser a do job; a retomada do lote e o próximo
+    # reposicionamento partem dela
+    job.parametros = json.dumps({'qr_position': qr_position}, sort_keys=True)
+    db.session.commit()
+    cancelamento = iniciar_cancelamento(job, request.environ)
+    
+    inline = data.get('inline', True) not in (False, 0, '0')
+    linearizacao = ResumoLinearizacao(interpretar_opcao(data.get('linearize'), current_app.config.get('LINEARIZAR')),
+                                      current_app.config.get('QPDF', 'qpdf'))
+    if linearizacao.pedida and not linearizacao.disponivel:
+        processing_log.aviso("⚠️ qpdf não encontrado: PDFs gravados sem linearização")
+    
+    # Modelos de layout só quando a posição depende deles (por modelo ou automática)
+    catalogo = None
+    if posicoes_modelo or qr_position.get('auto'):
+        catalogo = criar_catalogo(posicoes_modelo, processing_log)
+    escalonador = obter_escalonador(current_app.config)
+    
+    documentos = job.documentos.order_by(Documento.id).all()
+    processed_pdfs, sem_plano, ignorados = [], [], []
+    restantes = 0
+    for indice, documento in enumerate(documentos):
+        if cancelamento.cancelado():
+            restantes = len(documentos) - indice
+            processing_log.aviso("⛔ Reposicionamento cancelado (%s): %d diplomas não processados",
+                                 cancelamento.motivo, restantes, evento='cancelado')
+            break
+        if documento.status != 'concluido':
+            ignorados.append(documento.filename)
+            continue
+        diploma = ler_artefato(documento, 'diploma')
+        qr = ler_artefato(documento, 'qr_lote')
+        saida = next((artefato for artefato in documento.artefatos if artefato.tipo == 'pdf'), None)
+        if diploma is None or qr is None or saida is None:
+            # Sai dos concluídos: retomar o lote com o job_id reprocessa só estes diplomas
+            sem_plano.append(documento.filename)
+            registrar_documento(job, documento.input_hash, documento.filename, 'erro',
+                                erro='Sem plano do lote para reposicionar o QR: reenvie o diploma')
+            processing_log.aviso("⚠️ %s sem plano do lote guardado: reenvie o diploma", documento.filename,
+                                 evento='sem_plano')
+            continue
+        diploma_bytes, qr_bytes = diploma[1], qr[1]
+        
+        try:
+            modelo = None
+            with escalonador.vez('lote'):
+                if catalogo is not None:
+                    modelo, _ = catalogo.classificar_pdf(diploma_bytes, documento.filename)
+                pdf_saida, localizacao = inserir_qr_do_modelo(diploma_bytes, qr_bytes, qr_position, modelo,
+                                                              posicoes_modelo, documento.filename,
+                                                              processing_log)
+                pdf_saida, _ = linearizacao.aplicar(pdf_saida)
+            documento.qr_localizacao = json.dumps(localizacao) if localizacao else None
+            artefato = substituir_artefato(job, documento, 'pdf', saida.filename, pdf_saida)
+        except Exception as e:
+            db.session.rollback()
+            processing_log.erro("❌ Erro ao reposicionar '%s': %s", documento.filename, e, evento='erro')
+            DOCUMENTOS.inc(endpoint='batch_restamp', resultado='erro')
+            continue
+        DOCUMENTOS.inc(endpoint='batch_restamp', resultado='concluido')
+        processing_log.info("✅ QR reposicionado em %s", documento.filename, evento='concluido')
+        
+        pdf_base64 = None
+        if inline:
+            with medir_etapa('base64'):
+                pdf_base64 = f"data:application/pdf;base64,{base64.b64encode(pdf_saida).decode('utf-8')}"
+        processed_pdfs.append({
+            'filename': artefato.filename,
+            'pdf_base64': pdf_base64,
+            'url': artefato.to_dict()['url'],
+            'nome_aluno': documento.nome_extraido,
+            'matricula': documento.matricula,
+            'template': modelo and modelo.chave,
+            'localizacao': localizacao,
+            'linearized': linearizado(pdf_saida)
+        })
+    
+    if linearizacao.documentos:
+        processing_log.info("🌐 %d PDFs linearizados (%d → %d bytes)", linearizacao.documentos,
+                            linearizacao.bytes_antes, linearizacao.bytes_depois)
+    sem_documentos = modelos_sem_documentos(catalogo, posicoes_modelo, processing_log) if catalogo else []
+    finalizar_job(job, cancelamento)
+    processing_log.info("🎯 Reposicionamento concluído: %d PDFs", len(processed_pdfs))
+    
+    return jsonify({
+        'success': True,
+        'job_id': job.id,
+        'processed_pdfs': processed_pdfs,
+        'total_processed': len(processed_pdfs),
+        'missing_plan': sem_plano,
+        'skipped': ignorados,
+        'archive_url': f"/api/jobs/{job.id}/archive",
+        'processing_log': processing_log.linhas(),
+        'log_summary': processing_log.resumo(),
+        'timing_summary': g.resumo_tempos.resumo(),
+        'linearization': linearizacao.to_dict(),
+        'unmatched_templates': sem_documentos,
+        'cancelled': cancelamento.motivo,
+        'remaining': restantes
+    })
+
 # ====================================================================
 # SEÇÃO 8: ENDPOINTS DE SALVAMENTO DE PÁGINAS (FUNCIONALIDADES LEGADAS)
 # ====================================================================
@@ -795,6 +2048,8 @@ def save_page():
         - pageNumber: Número da página (0-indexed)
         - positions: JSON com posições dos QRs
     """
+    import fitz
+    from PIL import Image
     try:
         # Validação dos parâmetros de entrada
         pdf_file = request.files.get('pdf')
@@ -880,6 +2135,8 @@ def save_all_pages():
         - qr: Arquivo de imagem QR
         - allPositions: JSON com posições por página
     """
+    import fitz
+    from PIL import Image
     try:
         # Validação dos parâmetros de entrada
         pdf_file = request.files.get('pdf')
@@ -0,0 +1,253 @@
+# ====================================================================
+# CADASTRO OFICIAL DE ALUNOS (ROSTER) - IMPORTAÇÃO E ÍNDICE DE NOMES
+# ====================================================================
+# Este módulo permite importar uma única vez o cadastro da secretaria
+# (CSV com nome e matrícula) e mantém um índice normalizado persistido
+# no banco. Os lotes resolvem diplomas e QRs contra esse índice com
+# busca O(1) por nome ou matrícula, em vez de adivinhar pares por nome.
+# ====================================================================
+
+from flask import Blueprint, request, jsonify
+from sqlalchemy import func
+import csv
+import io
+import logging
+import threading
+from src.models.user import db
+from src.models.roster import Aluno, VersaoRoster
+from src.services.nomes import normalizar_para_matching
+
+roster_bp = Blueprint('roster', __name__)
+logger = logging.getLogger(__name__)
+
+# Cabeçalhos aceitos no CSV (comparados já normalizados e sem espaços)
+COLUNAS_NOME = {'nome', 'name', 'nomealuno', 'nomedoaluno', 'aluno', 'studentname'}
+COLUNAS_MATRICULA = {'matricula', 'enrollmentid', 'enrollment', 'ra', 'registro', 'id'}
+
+# Marcador para chaves que apontam para mais de um aluno
+_AMBIGUO = object()
+
+# Cache do índice em memória, reconstruído apenas quando o cadastro muda
+_indice_cache = {'assinatura': None, 'indice': None}
+_indice_lock = threading.Lock()
+
+# ====================================================================
+# SEÇÃO 1: LEITURA DO CSV
+# ====================================================================
+
+def ler_roster_csv(conteudo):
+    """
+    Lê o CSV do cadastro e retorna as linhas válidas.
+
+    Funcionalidades:
+    - Aceita UTF-8 (com ou sem BOM) e Latin-1
+    - Detecta o delimitador (vírgula, ponto e vírgula ou tabulação)
+    - Reconhece cabeçalhos em português ou inglês
+
+    Args:
+        conteudo (bytes): Conteúdo binário do arquivo CSV
+
+    Returns:
+        tuple: (linhas, ignoradas) onde linhas é uma lista de
+               (matricula, nome) e ignoradas o total de linhas inválidas
+    """
+    try:
+        texto = conteudo.decode('utf-8-sig')
+    except UnicodeDecodeError:
+        texto = conteudo.decode('latin-1')
+
+    try:
+        dialeto = csv.Sniffer().sniff(texto[:4096], delimiters=',;\t')
+    except csv.Error:
+        dialeto = csv.excel
+
+    leitor = csv.DictReader(io.StringIO(texto), dialect=dialeto)
+
+    # Identifica as colunas de nome e matrícula pelo cabeçalho
+    coluna_nome = coluna_matricula = None
+    for campo in leitor.fieldnames or []:
+        chave = normalizar_para_matching(campo)
+        chave = chave[1] if chave else ''
+        if chave in COLUNAS_NOME and coluna_nome is None:
+            coluna_nome = campo
+        elif chave in COLUNAS_MATRICULA and coluna_matricula is None:
+            coluna_matricula = campo
+
+    if coluna_nome is None or coluna_matricula is None:
+        raise ValueError('O CSV deve conter colunas de nome e matrícula')
+
+    linhas = []
+    ignoradas = 0
+    for registro in leitor:
+        nome = (registro.get(coluna_nome) or '').strip()
+        matricula = (registro.get(coluna_matricula) or '').strip()
+        if not nome or not matricula:
+            ignoradas += 1
+            continue
+        linhas.append((matricula, nome))
+
+    return linhas, ignoradas
+
+# ====================================================================
+# SEÇÃO 2: ÍNDICE NORMALIZADO EM MEMÓRIA
+# ====================================================================
+
+def obter_indice_roster():
+    """
+    Retorna o índice de busca do cadastro, ou None se não houver cadastro.
+
+    O índice é montado a partir das chaves já normalizadas no banco (sem
+    recalcular normalização) e fica em cache até o cadastro ser trocado.
+    A verificação de validade custa uma única consulta por lote: a versão
+    gravada por upload_roster, que vale também para os outros workers.
+
+    Returns:
+        dict or None: {chave: {'matricula', 'nome'}} com chaves por nome
+                      normalizado, nome sem espaços e matrícula
+    """
+    registro = db.session.get(VersaoRoster, 1)
+    if registro is not None:
+        assinatura = (registro.versao, registro.total_alunos)
+    else:
+        # Cadastro importado antes da versão existir
+        assinatura = (0, db.session.query(func.count(Aluno.id)).scalar())
+    if assinatura[1] == 0:
+        return None
+
+    with _indice_lock:
+        if _indice_cache['assinatura'] == assinatura:
+            return _indice_cache['indice']
+
+        indice = {}
+        consulta = db.session.query(Aluno.matricula, Aluno.nome,
+                                    Aluno.nome_normalizado, Aluno.nome_sem_espacos)
+        for matricula, nome, nome_normalizado, nome_sem_espacos in consulta:
+            entrada = {'matricula': matricula, 'nome': nome}
+            indice[matricula.lower()] = entrada
+            for chave in (nome_normalizado, nome_sem_espacos):
+                existente = indice.get(chave)
+                if existente is None:
+                    indice[chave] = entrada
+                elif existente is not _AMBIGUO and existente['matricula'] != matricula:
+                    # Homônimos: a chave não identifica um aluno único
+                    indice[chave] = _AMBIGUO
+
+        _indice_cache['assinatura'] = assinatura
+        _indice_cache['indice'] = indice
+        return indice
+
+def resolver_aluno(indice, nome):
+    """
+    Resolve um nome (ou matrícula) para o aluno do cadastro em O(1).
+
+    Args:
+        indice (dict): Índice retornado por obter_indice_roster()
+        nome (str): Nome extraído do PDF/arquivo ou matrícula
+
+    Returns:
+        dict or None: {'matricula', 'nome'} ou None se não encontrado/ambíguo
+    """
+    if not indice or not nome:
+        return None
+
+    entrada = indice.get(nome.strip().lower())
+    if entrada is None:
+        chaves = normalizar_para_matching(nome)
+        if not chaves:
+            return None
+        nome_normalizado, nome_sem_espacos = chaves
+        entrada = indice.get(nome_normalizado)
+        if entrada is None:
+            entrada = indice.get(nome_sem_espacos)
+
+    if entrada is None or entrada is _AMBIGUO:
+        return None
+    return entrada
+
+# ====================================================================
+# SEÇÃO 3: ENDPOINTS DA API
+# ====================================================================
+
+@roster_bp.route('/roster', methods=['POST'])
+def upload_roster():
+    """
+    Importa o cadastro de alunos, substituindo o cadastro anterior.
+
+    ENTRADA:
+        - roster: Arquivo CSV com colunas de nome e matrícula
+
+    Returns:
+        JSON: {'success', 'total_alunos', 'linhas_ignoradas',
+               'matriculas_duplicadas', 'nomes_ambiguos'}
+    """
+    try:
+        if 'roster' not in request.files:
+            return jsonify({'error': 'Nenhum arquivo CSV enviado'}), 400
+
+        roster_file = request.files['roster']
+        if roster_file.filename == '':
+            return jsonify({'error': 'Nenhum arquivo selecionado'}), 400
+
+        try:
+            linhas, ignoradas = ler_roster_csv(roster_file.read())
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+
+        # Pré-calcula as chaves normalizadas uma única vez na importação
+        registros = {}
+        duplicadas = 0
+        nomes_por_chave = {}
+        for matricula, nome in linhas:
+            if matricula in registros:
+                duplicadas += 1
+                continue
+            chaves = normalizar_para_matching(nome)
+            if not chaves or not chaves[1]:
+                ignoradas += 1
+                continue
+            nome_normalizado, nome_sem_espacos = chaves
+            registros[matricula] = {
+                'matricula': matricula,
+                'nome': nome,
+                'nome_normalizado': nome_normalizado,
+                'nome_sem_espacos': nome_sem_espacos
+            }
+            nomes_por_chave.setdefault(nome_normalizado, []).append(matricula)
+
+        db.session.query(Aluno).delete()
+        if registros:
+            db.session.execute(db.insert(Aluno), list(registros.values()))
+        # Nova versão na mesma transação: os índices em cache de todos os workers ficam inválidos
+        versao = db.session.get(VersaoRoster, 1)
+        if versao is None:
+            versao = VersaoRoster(id=1, versao=0)
+            db.session.add(versao)
+        versao.versao = (versao.versao or 0) + 1
+        versao.total_alunos = len(registros)
+        db.session.commit()
+
+        nomes_ambiguos = sorted(chave for chave, matriculas in nomes_por_chave.items() if len(matriculas) > 1)
+        logger.info("📚 Cadastro importado: %d alunos (%d linhas ignoradas)", len(registros), ignoradas)
+
+        return jsonify({
+            'success': True,
+            'total_alunos': len(registros),
+            'linhas_ignoradas': ignoradas,
+            'matriculas_duplicadas': duplicadas,
+            'nomes_ambiguos': nomes_ambiguos
+        })
+
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': f'Erro ao importar cadastro: {str(e)}'}), 500
+
+@roster_bp.route('/roster', methods=['GET'])
+def get_roster():
+    """
+    Retorna o resumo do cadastro atual.
+
+    Returns:
+        JSON: {'total_alunos': int}
+    """
+    total = db.session.query(func.count(Aluno.id)).scalar()
+    return jsonify({'total_alunos': total})
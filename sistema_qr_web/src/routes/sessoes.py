@@ -0,0 +1,539 @@
+# ====================================================================
+# SESSÕES DE ENVIO EM PARTES (UPLOADS RETOMÁVEIS)
+# ====================================================================
+# Um lote de uma turma inteira passa do MAX_CONTENT_LENGTH de uma única
+# requisição, e dividir o lote à mão quebra o matching (cada requisição
+# do /batch-process só enxerga os próprios QRs). Aqui o lote vira uma
+# sessão ligada a um job:
+#
+# 1. POST /api/upload-sessions                 cria a sessão (= job do lote)
+# 2. PUT  /api/upload-sessions/<id>/files/<f>  envia uma parte do arquivo
+#    (Content-Range: bytes início-fim/total, X-File-Name, X-File-Kind)
+# 3. GET  /api/upload-sessions/<id>/files/<f>  quantos bytes já chegaram
+#    (para retomar depois de uma queda)
+# 4. POST /api/upload-sessions/<id>/complete   processa o que faltar e
+#    devolve o resultado (PDFs baixados por URL ou ZIP do job)
+#
+# Os arquivos são montados em UPLOAD_STAGING_DIR/<id>/. Cada diploma
+# completo é processado em segundo plano enquanto as próximas partes
+# ainda chegam; um diploma cujo QR ainda não chegou espera e é tentado de
+# novo quando chega mais um QR. Todo o estado fica no disco (e no job),
+# então partes da mesma sessão podem cair em workers diferentes: até os
+# modelos de layout aprendidos (região do nome, posição automática) ficam
+# em modelos.json na pasta da sessão e valem para todos os workers. Na
+# memória de cada processo fica só o mapa dos QRs das últimas
+# SESSOES_EM_CACHE sessões.
+#
+# POST /api/jobs/<id>/cancel cancela a sessão: o processamento em segundo
+# plano para antes do próximo diploma, novas partes recebem 409 e o
+# /complete devolve só o que já foi concluído.
+# ====================================================================
+
+from flask import Blueprint, request, jsonify, current_app
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+import json
+import logging
+import os
+import re
+import tempfile
+import threading
+import time
+from urllib.parse import unquote
+from werkzeug.utils import secure_filename
+from src.models.user import db
+from src.models.job import Job
+from src.services.registro import LogJob
+
+sessoes_bp = Blueprint('sessoes', __name__)
+logger = logging.getLogger(__name__)
+
+# Identificadores de arquivo gerados pelo cliente (também usados como nome no disco)
+ARQUIVO_ID_VALIDO = re.compile(r'^[A-Za-z0-9_-]{1,64}$')
+CONTENT_RANGE = re.compile(r'^bytes (\d+)-(\d+)/(\d+)$')
+
+# Extensão do arquivo montado por tipo ('pdf' = diploma, 'qr' = PNG do QR extraído)
+EXTENSOES = {'pdf': '.pdf', 'qr': '.png'}
+SUFIXO_PROCESSANDO = '.processando'
+ARQUIVO_LOG = 'processamento.log'
+ARQUIVO_MODELOS = 'modelos.json'
+# Sessões com o mapa de QRs em memória por processo (as menos usadas saem primeiro)
+SESSOES_EM_CACHE = 4
+
+# ====================================================================
+# SEÇÃO 1: ÁREA DE MONTAGEM (STAGING)
+# ====================================================================
+
+def _pasta_sessao(sessao_id):
+    return os.path.join(current_app.config['UPLOAD_STAGING_DIR'], sessao_id)
+
+def _ler_sessao(sessao_id):
+    """Retorna os dados da sessão (sessao.json) ou None se ela não existe."""
+    caminho = os.path.join(_pasta_sessao(sessao_id), 'sessao.json')
+    if not os.path.exists(caminho):
+        return None
+    with open(caminho, encoding='utf-8') as arquivo:
+        return json.load(arquivo)
+
+def _ler_meta(pasta, arquivo_id):
+    caminho = os.path.join(pasta, f'{arquivo_id}.json')
+    if not os.path.exists(caminho):
+        return None
+    with open(caminho, encoding='utf-8') as arquivo:
+        return json.load(arquivo)
+
+def _gravar_meta(pasta, arquivo_id, meta):
+    with open(os.path.join(pasta, f'{arquivo_id}.json'), 'w', encoding='utf-8') as arquivo:
+        json.dump(meta, arquivo)
+
+def _estado_arquivo(pasta, arquivo_id, meta):
+    """Bytes recebidos e se o arquivo já foi montado por completo."""
+    parcial = os.path.join(pasta, f'{arquivo_id}.part')
+    if os.path.exists(parcial):
+        return os.path.getsize(parcial), False
+    # Montado (aguardando, em processamento ou já processado)
+    return meta['total'], True
+
+def _registrar_log(pasta, log):
+    """Acrescenta as mensagens de uma rodada ao log da sessão (uma linha JSON por mensagem)."""
+    with open(os.path.join(pasta, ARQUIVO_LOG), 'a', encoding='utf-8') as arquivo:
+        for nivel, msg, args, evento in log.entradas():
+            arquivo.write(json.dumps({'nivel': nivel, 'msg': msg % args if args else msg, 'evento': evento},
+                                     ensure_ascii=False) + '\n')
+
+def _ler_log(pasta, sessao_id):
+    """Log da sessão inteira, limitado às últimas LOG_LINHAS_JOB linhas (os contadores contam todas)."""
+    log = LogJob(current_app.config.get('LOG_LINHAS_JOB'), logger, sessao_id)
+    caminho = os.path.join(pasta, ARQUIVO_LOG)
+    if os.path.exists(caminho):
+        with open(caminho, encoding='utf-8') as arquivo:
+            for linha in arquivo:
+                entrada = json.loads(linha)
+                log.guardar(entrada['nivel'], entrada['msg'], evento=entrada['evento'])
+    return log
+
+# ====================================================================
+# SEÇÃO 2: PROCESSAMENTO EM SEGUNDO PLANO
+# ====================================================================
+
+_executor = None
+_agendadas = set()      # sessões com processamento já na fila deste processo
+_lock = threading.Lock()
+_cache_qrs = OrderedDict()  # sessao_id: (nomes dos PNGs, indice_roster, qr_map, qr_por_matricula), LRU
+
+def _obter_executor(app):
+    global _executor
+    with _lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(app.config.get('UPLOAD_THREADS', 1), thread_name_prefix='qr-sessao')
+        return _executor
+
+def agendar_processamento(app, sessao_id):
+    """Agenda (uma vez por vez) o processamento dos diplomas completos da sessão."""
+    with _lock:
+        if sessao_id in _agendadas:
+            return
+        _agendadas.add(sessao_id)
+    _obter_executor(app).submit(_processar_em_segundo_plano, app, sessao_id)
+
+def _processar_em_segundo_plano(app, sessao_id):
+    with _lock:
+        _agendadas.discard(sessao_id)
+    try:
+        with app.app_context():
+            processar_pendentes(sessao_id, final=False)
+    except Exception:
+        logger.exception("Erro no processamento da sessão %s", sessao_id)
+
+def _mapear_qrs_da_sessao(sessao_id, pasta, indice_roster, processing_log):
+    """Mapa dos QRs já montados, refeito só quando chega um QR novo (ou o cadastro muda)."""
+    from src.routes.pdf_qr import mapear_qrs
+
+    nomes = {}
+    for nome in os.listdir(pasta):
+        if nome.endswith(EXTENSOES['qr']):
+            meta = _ler_meta(pasta, nome[:-len(EXTENSOES['qr'])])
+            if meta:
+                nomes[nome] = meta['filename']
+    chave = frozenset(nomes)
+    with _lock:
+        em_cache = _cache_qrs.get(sessao_id)
+        if em_cache:
+            _cache_qrs.move_to_end(sessao_id)
+    if em_cache and em_cache[0] == chave and em_cache[1] is indice_roster:
+        return em_cache[2], em_cache[3]
+
+    def ler(nome):
+        with open(os.path.join(pasta, nome), 'rb') as arquivo:
+            return arquivo.read()
+
+    # O mapa é refeito a cada QR novo: o log de cada QR ficaria repetido, então só o total entra
+    qr_map, qr_por_matricula = mapear_qrs(((nomes[nome], ler(nome)) for nome in sorted(nomes)),
+                                          indice_roster, LogJob(emitir=False))
+    processing_log.info("🔎 %d QRs disponíveis na sessão", len(nomes))
+    with _lock:
+        _cache_qrs[sessao_id] = (chave, indice_roster, qr_map, qr_por_matricula)
+        _cache_qrs.move_to_end(sessao_id)
+        # Sessões concluídas, abandonadas (removidas pela retenção) ou esquecidas saem da memória
+        for antiga in [sessao for sessao in _cache_qrs if sessao != sessao_id
+                       and not os.path.isdir(os.path.join(os.path.dirname(pasta), sessao))]:
+            del _cache_qrs[antiga]
+        while len(_cache_qrs) > SESSOES_EM_CACHE:
+            _cache_qrs.popitem(last=False)
+    return qr_map, qr_por_matricula
+
+def descartar_cache(sessao_id):
+    """Tira da memória deste processo o mapa de QRs da sessão."""
+    with _lock:
+        _cache_qrs.pop(sessao_id, None)
+
+def _carregar_modelos(pasta, sessao):
+    """
+    Catálogo de modelos da sessão: as chaves de template_positions semeadas
+    e o que os workers já aprenderam, guardado em modelos.json.
+
+    Returns:
+        tuple: (CatalogoModelos, estado lido do disco, para _salvar_modelos)
+    """
+    from src.services.modelos import CatalogoModelos
+
+    catalogo = CatalogoModelos(current_app.config['MODELOS_DIR'])
+    catalogo.semear(sessao.get('template_positions'))
+    estado = _ler_modelos(pasta)
+    catalogo.incorporar(estado)
+    return catalogo, estado
+
+def _ler_modelos(pasta):
+    try:
+        with open(os.path.join(pasta, ARQUIVO_MODELOS), encoding='utf-8') as arquivo:
+            return json.load(arquivo)
+    except FileNotFoundError:
+        return {}
+
+def _salvar_modelos(pasta, catalogo, carregado):
+    """Grava em modelos.json o que a rodada aprendeu, junto com o que outro worker gravou nesse meio tempo."""
+    if json.dumps(catalogo.exportar(), sort_keys=True) == json.dumps(carregado, sort_keys=True):
+        return
+    catalogo.incorporar(_ler_modelos(pasta))
+    descritor, temporario = tempfile.mkstemp(dir=pasta, suffix='.tmp')
+    with os.fdopen(descritor, 'w', encoding='utf-8') as arquivo:
+        json.dump(catalogo.exportar(), arquivo)
+    os.replace(temporario, os.path.join(pasta, ARQUIVO_MODELOS))
+
+def processar_pendentes(sessao_id, final, cancelamento=None):
+    """
+    Processa os diplomas montados que ainda não foram processados.
+
+    Cada diploma é reservado renomeando o arquivo (operação atômica), então
+    dois workers nunca processam o mesmo diploma. Sem o QR correspondente, o
+    diploma volta a esperar; na chamada final ele é registrado como sem_qr.
+    Com a sessão cancelada, para antes do próximo diploma.
+
+    Returns:
+        int: Diplomas processados (concluídos, sem QR ou com erro)
+    """
+    from src.routes.jobs import documentos_concluidos, cancelamento_do_job
+    from src.routes.roster import obter_indice_roster
+    from src.routes.pdf_qr import processar_diploma
+    from src.services.linearizacao import ResumoLinearizacao
+
+    pasta = _pasta_sessao(sessao_id)
+    sessao = _ler_sessao(sessao_id)
+    job = db.session.get(Job, sessao_id)
+    if sessao is None or job is None:
+        return 0
+
+    processing_log = LogJob(current_app.config.get('LOG_LINHAS_JOB'), logger, sessao_id)
+    indice_roster = obter_indice_roster()
+    qr_map, qr_por_matricula = _mapear_qrs_da_sessao(sessao_id, pasta, indice_roster, processing_log)
+    # O log vai para o disco a cada diploma: rodadas de outros workers intercalam sem perder linhas
+    _registrar_log(pasta, processing_log)
+    concluidos = documentos_concluidos(job)
+    catalogo, modelos_carregados = _carregar_modelos(pasta, sessao)
+    cancelamento = cancelamento or cancelamento_do_job(sessao_id)
+    linearizacao = ResumoLinearizacao(sessao.get('linearize'), current_app.config.get('QPDF', 'qpdf'))
+    processados = 0
+
+    for nome in sorted(os.listdir(pasta)):
+        if not nome.endswith(EXTENSOES['pdf']):
+            continue
+        if cancelamento.cancelado():
+            break
+        arquivo_id = nome[:-len(EXTENSOES['pdf'])]
+        caminho = os.path.join(pasta, nome)
+        reservado = caminho + SUFIXO_PROCESSANDO
+        try:
+            os.rename(caminho, reservado)
+        except FileNotFoundError:
+            continue  # reservado por outro worker
+        # Log provisório: um diploma que volta a esperar o QR não deixa rastro
+        log_diploma = LogJob(emitir=False)
+        try:
+            meta = _ler_meta(pasta, arquivo_id)
+            with open(reservado, 'rb') as arquivo:
+                diploma_bytes = arquivo.read()
+            resultado = processar_diploma(job, diploma_bytes, secure_filename(meta['filename']), qr_map,
+                                          qr_por_matricula, indice_roster, sessao['qr_position'], concluidos,
+                                          log_diploma, endpoint='sessao', registrar_sem_qr=final,
+                                          catalogo=catalogo, posicoes_modelo=sessao.get('template_positions'),
+                                          linearizacao=linearizacao)
+        except BaseException:
+            os.rename(reservado, caminho)
+            raise
+        if resultado['status'] == 'sem_qr' and not final:
+            # Espera o QR: volta para a fila da sessão (o log sai quando ele for processado)
+            os.rename(reservado, caminho)
+            continue
+        # Modelo do diploma: o /complete avisa as posições de modelo sem nenhum diploma
+        meta['modelo'] = resultado['modelo']
+        _gravar_meta(pasta, arquivo_id, meta)
+        os.remove(reservado)
+        processing_log.anexar(log_diploma)
+        _registrar_log(pasta, log_diploma)
+        processados += 1
+    _salvar_modelos(pasta, catalogo, modelos_carregados)
+    if linearizacao.documentos:
+        log_linearizacao = LogJob(emitir=False)
+        log_linearizacao.info("🌐 %d PDFs linearizados (%d → %d bytes)", linearizacao.documentos,
+                              linearizacao.bytes_antes, linearizacao.bytes_depois)
+        processing_log.anexar(log_linearizacao)
+        _registrar_log(pasta, log_linearizacao)
+    return processados
+
+def _aguardar_processamento(pasta, limite):
+    """Espera os diplomas reservados por outras threads ou workers terminarem."""
+    prazo = time.monotonic() + limite
+    while time.monotonic() < prazo:
+        if not any(nome.endswith(SUFIXO_PROCESSANDO) for nome in os.listdir(pasta)):
+            return True
+        time.sleep(0.2)
+    return False
+
+# ====================================================================
+# SEÇÃO 3: ENDPOINTS
+# ====================================================================
+
+@sessoes_bp.route('/upload-sessions', methods=['POST'])
+def criar_sessao():
+    """
+    Cria uma sessão de envio em partes para um lote.
+
+    ENTRADA (JSON):
+        - qr_position: Posição unificada {x, y, size} ou automática {auto: true, size}
+        - template_positions (opcional): {modelo: {x, y, size}}, como em /api/batch-process
+        - linearize (opcional): PDFs de saída linearizados, como em /api/batch-process
+        - job_id (opcional): Identificador do job (retoma sessão ou lote anterior)
+        - ttl_hours (opcional): Prazo de retenção dos PDFs de saída
+
+    SAÍDA:
+        - session_id: Identificador da sessão (é o job_id do lote)
+        - chunk_size: Tamanho sugerido de cada parte, em bytes
+    """
+    from src.routes.jobs import obter_ou_criar_job, iniciar_cancelamento, JOB_ID_VALIDO
+    from src.routes.pdf_qr import ler_posicoes_modelo, criar_catalogo
+    from src.services.linearizacao import interpretar_opcao
+    from src.services.posicionamento import validar_posicao
+
+    data = request.get_json(silent=True) or {}
+    qr_position = data.get('qr_position')
+    if qr_position is None:
+        return jsonify({'error': 'A posição do QR Code é necessária'}), 400
+    erro_posicao = validar_posicao(qr_position)
+    posicoes_modelo, erro_modelos = ler_posicoes_modelo(data.get('template_positions'))
+    if erro_posicao or erro_modelos:
+        return jsonify({'error': erro_posicao or erro_modelos}), 400
+
+    # A própria sessão pode ser retomada enquanto está aberta (ex: página recarregada);
+    # outro lote em andamento com o mesmo job_id recebe 409
+    job_id = data.get('job_id')
+    sessao_aberta = bool(job_id) and JOB_ID_VALIDO.match(job_id) is not None and _ler_sessao(job_id) is not None
+    job, erro_job = obter_ou_criar_job(job_id, 'lote', {'qr_position': qr_position},
+                                       data.get('ttl_hours'), exclusivo=not sessao_aberta)
+    if erro_job:
+        return jsonify({'error': erro_job}), 409
+    # Retomar uma sessão cancelada descarta o pedido de cancelamento anterior
+    iniciar_cancelamento(job)
+
+    pasta = _pasta_sessao(job.id)
+    os.makedirs(pasta, exist_ok=True)
+    if _ler_sessao(job.id) is None:
+        with open(os.path.join(pasta, 'sessao.json'), 'w', encoding='utf-8') as arquivo:
+            json.dump({'qr_position': qr_position, 'template_positions': posicoes_modelo,
+                       'linearize': interpretar_opcao(data.get('linearize'), current_app.config.get('LINEARIZAR')),
+                       'criada_em': time.time()}, arquivo)
+        # Chaves de template_positions desconhecidas: avisadas uma vez, no log da sessão
+        log_sessao = LogJob(emitir=False)
+        criar_catalogo(posicoes_modelo, log_sessao)
+        _registrar_log(pasta, log_sessao)
+
+    return jsonify({
+        'success': True,
+        'session_id': job.id,
+        'chunk_size': int(current_app.config['UPLOAD_PARTE_MB'] * 1024 * 1024)
+    })
+
+@sessoes_bp.route('/upload-sessions/<sessao_id>/files/<arquivo_id>', methods=['PUT'])
+def enviar_parte(sessao_id, arquivo_id):
+    """
+    Recebe uma parte de um arquivo da sessão.
+
+    CABEÇALHOS:
+        - Content-Range: bytes <início>-<fim>/<total> (posições inclusivas)
+        - X-File-Name: Nome original do arquivo (usado no matching), codificado
+          como URL (cabeçalhos HTTP só aceitam ASCII)
+        - X-File-Kind: 'pdf' (diploma) ou 'qr' (PNG do QR extraído)
+
+    As partes de um arquivo devem chegar em ordem: uma parte que não começa
+    onde a anterior terminou recebe 409 com o total já recebido. Depois de
+    um cancelamento, toda parte recebe 409.
+    """
+    from src.routes.jobs import cancelamento_do_job
+
+    pasta = _pasta_sessao(sessao_id)
+    if not ARQUIVO_ID_VALIDO.match(arquivo_id) or _ler_sessao(sessao_id) is None:
+        return jsonify({'error': 'Sessão ou arquivo inválido'}), 404
+    if cancelamento_do_job(sessao_id).cancelado():
+        return jsonify({'error': 'Sessão cancelada'}), 409
+
+    intervalo = CONTENT_RANGE.match(request.headers.get('Content-Range', ''))
+    if not intervalo:
+        return jsonify({'error': 'Content-Range é necessário (bytes início-fim/total)'}), 400
+    inicio, fim, total = (int(valor) for valor in intervalo.groups())
+    if total > current_app.config['UPLOAD_ARQUIVO_MAX_MB'] * 1024 * 1024:
+        return jsonify({'error': 'Arquivo muito grande'}), 413
+
+    meta = _ler_meta(pasta, arquivo_id)
+    if meta is None:
+        tipo = request.headers.get('X-File-Kind', 'pdf')
+        nome = unquote(request.headers.get('X-File-Name', ''))
+        if tipo not in EXTENSOES or not nome:
+            return jsonify({'error': "X-File-Name e X-File-Kind ('pdf' ou 'qr') são necessários"}), 400
+        meta = {'filename': nome, 'tipo': tipo, 'total': total}
+        _gravar_meta(pasta, arquivo_id, meta)
+        open(os.path.join(pasta, f'{arquivo_id}.part'), 'wb').close()
+    elif meta['total'] != total:
+        return jsonify({'error': 'O tamanho total do arquivo mudou'}), 409
+
+    recebido, completo = _estado_arquivo(pasta, arquivo_id, meta)
+    if completo:
+        return jsonify({'received': recebido, 'complete': True})
+    dados = request.get_data()
+    if inicio != recebido or fim - inicio + 1 != len(dados) or fim >= total:
+        return jsonify({'error': 'Parte fora de ordem', 'received': recebido}), 409
+
+    parcial = os.path.join(pasta, f'{arquivo_id}.part')
+    with open(parcial, 'ab') as arquivo:
+        arquivo.write(dados)
+    recebido += len(dados)
+
+    if recebido == total:
+        os.replace(parcial, os.path.join(pasta, arquivo_id + EXTENSOES[meta['tipo']]))
+        # Diploma completo (ou QR que um diploma em espera pode usar): processa já
+        agendar_processamento(current_app._get_current_object(), sessao_id)
+    return jsonify({'received': recebido, 'complete': recebido == total})
+
+@sessoes_bp.route('/upload-sessions/<sessao_id>/files/<arquivo_id>', methods=['GET'])
+def estado_arquivo(sessao_id, arquivo_id):
+    """Informa quantos bytes do arquivo já chegaram (0 se nenhum)."""
+    pasta = _pasta_sessao(sessao_id)
+    if not ARQUIVO_ID_VALIDO.match(arquivo_id) or _ler_sessao(sessao_id) is None:
+        return jsonify({'error': 'Sessão ou arquivo inválido'}), 404
+    meta = _ler_meta(pasta, arquivo_id)
+    if meta is None:
+        return jsonify({'received': 0, 'complete': False})
+    recebido, completo = _estado_arquivo(pasta, arquivo_id, meta)
+    return jsonify({'received': recebido, 'total': meta['total'], 'complete': completo})
+
+@sessoes_bp.route('/upload-sessions/<sessao_id>/complete', methods=['POST'])
+def concluir_sessao(sessao_id):
+    """
+    Encerra a sessão: processa os diplomas restantes e devolve o resultado.
+
+    SAÍDA (como /batch-process com inline=0):
+        - processed_pdfs: [{filename, url, nome_aluno, matricula, linearized}]
+        - total_processed, processing_log, log_summary, job_id
+        - archive_url: ZIP com todos os PDFs do job
+        - incomplete_files: arquivos cujas partes não chegaram por completo
+        - unmatched_templates: chaves de template_positions sem nenhum diploma na sessão
+        - cancelled: 'pedido' ou 'desconectado' se a sessão foi cancelada (None se não)
+        - remaining: diplomas montados que não foram processados
+    """
+    import shutil
+    from src.models.job import Documento
+    from src.routes.jobs import finalizar_job, cancelamento_do_job
+    from src.services.linearizacao import CABECALHO_LINEARIZADO, linearizado, localizar_qpdf
+
+    pasta = _pasta_sessao(sessao_id)
+    job = db.session.get(Job, sessao_id)
+    sessao = _ler_sessao(sessao_id)
+    if sessao is None or job is None:
+        return jsonify({'error': 'Sessão não encontrada'}), 404
+
+    if not _aguardar_processamento(pasta, current_app.config.get('UPLOAD_ESPERA_MAXIMA', 300)):
+        return jsonify({'error': 'Diplomas ainda em processamento, tente novamente'}), 503
+    cancelamento = cancelamento_do_job(sessao_id, request.environ)
+    if not cancelamento.cancelado():
+        processar_pendentes(sessao_id, final=True, cancelamento=cancelamento)
+    restantes = sum(1 for nome in os.listdir(pasta) if nome.endswith(EXTENSOES['pdf']))
+
+    incompletos = []
+    modelos_usados = set()
+    for nome in sorted(os.listdir(pasta)):
+        if nome.endswith('.part'):
+            meta = _ler_meta(pasta, nome[:-len('.part')])
+            incompletos.append(meta['filename'] if meta else nome)
+        elif nome.endswith('.json') and nome not in ('sessao.json', ARQUIVO_MODELOS):
+            modelos_usados.add(_ler_meta(pasta, nome[:-len('.json')]).get('modelo'))
+
+    processing_log = _ler_log(pasta, sessao_id)
+
+    processed_pdfs = []
+    for documento in job.documentos.filter_by(status='concluido').order_by(Documento.id):
+        for artefato in documento.artefatos:
+            if artefato.tipo == 'pdf':
+                # Só o início do arquivo: o dicionário /Linearized vem no primeiro objeto
+                try:
+                    with open(artefato.caminho, 'rb') as arquivo:
+                        pdf_linearizado = linearizado(arquivo.read(CABECALHO_LINEARIZADO))
+                except OSError:
+                    pdf_linearizado = False
+                processed_pdfs.append({
+                    'filename': artefato.filename,
+                    'url': artefato.to_dict()['url'],
+                    'nome_aluno': documento.nome_extraido,
+                    'matricula': documento.matricula,
+                    'linearized': pdf_linearizado
+                })
+
+    if cancelamento.motivo:
+        processing_log.aviso("⛔ Sessão cancelada (%s): %d diplomas não processados", cancelamento.motivo,
+                             restantes, evento='cancelado')
+    sem_documentos = [chave for chave in sessao.get('template_positions') or {} if chave not in modelos_usados]
+    if sem_documentos:
+        processing_log.aviso("⚠️ Posição de modelo sem nenhum diploma neste envio: %s", ', '.join(sem_documentos),
+                             evento='modelo_sem_documentos')
+    processing_log.info("🎯 Sessão concluída: %d PDFs processados", len(processed_pdfs))
+    finalizar_job(job, cancelamento)
+
+    # Arquivos incompletos ficam para uma retomada; sem eles (ou com a sessão
+    # cancelada a pedido), a montagem não é mais necessária
+    if not incompletos or cancelamento.motivo == 'pedido':
+        shutil.rmtree(pasta, ignore_errors=True)
+        descartar_cache(sessao_id)
+
+    return jsonify({
+        'success': True,
+        'job_id': job.id,
+        'processed_pdfs': processed_pdfs,
+        'total_processed': len(processed_pdfs),
+        'processing_log': processing_log.linhas(),
+        'log_summary': processing_log.resumo(),
+        'archive_url': f'/api/jobs/{job.id}/archive',
+        'incomplete_files': incompletos,
+        'unmatched_templates': sem_documentos,
+        'linearization': {'requested': bool(sessao.get('linearize')),
+                          'available': localizar_qpdf(current_app.config.get('QPDF', 'qpdf')) is not None,
+                          'documents': sum(1 for pdf in processed_pdfs if pdf['linearized'])},
+        'cancelled': cancelamento.motivo,
+        'remaining': restantes
+    })
@@ -0,0 +1,222 @@
+# ====================================================================
+# CONTROLE DE ADMISSÃO DOS ENDPOINTS PESADOS
+# ====================================================================
+# /extract-qr e /batch-process podem ocupar centenas de MB cada (páginas
+# renderizadas em 3x, PDFs de saída e suas cópias base64). Sem limite,
+# uma rajada de lotes no fim do semestre leva o servidor ao swap.
+#
+# Cada endpoint controlado tem:
+# - um limite de requisições simultâneas
+# - um orçamento de memória, consumido pela estimativa de cada requisição
+#   (proporcional ao tamanho do upload)
+# - uma fila de espera limitada, atendida em ordem de chegada
+#
+# Fila cheia, ou espera maior que o limite, resulta em 503 imediato com
+# Retry-After.
+#
+# Os limites configurados são globais e divididos entre os processos
+# (QR_WORKERS, ver limites_por_processo): cada worker do gunicorn aplica a
+# sua parte, sem coordenação entre eles. Concorrência e fila valem ao
+# menos 1 por worker, então o total efetivo é workers × a parte de cada um
+# (em /api/admission, 'max_concorrentes_total' e 'orcamento_total_mb').
+# ====================================================================
+
+from collections import deque
+import math
+import threading
+import time
+
+from src.services.metrics import (ADMISSAO_ATIVAS, ADMISSAO_FILA, ADMISSAO_MEMORIA, ADMISSAO_ESPERA,
+                                  ADMISSAO_REJEICOES)
+
+# Estimativa de memória por requisição: (MB fixos, MB por MB enviado)
+# - extract_qr: renderização 3x de uma página A4 (~15MB RGB, mais cópias
+#   PPM/PIL/NumPy) além dos PNGs extraídos em base64
+# - batch_process: PDFs de saída mantidos em memória e suas cópias base64
+# - batch_restamp: o corpo é só JSON; os PDFs vêm do disco do job, então a
+#   estimativa é fixa (a de um lote médio)
+ESTIMATIVAS_MEMORIA = {
+    'pdf_qr.extract_qr': (80.0, 3.0),
+    'pdf_qr.batch_process': (30.0, 4.0),
+    'pdf_qr.batch_restamp': (60.0, 0.0),
+}
+ESTIMATIVA_PADRAO = (20.0, 2.0)
+
+class Sobrecarga(Exception):
+    """Requisição recusada pelo controle de admissão."""
+
+    def __init__(self, motivo, retry_after):
+        super().__init__(motivo)
+        self.motivo = motivo
+        self.retry_after = retry_after
+
+class ControleAdmissao:
+    """Semáforo com orçamento de memória e fila limitada (FIFO) de um endpoint."""
+
+    def __init__(self, endpoint, max_concorrentes, max_fila, espera_maxima, orcamento_mb, processos=1):
+        self.endpoint = endpoint
+        # Processos que dividem os limites globais (cada um com um controle igual a este)
+        self.processos = processos
+        self.max_concorrentes = max_concorrentes
+        self.max_fila = max_fila
+        self.espera_maxima = espera_maxima
+        self.orcamento_mb = orcamento_mb
+        self.ativas = 0
+        self.memoria_reservada_mb = 0.0
+        self._fila = deque()
+        self._condicao = threading.Condition()
+        # Média móvel da duração das requisições, usada no Retry-After
+        self._duracao_media = None
+        self._espera_total = 0.0
+        self._admitidas = 0
+        self._rejeitadas = 0
+
+    def estimar_memoria_mb(self, tamanho_bytes):
+        """Estimativa de memória de uma requisição a partir do tamanho do upload."""
+        fixo, fator = ESTIMATIVAS_MEMORIA.get(self.endpoint, ESTIMATIVA_PADRAO)
+        return fixo + fator * (tamanho_bytes or 0) / (1024 * 1024)
+
+    def _cabe(self, custo_mb):
+        if self.ativas >= self.max_concorrentes:
+            return False
+        # Uma requisição maior que o orçamento inteiro roda sozinha
+        return self.ativas == 0 or self.memoria_reservada_mb + custo_mb <= self.orcamento_mb
+
+    def _retry_after(self):
+        duracao = self._duracao_media or 5.0
+        rodadas = (len(self._fila) + 1) / self.max_concorrentes
+        return max(1, min(300, math.ceil(duracao * rodadas)))
+
+    def _rejeitar(self, motivo):
+        self._rejeitadas += 1
+        ADMISSAO_REJEICOES.inc(endpoint=self.endpoint, motivo=motivo)
+        return Sobrecarga(motivo, self._retry_after())
+
+    def _publicar(self):
+        ADMISSAO_ATIVAS.set(self.ativas, endpoint=self.endpoint)
+        ADMISSAO_FILA.set(len(self._fila), endpoint=self.endpoint)
+        ADMISSAO_MEMORIA.set(round(self.memoria_reservada_mb, 1), endpoint=self.endpoint)
+
+    def admitir(self, custo_mb):
+        """
+        Aguarda a vez da requisição.
+
+        Returns:
+            float: Segundos de espera na fila
+
+        Raises:
+            Sobrecarga: Fila cheia ou espera acima de espera_maxima
+        """
+        inicio = time.perf_counter()
+        with self._condicao:
+            if not self._fila and self._cabe(custo_mb):
+                return self._ocupar(custo_mb, inicio)
+            if len(self._fila) >= self.max_fila:
+                raise self._rejeitar('fila_cheia')
+
+            ficha = object()
+            self._fila.append(ficha)
+            self._publicar()
+            try:
+                prazo = inicio + self.espera_maxima
+                while not (self._fila[0] is ficha and self._cabe(custo_mb)):
+                    restante = prazo - time.perf_counter()
+                    if restante <= 0:
+                        raise self._rejeitar('tempo_espera')
+                    self._condicao.wait(restante)
+            finally:
+                self._fila.remove(ficha)
+                # O próximo da fila pode caber agora (ou virar o primeiro)
+                self._condicao.notify_all()
+                self._publicar()
+            return self._ocupar(custo_mb, inicio)
+
+    def _ocupar(self, custo_mb, inicio):
+        espera = time.perf_counter() - inicio
+        self.ativas += 1
+        self.memoria_reservada_mb += custo_mb
+        self._admitidas += 1
+        self._espera_total += espera
+        ADMISSAO_ESPERA.observe(espera, endpoint=self.endpoint)
+        self._publicar()
+        return espera
+
+    def liberar(self, custo_mb, duracao):
+        """Devolve a vaga e a memória reservada por uma requisição admitida."""
+        with self._condicao:
+            self.ativas -= 1
+            self.memoria_reservada_mb = max(0.0, self.memoria_reservada_mb - custo_mb)
+            if self._duracao_media is None:
+                self._duracao_media = duracao
+            else:
+                self._duracao_media = 0.8 * self._duracao_media + 0.2 * duracao
+            self._condicao.notify_all()
+            self._publicar()
+
+    def estado(self):
+        """Retorna um retrato do controle para /api/admission."""
+        with self._condicao:
+            return {
+                'endpoint': self.endpoint,
+                'ativas': self.ativas,
+                'fila': len(self._fila),
+                'memoria_reservada_mb': round(self.memoria_reservada_mb, 1),
+                'max_concorrentes': self.max_concorrentes,
+                'max_fila': self.max_fila,
+                'espera_maxima_s': self.espera_maxima,
+                'orcamento_mb': self.orcamento_mb,
+                'processos': self.processos,
+                'max_concorrentes_total': self.max_concorrentes * self.processos,
+                'orcamento_total_mb': round(self.orcamento_mb * self.processos, 1),
+                'admitidas': self._admitidas,
+                'rejeitadas': self._rejeitadas,
+                'espera_media_ms': round(self._espera_total / self._admitidas * 1000, 1) if self._admitidas else 0.0,
+                'duracao_media_s': round(self._duracao_media, 2) if self._duracao_media is not None else None,
+            }
+
+# ====================================================================
+# REGISTRO POR ENDPOINT
+# ====================================================================
+
+def limites_por_processo(limites, processos):
+    """
+    Parte de cada processo nos limites globais de um endpoint.
+
+    Args:
+        limites (dict): {'max_concorrentes', 'max_fila', 'espera_maxima', 'orcamento_mb'} globais
+        processos (int): Workers que atendem requisições (QR_WORKERS)
+
+    Returns:
+        dict: Limites do controle de cada processo (concorrência e fila no mínimo 1)
+    """
+    processos = max(1, processos)
+    return {
+        'max_concorrentes': max(1, limites['max_concorrentes'] // processos),
+        'max_fila': max(1, math.ceil(limites['max_fila'] / processos)),
+        'espera_maxima': limites['espera_maxima'],
+        'orcamento_mb': limites['orcamento_mb'] / processos,
+        'processos': processos,
+    }
+
+_controles = {}
+_lock_controles = threading.Lock()
+
+def obter_controle(endpoint, config):
+    """
+    Retorna o controle do endpoint, criado na primeira requisição a partir
+    de config['ADMISSAO'], ou None se o endpoint não é controlado.
+    """
+    limites = (config.get('ADMISSAO') or {}).get(endpoint)
+    if limites is None:
+        return None
+    with _lock_controles:
+        controle = _controles.get(endpoint)
+        if controle is None:
+            controle = _controles[endpoint] = ControleAdmissao(endpoint, **limites)
+        return controle
+
+def estado_controles():
+    """Retrato de todos os controles já criados neste processo."""
+    with _lock_controles:
+        controles = list(_controles.values())
+    return [controle.estado() for controle in controles]
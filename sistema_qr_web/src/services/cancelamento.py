@@ -0,0 +1,93 @@
+# ====================================================================
+# CANCELAMENTO COOPERATIVO DE LOTES E EXTRAÇÕES
+# ====================================================================
+# Fechar a aba não parava /api/batch-process nem /api/extract-qr: o
+# servidor seguia renderizando e gravando cada PDF restante. O trabalho
+# agora consulta um Cancelamento entre documentos (e entre páginas na
+# extração) e para no primeiro sinal:
+#
+# - pedido explícito: POST /api/jobs/<job_id>/cancel grava um marcador na
+#   pasta do job; vale para qualquer worker/processo que esteja rodando o job
+# - cliente desconectado: o socket da requisição (werkzeug/gunicorn) é
+#   espiado sem bloquear; na ponte ASGI (src/asgi.py) o http.disconnect
+#   acende um Event no environ
+#
+# O que já foi concluído fica registrado no job (reenviar com o mesmo
+# job_id retoma do ponto em que parou) e a resposta traz o resumo parcial.
+# ====================================================================
+
+import os
+import select
+import socket
+import time
+
+# Intervalo mínimo entre duas consultas ao marcador e ao socket, em segundos
+INTERVALO_VERIFICACAO = 0.1
+# Chave do environ com o threading.Event de desconexão (ponte ASGI)
+CHAVE_DESCONEXAO = 'qr.desconectado'
+
+class Cancelado(Exception):
+    """Trabalho interrompido por cancelamento ('pedido' ou 'desconectado')."""
+
+    def __init__(self, motivo):
+        super().__init__(motivo)
+        self.motivo = motivo
+
+def conexao_fechada(sock):
+    """
+    True se o cliente fechou a conexão: o socket está legível e a espiada
+    (MSG_PEEK, sem consumir nada) lê zero bytes.
+    """
+    try:
+        legivel, _, _ = select.select([sock], [], [], 0)
+        if not legivel:
+            return False
+        return sock.recv(1, socket.MSG_PEEK) == b''
+    except (BlockingIOError, InterruptedError):
+        return False
+    except ConnectionError:
+        return True
+    except (OSError, ValueError):
+        # Socket já fechado pelo servidor ou sem suporte a MSG_PEEK (TLS): sem como saber
+        return False
+
+class Cancelamento:
+    """
+    Sinal de cancelamento de uma requisição (ou sessão) de processamento.
+
+    Exemplo:
+        cancelamento = Cancelamento(marcador, request.environ)
+        for diploma in diplomas:
+            if cancelamento.cancelado():
+                break
+            ...
+    """
+
+    def __init__(self, marcador=None, environ=None):
+        self.marcador = marcador
+        self.motivo = None
+        environ = environ or {}
+        self._socket = environ.get('gunicorn.socket') or environ.get('werkzeug.socket')
+        self._desconexao = environ.get(CHAVE_DESCONEXAO)
+        self._proxima = 0.0
+
+    def cancelado(self):
+        """Consulta o marcador e a conexão (no máximo a cada INTERVALO_VERIFICACAO)."""
+        if self.motivo:
+            return True
+        agora = time.monotonic()
+        if agora < self._proxima:
+            return False
+        self._proxima = agora + INTERVALO_VERIFICACAO
+        if self.marcador and os.path.exists(self.marcador):
+            self.motivo = 'pedido'
+        elif self._desconexao is not None and self._desconexao.is_set():
+            self.motivo = 'desconectado'
+        elif self._socket is not None and conexao_fechada(self._socket):
+            self.motivo = 'desconectado'
+        return self.motivo is not None
+
+    def verificar(self):
+        """Levanta Cancelado se o trabalho foi cancelado."""
+        if self.cancelado():
+            raise Cancelado(self.motivo)
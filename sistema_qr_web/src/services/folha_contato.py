@@ -0,0 +1,133 @@
+# ====================================================================
+# FOLHA DE CONTATO: PRÉVIA DA POSIÇÃO UNIFICADA NO LOTE
+# ====================================================================
+# A posição do QR é escolhida em um diploma de amostra e aplicada a todos.
+# Nomes longos ou uma variante diferente do modelo só apareciam depois do
+# lote inteiro. A prévia renderiza apenas a primeira página de cada
+# diploma em baixa resolução, desenha o retângulo do QR e monta tudo em
+# uma única imagem:
+#
+# - modo 'recorte' (padrão): só a região em volta do QR, o mais rápido
+# - modo 'pagina': a página inteira em miniatura (variantes de layout)
+#
+# Além da imagem, cada diploma é conferido pelo texto e pelas imagens que
+# já ocupam o retângulo do QR (colisões), sem renderizar nada a mais.
+# ====================================================================
+
+MODOS = ('recorte', 'pagina')
+DPI_PADRAO = {'recorte': 48, 'pagina': 18}
+DPI_MAXIMO = 96
+# Margem em volta do QR no modo recorte, em tamanhos do QR
+MARGEM_RECORTE = 1.0
+ALTURA_ROTULO = 14
+COR_QR = (220, 38, 38)
+
+def conferir_diploma(pdf_bytes, qr_position, modo='recorte', dpi=None, catalogo=None, posicoes_modelo=None):
+    """
+    Renderiza a miniatura da primeira página com o retângulo do QR e
+    procura o que já ocupa esse retângulo.
+
+    Com 'catalogo' (CatalogoModelos), o diploma é classificado pelo modelo
+    de layout e usa a posição do modelo em 'posicoes_modelo', como no lote.
+
+    Returns:
+        dict: 'imagem' (PIL.Image ou None), 'palavras' (texto no retângulo),
+              'imagens' (imagens do PDF no retângulo), 'ajustada' (posição
+              deslocada para caber na página, ou posição automática sem
+              espaço livre), 'pagina' ([largura, altura] em pontos) e
+              'modelo' (chave do modelo de layout ou None)
+    """
+    import fitz
+    from PIL import Image, ImageDraw
+    from src.routes.pdf_qr import retangulo_na_pagina
+    from src.services.posicionamento import conteudo_no_retangulo
+    from src.services.metrics import medir_etapa
+
+    dpi = dpi or DPI_PADRAO[modo]
+    with medir_etapa('abrir_pdf'):
+        doc = fitz.open(stream=pdf_bytes, filetype="pdf")
+    try:
+        if len(doc) == 0:
+            return {'imagem': None, 'palavras': [], 'imagens': 0, 'ajustada': False, 'pagina': None, 'modelo': None}
+        page = doc[0]
+        modelo = catalogo.classificar(page)[0] if catalogo is not None else None
+        if modelo and posicoes_modelo and modelo.chave in posicoes_modelo:
+            qr_position = posicoes_modelo[modelo.chave]
+        rect, regiao = retangulo_na_pagina(page, qr_position)
+        if qr_position.get('auto'):
+            # Na posição automática, destaca só o diploma que caiu no plano B
+            ajustada = regiao == 'manual'
+        else:
+            ajustada = (rect.x0, rect.y0) != (qr_position['x'], qr_position['y'])
+
+        # Colisões: só o texto e as imagens dentro do retângulo do QR
+        with medir_etapa('conferir_colisoes'):
+            palavras, imagens = conteudo_no_retangulo(page, rect)
+
+        if modo == 'recorte':
+            margem = rect.width * MARGEM_RECORTE
+            clip = (rect + (-margem, -margem, margem, margem)) & page.rect
+        else:
+            clip = page.rect
+        zoom = dpi / 72.0
+        with medir_etapa('renderizar_miniatura'):
+            pix = page.get_pixmap(matrix=fitz.Matrix(zoom, zoom), clip=clip, alpha=False)
+            imagem = Image.frombytes('RGB', (pix.width, pix.height), pix.samples)
+
+        # Retângulo do QR sobre a miniatura (preenchimento translúcido e contorno)
+        caixa = [(rect.x0 - clip.x0) * zoom, (rect.y0 - clip.y0) * zoom,
+                 (rect.x1 - clip.x0) * zoom, (rect.y1 - clip.y0) * zoom]
+        camada = Image.new('RGBA', imagem.size, (0, 0, 0, 0))
+        ImageDraw.Draw(camada).rectangle(caixa, fill=COR_QR + (60,), outline=COR_QR + (255,), width=2)
+        imagem = Image.alpha_composite(imagem.convert('RGBA'), camada).convert('RGB')
+
+        return {'imagem': imagem, 'palavras': palavras, 'imagens': imagens, 'ajustada': ajustada,
+                'pagina': [round(page.rect.width, 1), round(page.rect.height, 1)],
+                'modelo': modelo and modelo.chave}
+    finally:
+        doc.close()
+
+def montar_folha(miniaturas, rotulos, destaques, colunas=None):
+    """
+    Monta as miniaturas em uma grade, com o rótulo de cada diploma embaixo.
+
+    Args:
+        miniaturas (list): PIL.Image de cada diploma (None = diploma sem página)
+        rotulos (list): Texto sob cada miniatura
+        destaques (list): True para emoldurar a miniatura em vermelho (colisão)
+        colunas (int or None): Colunas da grade (padrão: grade aproximadamente quadrada)
+
+    Returns:
+        tuple: (PIL.Image da folha, colunas usadas)
+    """
+    import math
+    import unicodedata
+    from PIL import Image, ImageDraw
+    from src.services.metrics import medir_etapa
+
+    with medir_etapa('montar_folha'):
+        validas = [imagem for imagem in miniaturas if imagem is not None]
+        largura = max((imagem.width for imagem in validas), default=64)
+        altura = max((imagem.height for imagem in validas), default=64)
+        total = max(1, len(miniaturas))
+        if not colunas:
+            # Folha aproximadamente quadrada, considerando a proporção de cada célula
+            colunas = max(1, round(math.sqrt(total * (altura + ALTURA_ROTULO) / largura)))
+        colunas = min(colunas, total)
+        linhas = math.ceil(total / colunas)
+
+        celula_l, celula_a = largura + 4, altura + ALTURA_ROTULO + 4
+        folha = Image.new('RGB', (colunas * celula_l, linhas * celula_a), (255, 255, 255))
+        desenho = ImageDraw.Draw(folha)
+        for indice, (imagem, rotulo, destaque) in enumerate(zip(miniaturas, rotulos, destaques)):
+            x = (indice % colunas) * celula_l + 2
+            y = (indice // colunas) * celula_a + 2
+            if imagem is not None:
+                folha.paste(imagem, (x + (largura - imagem.width) // 2, y))
+            if destaque or imagem is None:
+                desenho.rectangle([x - 1, y - 1, x + largura, y + altura], outline=COR_QR, width=2)
+            # Rótulo sem acentos (a fonte padrão do Pillow só tem ASCII), cortado
+            # na largura da célula (~6px por caractere)
+            rotulo = unicodedata.normalize('NFKD', rotulo).encode('ascii', 'ignore').decode('ascii')
+            desenho.text((x, y + altura + 1), rotulo[:max(4, largura // 6)], fill=(0, 0, 0))
+    return folha, colunas
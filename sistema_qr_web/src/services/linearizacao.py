@@ -0,0 +1,129 @@
+# ====================================================================
+# LINEARIZAÇÃO ("FAST WEB VIEW") DOS PDFs DE SAÍDA
+# ====================================================================
+# Os formandos abrem o diploma pelo portal, no navegador. Um PDF comum
+# tem a tabela de objetos no fim do arquivo: o visualizador baixa tudo
+# antes de mostrar a primeira página. Um PDF linearizado começa com um
+# dicionário /Linearized e traz a primeira página inteira logo no início,
+# então ela aparece enquanto o resto ainda chega.
+#
+# O PyMuPDF desta versão (MuPDF 1.26) não lineariza mais: doc.save com
+# linear=True falha com "Linearisation is no longer supported". A
+# linearização é feita pelo qpdf (qpdf --linearize), quando instalado
+# (apt install qpdf). Sem o qpdf, o pedido é atendido sem linearização e
+# a resposta informa 'available': False; nada mais muda na saída.
+#
+# O custo aparece no timing_summary (etapa 'linearizar') e no resumo
+# 'linearization' das respostas (documentos e bytes antes e depois).
+# ====================================================================
+
+import logging
+import os
+import shutil
+import subprocess
+import tempfile
+
+from src.services.metrics import medir_etapa
+
+logger = logging.getLogger(__name__)
+
+# Tempo máximo do qpdf por documento, em segundos
+TEMPO_MAXIMO = 60
+# O dicionário /Linearized fica no primeiro objeto do arquivo
+CABECALHO_LINEARIZADO = 1024
+
+def interpretar_opcao(valor, padrao=False):
+    """Opção 'linearize' de um formulário ou JSON ('1', 'true', True...); None usa o padrão."""
+    if valor is None or valor == '':
+        return bool(padrao)
+    if isinstance(valor, bool):
+        return valor
+    return str(valor).strip().lower() in ('1', 'true', 'sim', 'yes', 'on')
+
+def linearizado(pdf_bytes):
+    """True se o PDF já é linearizado (dicionário /Linearized no início do arquivo)."""
+    return b'/Linearized' in pdf_bytes[:CABECALHO_LINEARIZADO]
+
+def localizar_qpdf(executavel='qpdf'):
+    """Caminho do qpdf ou None se não está instalado."""
+    return shutil.which(executavel)
+
+def linearizar(pdf_bytes, executavel='qpdf'):
+    """
+    Lineariza o PDF com o qpdf.
+
+    Args:
+        pdf_bytes (bytes): PDF de saída (de doc.save)
+        executavel (str): Nome ou caminho do qpdf (config QPDF)
+
+    Returns:
+        bytes or None: PDF linearizado, ou None se o qpdf não está
+                       instalado ou falhou (o PDF original segue valendo)
+    """
+    caminho = localizar_qpdf(executavel)
+    if caminho is None:
+        return None
+    with medir_etapa('linearizar'), tempfile.TemporaryDirectory(prefix='qr-linear-') as pasta:
+        entrada = os.path.join(pasta, 'entrada.pdf')
+        saida = os.path.join(pasta, 'saida.pdf')
+        with open(entrada, 'wb') as arquivo:
+            arquivo.write(pdf_bytes)
+        try:
+            resultado = subprocess.run([caminho, '--linearize', entrada, saida], capture_output=True,
+                                       timeout=TEMPO_MAXIMO)
+        except (OSError, subprocess.TimeoutExpired) as erro:
+            logger.warning("Falha ao linearizar PDF com o qpdf: %s", erro)
+            return None
+        # 3 = concluído com avisos (PDF de entrada com pequenas falhas, saída válida)
+        if resultado.returncode not in (0, 3) or not os.path.exists(saida):
+            logger.warning("Falha ao linearizar PDF com o qpdf (código %d): %s", resultado.returncode,
+                           resultado.stderr.decode('utf-8', 'replace').strip()[:200])
+            return None
+        with open(saida, 'rb') as arquivo:
+            return arquivo.read()
+
+class ResumoLinearizacao:
+    """Documentos linearizados de uma requisição e o que isso custou em bytes."""
+
+    def __init__(self, pedida, executavel='qpdf'):
+        self.pedida = pedida
+        self.executavel = executavel
+        self.disponivel = bool(pedida) and localizar_qpdf(executavel) is not None
+        self.documentos = 0
+        self.bytes_antes = 0
+        self.bytes_depois = 0
+
+    def aplicar(self, pdf_bytes):
+        """
+        Lineariza o PDF se foi pedido e o qpdf está disponível.
+
+        Returns:
+            tuple: (bytes do PDF, True se saiu linearizado)
+        """
+        if not self.disponivel:
+            return pdf_bytes, False
+        return self.registrar(pdf_bytes, linearizar(pdf_bytes, self.executavel))
+
+    def registrar(self, pdf_bytes, saida):
+        """
+        Contabiliza uma linearização feita fora do resumo (ex: em um
+        executor de processos, que não devolve o objeto alterado).
+
+        Returns:
+            tuple: (saida ou, se ela é None, o PDF original; True se linearizado)
+        """
+        if saida is None:
+            return pdf_bytes, False
+        self.documentos += 1
+        self.bytes_antes += len(pdf_bytes)
+        self.bytes_depois += len(saida)
+        return saida, True
+
+    def to_dict(self):
+        return {
+            'requested': bool(self.pedida),
+            'available': self.disponivel,
+            'documents': self.documentos,
+            'bytes_before': self.bytes_antes,
+            'bytes_after': self.bytes_depois,
+        }
@@ -0,0 +1,277 @@
+# ====================================================================
+# PÁGINAS RENDERIZADAS EM MEMÓRIA COMPARTILHADA
+# ====================================================================
+# Na extração de QRs cada página é renderizada em Matrix(3.0, 3.0): uma
+# A4 vira ~13MB de pixels RGB. Para separar a renderização (PyMuPDF) e a
+# detecção (OpenCV) em núcleos diferentes sem serializar esses pixels
+# entre processos, a página é copiada uma única vez para um bloco de
+# memória compartilhada e o processo detector a enxerga como um array
+# NumPy sobre o mesmo bloco, sem cópia.
+#
+# Ciclo de vida:
+# - Os blocos pertencem ao processo que renderiza (PoolBlocos), são
+#   reaproveitados entre páginas e só crescem quando uma página não cabe
+# - O número de blocos limita as páginas em voo (e a memória usada)
+# - Os processos detectores mantêm os blocos anexados em cache e apenas
+#   os fecham; quem remove (unlink) é sempre o dono, em fechar() ou na
+#   saída do processo (atexit)
+# ====================================================================
+
+import atexit
+from collections import OrderedDict, deque
+from concurrent.futures import ProcessPoolExecutor
+import multiprocessing
+from multiprocessing import shared_memory
+import queue
+import threading
+
+class BlocoCompartilhado:
+    """Bloco de memória compartilhada reaproveitável, de propriedade deste processo."""
+
+    def __init__(self):
+        self.shm = None
+
+    def garantir(self, tamanho):
+        """Garante capacidade para 'tamanho' bytes, recriando o bloco se preciso."""
+        if self.shm is None or self.shm.size < tamanho:
+            self.fechar()
+            self.shm = shared_memory.SharedMemory(create=True, size=tamanho)
+        return self.shm
+
+    def fechar(self):
+        if self.shm is not None:
+            self.shm.close()
+            self.shm.unlink()
+            self.shm = None
+
+class PoolBlocos:
+    """Conjunto fixo de blocos; adquirir() bloqueia até um bloco ficar livre."""
+
+    def __init__(self, quantidade):
+        self._todos = [BlocoCompartilhado() for _ in range(quantidade)]
+        self._livres = queue.Queue()
+        for bloco in self._todos:
+            self._livres.put(bloco)
+
+    def adquirir(self):
+        return self._livres.get()
+
+    def devolver(self, bloco):
+        self._livres.put(bloco)
+
+    def fechar(self):
+        for bloco in self._todos:
+            bloco.fechar()
+
+# ====================================================================
+# LADO DO PROCESSO DETECTOR
+# ====================================================================
+
+# Blocos anexados neste processo detector, do menos ao mais recente
+_anexados = OrderedDict()
+MAXIMO_ANEXADOS = 8
+
+def _anexar(nome):
+    shm = _anexados.pop(nome, None)
+    if shm is None:
+        shm = shared_memory.SharedMemory(name=nome)
+        while len(_anexados) >= MAXIMO_ANEXADOS:
+            _, antigo = _anexados.popitem(last=False)
+            antigo.close()
+    _anexados[nome] = shm
+    return shm
+
+def _detectar_em_bloco(nome, forma):
+    """
+    Detecta o QR na página que está no bloco compartilhado.
+
+    Executada no processo detector. O array NumPy é uma visão do bloco,
+    sem cópia; só o recorte do QR (PNG de poucos KB) volta ao processo
+    que renderizou. Os contadores de DETECCOES incrementados aqui ficam no
+    processo detector: os incrementos voltam junto do resultado para serem
+    repetidos no processo que exporta as métricas.
+
+    Returns:
+        tuple: (coords ou None, png do QR ou None, {etapa: segundos},
+                {labels: incremento} de DETECCOES)
+    """
+    import io
+    import numpy as np
+    from PIL import Image
+    from src.routes.pdf_qr import detectar_qr_code_na_imagem
+    from src.services.metrics import iniciar_resumo, encerrar_resumo, medir_etapa, DETECCOES
+
+    shm = _anexar(nome)
+    img_array = np.ndarray(forma, dtype=np.uint8, buffer=shm.buf)
+    # Cada processo detector roda uma detecção por vez: a diferença é só desta página
+    antes = DETECCOES.valores()
+    resumo = iniciar_resumo()
+    try:
+        coords = detectar_qr_code_na_imagem(img_array)
+        qr_png = None
+        if coords:
+            x, y, w, h = coords
+            with medir_etapa('codificar_imagem'):
+                buffer = io.BytesIO()
+                Image.fromarray(img_array[y:y + h, x:x + w]).save(buffer, format='PNG')
+            qr_png = buffer.getvalue()
+    finally:
+        encerrar_resumo()
+        del img_array
+    etapas = {etapa: item['total_ms'] / 1000 for etapa, item in resumo.resumo().items()}
+    deteccoes = {chave: total - antes.get(chave, 0) for chave, total in DETECCOES.valores().items()
+                 if total != antes.get(chave, 0)}
+    return coords, qr_png, etapas, deteccoes
+
+def _fechar_anexados():
+    while _anexados:
+        _, shm = _anexados.popitem()
+        shm.close()
+
+def _iniciar_detector():
+    atexit.register(_fechar_anexados)
+
+# ====================================================================
+# PIPELINE RENDERIZAÇÃO → DETECÇÃO
+# ====================================================================
+
+class PipelineDeteccao:
+    """
+    Renderiza páginas no processo atual e detecta os QRs em processos
+    separados, com as páginas trafegando em memória compartilhada.
+
+    Exemplo:
+        pipeline = PipelineDeteccao(processos=2)
+        for indice, resultado in pipeline.localizar_em_lote(lista_de_pdfs):
+            ...
+        pipeline.fechar()
+    """
+
+    def __init__(self, processos, escala=3.0):
+        self.processos = processos
+        self.escala = escala
+        # Um bloco por processo detector e mais um sendo preenchido pela renderização
+        self._blocos = PoolBlocos(processos + 1)
+        # 'spawn': fork de um processo com threads (servidor) pode herdar locks travados
+        self._executor = ProcessPoolExecutor(processos, mp_context=multiprocessing.get_context('spawn'),
+                                             initializer=_iniciar_detector)
+        self._fechado = False
+        self._lock = threading.Lock()
+
+    def _enviar(self, page):
+        """Renderiza a página, copia os pixels para um bloco livre e agenda a detecção."""
+        import fitz
+        from src.services.metrics import medir_etapa
+
+        with medir_etapa('renderizar'):
+            pix = page.get_pixmap(matrix=fitz.Matrix(self.escala, self.escala))
+        bloco = self._blocos.adquirir()
+        try:
+            with medir_etapa('converter_imagem'):
+                shm = bloco.garantir(len(pix.samples_mv))
+                shm.buf[:len(pix.samples_mv)] = pix.samples_mv
+            forma = (pix.height, pix.width, pix.n)
+            futuro = self._executor.submit(_detectar_em_bloco, shm.name, forma)
+        except BaseException:
+            self._blocos.devolver(bloco)
+            raise
+        futuro.add_done_callback(lambda _: self._blocos.devolver(bloco))
+        return futuro
+
+    def localizar_em_lote(self, documentos, janela=None, cancelamento=None):
+        """
+        Localiza o primeiro QR de cada PDF, mantendo até 'janela' documentos
+        em voo para que a renderização do próximo sobreponha a detecção do atual.
+
+        Args:
+            documentos (list): Conteúdo (bytes) de cada PDF
+            janela (int or None): Documentos em voo (padrão: processos + 1)
+            cancelamento (Cancelamento or None): Conferido antes de cada página enviada
+
+        Yields:
+            tuple: (indice, (page_num, (x, y, w, h), qr_png) ou None), na ordem de entrada
+
+        Raises:
+            Cancelado: O trabalho foi cancelado; nada mais é enviado aos detectores
+        """
+        import fitz
+        from src.services.metrics import medir_etapa, registrar_etapa, DETECCOES
+
+        janela = janela or self.processos + 1
+        pendentes = iter(enumerate(documentos))
+        em_voo = deque()  # [indice, doc, page_num, futuro]
+
+        def agendar_proximo():
+            for indice, pdf_bytes in pendentes:
+                with medir_etapa('abrir_pdf'):
+                    doc = fitz.open(stream=pdf_bytes, filetype="pdf")
+                if len(doc) == 0:
+                    doc.close()
+                    em_voo.append([indice, None, 0, None])
+                else:
+                    em_voo.append([indice, doc, 0, self._enviar(doc[0])])
+                return True
+            return False
+
+        try:
+            while em_voo or agendar_proximo():
+                if cancelamento is not None:
+                    cancelamento.verificar()
+                while len(em_voo) < janela and agendar_proximo():
+                    pass
+                item = em_voo[0]
+                indice, doc, page_num, futuro = item
+                if futuro is None:
+                    em_voo.popleft()
+                    yield indice, None
+                    continue
+
+                coords, qr_png, etapas, deteccoes = futuro.result()
+                for etapa, segundos in etapas.items():
+                    registrar_etapa(etapa, segundos)
+                for chave, incremento in deteccoes.items():
+                    DETECCOES.inc(incremento, **dict(chave))
+
+                if coords:
+                    em_voo.popleft()
+                    doc.close()
+                    yield indice, (page_num, coords, qr_png)
+                elif page_num + 1 < len(doc):
+                    item[2] = page_num + 1
+                    item[3] = self._enviar(doc[page_num + 1])
+                else:
+                    em_voo.popleft()
+                    doc.close()
+                    yield indice, None
+        finally:
+            # Consumo interrompido (erro ou cancelamento): espera as detecções em voo
+            # para que nenhum bloco seja reutilizado enquanto um detector ainda o lê
+            for _, doc, _, futuro in em_voo:
+                if futuro is not None:
+                    futuro.cancel() or futuro.exception()
+                if doc is not None:
+                    doc.close()
+
+    def fechar(self):
+        """Encerra os processos detectores e remove os blocos compartilhados."""
+        with self._lock:
+            if self._fechado:
+                return
+            self._fechado = True
+        self._executor.shutdown(wait=True, cancel_futures=True)
+        self._blocos.fechar()
+
+# Pipeline compartilhado pelas requisições deste processo, criado no primeiro uso
+_pipeline = None
+_lock_pipeline = threading.Lock()
+
+def obter_pipeline(processos):
+    """Retorna o pipeline do processo (ou None se processos <= 0)."""
+    global _pipeline
+    if processos <= 0:
+        return None
+    with _lock_pipeline:
+        if _pipeline is None:
+            _pipeline = PipelineDeteccao(processos)
+            atexit.register(_pipeline.fechar)
+        return _pipeline
@@ -0,0 +1,248 @@
+# ====================================================================
+# MÉTRICAS DE DESEMPENHO - HISTOGRAMAS, CONTADORES E TEMPOS POR ETAPA
+# ====================================================================
+# Instrumentação leve das etapas do processamento de PDFs (abrir,
+# extrair texto, renderizar, detectar QR, codificar, inserir, salvar,
+# base64). Os tempos são agregados em histogramas por processo e
+# exportados no formato texto do Prometheus; cada requisição também
+# acumula um resumo próprio que volta na resposta dos lotes.
+# ====================================================================
+
+from contextlib import contextmanager
+from contextvars import ContextVar
+import threading
+import time
+
+# Limites dos buckets (segundos), do mais rápido ao mais lento
+BUCKETS_PADRAO = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+def _chave_labels(labels):
+    return tuple(sorted(labels.items()))
+
+def _formatar_labels(chave, extra=None):
+    pares = list(chave) + (list(extra) if extra else [])
+    if not pares:
+        return ''
+    conteudo = ','.join(f'{nome}="{str(valor)}"' for nome, valor in pares)
+    return '{' + conteudo + '}'
+
+def _formatar_valor(valor):
+    if valor == float('inf'):
+        return '+Inf'
+    return repr(float(valor)) if isinstance(valor, float) else str(valor)
+
+class Contador:
+    """Contador monotônico com labels."""
+
+    tipo = 'counter'
+
+    def __init__(self, nome, descricao):
+        self.nome = nome
+        self.descricao = descricao
+        self._valores = {}
+        self._lock = threading.Lock()
+
+    def inc(self, valor=1, **labels):
+        chave = _chave_labels(labels)
+        with self._lock:
+            self._valores[chave] = self._valores.get(chave, 0) + valor
+
+    def valores(self):
+        """Cópia dos totais atuais, por labels: {((label, valor), ...): total}."""
+        with self._lock:
+            return dict(self._valores)
+
+    def exportar(self):
+        with self._lock:
+            itens = list(self._valores.items())
+        return [f'{self.nome}{_formatar_labels(chave)} {_formatar_valor(valor)}' for chave, valor in itens]
+
+class Medidor:
+    """Valor instantâneo com labels (gauge), que pode subir e descer."""
+
+    tipo = 'gauge'
+
+    def __init__(self, nome, descricao):
+        self.nome = nome
+        self.descricao = descricao
+        self._valores = {}
+        self._lock = threading.Lock()
+
+    def set(self, valor, **labels):
+        with self._lock:
+            self._valores[_chave_labels(labels)] = valor
+
+    def exportar(self):
+        with self._lock:
+            itens = list(self._valores.items())
+        return [f'{self.nome}{_formatar_labels(chave)} {_formatar_valor(valor)}' for chave, valor in itens]
+
+class Histograma:
+    """Histograma cumulativo com labels, no modelo do Prometheus."""
+
+    tipo = 'histogram'
+
+    def __init__(self, nome, descricao, buckets=BUCKETS_PADRAO):
+        self.nome = nome
+        self.descricao = descricao
+        self.buckets = tuple(buckets)
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, valor, **labels):
+        chave = _chave_labels(labels)
+        with self._lock:
+            serie = self._series.get(chave)
+            if serie is None:
+                serie = self._series[chave] = {'contagens': [0] * len(self.buckets), 'soma': 0.0, 'total': 0}
+            for indice, limite in enumerate(self.buckets):
+                if valor <= limite:
+                    serie['contagens'][indice] += 1
+                    break
+            serie['soma'] += valor
+            serie['total'] += 1
+
+    def exportar(self):
+        with self._lock:
+            itens = [(chave, list(serie['contagens']), serie['soma'], serie['total'])
+                     for chave, serie in self._series.items()]
+        linhas = []
+        for chave, contagens, soma, total in itens:
+            acumulado = 0
+            for limite, contagem in zip(self.buckets, contagens):
+                acumulado += contagem
+                linhas.append(f'{self.nome}_bucket{_formatar_labels(chave, [("le", _formatar_valor(limite))])} {acumulado}')
+            linhas.append(f'{self.nome}_bucket{_formatar_labels(chave, [("le", "+Inf")])} {total}')
+            linhas.append(f'{self.nome}_sum{_formatar_labels(chave)} {_formatar_valor(soma)}')
+            linhas.append(f'{self.nome}_count{_formatar_labels(chave)} {total}')
+        return linhas
+
+# ====================================================================
+# REGISTRO GLOBAL DE MÉTRICAS
+# ====================================================================
+
+_registro = []
+
+def _registrar(metrica):
+    _registro.append(metrica)
+    return metrica
+
+DURACAO_ETAPA = _registrar(Histograma(
+    'qr_etapa_duracao_segundos', 'Duração de cada etapa do processamento de PDFs'))
+DURACAO_REQUISICAO = _registrar(Histograma(
+    'qr_requisicao_duracao_segundos', 'Duração total das requisições da API'))
+REQUISICOES = _registrar(Contador(
+    'qr_requisicoes_total', 'Requisições atendidas por endpoint e status HTTP'))
+DOCUMENTOS = _registrar(Contador(
+    'qr_documentos_total', 'Documentos processados por endpoint e resultado'))
+DETECCOES = _registrar(Contador(
+    'qr_deteccoes_total', 'Tentativas de detecção de QR por estratégia e resultado'))
+VERIFICACOES = _registrar(Contador(
+    'qr_verificacoes_total', 'Verificações de QRs inseridos por resultado'))
+
+# Retenção dos arquivos de saída (ver src/services/retencao.py)
+RETENCAO_BYTES = _registrar(Medidor(
+    'qr_armazenamento_bytes', 'Bytes ocupados pelos arquivos de saída na última limpeza'))
+RETENCAO_REMOCOES = _registrar(Contador(
+    'qr_armazenamento_remocoes_total', 'Arquivos de saída removidos por motivo (expirado, cota)'))
+
+# Controle de admissão (ver src/services/admissao.py)
+ADMISSAO_ATIVAS = _registrar(Medidor(
+    'qr_admissao_ativas', 'Requisições em execução por endpoint controlado'))
+ADMISSAO_FILA = _registrar(Medidor(
+    'qr_admissao_fila', 'Requisições aguardando admissão por endpoint'))
+ADMISSAO_MEMORIA = _registrar(Medidor(
+    'qr_admissao_memoria_reservada_mb', 'Memória estimada reservada pelas requisições em execução'))
+ADMISSAO_ESPERA = _registrar(Histograma(
+    'qr_admissao_espera_segundos', 'Tempo de espera na fila até a admissão'))
+ADMISSAO_REJEICOES = _registrar(Contador(
+    'qr_admissao_rejeicoes_total', 'Requisições recusadas com 503 por endpoint e motivo'))
+
+# Escalonamento por prioridade do trabalho de CPU (ver src/services/prioridade.py)
+PRIORIDADE_ATIVAS = _registrar(Medidor(
+    'qr_prioridade_ativas', 'Vagas de CPU ocupadas por classe de prioridade'))
+PRIORIDADE_FILA = _registrar(Medidor(
+    'qr_prioridade_fila', 'Trabalhos aguardando vaga de CPU por classe de prioridade'))
+PRIORIDADE_ESPERA = _registrar(Histograma(
+    'qr_prioridade_espera_segundos', 'Tempo de espera por uma vaga de CPU por classe de prioridade'))
+
+def exportar_prometheus():
+    """Retorna todas as métricas no formato texto do Prometheus (0.0.4)."""
+    linhas = []
+    for metrica in _registro:
+        linhas.append(f'# HELP {metrica.nome} {metrica.descricao}')
+        linhas.append(f'# TYPE {metrica.nome} {metrica.tipo}')
+        linhas.extend(metrica.exportar())
+    return '\n'.join(linhas) + '\n'
+
+# ====================================================================
+# TEMPOS POR ETAPA E RESUMO POR REQUISIÇÃO
+# ====================================================================
+
+class ResumoTempos:
+    """Acumula os tempos das etapas de uma única requisição."""
+
+    def __init__(self):
+        self._etapas = {}
+        self._lock = threading.Lock()
+
+    def registrar(self, etapa, duracao):
+        with self._lock:
+            item = self._etapas.get(etapa)
+            if item is None:
+                item = self._etapas[etapa] = {'count': 0, 'total_ms': 0.0, 'max_ms': 0.0}
+            duracao_ms = duracao * 1000
+            item['count'] += 1
+            item['total_ms'] += duracao_ms
+            item['max_ms'] = max(item['max_ms'], duracao_ms)
+
+    def resumo(self):
+        """Retorna {etapa: {'count', 'total_ms', 'mean_ms', 'max_ms'}}."""
+        with self._lock:
+            return {
+                etapa: {
+                    'count': item['count'],
+                    'total_ms': round(item['total_ms'], 2),
+                    'mean_ms': round(item['total_ms'] / item['count'], 2),
+                    'max_ms': round(item['max_ms'], 2)
+                }
+                for etapa, item in self._etapas.items()
+            }
+
+_resumo_atual = ContextVar('resumo_tempos', default=None)
+
+def iniciar_resumo():
+    """Inicia um resumo de tempos para a requisição atual e o retorna."""
+    resumo = ResumoTempos()
+    _resumo_atual.set(resumo)
+    return resumo
+
+def resumo_atual():
+    """Retorna o resumo da requisição atual (ou None fora de requisições)."""
+    return _resumo_atual.get()
+
+def encerrar_resumo():
+    """Desvincula o resumo da requisição atual."""
+    _resumo_atual.set(None)
+
+def registrar_etapa(etapa, duracao):
+    """Registra a duração (segundos) de uma etapa no histograma e no resumo."""
+    DURACAO_ETAPA.observe(duracao, etapa=etapa)
+    resumo = _resumo_atual.get()
+    if resumo is not None:
+        resumo.registrar(etapa, duracao)
+
+@contextmanager
+def medir_etapa(etapa):
+    """
+    Mede o bloco como uma etapa do processamento.
+
+    Exemplo:
+        with medir_etapa('renderizar'):
+            pix = page.get_pixmap(matrix=mat)
+    """
+    inicio = time.perf_counter()
+    try:
+        yield
+    finally:
+        registrar_etapa(etapa, time.perf_counter() - inicio)
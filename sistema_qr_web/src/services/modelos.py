@@ -0,0 +1,308 @@
+# ====================================================================
+# IMPRESSÃO DE LAYOUT E AGRUPAMENTO DE LOTES POR MODELO
+# ====================================================================
+# Um lote real mistura modelos (bacharelado, licenciatura, pós): cada um
+# põe o nome e o QR em um lugar. A impressão de layout de um diploma é
+# calculada sem renderizar nada, só com a estrutura da primeira página:
+#
+# - tamanho da página
+# - origem (canto superior esquerdo) de cada bloco de texto, quantizada
+#   em uma grade de GRADE x GRADE da página; só a origem, porque a
+#   largura e a altura do bloco mudam com o tamanho do nome
+# - posição e tamanho em pixels de cada imagem (xref) desenhada na
+#   página; o número do xref em si muda entre PDFs exportados à parte
+#
+# Diplomas com a mesma chave (a impressão sem a coluna dos blocos de
+# texto, ver chave_impressao) são do mesmo modelo; uma impressão nova entra
+# no modelo mais parecido (Jaccard >= LIMIAR_SIMILARIDADE) ou abre um
+# modelo. Cada modelo guarda em 'dados' o que vale para o grupo todo: a
+# posição do QR, a região do nome e a região onde o QR foi encontrado.
+#
+# A impressão de cada modelo novo fica registrada em MODELOS_DIR. Uma
+# chave recebida de outra requisição (template_positions vindas de
+# /api/batch-templates, modelos de outra parte da prévia) é semeada no
+# catálogo antes do lote: os diplomas parecidos com ela entram nela,
+# qualquer que seja a ordem ou a divisão do lote em partes.
+# ====================================================================
+
+import hashlib
+import json
+import os
+import tempfile
+import threading
+
+GRADE = 40
+LIMIAR_SIMILARIDADE = 0.6
+# Arquivos de exemplo guardados por modelo (para o operador reconhecer o grupo)
+EXEMPLOS = 3
+# Impressões mantidas em MODELOS_DIR; as menos usadas são apagadas a cada registro
+MAXIMO_REGISTRADOS = 500
+
+def impressao_layout(page):
+    """
+    Impressão de layout da página, sem renderizá-la.
+
+    Returns:
+        frozenset: Elementos do layout ('pagina:...', 'texto:...', 'imagem:...')
+    """
+    largura, altura = page.rect.width, page.rect.height
+
+    def quantizar(x, y):
+        return int(x / largura * GRADE), int(y / altura * GRADE)
+
+    elementos = {f"pagina:{round(largura)}x{round(altura)}"}
+    for bloco in page.get_text('blocks'):
+        if bloco[6] != 0:  # só blocos de texto (as imagens vêm abaixo, com o tamanho)
+            continue
+        elementos.add('texto:%d:%d' % quantizar(bloco[0], bloco[1]))
+    for info in page.get_image_info():
+        x0, y0, x1, y1 = info['bbox']
+        elementos.add('imagem:%d:%d:%d:%d:%dx%d' % (quantizar(x0, y0) + quantizar(x1, y1)
+                                                     + (info['width'], info['height'])))
+    return frozenset(elementos)
+
+def similaridade(a, b):
+    """Índice de Jaccard entre duas impressões."""
+    if not a and not b:
+        return 1.0
+    return len(a & b) / len(a | b)
+
+def chave_impressao(impressao):
+    """
+    Chave curta da impressão, sem a coluna dos blocos de texto: um nome
+    centralizado ou alinhado à direita desloca a origem x do bloco conforme
+    o tamanho, mas não a linha. Diplomas do mesmo modelo têm a mesma chave
+    em qualquer lote e em qualquer ordem.
+    """
+    estrutura = {'texto:' + elemento.rsplit(':', 1)[1] if elemento.startswith('texto:') else elemento
+                 for elemento in impressao}
+    return hashlib.sha1('|'.join(sorted(estrutura)).encode('utf-8')).hexdigest()[:12]
+
+def registrar_impressao(pasta, modelo, maximo=MAXIMO_REGISTRADOS):
+    """Grava a impressão do modelo em MODELOS_DIR (atômico), mantendo só as `maximo` mais recentes."""
+    os.makedirs(pasta, exist_ok=True)
+    caminho = os.path.join(pasta, f'{modelo.chave}.json')
+    if os.path.exists(caminho):
+        os.utime(caminho)
+        return
+    # Nome temporário único: dois workers podem registrar o mesmo modelo ao mesmo tempo
+    descritor, temporario = tempfile.mkstemp(dir=pasta, suffix='.tmp')
+    with os.fdopen(descritor, 'w', encoding='utf-8') as arquivo:
+        json.dump({'impressao': sorted(modelo.impressao), 'pagina': modelo.pagina}, arquivo)
+    os.replace(temporario, caminho)
+
+    arquivos = []
+    for nome in os.listdir(pasta):
+        if nome.endswith('.json'):
+            try:
+                arquivos.append((os.path.getmtime(os.path.join(pasta, nome)), nome))
+            except FileNotFoundError:
+                continue  # Removido por outro worker entre o listdir e o stat
+    arquivos.sort(reverse=True)
+    for _, nome in arquivos[max(1, maximo):]:
+        try:
+            os.remove(os.path.join(pasta, nome))
+        except FileNotFoundError:
+            pass
+
+def carregar_impressao(pasta, chave):
+    """
+    Impressão registrada de uma chave de modelo.
+
+    Returns:
+        tuple or None: (frozenset da impressão, [largura, altura]) ou None
+                       se a chave nunca foi registrada (ou já foi apagada)
+    """
+    if not pasta or not chave.isalnum():
+        return None
+    caminho = os.path.join(pasta, f'{chave}.json')
+    try:
+        with open(caminho, encoding='utf-8') as arquivo:
+            registro = json.load(arquivo)
+        os.utime(caminho)  # Chave em uso: fica entre as mais recentes
+    except FileNotFoundError:
+        return None
+    return frozenset(registro['impressao']), registro['pagina']
+
+class Modelo:
+    """Um grupo de diplomas com o mesmo layout e o que foi aprendido sobre ele."""
+
+    def __init__(self, chave, impressao, pagina):
+        self.chave = chave
+        self.impressao = impressao
+        self.pagina = pagina  # [largura, altura] em pontos
+        self.documentos = 0
+        self.exemplos = []
+        # 'posicao': {x, y, size} do QR; 'regiao_nome': (x0, y0, x1, y1);
+        # 'regiao_qr': (página, (x0, y0, x1, y1)), tudo em pontos
+        self.dados = {}
+
+    def to_dict(self):
+        return {
+            'template': self.chave,
+            'documents': self.documentos,
+            'examples': list(self.exemplos),
+            'page_size': self.pagina,
+            'learned': sorted(self.dados),
+        }
+
+class CatalogoModelos:
+    """
+    Modelos de layout vistos em um lote (ou sessão de envio).
+
+    Exemplo:
+        catalogo = CatalogoModelos(current_app.config['MODELOS_DIR'])
+        catalogo.semear(posicoes_modelo)
+        modelo, novo = catalogo.classificar_pdf(pdf_bytes, 'diploma.pdf')
+        posicao = modelo.dados.get('posicao')
+    """
+
+    def __init__(self, pasta=None, limiar=LIMIAR_SIMILARIDADE):
+        self.pasta = pasta  # MODELOS_DIR (None: sem registro das impressões)
+        self.limiar = limiar
+        self._modelos = {}
+        self._apelidos = {}  # chave de uma impressão parecida: chave do modelo
+        self.desconhecidas = []  # chaves pedidas em semear() sem impressão registrada
+        self._lock = threading.Lock()
+
+    def semear(self, chaves):
+        """
+        Cria, sem documentos, os modelos das chaves vindas de outra
+        requisição, a partir das impressões registradas: os diplomas deste
+        lote parecidos com elas entram nelas em vez de abrir outra chave.
+
+        Returns:
+            list: Chaves desconhecidas (nunca registradas ou já apagadas)
+        """
+        desconhecidas = []
+        for chave in chaves or ():
+            with self._lock:
+                if chave in self._modelos:
+                    continue
+            registro = carregar_impressao(self.pasta, str(chave))
+            if registro is None:
+                desconhecidas.append(chave)
+                self.desconhecidas.append(chave)
+                continue
+            with self._lock:
+                self._modelos.setdefault(chave, Modelo(chave, registro[0], registro[1]))
+        return desconhecidas
+
+    def exportar(self):
+        """
+        Estado do catálogo para guardar em disco: impressão, página e dados
+        aprendidos de cada modelo e os apelidos (sem contagens nem exemplos).
+        """
+        with self._lock:
+            return {
+                'modelos': {chave: {'impressao': sorted(modelo.impressao), 'pagina': modelo.pagina,
+                                    'dados': dict(modelo.dados)}
+                            for chave, modelo in self._modelos.items()},
+                'apelidos': dict(self._apelidos),
+            }
+
+    def incorporar(self, estado):
+        """
+        Junta o estado exportado por outro catálogo (ex: o de outro worker na
+        mesma sessão de envio): modelos e apelidos novos entram, e um dado
+        aprendido só entra se este catálogo ainda não o tem.
+        """
+        with self._lock:
+            for chave, salvo in estado.get('modelos', {}).items():
+                modelo = self._modelos.get(chave)
+                if modelo is None:
+                    modelo = self._modelos[chave] = Modelo(chave, frozenset(salvo['impressao']), salvo['pagina'])
+                for nome, valor in salvo['dados'].items():
+                    modelo.dados.setdefault(nome, valor)
+            for chave, destino in estado.get('apelidos', {}).items():
+                self._apelidos.setdefault(chave, destino)
+
+    def sem_documentos(self, chaves):
+        """Chaves (ex: de template_positions) que não ficaram com nenhum diploma deste lote."""
+        return [chave for chave in chaves or ()
+                if chave not in self._modelos or self._modelos[chave].documentos == 0]
+
+    def classificar(self, page, nome=None):
+        """
+        Modelo da página (criado se o layout é novo).
+
+        Returns:
+            tuple: (Modelo, True se o modelo acabou de ser criado)
+        """
+        impressao = impressao_layout(page)
+        chave = chave_impressao(impressao)
+        with self._lock:
+            modelo = self._modelos.get(self._apelidos.get(chave, chave))
+            novo = False
+            if modelo is None:
+                parecido = max(self._modelos.values(), key=lambda m: similaridade(impressao, m.impressao),
+                               default=None)
+                if parecido is not None and similaridade(impressao, parecido.impressao) >= self.limiar:
+                    modelo = parecido
+                    self._apelidos[chave] = parecido.chave
+                else:
+                    modelo = Modelo(chave, impressao, [round(page.rect.width, 1), round(page.rect.height, 1)])
+                    self._modelos[chave] = modelo
+                    novo = True
+            modelo.documentos += 1
+            if nome and len(modelo.exemplos) < EXEMPLOS:
+                modelo.exemplos.append(nome)
+        if novo and self.pasta:
+            registrar_impressao(self.pasta, modelo)
+        return modelo, novo
+
+    def classificar_pdf(self, pdf_bytes, nome=None):
+        """
+        Modelo da primeira página do PDF.
+
+        Returns:
+            tuple: (Modelo ou None se o PDF não tem páginas ou não abre,
+                    True se o modelo é novo); o erro de um PDF inválido
+                    aparece depois, na etapa que o processa
+        """
+        import fitz
+        from src.services.metrics import medir_etapa
+        with medir_etapa('impressao_layout'):
+            try:
+                doc = fitz.open(stream=pdf_bytes, filetype="pdf")
+            except Exception:
+                return None, False
+            try:
+                if len(doc) == 0:
+                    return None, False
+                return self.classificar(doc[0], nome)
+            finally:
+                doc.close()
+
+    def modelos(self):
+        """Modelos com ao menos um diploma (os semeados sem diplomas ficam de fora)."""
+        return [modelo for modelo in self._modelos.values() if modelo.documentos]
+
+    def resumo(self):
+        return [modelo.to_dict() for modelo in sorted(self.modelos(), key=lambda m: -m.documentos)]
+
+def regiao_do_nome(pdf_bytes, nome):
+    """
+    Faixa da primeira página com o bloco de texto que contém o nome: a
+    largura toda da página (nomes longos crescem para a direita) e uma
+    linha a mais (nomes que quebram a linha).
+
+    Returns:
+        tuple or None: (x0, y0, x1, y1) em pontos
+    """
+    import fitz
+    from src.services.nomes import normalizar_para_matching
+    _, procurado = normalizar_para_matching(nome)
+    if not procurado:
+        return None
+    doc = fitz.open(stream=pdf_bytes, filetype="pdf")
+    try:
+        if len(doc) == 0:
+            return None
+        page = doc[0]
+        for x0, y0, x1, y1, texto, _, tipo in page.get_text('blocks'):
+            if tipo == 0 and procurado in normalizar_para_matching(texto)[1]:
+                return (0, max(0, y0 - 2), page.rect.width, min(page.rect.height, y1 + (y1 - y0) + 2))
+        return None
+    finally:
+        doc.close()
@@ -0,0 +1,114 @@
+# ====================================================================
+# NORMALIZAÇÃO E MATCHING DE NOMES DE ALUNOS
+# ====================================================================
+# Funções puras (apenas biblioteca padrão) usadas pelas rotas, pelo
+# cadastro de alunos e por ferramentas de linha de comando como
+# teste_nomes.py. Este módulo não deve importar PyMuPDF, OpenCV, NumPy
+# ou Pillow: quem só precisa comparar nomes não paga essas importações.
+# ====================================================================
+
+import re
+import unicodedata
+
+def limpar_nome_arquivo(nome):
+    """
+    Limpa e padroniza nomes de arquivos removendo acentos e caracteres especiais.
+    
+    Funcionalidades:
+    - Remove quebras de linha e espaços extras
+    - Normaliza acentos (á → a, ç → c, etc.)
+    - Remove caracteres especiais mantendo letras, números e espaços
+    - Remove extensão .pdf se presente
+    
+    Args:
+        nome (str): Nome original do arquivo ou texto
+        
+    Returns:
+        str: Nome limpo e padronizado
+        
+    Exemplo:
+        "José da Silva.pdf" → "Jose da Silva"
+        "María_López" → "Maria Lopez"
+    """
+    if not nome:
+        return ""
+    
+    # Remove quebras de linha e espaços extras
+    nome = re.sub(r'\s+', ' ', nome.strip())
+    
+    # Normaliza acentos (NFD = separa caracteres e acentos)
+    nome_normalizado = unicodedata.normalize('NFD', nome)
+    
+    # Remove apenas os acentos, mantendo letras
+    nome_sem_acento = ''.join(char for char in nome_normalizado if unicodedata.category(char) != 'Mn')
+    
+    # Remove caracteres especiais, mas mantém letras, números e espaços
+    nome_limpo = re.sub(r'[^\w\s]', '', nome_sem_acento)
+    
+    # Substitui múltiplos espaços por um único espaço
+    nome_limpo = re.sub(r'\s+', ' ', nome_limpo)
+    
+    # Remove .pdf se existir
+    if nome_limpo.lower().endswith('.pdf'):
+        nome_limpo = nome_limpo[:-4]
+    
+    return nome_limpo.strip()
+
+def normalizar_para_matching(nome):
+    """
+    Prepara nomes para matching inteligente com múltiplas variações.
+    
+    Funcionalidades:
+    - Aplica limpeza básica de caracteres
+    - Substitui underscores por espaços
+    - Converte para minúsculas
+    - Cria versão sem espaços para matching flexível
+    
+    Args:
+        nome (str): Nome a ser normalizado
+        
+    Returns:
+        tuple: (nome_com_espacos, nome_sem_espacos) para matching
+        
+    Exemplo:
+        "João_Silva" → ("joao silva", "joaosilva")
+        "Ana Costa" → ("ana costa", "anacosta")
+    """
+    if not nome:
+        return ""
+    
+    # Aplica limpeza básica
+    nome_limpo = limpar_nome_arquivo(nome)
+    
+    # Remove underscores e substitui por espaços
+    nome_limpo = nome_limpo.replace('_', ' ')
+    
+    # Converte para minúsculas para matching case-insensitive
+    nome_limpo = nome_limpo.lower()
+    
+    # Remove espaços para matching mais flexível
+    nome_sem_espacos = nome_limpo.replace(' ', '')
+    
+    return nome_limpo, nome_sem_espacos
+
+# ====================================================================
+# MATCHING POR NOME
+# ====================================================================
+
+def mapear_por_nome(mapa, nome, valor):
+    """Registra o valor no mapa pelas duas versões normalizadas do nome."""
+    nome_normalizado, nome_sem_espacos = normalizar_para_matching(nome)
+    mapa[nome_normalizado] = valor
+    mapa[nome_sem_espacos] = valor
+
+def buscar_por_nome(mapa, nome):
+    """
+    Busca no mapa (montado com mapear_por_nome) o valor do nome.
+
+    Exemplo:
+        "Maria_Silva" encontra o valor registrado para "Maria Silva.png"
+    """
+    if not nome:
+        return None
+    nome_normalizado, nome_sem_espacos = normalizar_para_matching(nome)
+    return mapa.get(nome_normalizado) or mapa.get(nome_sem_espacos)
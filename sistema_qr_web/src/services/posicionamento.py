@@ -0,0 +1,176 @@
+# ====================================================================
+# POSICIONAMENTO AUTOMÁTICO DO QR (BUSCA DE ESPAÇO LIVRE)
+# ====================================================================
+# A posição unificada é escolhida no canvas em um diploma de amostra;
+# com modelos diferentes no mesmo lote, ela cai sobre o texto de alguns.
+# Com {"auto": true, "size": 90} a posição é calculada por diploma:
+#
+# 1. A primeira página é renderizada em baixa resolução (DPI_BUSCA) em
+#    tons de cinza; pixels abaixo de LIMIAR_TINTA são tinta
+# 2. A imagem integral da tinta dá a soma de qualquer quadrado em O(1);
+#    para um lado L, todos os quadrados da página são somados de uma vez
+# 3. Em cada região preferida, na ordem pedida, procura-se (busca
+#    binária no lado) o maior quadrado vazio que comporta o QR com a
+#    margem; o QR fica centralizado nele, e entre quadrados do mesmo
+#    lado vence o mais próximo do canto (ou do centro do rodapé)
+#
+# Uma página A4 a 24 DPI tem ~200x280 pixels: a busca leva alguns
+# milissegundos, menos que abrir o PDF.
+# ====================================================================
+
+import numpy as np
+
+DPI_BUSCA = 24
+# Cinza abaixo do limiar é tinta (a 24 DPI um fio de 1pt já sai acinzentado)
+LIMIAR_TINTA = 230
+# Espaço livre exigido em volta do QR, em pontos
+MARGEM_PADRAO = 12
+# Maior quadrado procurado, em múltiplos do QR (acima disso o QR se afastaria do canto)
+FOLGA_MAXIMA = 2.0
+
+# Regiões em frações da página (x0, y0, x1, y1) e o ponto de referência da região
+REGIOES = {
+    'inferior_direito': ((0.5, 0.6, 1.0, 1.0), (1.0, 1.0)),
+    'inferior_esquerdo': ((0.0, 0.6, 0.5, 1.0), (0.0, 1.0)),
+    'rodape': ((0.0, 0.75, 1.0, 1.0), (0.5, 1.0)),
+    'superior_direito': ((0.5, 0.0, 1.0, 0.4), (1.0, 0.0)),
+    'superior_esquerdo': ((0.0, 0.0, 0.5, 0.4), (0.0, 0.0)),
+    'pagina': ((0.0, 0.0, 1.0, 1.0), (1.0, 1.0)),
+}
+REGIOES_PADRAO = ('inferior_direito', 'inferior_esquerdo', 'rodape', 'superior_direito', 'superior_esquerdo')
+
+def validar_posicao(qr_position):
+    """
+    Confere a posição recebida: manual {x, y, size} ou automática
+    {auto: true, size, regions?} (x e y, se vierem, são o plano B).
+
+    Returns:
+        str or None: Mensagem de erro ou None se a posição é válida
+    """
+    if not isinstance(qr_position, dict) or 'size' not in qr_position:
+        return 'A posição do QR precisa de size (em pontos do PDF)'
+    if not qr_position.get('auto'):
+        if not all(chave in qr_position for chave in ('x', 'y')):
+            return 'A posição do QR precisa de x, y e size (ou auto: true)'
+        return None
+    desconhecidas = [regiao for regiao in qr_position.get('regions') or () if regiao not in REGIOES]
+    if desconhecidas:
+        return f"Regiões desconhecidas: {', '.join(desconhecidas)} (use {', '.join(REGIOES)})"
+    return None
+
+def conteudo_no_retangulo(page, rect):
+    """
+    O que já ocupa o retângulo, sem renderizar: palavras inteiras que o
+    tocam e imagens que o cruzam.
+
+    Returns:
+        tuple: (lista de palavras, quantidade de imagens)
+    """
+    import fitz
+    palavras = [palavra[4] for palavra in page.get_text('words') if fitz.Rect(palavra[:4]).intersects(rect)]
+    imagens = sum(1 for info in page.get_image_info() if fitz.Rect(info['bbox']).intersects(rect))
+    return palavras, imagens
+
+def mapa_de_tinta(page, dpi=DPI_BUSCA):
+    """Página em baixa resolução como matriz booleana (True = tinta)."""
+    import fitz
+    zoom = dpi / 72.0
+    pix = page.get_pixmap(matrix=fitz.Matrix(zoom, zoom), colorspace=fitz.csGRAY, alpha=False)
+    cinza = np.frombuffer(pix.samples, dtype=np.uint8).reshape(pix.height, pix.stride)[:, :pix.width]
+    return cinza < LIMIAR_TINTA
+
+def imagem_integral(tinta):
+    """Soma acumulada com uma linha e uma coluna de zeros: soma de [y0:y1, x0:x1] em quatro leituras."""
+    integral = np.zeros((tinta.shape[0] + 1, tinta.shape[1] + 1), dtype=np.int32)
+    integral[1:, 1:] = tinta.cumsum(axis=0, dtype=np.int32).cumsum(axis=1, dtype=np.int32)
+    return integral
+
+def quadrados_vazios(integral, lado, limites):
+    """
+    Quadrados de lado 'lado' sem tinta, inteiramente dentro de 'limites'.
+
+    Args:
+        integral (numpy.ndarray): De imagem_integral()
+        lado (int): Lado do quadrado em pixels
+        limites (tuple): (x0, y0, x1, y1) da região em pixels
+
+    Returns:
+        numpy.ndarray: Matriz booleana dos cantos superiores esquerdos
+                       (índice [0, 0] = canto (x0, y0)); vazia se não cabe
+    """
+    x0, y0, x1, y1 = limites
+    if x1 - x0 < lado or y1 - y0 < lado:
+        return np.zeros((0, 0), dtype=bool)
+    # Soma de cada quadrado: I[y+L, x+L] - I[y, x+L] - I[y+L, x] + I[y, x]
+    baixo = integral[y0 + lado:y1 + 1]
+    cima = integral[y0:y1 + 1 - lado]
+    soma = (baixo[:, x0 + lado:x1 + 1] - cima[:, x0 + lado:x1 + 1]
+            - baixo[:, x0:x1 + 1 - lado] + cima[:, x0:x1 + 1 - lado])
+    return soma == 0
+
+def maior_quadrado_vazio(integral, limites, minimo, maximo, ancora):
+    """
+    Maior quadrado vazio da região com lado entre 'minimo' e 'maximo'
+    (busca binária: se um lado cabe, todos os menores também cabem).
+
+    Returns:
+        tuple or None: (x, y, lado) em pixels, o mais próximo da âncora, ou None
+    """
+    vazios = quadrados_vazios(integral, minimo, limites)
+    if not vazios.any():
+        return None
+    melhor_lado, melhor_vazios = minimo, vazios
+    baixo, alto = minimo + 1, maximo
+    while baixo <= alto:
+        lado = (baixo + alto) // 2
+        vazios = quadrados_vazios(integral, lado, limites)
+        if vazios.any():
+            melhor_lado, melhor_vazios = lado, vazios
+            baixo = lado + 1
+        else:
+            alto = lado - 1
+
+    ys, xs = np.nonzero(melhor_vazios)
+    centro_x = limites[0] + xs + melhor_lado / 2.0
+    centro_y = limites[1] + ys + melhor_lado / 2.0
+    escolhido = int(np.argmin((centro_x - ancora[0]) ** 2 + (centro_y - ancora[1]) ** 2))
+    return limites[0] + int(xs[escolhido]), limites[1] + int(ys[escolhido]), melhor_lado
+
+def posicao_automatica(page, size, regioes=None, margem=MARGEM_PADRAO, dpi=DPI_BUSCA):
+    """
+    Posição livre para um QR de 'size' pontos na página.
+
+    Args:
+        page (fitz.Page): Página do diploma (normalmente a primeira)
+        size (float): Lado do QR em pontos
+        regioes (list or None): Nomes de REGIOES em ordem de preferência
+            (padrão REGIOES_PADRAO)
+        margem (float): Espaço livre exigido em volta do QR, em pontos
+        dpi (int): Resolução da busca
+
+    Returns:
+        dict or None: {'x', 'y', 'size', 'regiao', 'folga'} em pontos
+                      ('folga': lado do quadrado vazio encontrado) ou None
+                      se nenhuma região tem espaço
+    """
+    zoom = dpi / 72.0
+    tinta = mapa_de_tinta(page, dpi)
+    altura, largura = tinta.shape
+    integral = imagem_integral(tinta)
+
+    # Lado mínimo arredondado para cima: o QR com a margem nunca encosta em tinta
+    minimo = int(np.ceil((size + 2 * margem) * zoom))
+    maximo = int((FOLGA_MAXIMA * size + 2 * margem) * zoom)
+    for nome in regioes or REGIOES_PADRAO:
+        (fx0, fy0, fx1, fy1), (ax, ay) = REGIOES[nome]
+        limites = (int(fx0 * largura), int(fy0 * altura), int(round(fx1 * largura)), int(round(fy1 * altura)))
+        encontrado = maior_quadrado_vazio(integral, limites, minimo, maximo, (ax * largura, ay * altura))
+        if encontrado is None:
+            continue
+        x, y, lado = encontrado
+        # QR centralizado no quadrado vazio, convertido para pontos
+        centro_x = (x + lado / 2.0) / zoom
+        centro_y = (y + lado / 2.0) / zoom
+        return {'x': round(centro_x - size / 2.0, 2), 'y': round(centro_y - size / 2.0, 2), 'size': size,
+                'regiao': nome, 'folga': round(lado / zoom, 1)}
+    return None
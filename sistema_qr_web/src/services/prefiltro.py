@@ -0,0 +1,191 @@
+# ====================================================================
+# PRÉ-FILTRO DE PADRÕES LOCALIZADORES (FINDER PATTERNS)
+# ====================================================================
+# A página é renderizada em Matrix(3.0, 3.0) e quase toda ela é texto e
+# ornamento. Em vez de entregar a página inteira ao detector OpenCV (e,
+# se ele falhar, ainda fazer o threshold adaptativo da página inteira),
+# uma versão reduzida da página é varrida com NumPy atrás da assinatura
+# dos três quadrados dos cantos de um QR code:
+#
+#   escuro : claro : escuro : claro : escuro  =  1 : 1 : 3 : 1 : 1
+#
+# 1. A página reduzida é binarizada e convertida em sequências (runs) de
+#    pixels iguais, de uma vez para todas as linhas (e colunas)
+# 2. Cinco runs consecutivos na proporção 1:1:3:1:1 são um candidato;
+#    um localizador é confirmado quando linha e coluna concordam
+# 3. Localizadores próximos (no mínimo dois) formam uma janela candidata
+#
+# O detector roda só nessas janelas (alguns % da página). Sem candidato,
+# ou se as janelas não tiverem QR, o chamador volta à página inteira.
+# ====================================================================
+
+import numpy as np
+
+# Redução da página antes da varredura: a 3x, um QR de 90pt tem ~270px e
+# cada módulo ~8px; reduzido pela metade, o localizador ainda tem ~28px
+REDUCAO = 2
+# Tolerância de cada run em relação ao esperado, em módulos
+TOLERANCIA_MODULO = 0.5
+# Menor localizador aceito na página reduzida (7 módulos de 1px)
+MENOR_LOCALIZADOR = 7
+# Localizadores do mesmo QR: razão máxima entre os tamanhos e distância
+# máxima entre os centros, em tamanhos de localizador
+PROPORCAO_LADOS = 1.25
+DISTANCIA_LOCALIZADORES = 7.5
+
+def _runs(binaria):
+    """
+    Sequências de pixels iguais de todas as linhas da imagem binária.
+
+    Returns:
+        tuple: (linha, início, comprimento, escuro) de cada run, em arrays,
+               na ordem das linhas e, dentro da linha, da esquerda para a direita
+    """
+    altura, largura = binaria.shape
+    bordas = np.ones((altura, largura + 1), dtype=bool)
+    bordas[:, 1:largura] = binaria[:, 1:] != binaria[:, :-1]
+    linhas, colunas = np.nonzero(bordas)
+    # Pares de bordas consecutivas da mesma linha delimitam um run
+    mesma_linha = linhas[1:] == linhas[:-1]
+    linha = linhas[:-1][mesma_linha]
+    inicio = colunas[:-1][mesma_linha]
+    comprimento = (colunas[1:] - colunas[:-1])[mesma_linha]
+    return linha, inicio, comprimento, binaria[linha, inicio]
+
+def _localizadores_em_linhas(binaria):
+    """
+    Cortes 1:1:3:1:1 nas linhas da imagem.
+
+    Returns:
+        tuple: (linha, coluna do centro, largura total) de cada corte
+    """
+    linha, inicio, comprimento, escuro = _runs(binaria)
+    if len(linha) < 5:
+        vazio = np.empty(0, dtype=np.int64)
+        return vazio, vazio, vazio
+
+    # Janelas de cinco runs consecutivos: runs[i..i+4]
+    n = len(linha) - 4
+    partes = np.stack([comprimento[k:k + n] for k in range(5)]).astype(np.float32)
+    total = partes.sum(axis=0)
+    modulo = total / 7.0
+    esperado = np.array([1, 1, 3, 1, 1], dtype=np.float32)[:, None] * modulo
+    proporcional = np.all(np.abs(partes - esperado) <= TOLERANCIA_MODULO * modulo + 0.5, axis=0)
+    validos = (proporcional & escuro[:n] & (linha[:n] == linha[4:]) & (total >= MENOR_LOCALIZADOR))
+
+    indices = np.flatnonzero(validos)
+    centro = inicio[indices + 2] + comprimento[indices + 2] // 2
+    return linha[indices], centro, total[indices].astype(np.int64)
+
+def localizar_padroes(gray):
+    """
+    Localiza padrões localizadores na imagem em escala de cinza (já reduzida).
+
+    Returns:
+        list: [(x, y, lado)] de cada localizador confirmado na horizontal e na vertical
+    """
+    # Binarização global: diplomas são tinta escura em papel claro
+    limiar = (int(gray.min()) + int(gray.max())) // 2
+    binaria = gray < limiar
+
+    y_h, x_h, lado_h = _localizadores_em_linhas(binaria)
+    x_v, y_v, lado_v = _localizadores_em_linhas(np.ascontiguousarray(binaria.T))
+    if len(y_h) == 0 or len(x_v) == 0:
+        return []
+
+    # Confirmação cruzada em uma grade grossa: uma célula com cortes
+    # horizontais e verticais contém o centro de um localizador
+    celula = max(4, int(np.median(lado_h)) // 2)
+    colunas_grade = binaria.shape[1] // celula + 1
+    tamanho_grade = (binaria.shape[0] // celula + 1) * colunas_grade
+    celulas_h = (y_h // celula) * colunas_grade + x_h // celula
+    celulas_v = (y_v // celula) * colunas_grade + x_v // celula
+    confirmadas = np.flatnonzero((np.bincount(celulas_h, minlength=tamanho_grade) > 0)
+                                 & (np.bincount(celulas_v, minlength=tamanho_grade) > 0))
+    if len(confirmadas) == 0:
+        return []
+
+    # Centro e tamanho de cada célula confirmada pela média dos cortes horizontais
+    pertence = np.isin(celulas_h, confirmadas)
+    _, grupo = np.unique(celulas_h[pertence], return_inverse=True)
+    contagem = np.bincount(grupo)
+    xs = np.bincount(grupo, weights=x_h[pertence]) / contagem
+    ys = np.bincount(grupo, weights=y_h[pertence]) / contagem
+    lados = np.bincount(grupo, weights=lado_h[pertence]) / contagem
+
+    # Células vizinhas do mesmo localizador viram um só (poucas dezenas de células)
+    localizadores = []
+    for x, y, lado in sorted(zip(xs, ys, lados), key=lambda item: -item[2]):
+        if all(abs(x - lx) > ll / 2 or abs(y - ly) > ll / 2 for lx, ly, ll in localizadores):
+            localizadores.append((x, y, lado))
+    return localizadores
+
+def agrupar_localizadores(localizadores, largura, altura):
+    """
+    Agrupa localizadores próximos em janelas candidatas a QR code.
+
+    Dois localizadores são compatíveis quando têm quase o mesmo tamanho e
+    estão a poucos tamanhos de localizador um do outro (os três cantos de
+    um mesmo QR); os grupos são as componentes conexas dessa relação.
+    Grupos com um só localizador são descartados (letras e ornamentos
+    também produzem cortes 1:1:3:1:1 isolados).
+
+    Returns:
+        list: [(x, y, w, h, localizadores no grupo)], do grupo mais completo ao menos
+    """
+    if len(localizadores) < 2:
+        return []
+    xs, ys, lados = (np.array(valores, dtype=np.float64) for valores in zip(*localizadores))
+
+    # Compatibilidade par a par. Um QR de até ~57 módulos: centros a até 50 módulos (~7 localizadores)
+    menor = np.minimum(lados[:, None], lados[None, :])
+    compativeis = ((np.maximum(lados[:, None], lados[None, :]) <= PROPORCAO_LADOS * menor)
+                   & (np.abs(xs[:, None] - xs[None, :]) <= DISTANCIA_LOCALIZADORES * menor)
+                   & (np.abs(ys[:, None] - ys[None, :]) <= DISTANCIA_LOCALIZADORES * menor))
+
+    # Componentes conexas: cada localizador fica com o menor rótulo alcançável
+    rotulos = np.arange(len(xs))
+    while True:
+        novos = np.where(compativeis, rotulos[None, :], len(xs)).min(axis=1)
+        if np.array_equal(novos, rotulos):
+            break
+        rotulos = novos
+
+    janelas = []
+    for rotulo in np.unique(rotulos):
+        membros = rotulos == rotulo
+        quantidade = int(membros.sum())
+        if quantidade < 2:
+            continue
+        gx, gy, lado = xs[membros], ys[membros], lados[membros].max()
+        if quantidade >= 3:
+            # Os três cantos: basta o meio localizador e a zona de silêncio em volta
+            margem = lado
+        else:
+            # Falta um canto, que pode estar em qualquer lado do par encontrado
+            margem = max(gx.max() - gx.min(), gy.max() - gy.min()) + lado
+        x0 = max(0, int(gx.min() - margem))
+        y0 = max(0, int(gy.min() - margem))
+        x1 = min(largura, int(gx.max() + margem))
+        y1 = min(altura, int(gy.max() + margem))
+        janelas.append((x0, y0, x1 - x0, y1 - y0, quantidade))
+    janelas.sort(key=lambda janela: -janela[4])
+    return janelas
+
+def janelas_candidatas(gray, max_janelas=3):
+    """
+    Propõe janelas da página com prováveis QR codes.
+
+    Args:
+        gray (numpy.ndarray): Página em escala de cinza, na resolução da detecção
+        max_janelas (int): Máximo de janelas retornadas
+
+    Returns:
+        list: [(x, y, w, h)] em coordenadas de 'gray'; vazia se nenhum candidato
+    """
+    reduzida = gray[::REDUCAO, ::REDUCAO]
+    if reduzida.size == 0:
+        return []
+    localizadores = localizar_padroes(reduzida)
+    janelas = agrupar_localizadores(localizadores, reduzida.shape[1], reduzida.shape[0])
+    return [(x * REDUCAO, y * REDUCAO, w * REDUCAO, h * REDUCAO) for x, y, w, h, _ in janelas[:max_janelas]]
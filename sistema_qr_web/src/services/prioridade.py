@@ -0,0 +1,181 @@
+# ====================================================================
+# ESCALONAMENTO POR PRIORIDADE DO TRABALHO DE CPU
+# ====================================================================
+# O controle de admissão (src/services/admissao.py) decide quantas
+# requisições pesadas entram; depois de admitidas, um lote de vários
+# minutos e a prévia de um diploma disputavam a CPU de igual para igual,
+# e a prévia esperava atrás dos documentos do lote no fim do semestre.
+#
+# O trabalho de CPU é dividido em classes, em ordem de prioridade:
+#
+# - 'interativa': /api/upload-pdf (prévia) e /api/insert-qr, uma vez por
+#   requisição
+# - 'lote': cada documento de /api/batch-process, das sessões de envio,
+#   da pasta monitorada e da detecção de /api/extract-qr; o lote devolve
+#   a vaga entre um documento e outro
+#
+# Há VAGAS de CPU no processo e um limite por classe (por padrão o lote
+# deixa uma vaga livre quando há mais de uma). Quando uma vaga abre, a
+# classe mais prioritária com alguém esperando entra primeiro; dentro da
+# classe, a ordem é de chegada. Um documento de lote que espera mais que
+# 'promocao' segundos deixa de ceder a vez, então uma rajada de prévias
+# não para o lote.
+#
+# As vagas valem por processo. Com o gunicorn, as VAGAS configuradas (por
+# padrão, uma por CPU) são divididas entre os workers (QR_WORKERS), no
+# mínimo uma por worker: cada worker escalona a sua parte da CPU. A
+# prévia passa à frente dos documentos de lote do worker que a atendeu,
+# não dos que rodam em outros workers; entre workers, quem divide a CPU
+# é o sistema operacional.
+# ====================================================================
+
+from collections import deque
+from contextlib import contextmanager
+import threading
+import time
+
+from src.services.metrics import PRIORIDADE_ATIVAS, PRIORIDADE_FILA, PRIORIDADE_ESPERA, registrar_etapa
+
+# Classes em ordem de prioridade (a primeira passa à frente)
+CLASSES = ('interativa', 'lote')
+PROMOCAO_PADRAO = 2.0
+
+class Escalonador:
+    """Vagas de CPU do processo, com limite e fila (FIFO) por classe de prioridade."""
+
+    def __init__(self, vagas, limites=None, promocao=PROMOCAO_PADRAO, processos=1):
+        self.vagas = max(1, vagas)
+        # Workers que dividem a CPU, cada um com o seu escalonador (só informativo)
+        self.processos = processos
+        limites = limites or {}
+        self.limites = {classe: max(1, min(self.vagas, limites.get(classe, self.vagas))) for classe in CLASSES}
+        self.promocao = promocao
+        self.ativas = {classe: 0 for classe in CLASSES}
+        self._filas = {classe: deque() for classe in CLASSES}
+        self._condicao = threading.Condition()
+        # Vaga já ocupada pela thread: uma chamada aninhada não espera por outra
+        self._local = threading.local()
+        self._espera_total = {classe: 0.0 for classe in CLASSES}
+        self._atendidas = {classe: 0 for classe in CLASSES}
+
+    def _pode_entrar(self, classe, ficha, inicio):
+        if sum(self.ativas.values()) >= self.vagas or self.ativas[classe] >= self.limites[classe]:
+            return False
+        if self._filas[classe][0] is not ficha:
+            return False
+        if time.perf_counter() - inicio >= self.promocao:
+            return True
+        # Classes mais prioritárias com alguém esperando (e vaga na própria classe) vão antes
+        for outra in CLASSES[:CLASSES.index(classe)]:
+            if self._filas[outra] and self.ativas[outra] < self.limites[outra]:
+                return False
+        return True
+
+    def _publicar(self, classe):
+        PRIORIDADE_ATIVAS.set(self.ativas[classe], classe=classe)
+        PRIORIDADE_FILA.set(len(self._filas[classe]), classe=classe)
+
+    def entrar(self, classe):
+        """
+        Aguarda uma vaga de CPU para a classe.
+
+        Returns:
+            float: Segundos de espera na fila
+        """
+        inicio = time.perf_counter()
+        # Ficha única por espera: deque.remove compara por igualdade, e duas
+        # fichas com o mesmo valor poderiam tirar da fila a espera errada
+        ficha = object()
+        with self._condicao:
+            self._filas[classe].append(ficha)
+            self._publicar(classe)
+            try:
+                while not self._pode_entrar(classe, ficha, inicio):
+                    # Acorda a tempo de ser promovido, mesmo sem ninguém liberar vaga
+                    restante = inicio + self.promocao - time.perf_counter()
+                    self._condicao.wait(restante if restante > 0 else None)
+            finally:
+                self._filas[classe].remove(ficha)
+                self._condicao.notify_all()
+            espera = time.perf_counter() - inicio
+            self.ativas[classe] += 1
+            self._atendidas[classe] += 1
+            self._espera_total[classe] += espera
+            self._publicar(classe)
+        PRIORIDADE_ESPERA.observe(espera, classe=classe)
+        return espera
+
+    def sair(self, classe):
+        """Devolve a vaga ocupada por entrar()."""
+        with self._condicao:
+            self.ativas[classe] -= 1
+            self._condicao.notify_all()
+            self._publicar(classe)
+
+    @contextmanager
+    def vez(self, classe):
+        """
+        Ocupa uma vaga da classe durante o bloco. A espera entra no resumo
+        de tempos da requisição como a etapa 'espera_cpu'.
+
+        Exemplo:
+            with escalonador.vez('lote'):
+                pdf_saida, localizacao = inserir_qr_na_posicao(...)
+        """
+        if getattr(self._local, 'classe', None) is not None:
+            yield
+            return
+        registrar_etapa('espera_cpu', self.entrar(classe))
+        self._local.classe = classe
+        try:
+            yield
+        finally:
+            self._local.classe = None
+            self.sair(classe)
+
+    def estado(self):
+        """Retorna um retrato das vagas e filas para /api/admission."""
+        with self._condicao:
+            return {
+                'vagas': self.vagas,
+                'processos': self.processos,
+                'promocao_s': self.promocao,
+                'classes': {
+                    classe: {
+                        'ativas': self.ativas[classe],
+                        'fila': len(self._filas[classe]),
+                        'limite': self.limites[classe],
+                        'atendidas': self._atendidas[classe],
+                        'espera_media_ms': (round(self._espera_total[classe] / self._atendidas[classe] * 1000, 1)
+                                            if self._atendidas[classe] else 0.0),
+                    }
+                    for classe in CLASSES
+                },
+            }
+
+# ====================================================================
+# ESCALONADOR DO PROCESSO
+# ====================================================================
+
+_escalonador = None
+_lock_escalonador = threading.Lock()
+
+def obter_escalonador(config):
+    """
+    Retorna o escalonador do processo, criado na primeira chamada a partir
+    de config['PRIORIDADE'] ({'vagas', 'limites', 'promocao'}).
+    """
+    global _escalonador
+    with _lock_escalonador:
+        if _escalonador is None:
+            parametros = config.get('PRIORIDADE') or {}
+            _escalonador = Escalonador(parametros.get('vagas', 1), parametros.get('limites'),
+                                       parametros.get('promocao', PROMOCAO_PADRAO),
+                                       config.get('PROCESSOS', 1))
+        return _escalonador
+
+def estado_escalonador():
+    """Retrato do escalonador deste processo (None se ainda não foi usado)."""
+    with _lock_escalonador:
+        escalonador = _escalonador
+    return escalonador.estado() if escalonador is not None else None
@@ -0,0 +1,221 @@
+# ====================================================================
+# PERFILADOR DE REQUISIÇÕES (OPCIONAL, RESTRITO A ADMINISTRADORES)
+# ====================================================================
+# Permite diagnosticar em produção uma requisição lenta com o PDF real
+# do cliente: a requisição é executada sob o cProfile (determinístico)
+# e o tracemalloc, e o relatório com as funções mais custosas, o pico
+# de memória e os principais pontos de alocação é devolvido junto da
+# resposta e/ou gravado em PROFILE_DIR.
+#
+# Ativação (ambas exigem ADMIN_TOKEN configurado):
+# - Cabeçalhos 'X-Profile: 1' e 'X-Admin-Token: <token>' em uma
+#   requisição: o relatório volta no campo 'profile' da resposta JSON
+# - Config PROFILE_REQUESTS = True: todas as requisições da API são
+#   perfiladas e os relatórios ficam em disco (consulta em /api/profiles)
+# ====================================================================
+
+import cProfile
+import hmac
+import json
+import os
+import pstats
+import tempfile
+import threading
+import time
+import tracemalloc
+import uuid
+
+# O tracemalloc é global ao processo: só uma requisição é perfilada por vez
+_lock_perfil = threading.Lock()
+
+TOTAL_FUNCOES = 25
+TOTAL_ALOCACOES = 15
+
+# Relatórios mantidos em PROFILE_DIR; os mais antigos são apagados a cada gravação
+MAXIMO_RELATORIOS = 200
+
+def token_admin_valido(token, config):
+    """Confere o token de administrador em tempo constante."""
+    esperado = config.get('ADMIN_TOKEN')
+    if not esperado or not token:
+        return False
+    return hmac.compare_digest(token.encode('utf-8'), esperado.encode('utf-8'))
+
+def modo_perfil(headers, config):
+    """
+    Decide se a requisição deve ser perfilada.
+
+    Returns:
+        str or None: 'inline' (relatório na resposta), 'disco' (apenas
+                     gravado em PROFILE_DIR) ou None
+    """
+    if not config.get('ADMIN_TOKEN'):
+        return None
+    if headers.get('X-Profile') == '1' and token_admin_valido(headers.get('X-Admin-Token'), config):
+        return 'inline'
+    if config.get('PROFILE_REQUESTS'):
+        return 'disco'
+    return None
+
+class PerfilRequisicao:
+    """Sessão de perfilamento de uma única requisição."""
+
+    def __init__(self, endpoint, modo):
+        self.id = uuid.uuid4().hex
+        self.endpoint = endpoint
+        self.modo = modo
+        self._profiler = cProfile.Profile()
+        self._tracemalloc_proprio = False
+        self._inicio = None
+
+    def iniciar(self):
+        """
+        Inicia cProfile e tracemalloc.
+
+        Returns:
+            bool: False se outra requisição já estiver sendo perfilada
+        """
+        if not _lock_perfil.acquire(blocking=False):
+            return False
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(10)
+            self._tracemalloc_proprio = True
+        tracemalloc.reset_peak()
+        self._inicio = time.perf_counter()
+        self._profiler.enable()
+        return True
+
+    def finalizar(self):
+        """
+        Encerra a coleta e monta o relatório.
+
+        Returns:
+            dict: {'id', 'endpoint', 'duracao_ms', 'memoria_pico_mb',
+                   'top_funcoes', 'alocacoes'}
+        """
+        try:
+            self._profiler.disable()
+            duracao = time.perf_counter() - self._inicio
+            _, pico = tracemalloc.get_traced_memory()
+            snapshot = tracemalloc.take_snapshot()
+            if self._tracemalloc_proprio:
+                tracemalloc.stop()
+        finally:
+            _lock_perfil.release()
+
+        return {
+            'id': self.id,
+            'endpoint': self.endpoint,
+            'criado_em': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'duracao_ms': round(duracao * 1000, 2),
+            'memoria_pico_mb': round(pico / (1024 * 1024), 2),
+            'top_funcoes': self._top_funcoes(),
+            'alocacoes': _top_alocacoes(snapshot)
+        }
+
+    def _top_funcoes(self):
+        estatisticas = pstats.Stats(self._profiler)
+        linhas = []
+        for (arquivo, linha, funcao), (_, chamadas, tempo_proprio, tempo_cumulativo, _) in estatisticas.stats.items():
+            linhas.append({
+                'funcao': funcao,
+                'arquivo': arquivo,
+                'linha': linha,
+                'chamadas': chamadas,
+                'tempo_proprio_ms': round(tempo_proprio * 1000, 3),
+                'tempo_cumulativo_ms': round(tempo_cumulativo * 1000, 3)
+            })
+        linhas.sort(key=lambda item: item['tempo_proprio_ms'], reverse=True)
+        return linhas[:TOTAL_FUNCOES]
+
+def _top_alocacoes(snapshot):
+    """Agrupa as alocações ainda vivas por linha de origem."""
+    snapshot = snapshot.filter_traces((
+        tracemalloc.Filter(False, tracemalloc.__file__),
+        tracemalloc.Filter(False, '<frozen importlib._bootstrap>'),
+    ))
+    alocacoes = []
+    for estatistica in snapshot.statistics('lineno')[:TOTAL_ALOCACOES]:
+        origem = estatistica.traceback[0]
+        alocacoes.append({
+            'local': f'{origem.filename}:{origem.lineno}',
+            'tamanho_kb': round(estatistica.size / 1024, 1),
+            'blocos': estatistica.count
+        })
+    return alocacoes
+
+# ====================================================================
+# ARMAZENAMENTO DOS RELATÓRIOS
+# ====================================================================
+
+def salvar_relatorio(relatorio, pasta, maximo=MAXIMO_RELATORIOS):
+    """Grava o relatório como JSON em PROFILE_DIR, mantendo só os `maximo` mais recentes."""
+    os.makedirs(pasta, exist_ok=True)
+    caminho = os.path.join(pasta, f"{relatorio['id']}.json")
+    # Temporário + os.replace: a listagem nunca lê um JSON pela metade
+    descritor, temporario = tempfile.mkstemp(dir=pasta, suffix='.tmp')
+    try:
+        with os.fdopen(descritor, 'w', encoding='utf-8') as arquivo:
+            json.dump(relatorio, arquivo, ensure_ascii=False, indent=2)
+        os.replace(temporario, caminho)
+    except BaseException:
+        try:
+            os.remove(temporario)
+        except FileNotFoundError:
+            pass
+        raise
+    _podar_relatorios(pasta, maximo)
+    return caminho
+
+def _podar_relatorios(pasta, maximo):
+    """Apaga os relatórios mais antigos (por data de modificação) além de `maximo`."""
+    arquivos = []
+    for nome in os.listdir(pasta):
+        if not nome.endswith('.json'):
+            continue
+        caminho = os.path.join(pasta, nome)
+        try:
+            arquivos.append((os.path.getmtime(caminho), caminho))
+        except FileNotFoundError:
+            continue  # Removido por outro worker entre o listdir e o stat
+    
+    arquivos.sort(reverse=True)
+    for _, caminho in arquivos[max(1, maximo):]:
+        try:
+            os.remove(caminho)
+        except FileNotFoundError:
+            pass
+
+def listar_relatorios(pasta):
+    """Lista os relatórios gravados, do mais recente ao mais antigo."""
+    if not os.path.isdir(pasta):
+        return []
+    resumo = []
+    for nome in os.listdir(pasta):
+        if not nome.endswith('.json'):
+            continue
+        try:
+            with open(os.path.join(pasta, nome), encoding='utf-8') as arquivo:
+                relatorio = json.load(arquivo)
+        except FileNotFoundError:
+            continue  # Podado por uma gravação concorrente
+        resumo.append({
+            'id': relatorio['id'],
+            'endpoint': relatorio['endpoint'],
+            'criado_em': relatorio['criado_em'],
+            'duracao_ms': relatorio['duracao_ms'],
+            'memoria_pico_mb': relatorio['memoria_pico_mb']
+        })
+    resumo.sort(key=lambda item: item['criado_em'], reverse=True)
+    return resumo
+
+def carregar_relatorio(pasta, relatorio_id):
+    """Carrega um relatório pelo id, ou None se não existir."""
+    if not relatorio_id.isalnum():
+        return None
+    caminho = os.path.join(pasta, f'{relatorio_id}.json')
+    try:
+        with open(caminho, encoding='utf-8') as arquivo:
+            return json.load(arquivo)
+    except FileNotFoundError:
+        return None
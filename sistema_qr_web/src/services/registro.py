@@ -0,0 +1,171 @@
+# ====================================================================
+# LOGS ESTRUTURADOS E LOG LIMITADO POR JOB
+# ====================================================================
+# Dois destinos para as mensagens do processamento:
+#
+# - O log do servidor (módulo logging): cada módulo usa
+#   logging.getLogger(__name__), com nível (QR_LOG_NIVEL) e formato
+#   ('texto' ou 'json', QR_LOG_FORMATO) configurados uma vez em
+#   configurar_logs(). A formatação é preguiçosa (logger.info('%s', x)):
+#   mensagens abaixo do nível não são montadas; o texto completo dos PDFs
+#   só aparece em DEBUG
+# - O log do job (LogJob), devolvido ao cliente em 'processing_log': um
+#   buffer circular com as últimas LOG_LINHAS_JOB linhas e contadores por
+#   nível e por evento (concluido, sem_qr, erro...), para que um lote de
+#   10 mil diplomas não gere uma resposta de megabytes
+# ====================================================================
+
+from collections import Counter, deque
+import json
+import logging
+import sys
+
+LOGGER_RAIZ = 'src'
+CAPACIDADE_PADRAO = 500
+
+NOMES_NIVEIS = {
+    logging.DEBUG: 'debug',
+    logging.INFO: 'info',
+    logging.WARNING: 'aviso',
+    logging.ERROR: 'erro',
+    logging.CRITICAL: 'critico',
+}
+
+class FormatoJSON(logging.Formatter):
+    """Uma linha JSON por mensagem, com os campos extras do job quando houver."""
+
+    CAMPOS_EXTRAS = ('job_id', 'evento')
+
+    def format(self, record):
+        registro = {
+            'ts': self.formatTime(record, '%Y-%m-%dT%H:%M:%S'),
+            'nivel': NOMES_NIVEIS.get(record.levelno, record.levelname.lower()),
+            'logger': record.name,
+            'mensagem': record.getMessage(),
+        }
+        for campo in self.CAMPOS_EXTRAS:
+            valor = getattr(record, campo, None)
+            if valor is not None:
+                registro[campo] = valor
+        if record.exc_info:
+            registro['excecao'] = self.formatException(record.exc_info)
+        return json.dumps(registro, ensure_ascii=False)
+
+def configurar_logs(nivel='INFO', formato='texto'):
+    """
+    Configura o logger raiz da aplicação (idempotente: chamadas seguintes
+    só ajustam o nível e o formato).
+
+    Args:
+        nivel (str): DEBUG, INFO, WARNING ou ERROR
+        formato (str): 'texto' (legível no console) ou 'json' (uma linha por mensagem)
+    """
+    logger = logging.getLogger(LOGGER_RAIZ)
+    logger.setLevel(getattr(logging, str(nivel).upper(), logging.INFO))
+    handler = next((h for h in logger.handlers if getattr(h, '_qr_configurado', False)), None)
+    if handler is None:
+        handler = logging.StreamHandler(sys.stderr)
+        handler._qr_configurado = True
+        logger.addHandler(handler)
+        # As mensagens não sobem para o logger raiz (evita duplicar com o gunicorn/uvicorn)
+        logger.propagate = False
+    if formato == 'json':
+        handler.setFormatter(FormatoJSON())
+    else:
+        handler.setFormatter(logging.Formatter('%(asctime)s %(levelname)s [%(name)s] %(message)s'))
+    return logger
+
+class LogJob:
+    """
+    Log de um job: envia cada mensagem ao logger e guarda as últimas no
+    buffer circular devolvido ao cliente.
+
+    Aceita append()/extend() de strings como a lista usada antes, então
+    funções que recebem processing_log funcionam com os dois.
+
+    Exemplo:
+        log = LogJob(capacidade=500, logger=logger)
+        log.info("📄 Processando diploma: %s", nome, evento='inicio')
+        resposta = {'processing_log': log.linhas(), 'log_summary': log.resumo()}
+    """
+
+    def __init__(self, capacidade=None, logger=None, job_id=None, emitir=True):
+        self.capacidade = capacidade or CAPACIDADE_PADRAO
+        self.logger = logger or logging.getLogger(LOGGER_RAIZ)
+        self.job_id = job_id
+        # emitir=False: só guarda (ex: log provisório de um diploma que ainda pode ser refeito)
+        self.emitir = emitir
+        self._entradas = deque(maxlen=self.capacidade)  # (nivel, msg, args, evento)
+        self.total = 0
+        self.por_nivel = Counter()
+        self.eventos = Counter()
+
+    def guardar(self, nivel, msg, args=(), evento=None):
+        """Guarda a mensagem no buffer e nos contadores, sem enviá-la ao logger."""
+        self.total += 1
+        self.por_nivel[NOMES_NIVEIS.get(nivel, str(nivel))] += 1
+        if evento:
+            self.eventos[evento] += 1
+        self._entradas.append((nivel, msg, args, evento))
+
+    def log(self, nivel, msg, *args, evento=None):
+        if self.emitir and self.logger.isEnabledFor(nivel):
+            self.logger.log(nivel, msg, *args, extra={'job_id': self.job_id, 'evento': evento})
+        if nivel >= logging.INFO:
+            self.guardar(nivel, msg, args, evento)
+
+    def debug(self, msg, *args, evento=None):
+        self.log(logging.DEBUG, msg, *args, evento=evento)
+
+    def info(self, msg, *args, evento=None):
+        self.log(logging.INFO, msg, *args, evento=evento)
+
+    def aviso(self, msg, *args, evento=None):
+        self.log(logging.WARNING, msg, *args, evento=evento)
+
+    def erro(self, msg, *args, evento=None):
+        self.log(logging.ERROR, msg, *args, evento=evento)
+
+    def anexar(self, outro, emitir=True):
+        """
+        Repassa a este log as mensagens guardadas em outro LogJob; com
+        emitir=False elas não são enviadas de novo ao logger (o outro já as emitiu).
+        """
+        for nivel, msg, args, evento in outro.entradas():
+            if emitir:
+                self.log(nivel, msg, *args, evento=evento)
+            else:
+                self.guardar(nivel, msg, args, evento)
+
+    def entradas(self):
+        return list(self._entradas)
+
+    # Compatibilidade com processing_log como lista de strings
+    def append(self, linha):
+        self.info('%s', linha)
+
+    def extend(self, linhas):
+        for linha in linhas:
+            self.append(linha)
+
+    def __len__(self):
+        return self.total
+
+    def __iter__(self):
+        return iter(self.linhas())
+
+    def linhas(self):
+        """As últimas mensagens formatadas (a formatação só acontece aqui)."""
+        linhas = [msg % args if args else msg for _, msg, args, _ in self._entradas]
+        omitidas = self.total - len(self._entradas)
+        if omitidas:
+            linhas.insert(0, f"… {omitidas} linhas anteriores omitidas (ver log_summary)")
+        return linhas
+
+    def resumo(self):
+        return {
+            'linhas': self.total,
+            'omitidas': self.total - len(self._entradas),
+            'por_nivel': dict(self.por_nivel),
+            'eventos': dict(self.eventos),
+        }
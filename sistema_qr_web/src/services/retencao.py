@@ -0,0 +1,201 @@
+# ====================================================================
+# RETENÇÃO DOS ARQUIVOS DE SAÍDA (STORAGE_DIR)
+# ====================================================================
+# Os PDFs com QR, os PNGs extraídos e os ZIPs de cada job ficam em
+# STORAGE_DIR/<job_id>/ e são servidos de novo pelo disco, sem
+# reprocessamento. Para o disco não crescer sem limite:
+#
+# - Cada job tem um prazo (expira_em, RETENCAO_TTL_HORAS ou 'ttl_hours'
+#   no envio); vencido o prazo, a pasta do job é removida
+# - Uma cota global (RETENCAO_COTA_MB) remove os arquivos usados há mais
+#   tempo (LRU) até o total ficar abaixo de 90% da cota. O último uso é a
+#   data de modificação do arquivo, atualizada a cada download ou
+#   reaproveitamento (os arquivos nunca são reescritos)
+# - Uma thread de limpeza em cada processo roda a cada RETENCAO_INTERVALO
+#   segundos; um lock de arquivo evita que workers do gunicorn limpem ao
+#   mesmo tempo
+#
+# Arquivos removidos deixam de ter artefato no banco: o download responde
+# 410 e a retomada do job processa o documento de novo. Pastas de sessões
+# de envio em partes (UPLOAD_STAGING_DIR) sem atividade dentro do prazo
+# padrão também são removidas.
+# ====================================================================
+
+from datetime import datetime, timedelta, timezone
+import logging
+import os
+import shutil
+import threading
+import time
+
+try:
+    import fcntl
+except ImportError:  # Windows: sem lock entre processos
+    fcntl = None
+
+from src.services.metrics import RETENCAO_BYTES, RETENCAO_REMOCOES
+
+logger = logging.getLogger(__name__)
+
+# Fração da cota em que a remoção por LRU para (evita remover a cada novo arquivo)
+ALVO_COTA = 0.9
+
+def prazo_job(ttl_horas):
+    """Data de expiração de um job com esse TTL (None ou <= 0 = sem prazo)."""
+    if not ttl_horas or ttl_horas <= 0:
+        return None
+    return datetime.now(timezone.utc) + timedelta(hours=ttl_horas)
+
+def marcar_uso(caminho):
+    """Registra o acesso a um arquivo para a ordem LRU."""
+    try:
+        os.utime(caminho)
+    except OSError:
+        pass
+
+def _listar_arquivos(pasta_storage):
+    """Retorna [(mtime, tamanho, caminho)] de todos os arquivos do storage."""
+    arquivos = []
+    for raiz, _, nomes in os.walk(pasta_storage):
+        for nome in nomes:
+            if nome.startswith('.'):
+                continue
+            caminho = os.path.join(raiz, nome)
+            try:
+                stat = os.stat(caminho)
+            except FileNotFoundError:
+                continue
+            arquivos.append((stat.st_mtime, stat.st_size, caminho))
+    return arquivos
+
+def remover_expirados(pasta_storage):
+    """
+    Remove as pastas dos jobs com prazo vencido.
+
+    Returns:
+        int: Número de jobs expirados
+    """
+    from src.models.user import db
+    from src.models.job import Job, Artefato
+
+    agora = datetime.now(timezone.utc)
+    expirados = Job.query.filter(Job.expira_em.isnot(None), Job.expira_em < agora).all()
+    for job in expirados:
+        shutil.rmtree(os.path.join(pasta_storage, job.id), ignore_errors=True)
+        removidos = Artefato.query.filter_by(job_id=job.id).delete()
+        RETENCAO_REMOCOES.inc(removidos, motivo='expirado')
+        job.status = 'expirado'
+        job.expira_em = None
+        db.session.commit()
+        logger.info("🧹 Job %s expirado: %d arquivos removidos", job.id, removidos)
+    return len(expirados)
+
+def aplicar_cota(pasta_storage, cota_bytes):
+    """
+    Remove os arquivos usados há mais tempo até o total ficar abaixo da cota.
+
+    Returns:
+        tuple: (bytes em uso após a limpeza, arquivos removidos)
+    """
+    from src.models.user import db
+    from src.models.job import Artefato
+
+    arquivos = _listar_arquivos(pasta_storage)
+    total = sum(tamanho for _, tamanho, _ in arquivos)
+    removidos = 0
+    if cota_bytes and total > cota_bytes:
+        alvo = cota_bytes * ALVO_COTA
+        for _, tamanho, caminho in sorted(arquivos):
+            if total <= alvo:
+                break
+            try:
+                os.remove(caminho)
+            except FileNotFoundError:
+                pass
+            Artefato.query.filter_by(caminho=caminho).delete()
+            total -= tamanho
+            removidos += 1
+        db.session.commit()
+        RETENCAO_REMOCOES.inc(removidos, motivo='cota')
+        logger.info("🧹 Cota de armazenamento: %d arquivos menos usados removidos", removidos)
+    RETENCAO_BYTES.set(total)
+    return total, removidos
+
+def remover_montagens_abandonadas(pasta_staging, idade_maxima):
+    """
+    Remove as pastas de sessões de envio em partes (src/routes/sessoes.py)
+    sem nenhuma atividade há mais de idade_maxima segundos.
+
+    Returns:
+        int: Número de sessões removidas
+    """
+    if not idade_maxima or idade_maxima <= 0 or not os.path.isdir(pasta_staging):
+        return 0
+    limite = time.time() - idade_maxima
+    removidas = 0
+    for nome in os.listdir(pasta_staging):
+        pasta = os.path.join(pasta_staging, nome)
+        arquivos = [os.path.join(pasta, arquivo) for arquivo in os.listdir(pasta)] if os.path.isdir(pasta) else []
+        try:
+            ultima_atividade = max([os.path.getmtime(pasta)] + [os.path.getmtime(caminho) for caminho in arquivos])
+        except FileNotFoundError:
+            continue
+        if ultima_atividade < limite:
+            shutil.rmtree(pasta, ignore_errors=True)
+            removidas += 1
+            logger.info("🧹 Sessão de envio %s abandonada: arquivos parciais removidos", nome)
+    return removidas
+
+def limpar(app):
+    """Uma rodada de limpeza (prazos e cota), se nenhum outro processo estiver limpando."""
+    pasta_storage = app.config['STORAGE_DIR']
+    os.makedirs(pasta_storage, exist_ok=True)
+    with open(os.path.join(pasta_storage, '.limpeza.lock'), 'w') as trava:
+        if fcntl is not None:
+            try:
+                fcntl.flock(trava, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except OSError:
+                return None
+        with app.app_context():
+            expirados = remover_expirados(pasta_storage)
+            total, removidos = aplicar_cota(pasta_storage, app.config.get('RETENCAO_COTA_MB', 0) * 1024 * 1024)
+        sessoes = remover_montagens_abandonadas(app.config.get('UPLOAD_STAGING_DIR', ''),
+                                                 app.config.get('RETENCAO_TTL_HORAS', 0) * 3600)
+        return {'jobs_expirados': expirados, 'arquivos_removidos': removidos, 'bytes_em_uso': total,
+                'sessoes_abandonadas': sessoes}
+
+# ====================================================================
+# THREAD DE LIMPEZA
+# ====================================================================
+
+_limpeza = {'pid': None}
+_lock_limpeza = threading.Lock()
+
+def _laco_limpeza(app, intervalo):
+    while True:
+        try:
+            limpar(app)
+        except Exception:
+            logger.exception("Erro na limpeza do armazenamento")
+        time.sleep(intervalo)
+
+def iniciar_limpeza(app):
+    """
+    Inicia a thread de limpeza deste processo na primeira requisição.
+
+    A thread não é criada em create_app(): com preload_app o gunicorn
+    importa o app no processo mestre, e threads não sobrevivem ao fork.
+    """
+    intervalo = app.config.get('RETENCAO_INTERVALO', 0)
+    if intervalo <= 0:
+        return
+
+    @app.before_request
+    def _garantir_limpeza():
+        if _limpeza['pid'] == os.getpid():
+            return
+        with _lock_limpeza:
+            if _limpeza['pid'] != os.getpid():
+                _limpeza['pid'] = os.getpid()
+                threading.Thread(target=_laco_limpeza, args=(app, intervalo), daemon=True,
+                                 name='qr-limpeza').start()
@@ -0,0 +1,98 @@
+# ====================================================================
+# VERIFICAÇÃO DOS QRs INSERIDOS
+# ====================================================================
+# Depois da inserção, o QR de cada diploma (ou de uma amostra) é lido de
+# volta do PDF de saída por verificar_qr_inserido (src/routes/pdf_qr.py),
+# que renderiza só o retângulo do QR. Um QR pequeno demais para o
+# conteúdo aparece aqui, e não depois da impressão.
+#
+# - A amostra é determinística (pelo hash do diploma): reprocessar o mesmo
+#   lote verifica os mesmos documentos
+# - Com processos > 0 as verificações rodam em paralelo, enquanto o lote
+#   segue para os próximos diplomas; com 0 rodam no próprio processo
+# ====================================================================
+
+import atexit
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+import multiprocessing
+import threading
+
+def interpretar_amostra(valor, padrao=0.0):
+    """
+    Converte o parâmetro de verificação em fração dos documentos.
+
+    Aceita 'all'/'todos' (1.0), 'none'/'nenhum' (0.0) ou um número entre 0 e 1.
+    """
+    if valor is None or valor == '':
+        return padrao
+    texto = str(valor).strip().lower()
+    if texto in ('all', 'todos', 'true'):
+        return 1.0
+    if texto in ('none', 'nenhum', 'false'):
+        return 0.0
+    return min(1.0, max(0.0, float(texto)))
+
+def deve_verificar(input_hash, amostra):
+    """Decide pelo hash do documento se ele entra na amostra."""
+    if amostra >= 1.0:
+        return True
+    if amostra <= 0.0:
+        return False
+    return int(input_hash[:8], 16) / 0x100000000 < amostra
+
+def _verificar(pdf_bytes, localizacao, qr_bytes, escala):
+    from src.routes.pdf_qr import verificar_qr_inserido
+    return verificar_qr_inserido(pdf_bytes, localizacao, qr_bytes, escala)
+
+class Verificador:
+    """Executa verificações no próprio processo (processos=0) ou em um pool de processos."""
+
+    def __init__(self, processos=0, escala=2.0):
+        self.processos = processos
+        self.escala = escala
+        self._executor = self._criar_executor() if processos > 0 else None
+        self._lock = threading.Lock()
+
+    def _criar_executor(self):
+        # 'spawn': fork de um processo com threads (servidor) pode herdar locks travados
+        return ProcessPoolExecutor(self.processos, mp_context=multiprocessing.get_context('spawn'))
+
+    def enviar(self, pdf_bytes, localizacao, qr_bytes):
+        """
+        Agenda a verificação de um documento.
+
+        Returns:
+            Future: resultado de verificar_qr_inserido ({'status', 'conteudo'})
+        """
+        if self._executor is not None:
+            with self._lock:
+                try:
+                    return self._executor.submit(_verificar, pdf_bytes, localizacao, qr_bytes, self.escala)
+                except BrokenProcessPool:
+                    # Um processo verificador morreu (ex: falta de memória): recria o pool
+                    self._executor = self._criar_executor()
+                    return self._executor.submit(_verificar, pdf_bytes, localizacao, qr_bytes, self.escala)
+        futuro = Future()
+        try:
+            futuro.set_result(_verificar(pdf_bytes, localizacao, qr_bytes, self.escala))
+        except Exception as e:
+            futuro.set_exception(e)
+        return futuro
+
+    def fechar(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=True, cancel_futures=True)
+
+# Verificadores compartilhados pelas requisições deste processo, criados no primeiro uso
+_verificadores = {}
+_lock_verificadores = threading.Lock()
+
+def obter_verificador(processos, escala=2.0):
+    """Retorna o verificador do processo para essa configuração."""
+    with _lock_verificadores:
+        verificador = _verificadores.get((processos, escala))
+        if verificador is None:
+            verificador = _verificadores[(processos, escala)] = Verificador(processos, escala)
+            atexit.register(verificador.fechar)
+        return verificador
@@ -9,12 +9,22 @@ let appState = {
     batchPdfs: [],
     batchQrs: [],
     extractedQrs: [],
+    batchJobId: null, // Job do lote em andamento (reenviado para retomar após falha)
+    lastBatchJobId: null, // Último lote concluído (reposicionado sem reenvio em /batch-restamp)
+    unifiedPosition: null, // Posição unificada do lote (clique fora de um modelo)
+    batchTemplates: [], // Modelos de layout do lote (/batch-templates)
+    templatePositions: {}, // Posição do QR por modelo (template_positions)
+    activeTemplate: null, // Modelo cuja posição está sendo definida no canvas
     viewMode: 'fit' // 'fit' ou 'real'
 };
 
 // Configuração da API
 const API_BASE = '/api';
 
+// Lotes acima deste total (bytes) são enviados em partes por uma sessão de envio,
+// abaixo do limite de uma única requisição no servidor (50MB)
+const BATCH_SINGLE_REQUEST_MAX = 40 * 1024 * 1024;
+
 // Inicialização
 document.addEventListener('DOMContentLoaded', function() {
     setupEventListeners();
@@ -137,6 +147,16 @@ function handleCanvasClick(e) {
     drawQrOverlays();
     updateSaveButtons();
     log(`QR Code posicionado na página ${appState.currentPage + 1} em coordenadas reais (${Math.round(finalX)}, ${Math.round(finalY)})`);
+
+    // Com um modelo ativo o clique define a posição só daquele modelo
+    const placed = appState.qrPositions[appState.currentPage][0];
+    if (appState.activeTemplate) {
+        appState.templatePositions[appState.activeTemplate] = placed;
+        renderTemplateList();
+        log(`📍 Posição do modelo ${appState.activeTemplate} definida`);
+    } else {
+        appState.unifiedPosition = placed;
+    }
 }
 
 async function loadPdfs(files) {
@@ -146,6 +166,12 @@ async function loadPdfs(files) {
     
     try {
         appState.batchPdfs = Array.from(files);
+        // Lote novo: os modelos e as posições do lote anterior não valem mais
+        appState.unifiedPosition = null;
+        appState.batchTemplates = [];
+        appState.templatePositions = {};
+        appState.activeTemplate = null;
+        renderTemplateList();
         updateFilesList();
         log(`Carregados ${files.length} PDFs em lote`);
         
@@ -282,6 +308,39 @@ async function extractQrs(files) {
     }
 }
 
+async function loadRoster(files) {
+    if (!files || files.length === 0) return;
+    
+    showLoading('Importando cadastro de alunos...');
+    
+    try {
+        const formData = new FormData();
+        formData.append('roster', files[0]);
+        
+        const response = await fetch(`${API_BASE}/roster`, {
+            method: 'POST',
+            body: formData
+        });
+        
+        const result = await response.json();
+        
+        if (result.success) {
+            log(`Cadastro importado: ${result.total_alunos} alunos (${result.linhas_ignoradas} linhas ignoradas)`);
+            if (result.nomes_ambiguos.length > 0) {
+                log(`Atenção: nomes homônimos no cadastro (use a matrícula no nome do QR): ${result.nomes_ambiguos.join(', ')}`);
+            }
+        } else {
+            throw new Error(result.error);
+        }
+    } catch (error) {
+        log(`Erro ao importar cadastro: ${error.message}`);
+        alert('Erro ao importar cadastro: ' + error.message);
+    } finally {
+        document.getElementById('rosterInput').value = '';
+        hideLoading();
+    }
+}
+
 function renderCurrentPage() {
     if (!appState.pages || appState.pages.length === 0) return;
     
@@ -456,6 +515,8 @@ function updateSaveButtons() {
     const saveCurrentPageBtn = document.getElementById('saveCurrentPage');
     const saveAllPagesBtn = document.getElementById('saveAllPages');
     const processInBatchBtn = document.getElementById('processInBatch');
+    const previewBatchBtn = document.getElementById('previewBatch');
+    const restampBatchBtn = document.getElementById('restampBatch');
     
     const hasQrPositioned = appState.qrPositions.some(positions => positions.length > 0);
     const canSave = appState.currentPdf && appState.qrImage && hasQrPositioned;
@@ -468,6 +529,10 @@ function updateSaveButtons() {
     if (saveCurrentPageBtn) saveCurrentPageBtn.disabled = !hasCurrentPageQr;
     if (saveAllPagesBtn) saveAllPagesBtn.disabled = !canSave;
     if (processInBatchBtn) processInBatchBtn.disabled = !canProcessBatch;
+    if (previewBatchBtn) previewBatchBtn.disabled = !(appState.batchPdfs.length > 0 && hasQrPositioned);
+    if (restampBatchBtn) restampBatchBtn.disabled = !(appState.lastBatchJobId && hasQrPositioned);
+    const groupTemplatesBtn = document.getElementById('groupTemplates');
+    if (groupTemplatesBtn) groupTemplatesBtn.disabled = appState.batchPdfs.length === 0;
 }
 
 function removeQrFromPage() {
@@ -514,7 +579,8 @@ async function savePdf() {
             body: JSON.stringify({
                 pdf_base64: pdfBase64,
                 qr_base64: appState.qrImage,
-                qr_positions: qrPositions
+                qr_positions: qrPositions,
+                linearize: linearizeOutput()
             })
         });
         
@@ -534,61 +600,336 @@ async function savePdf() {
     }
 }
 
+function batchPosition(qrPosition) {
+    // Na posição automática o servidor procura o espaço livre de cada diploma;
+    // a posição do canvas fica como plano B
+    const position = { x: qrPosition.x, y: qrPosition.y, size: qrPosition.size };
+    const autoPlacement = document.getElementById('autoPlacement');
+    if (autoPlacement && autoPlacement.checked) {
+        position.auto = true;
+    }
+    return position;
+}
+
+// Posição unificada do lote: a última definida fora de um modelo (ou a do diploma na tela)
+function unifiedQrPosition() {
+    return appState.unifiedPosition
+        || (appState.qrPositions[appState.currentPage] && appState.qrPositions[appState.currentPage][0]);
+}
+
+// template_positions: {modelo: posição} dos modelos posicionados (null se nenhum)
+function batchTemplatePositions() {
+    const keys = Object.keys(appState.templatePositions);
+    if (keys.length === 0) return null;
+    const positions = {};
+    keys.forEach(key => {
+        positions[key] = batchPosition(appState.templatePositions[key]);
+    });
+    return positions;
+}
+
+// Agrupa o lote por modelo de layout (/batch-templates), em partes como a prévia
+async function groupTemplates() {
+    if (appState.batchPdfs.length === 0) {
+        alert('Carregue os PDFs do lote para agrupar por modelo.');
+        return;
+    }
+
+    showLoading('Agrupando diplomas por modelo...');
+    try {
+        const templates = {};
+        const documents = [];
+        for (const part of splitBatchForPreview(appState.batchPdfs)) {
+            const formData = new FormData();
+            part.files.forEach(file => formData.append('pdfs', file));
+            formData.append('offset', part.offset);
+            if (Object.keys(templates).length > 0) {
+                formData.append('templates', JSON.stringify(Object.keys(templates)));
+            }
+            const response = await fetch(`${API_BASE}/batch-templates`, { method: 'POST', body: formData });
+            const result = await response.json();
+            if (!response.ok) {
+                throw new Error(result.error || 'Erro ao agrupar o lote');
+            }
+            result.templates.forEach(template => {
+                const merged = templates[template.template]
+                    || (templates[template.template] = { template: template.template, documents: 0, examples: [] });
+                merged.documents += template.documents;
+                merged.examples.push(...template.examples.slice(0, 3 - merged.examples.length));
+            });
+            documents.push(...result.documents);
+        }
+
+        // Cada modelo guarda o primeiro diploma dele, aberto em "Posicionar"
+        appState.batchTemplates = Object.values(templates)
+            .map(template => ({ ...template, index: documents.find(doc => doc.template === template.template).index }))
+            .sort((a, b) => b.documents - a.documents);
+        Object.keys(appState.templatePositions).forEach(key => {
+            if (!templates[key]) delete appState.templatePositions[key];
+        });
+        renderTemplateList();
+        log(`🧩 ${documents.length} diplomas em ${appState.batchTemplates.length} modelo(s) de layout`);
+    } catch (error) {
+        log(`Erro ao agrupar o lote: ${error.message}`);
+        alert('Erro ao agrupar o lote: ' + error.message);
+    } finally {
+        hideLoading();
+    }
+}
+
+function renderTemplateList() {
+    const templateList = document.getElementById('templateList');
+    if (!templateList) return;
+    if (appState.batchTemplates.length === 0) {
+        templateList.innerHTML = '<div class="file-item">Nenhum modelo agrupado</div>';
+        return;
+    }
+
+    templateList.innerHTML = appState.batchTemplates.map(template => {
+        const position = appState.templatePositions[template.template];
+        const active = appState.activeTemplate === template.template;
+        const status = position ? `📍 (${Math.round(position.x)}, ${Math.round(position.y)})` : 'posição unificada';
+        return `
+            <div class="file-item" style="${active ? 'background: #e3f2fd;' : ''}">
+                <strong>${template.template}</strong> · ${template.documents} diploma(s) · ${status}<br>
+                <small>${template.examples.join(', ')}</small><br>
+                ${active
+                    ? '<button class="btn btn-success" onclick="finishTemplate()">✔ Concluir</button>'
+                    : `<button class="btn btn-secondary" onclick="placeTemplate('${template.template}')">📍 Posicionar</button>`}
+                ${position ? `<button class="btn btn-danger" onclick="clearTemplatePosition('${template.template}')">✖</button>` : ''}
+            </div>
+        `;
+    }).join('');
+}
+
+// Abre o primeiro diploma do modelo: o próximo clique no canvas define a posição do modelo
+async function placeTemplate(key) {
+    const template = appState.batchTemplates.find(item => item.template === key);
+    if (!template) return;
+
+    showLoading('Carregando diploma do modelo...');
+    try {
+        await loadSinglePdf(appState.batchPdfs[template.index]);
+        appState.activeTemplate = key;
+        if (appState.templatePositions[key]) {
+            appState.qrPositions[0] = [appState.templatePositions[key]];
+            drawQrOverlays();
+            updateSaveButtons();
+        }
+        renderTemplateList();
+        log(`📍 Clique no diploma para posicionar o QR do modelo ${key}`);
+    } catch (error) {
+        log(`Erro ao carregar o diploma do modelo: ${error.message}`);
+        alert('Erro ao carregar o diploma do modelo: ' + error.message);
+    } finally {
+        hideLoading();
+    }
+}
+
+function finishTemplate() {
+    appState.activeTemplate = null;
+    renderTemplateList();
+}
+
+function clearTemplatePosition(key) {
+    delete appState.templatePositions[key];
+    renderTemplateList();
+    log(`Modelo ${key} volta a usar a posição unificada`);
+}
+
+function linearizeOutput() {
+    const linearize = document.getElementById('linearizeOutput');
+    return Boolean(linearize && linearize.checked);
+}
+
+async function previewBatch() {
+    const qrPosition = unifiedQrPosition();
+    if (appState.batchPdfs.length === 0 || !qrPosition) {
+        alert('Carregue os PDFs e posicione o QR Code para ver a prévia do lote.');
+        return;
+    }
+
+    showLoading('Gerando prévia do lote...');
+    try {
+        // Lotes maiores que uma requisição são conferidos em partes (cada uma abaixo do
+        // MAX_CONTENT_LENGTH do servidor); as folhas de cada parte ficam uma embaixo da outra
+        const parts = splitBatchForPreview(appState.batchPdfs);
+        const sheets = [];
+        const documents = [];
+        const templates = {};
+        const templatePositions = batchTemplatePositions();
+        let unmatched = null;
+        let columns = null;
+        for (const [index, part] of parts.entries()) {
+            if (parts.length > 1) {
+                showLoading(`Gerando prévia do lote... ${index + 1}/${parts.length}`);
+            }
+            // Só a região do QR de cada diploma, em baixa resolução
+            const formData = new FormData();
+            part.files.forEach(file => formData.append('pdfs', file));
+            formData.append('qr_position', JSON.stringify(batchPosition(qrPosition)));
+            if (templatePositions) {
+                formData.append('template_positions', JSON.stringify(templatePositions));
+            }
+            formData.append('offset', part.offset);
+            if (columns) {
+                // Mesma grade em todas as partes
+                formData.append('columns', columns);
+            }
+            if (Object.keys(templates).length > 0) {
+                // Modelos das partes anteriores: os diplomas desta parte entram nas mesmas chaves
+                formData.append('templates', JSON.stringify(Object.keys(templates)));
+            }
+
+            const response = await fetch(`${API_BASE}/batch-preview`, { method: 'POST', body: formData });
+            const result = await response.json();
+            if (!response.ok) {
+                throw new Error(result.error || 'Erro ao gerar a prévia');
+            }
+            columns = columns || result.columns;
+            sheets.push(result.sheet);
+            documents.push(...result.documents);
+            result.templates.forEach(template => {
+                templates[template.template] = (templates[template.template] || 0) + template.documents;
+            });
+            // Modelo sem diplomas: só quando nenhuma parte tem diplomas dele
+            unmatched = unmatched === null ? result.unmatched_templates
+                : unmatched.filter(key => result.unmatched_templates.includes(key));
+        }
+
+        const collisions = documents.filter(doc => doc.collision);
+        log(`🖼 Prévia: ${documents.length} diplomas, ${collisions.length} com texto ou imagem sob o QR`);
+        if (Object.keys(templates).length > 1) {
+            log(`🧩 Modelos de layout: ${Object.entries(templates).map(([key, total]) => `${key} (${total})`).join(', ')}`);
+        }
+        if (unmatched && unmatched.length > 0) {
+            log(`⚠️ Posição de modelo sem nenhum diploma no lote: ${unmatched.join(', ')}`);
+        }
+        collisions.forEach(doc => {
+            log(`⚠️ ${doc.filename}: ${doc.words.slice(0, 5).join(' ') || `${doc.images} imagem(ns)`}`);
+        });
+        const janela = window.open();
+        if (janela) {
+            const images = sheets.map(sheet => `<img src="${sheet}" style="max-width:100%;display:block">`).join('');
+            janela.document.write(`<title>Prévia do lote</title>${images}`);
+        }
+    } catch (error) {
+        console.error('Erro na prévia do lote:', error);
+        alert('Erro na prévia do lote: ' + error.message);
+    } finally {
+        hideLoading();
+    }
+}
+
+// Divide os PDFs em partes de até BATCH_SINGLE_REQUEST_MAX bytes (ao menos um PDF por parte)
+function splitBatchForPreview(files) {
+    const parts = [];
+    let current = null;
+    files.forEach((file, index) => {
+        if (!current || (current.size + file.size > BATCH_SINGLE_REQUEST_MAX && current.files.length > 0)) {
+            current = { offset: index, files: [], size: 0 };
+            parts.push(current);
+        }
+        current.files.push(file);
+        current.size += file.size;
+    });
+    return parts;
+}
+
 async function processInBatch() {
     if (appState.batchPdfs.length === 0 || appState.batchQrs.length === 0) {
         alert('Carregue os PDFs e os QR Codes para o processamento em lote.');
         return;
     }
 
-    const qrPosition = appState.qrPositions[appState.currentPage] && appState.qrPositions[appState.currentPage][0];
+    const qrPosition = unifiedQrPosition();
     if (!qrPosition) {
         alert('Posicione o QR Code no primeiro diploma para definir a posição para todos.');
         return;
     }
 
     showLoading('Processando em lote...');
+    document.getElementById('cancelBatch').classList.remove('hidden');
     log('Iniciando processamento em lote com múltiplos QR Codes...');
 
-    try {
-        const formData = new FormData();
-
-        // Adiciona todos os PDFs
-        appState.batchPdfs.forEach(file => {
-            formData.append('pdfs', file);
-        });
+    // Mantém o mesmo job até o lote concluir: um novo envio após queda
+    // de conexão retoma o job, pulando os diplomas já processados
+    if (!appState.batchJobId) {
+        appState.batchJobId = crypto.randomUUID().replace(/-/g, '');
+    } else {
+        log(`Retomando job ${appState.batchJobId}...`);
+    }
 
-        // Adiciona todos os QR Codes
+    try {
+        // QR Codes como Blobs (os extraídos chegam em base64)
+        const qrBlobs = [];
         for (const qr of appState.batchQrs) {
             if (qr.dataUrl) {
-                // QR extraído (base64)
-                const blob = await base64ToBlob(qr.dataUrl);
-                formData.append('qrs', blob, qr.name || 'qr.png');
+                qrBlobs.push({ blob: await base64ToBlob(qr.dataUrl), name: qr.name || 'qr.png' });
             } else {
-                // QR carregado (File object)
-                formData.append('qrs', qr);
+                qrBlobs.push({ blob: qr, name: qr.name });
             }
         }
 
-        // Adiciona a posição do QR
-        formData.append('qr_position', JSON.stringify({
-            x: qrPosition.x,
-            y: qrPosition.y,
-            size: qrPosition.size
-        }));
+        const position = batchPosition(qrPosition);
+        const templatePositions = batchTemplatePositions();
+        const totalSize = appState.batchPdfs.reduce((total, file) => total + file.size, 0)
+            + qrBlobs.reduce((total, qr) => total + qr.blob.size, 0);
 
-        const response = await fetch(`${API_BASE}/batch-process`, {
-            method: 'POST',
-            body: formData
-        });
+        let response;
+        let result;
+        if (totalSize > BATCH_SINGLE_REQUEST_MAX) {
+            ({ response, result } = await sendBatchInParts(qrBlobs, position, templatePositions));
+        } else {
+            const formData = new FormData();
+            formData.append('job_id', appState.batchJobId);
 
-        const result = await response.json();
+            // Adiciona todos os PDFs
+            appState.batchPdfs.forEach(file => {
+                formData.append('pdfs', file);
+            });
+
+            // Adiciona todos os QR Codes
+            qrBlobs.forEach(qr => {
+                formData.append('qrs', qr.blob, qr.name);
+            });
+
+            // Adiciona a posição do QR (unificada e por modelo de layout)
+            formData.append('qr_position', JSON.stringify(position));
+            if (templatePositions) {
+                formData.append('template_positions', JSON.stringify(templatePositions));
+            }
+            formData.append('linearize', linearizeOutput() ? '1' : '0');
+
+            response = await fetch(`${API_BASE}/batch-process`, {
+                method: 'POST',
+                body: formData
+            });
+            result = await response.json();
+        }
 
         // Log detalhado do servidor
         if (result.processing_log) {
             result.processing_log.forEach(msg => log(msg));
         }
 
-        if (result.success && result.processed_pdfs && result.processed_pdfs.length > 0) {
+        // Lote cancelado: o job continua, e processar de novo retoma dos diplomas restantes
+        if (result.cancelled) {
+            log(`Lote cancelado: ${result.remaining} diplomas não processados (processe de novo para retomar).`);
+        } else if (result.success || response.status === 409) {
+            if (result.success) {
+                appState.lastBatchJobId = result.job_id;
+            }
+            appState.batchJobId = null;
+        }
+        updateSaveButtons();
+
+        if (result.success && result.archive_url && result.processed_pdfs.length > 0) {
+            // Lote enviado em partes: os PDFs ficam no servidor, o ZIP do job é baixado pronto
+            log(`Processamento concluído. ${result.total_processed} PDFs foram processados.`);
+            const archive = await fetch(result.archive_url);
+            downloadBlob(await archive.blob(), 'diplomas_com_qr.zip');
+        } else if (result.success && result.processed_pdfs && result.processed_pdfs.length > 0) {
             log(`Processamento concluído. ${result.total_processed} PDFs foram processados.`);
             await saveZip(result.processed_pdfs, 'diplomas_com_qr.zip');
         } else if (result.success) {
@@ -601,10 +942,131 @@ async function processInBatch() {
         log(`Erro fatal no processamento em lote: ${error.message}`);
         alert(`Erro no processamento em lote: ${error.message}`);
     } finally {
+        document.getElementById('cancelBatch').classList.add('hidden');
         hideLoading();
     }
 }
 
+// Reposiciona o QR do último lote concluído na posição atual: o servidor guarda
+// cada diploma e o QR casado com ele, então nada é reenviado e só a inserção se repete
+async function restampBatch() {
+    const qrPosition = unifiedQrPosition();
+    if (!appState.lastBatchJobId || !qrPosition) {
+        alert('Processe um lote e posicione o QR Code para reposicionar.');
+        return;
+    }
+
+    showLoading('Reposicionando o QR no lote...');
+    try {
+        const response = await fetch(`${API_BASE}/batch-restamp`, {
+            method: 'POST',
+            headers: { 'Content-Type': 'application/json' },
+            body: JSON.stringify({
+                job_id: appState.lastBatchJobId,
+                qr_position: batchPosition(qrPosition),
+                template_positions: batchTemplatePositions(),
+                linearize: linearizeOutput(),
+                inline: false
+            })
+        });
+        const result = await response.json();
+        if (result.processing_log) {
+            result.processing_log.forEach(msg => log(msg));
+        }
+        if (!response.ok) {
+            throw new Error(result.error || 'Erro ao reposicionar o lote');
+        }
+        if (result.missing_plan.length > 0) {
+            log(`⚠️ ${result.missing_plan.length} diplomas sem plano guardado: processe o lote de novo para eles.`);
+        }
+        if (result.total_processed > 0) {
+            log(`Reposicionamento concluído. ${result.total_processed} PDFs atualizados.`);
+            const archive = await fetch(result.archive_url);
+            downloadBlob(await archive.blob(), 'diplomas_com_qr.zip');
+        }
+    } catch (error) {
+        log(`Erro ao reposicionar o lote: ${error.message}`);
+        alert(`Erro ao reposicionar o lote: ${error.message}`);
+    } finally {
+        hideLoading();
+    }
+}
+
+// Pede o cancelamento do lote em andamento: o servidor para antes do próximo
+// diploma e a requisição do lote responde com o que já foi concluído
+async function cancelBatch() {
+    if (!appState.batchJobId) return;
+    showLoading('Cancelando o lote...');
+    try {
+        const response = await fetch(`${API_BASE}/jobs/${appState.batchJobId}/cancel`, { method: 'POST' });
+        const result = await response.json();
+        log(response.ok ? `Cancelamento do job ${result.job_id} pedido.` : `Não foi possível cancelar: ${result.error}`);
+    } catch (error) {
+        log(`Não foi possível cancelar: ${error.message}`);
+    }
+}
+
+// Envia o lote por uma sessão de envio em partes (/api/upload-sessions). A sessão
+// usa o job do lote: repetir o envio depois de uma queda retoma cada arquivo de
+// onde parou, e o servidor já processa os diplomas completos durante o envio
+async function sendBatchInParts(qrBlobs, position, templatePositions) {
+    const sessionResponse = await fetch(`${API_BASE}/upload-sessions`, {
+        method: 'POST',
+        headers: { 'Content-Type': 'application/json' },
+        body: JSON.stringify({
+            job_id: appState.batchJobId,
+            qr_position: position,
+            template_positions: templatePositions,
+            linearize: linearizeOutput()
+        })
+    });
+    const session = await sessionResponse.json();
+    if (!session.success) {
+        return { response: sessionResponse, result: session };
+    }
+
+    // QRs primeiro: cada diploma que termina de chegar já encontra o seu QR
+    const files = qrBlobs.map((qr, i) => ({ id: `qr${i}`, kind: 'qr', blob: qr.blob, name: qr.name }))
+        .concat(appState.batchPdfs.map((file, i) => ({ id: `pdf${i}`, kind: 'pdf', blob: file, name: file.name })));
+
+    for (const [index, file] of files.entries()) {
+        const fileUrl = `${API_BASE}/upload-sessions/${session.session_id}/files/${file.id}`;
+        const status = await fetch(fileUrl).then(r => r.json());
+        let offset = status.received || 0;
+        while (offset < file.blob.size) {
+            const end = Math.min(offset + session.chunk_size, file.blob.size);
+            const partResponse = await fetch(fileUrl, {
+                method: 'PUT',
+                headers: {
+                    'Content-Range': `bytes ${offset}-${end - 1}/${file.blob.size}`,
+                    'X-File-Name': encodeURIComponent(file.name),
+                    'X-File-Kind': file.kind
+                },
+                body: file.blob.slice(offset, end)
+            });
+            const part = await partResponse.json();
+            if (!partResponse.ok && partResponse.status !== 409) {
+                throw new Error(part.error || `Falha no envio de ${file.name}`);
+            }
+            if (part.received === undefined) {
+                // Sessão cancelada: o /complete devolve o que já foi concluído
+                return completeBatchSession(session);
+            }
+            // 409: o servidor já tinha outra quantidade de bytes; continua de lá
+            offset = part.received;
+        }
+        showLoading(`Enviando arquivos... ${index + 1}/${files.length}`);
+    }
+
+    return completeBatchSession(session);
+}
+
+async function completeBatchSession(session) {
+    showLoading('Processando em lote...');
+    const response = await fetch(`${API_BASE}/upload-sessions/${session.session_id}/complete`, { method: 'POST' });
+    return { response, result: await response.json() };
+}
+
 async function saveCurrentPage() {
     if (!appState.currentPdf || !appState.qrImage) {
         alert('Carregue um PDF e QR Code primeiro.');
@@ -692,7 +1154,14 @@ function resetSystem() {
         qrPositions: [],
         batchPdfs: [],
         batchQrs: [],
-        extractedQrs: []
+        extractedQrs: [],
+        batchJobId: null,
+        lastBatchJobId: null,
+        unifiedPosition: null,
+        batchTemplates: [],
+        templatePositions: {},
+        activeTemplate: null,
+        viewMode: appState.viewMode
     };
     
     // Reset UI
@@ -715,6 +1184,7 @@ function resetSystem() {
     updateFilesList();
     updateStatus();
     updateSaveButtons();
+    renderTemplateList();
     
     log('Sistema reiniciado. Carregue um PDF e QR Code para começar.');
 }
@@ -0,0 +1,21 @@
+# ====================================================================
+# PONTO DE ENTRADA WSGI PARA PRODUÇÃO (GUNICORN)
+# ====================================================================
+# Com preload_app = True (gunicorn.conf.py) este módulo é importado uma
+# única vez no processo mestre, antes do fork dos workers. As bibliotecas
+# pesadas são carregadas aqui para que o código e os dados somente
+# leitura delas (PyMuPDF, OpenCV, NumPy, Pillow) sejam compartilhados
+# entre os workers por copy-on-write, em vez de cada worker pagar a
+# importação e a memória separadamente.
+# ====================================================================
+
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+from src.main import create_app, precarregar_dependencias
+
+precarregar_dependencias()
+
+app = create_app()
@@ -0,0 +1,32 @@
+# ====================================================================
+# FIXTURES COMPARTILHADAS DOS TESTES
+# ====================================================================
+# Os diplomas de teste vêm do mesmo gerador de corpus dos benchmarks
+# (benchmarks/corpus.py), com semente fixa: os testes e as medições
+# usam os mesmos documentos.
+#
+# Uso (na pasta sistema_qr_web):
+#     python -m pytest -q
+# ====================================================================
+
+import os
+import sys
+
+import pytest
+
+PASTA_PROJETO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PASTA_PROJETO)
+sys.path.insert(0, os.path.join(PASTA_PROJETO, 'benchmarks'))
+
+@pytest.fixture(scope='session')
+def corpus():
+    """Três diplomas sintéticos (assinado, em branco e PNG do QR de cada aluno)."""
+    from corpus import gerar_corpus
+    return gerar_corpus(3)
+
+@pytest.fixture
+def app(tmp_path, monkeypatch):
+    """Aplicação com pasta de dados isolada e sem a thread de limpeza."""
+    monkeypatch.setenv('QR_DATA_DIR', str(tmp_path))
+    from src.main import create_app
+    return create_app({'RETENCAO_INTERVALO': 0, 'LOG_NIVEL': 'WARNING'})
@@ -0,0 +1,100 @@
+import io
+import threading
+import time
+
+import pytest
+
+from src.services import admissao
+from src.services.admissao import ControleAdmissao, Sobrecarga
+
+def _aguardar(condicao, limite=5.0):
+    prazo = time.perf_counter() + limite
+    while not condicao():
+        assert time.perf_counter() < prazo, 'condição não atingida a tempo'
+        time.sleep(0.01)
+
+def _enfileirar(controle, nome, custo_mb, ordem):
+    def admitir():
+        controle.admitir(custo_mb)
+        ordem.append(nome)
+        controle.liberar(custo_mb, 0.01)
+    thread = threading.Thread(target=admitir)
+    fila_antes = controle.estado()['fila']
+    thread.start()
+    _aguardar(lambda: controle.estado()['fila'] == fila_antes + 1)
+    return thread
+
+def test_fila_atendida_em_ordem_de_chegada():
+    controle = ControleAdmissao('teste', max_concorrentes=1, max_fila=5, espera_maxima=5, orcamento_mb=1000)
+    controle.admitir(10)
+    ordem = []
+    threads = [_enfileirar(controle, nome, 10, ordem) for nome in ('a', 'b', 'c')]
+
+    controle.liberar(10, 0.01)
+    for thread in threads:
+        thread.join()
+    assert ordem == ['a', 'b', 'c']
+    assert controle.estado()['ativas'] == 0
+
+def test_requisicao_pequena_nao_passa_a_frente_da_grande():
+    controle = ControleAdmissao('teste', max_concorrentes=4, max_fila=5, espera_maxima=5, orcamento_mb=100)
+    controle.admitir(60)
+    ordem = []
+    # A grande não cabe no orçamento; a pequena caberia, mas chegou depois
+    grande = _enfileirar(controle, 'grande', 50, ordem)
+    pequena = _enfileirar(controle, 'pequena', 10, ordem)
+    time.sleep(0.05)
+    assert ordem == []
+
+    controle.liberar(60, 0.01)
+    grande.join()
+    pequena.join()
+    assert ordem == ['grande', 'pequena']
+
+def test_fila_cheia_recusa_com_retry_after():
+    controle = ControleAdmissao('teste', max_concorrentes=1, max_fila=1, espera_maxima=5, orcamento_mb=1000)
+    controle.admitir(10)
+    espera = _enfileirar(controle, 'na_fila', 10, [])
+
+    with pytest.raises(Sobrecarga) as erro:
+        controle.admitir(10)
+    assert erro.value.motivo == 'fila_cheia'
+    assert 1 <= erro.value.retry_after <= 300
+
+    controle.liberar(10, 0.01)
+    espera.join()
+    assert controle.estado()['rejeitadas'] == 1
+
+def test_espera_acima_do_limite_recusa():
+    controle = ControleAdmissao('teste', max_concorrentes=1, max_fila=5, espera_maxima=0.05, orcamento_mb=1000)
+    controle.admitir(10)
+    with pytest.raises(Sobrecarga) as erro:
+        controle.admitir(10)
+    assert erro.value.motivo == 'tempo_espera'
+    # A espera recusada sai da fila
+    assert controle.estado()['fila'] == 0
+
+def test_retry_after_acompanha_a_duracao_media():
+    controle = ControleAdmissao('teste', max_concorrentes=1, max_fila=0, espera_maxima=5, orcamento_mb=1000)
+    controle.admitir(10)
+    controle.liberar(10, 40.0)
+    controle.admitir(10)
+    with pytest.raises(Sobrecarga) as erro:
+        controle.admitir(10)
+    assert erro.value.retry_after == 40
+
+def test_endpoint_sobrecarregado_responde_503(app, corpus, monkeypatch):
+    monkeypatch.setattr(admissao, '_controles', {})
+    app.config['ADMISSAO']['pdf_qr.extract_qr'] = {'max_concorrentes': 1, 'max_fila': 0, 'espera_maxima': 1,
+                                                   'orcamento_mb': 1000}
+    controle = admissao.obter_controle('pdf_qr.extract_qr', app.config)
+    controle.admitir(10)
+    try:
+        resposta = app.test_client().post('/api/extract-qr', data={'pdfs': (io.BytesIO(corpus[0]['assinado']),
+                                                                            'diploma.pdf')})
+    finally:
+        controle.liberar(10, 0.01)
+
+    assert resposta.status_code == 503
+    assert resposta.get_json()['motivo'] == 'fila_cheia'
+    assert int(resposta.headers['Retry-After']) == resposta.get_json()['retry_after'] >= 1
@@ -0,0 +1,67 @@
+import fitz
+import numpy as np
+
+from src.services.posicionamento import (imagem_integral, quadrados_vazios, maior_quadrado_vazio,
+                                         posicao_automatica, conteudo_no_retangulo, validar_posicao)
+
+def _tinta(altura, largura, manchas):
+    """Mapa de tinta sintético: manchas (x0, y0, x1, y1) em pixels."""
+    tinta = np.zeros((altura, largura), dtype=bool)
+    for x0, y0, x1, y1 in manchas:
+        tinta[y0:y1, x0:x1] = True
+    return tinta
+
+def test_quadrados_vazios_respeitam_a_tinta():
+    integral = imagem_integral(_tinta(20, 20, [(5, 5, 6, 6)]))
+    vazios = quadrados_vazios(integral, 5, (0, 0, 20, 20))
+    assert vazios.shape == (16, 16)
+    # Todo quadrado de lado 5 que cobre o pixel (5, 5) tem tinta
+    assert not vazios[1:6, 1:6].any()
+    assert vazios[0, 0] and vazios[6, 6] and vazios[15, 15]
+    # Região menor que o quadrado
+    assert quadrados_vazios(integral, 30, (0, 0, 20, 20)).size == 0
+
+def test_maior_quadrado_vazio_busca_o_maior_lado():
+    # Página 100x100 com um vão de 30x30 no canto inferior direito e tinta no resto
+    tinta = np.ones((100, 100), dtype=bool)
+    tinta[60:90, 65:95] = False
+    integral = imagem_integral(tinta)
+    assert maior_quadrado_vazio(integral, (0, 0, 100, 100), 10, 60, (100, 100)) == (65, 60, 30)
+    # O lado máximo limita o quadrado, que fica o mais perto possível da âncora
+    assert maior_quadrado_vazio(integral, (0, 0, 100, 100), 10, 20, (100, 100)) == (75, 70, 20)
+    assert maior_quadrado_vazio(integral, (0, 0, 100, 100), 10, 20, (0, 0)) == (65, 60, 20)
+    # Nem o mínimo cabe
+    assert maior_quadrado_vazio(integral, (0, 0, 100, 100), 31, 60, (100, 100)) is None
+    # O vão está fora da região
+    assert maior_quadrado_vazio(integral, (0, 0, 50, 50), 10, 60, (0, 0)) is None
+
+def test_posicao_automatica_evita_o_texto(corpus):
+    with fitz.open(stream=corpus[0]['em_branco'], filetype='pdf') as doc:
+        page = doc[0]
+        posicao = posicao_automatica(page, 90)
+        assert posicao is not None
+        assert posicao['regiao'] == 'inferior_direito'
+        assert posicao['folga'] >= 90 + 2 * 12
+        rect = fitz.Rect(posicao['x'], posicao['y'], posicao['x'] + 90, posicao['y'] + 90)
+        assert page.rect.contains(rect)
+        assert conteudo_no_retangulo(page, rect) == ([], 0)
+
+def test_posicao_automatica_segue_as_regioes_pedidas(corpus):
+    with fitz.open(stream=corpus[0]['em_branco'], filetype='pdf') as doc:
+        page = doc[0]
+        posicao = posicao_automatica(page, 60, regioes=['superior_direito'])
+        assert posicao['regiao'] == 'superior_direito'
+        assert posicao['x'] >= page.rect.width * 0.5 and posicao['y'] + 60 <= page.rect.height * 0.4
+
+def test_posicao_automatica_sem_espaco():
+    doc = fitz.open()
+    page = doc.new_page(width=300, height=300)
+    page.draw_rect(page.rect, color=(0, 0, 0), fill=(0, 0, 0))
+    assert posicao_automatica(page, 90) is None
+    doc.close()
+
+def test_validar_posicao():
+    assert validar_posicao({'x': 1, 'y': 2, 'size': 90}) is None
+    assert validar_posicao({'auto': True, 'size': 90, 'regions': ['rodape']}) is None
+    assert validar_posicao({'x': 1, 'size': 90}) is not None
+    assert 'centro' in validar_posicao({'auto': True, 'size': 90, 'regions': ['centro']})
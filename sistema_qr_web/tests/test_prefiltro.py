@@ -0,0 +1,43 @@
+import fitz
+import numpy as np
+
+from corpus import posicao_qr
+from src.services.prefiltro import janelas_candidatas
+
+ESCALA = 3.0
+
+def _pagina_cinza(pdf_bytes):
+    """Primeira página em tons de cinza na resolução da detecção (Matrix 3x)."""
+    with fitz.open(stream=pdf_bytes, filetype='pdf') as doc:
+        pix = doc[0].get_pixmap(matrix=fitz.Matrix(ESCALA, ESCALA), colorspace=fitz.csGRAY, alpha=False)
+    return np.frombuffer(pix.samples, dtype=np.uint8).reshape(pix.height, pix.stride)[:, :pix.width]
+
+def test_pagina_com_qr_tem_janela_sobre_o_qr(corpus):
+    item = corpus[0]
+    gray = _pagina_cinza(item['assinado'])
+    janelas = janelas_candidatas(gray)
+    assert janelas
+
+    x, y, lado = (valor * ESCALA for valor in posicao_qr(item['layout']))
+    jx, jy, jw, jh = janelas[0]
+    # A melhor janela está sobre o QR (a imagem inclui a zona branca em volta
+    # dos módulos) e é uma fração pequena da página
+    assert jx <= x + lado / 2 <= jx + jw and jy <= y + lado / 2 <= jy + jh
+    assert x <= jx + jw / 2 <= x + lado and y <= jy + jh / 2 <= y + lado
+    assert jw * jh < 0.1 * gray.size
+
+def test_janela_basta_para_o_detector(corpus):
+    import cv2
+    gray = _pagina_cinza(corpus[1]['assinado'])
+    jx, jy, jw, jh = janelas_candidatas(gray)[0]
+    dados, pontos, _ = cv2.QRCodeDetector().detectAndDecode(gray[jy:jy + jh, jx:jx + jw])
+    assert pontos is not None
+    assert dados.endswith(corpus[1]['matricula'])
+
+def test_pagina_so_com_texto_nao_tem_candidatos(corpus):
+    for item in corpus:
+        assert janelas_candidatas(_pagina_cinza(item['em_branco'])) == []
+
+def test_pagina_vazia():
+    assert janelas_candidatas(np.full((300, 200), 255, dtype=np.uint8)) == []
+    assert janelas_candidatas(np.zeros((0, 0), dtype=np.uint8)) == []
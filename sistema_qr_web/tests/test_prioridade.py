@@ -0,0 +1,114 @@
+import threading
+import time
+
+from src.services.prioridade import Escalonador
+
+def _aguardar(condicao, limite=5.0):
+    prazo = time.perf_counter() + limite
+    while not condicao():
+        assert time.perf_counter() < prazo, 'condição não atingida a tempo'
+        time.sleep(0.01)
+
+def _na_fila(escalonador, classe):
+    return escalonador.estado()['classes'][classe]['fila']
+
+def _entrar_em_thread(escalonador, classe, nome, ordem):
+    def entrar():
+        escalonador.entrar(classe)
+        ordem.append(nome)
+        escalonador.sair(classe)
+    thread = threading.Thread(target=entrar)
+    na_fila = _na_fila(escalonador, classe)
+    thread.start()
+    _aguardar(lambda: _na_fila(escalonador, classe) == na_fila + 1)
+    return thread
+
+def test_interativa_passa_a_frente_do_lote():
+    escalonador = Escalonador(1, promocao=30)
+    escalonador.entrar('lote')
+    ordem = []
+    lote = _entrar_em_thread(escalonador, 'lote', 'lote', ordem)
+    interativa = _entrar_em_thread(escalonador, 'interativa', 'interativa', ordem)
+
+    escalonador.sair('lote')
+    lote.join()
+    interativa.join()
+    assert ordem == ['interativa', 'lote']
+
+def test_ordem_de_chegada_dentro_da_classe():
+    escalonador = Escalonador(1, promocao=30)
+    escalonador.entrar('lote')
+    ordem = []
+    threads = [_entrar_em_thread(escalonador, 'lote', nome, ordem) for nome in ('a', 'b', 'c')]
+
+    escalonador.sair('lote')
+    for thread in threads:
+        thread.join()
+    assert ordem == ['a', 'b', 'c']
+
+def test_lote_promovido_deixa_de_ceder_a_vez():
+    escalonador = Escalonador(1, promocao=0.2)
+    ficha_lote, ficha_interativa = object(), object()
+    escalonador._filas['lote'].append(ficha_lote)
+    escalonador._filas['interativa'].append(ficha_interativa)
+
+    # Com uma prévia esperando, o lote recém-chegado cede a vaga...
+    assert not escalonador._pode_entrar('lote', ficha_lote, time.perf_counter())
+    # ...mas não depois de esperar mais que 'promocao'
+    assert escalonador._pode_entrar('lote', ficha_lote, time.perf_counter() - 0.3)
+
+def test_rajada_de_previas_nao_para_o_lote():
+    escalonador = Escalonador(1, promocao=0.2)
+    parar = threading.Event()
+
+    def previas():
+        while not parar.is_set():
+            with escalonador.vez('interativa'):
+                time.sleep(0.005)
+
+    rajada = [threading.Thread(target=previas) for _ in range(3)]
+    for thread in rajada:
+        thread.start()
+    try:
+        _aguardar(lambda: _na_fila(escalonador, 'interativa') > 0)
+        espera = escalonador.entrar('lote')
+        escalonador.sair('lote')
+    finally:
+        parar.set()
+        for thread in rajada:
+            thread.join()
+    # Sem a promoção o lote só entraria quando a rajada acabasse
+    assert espera < 2.0
+
+def test_limite_da_classe_deixa_vaga_para_as_previas():
+    escalonador = Escalonador(2, limites={'lote': 1}, promocao=30)
+    escalonador.entrar('lote')
+    ordem = []
+    lote = _entrar_em_thread(escalonador, 'lote', 'lote', ordem)
+
+    # Há vaga livre, mas só para a classe interativa
+    assert escalonador.entrar('interativa') < 1.0
+    assert ordem == []
+    escalonador.sair('interativa')
+
+    escalonador.sair('lote')
+    lote.join()
+    assert ordem == ['lote']
+
+def test_vez_aninhada_nao_espera_por_outra_vaga():
+    escalonador = Escalonador(1, promocao=30)
+    estados = []
+
+    def aninhada():
+        with escalonador.vez('lote'):
+            # Ex: inserir_qr_na_posicao chamada de dentro de outra etapa do lote
+            with escalonador.vez('lote'):
+                with escalonador.vez('interativa'):
+                    estados.append(dict(escalonador.ativas))
+        estados.append(dict(escalonador.ativas))
+
+    thread = threading.Thread(target=aninhada)
+    thread.start()
+    thread.join(5)
+    assert not thread.is_alive(), 'a chamada aninhada esperou pela própria vaga'
+    assert estados == [{'interativa': 0, 'lote': 1}, {'interativa': 0, 'lote': 0}]
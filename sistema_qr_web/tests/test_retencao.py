@@ -0,0 +1,85 @@
+from datetime import datetime, timedelta, timezone
+import os
+import time
+
+from src.models.user import db
+from src.models.job import Job, Artefato
+from src.routes.jobs import calcular_hash, obter_ou_criar_job, registrar_documento, salvar_artefato
+from src.services.retencao import remover_expirados, aplicar_cota, marcar_uso
+
+def _criar_job(corpus, job_id, ttl_horas):
+    """Job de lote com um PDF de saída por diploma do corpus."""
+    job, erro = obter_ou_criar_job(job_id, 'lote', {'job': job_id}, ttl_horas)
+    assert erro is None
+    caminhos = []
+    for item in corpus:
+        documento = registrar_documento(job, calcular_hash(item['assinado']), f"{item['matricula']}.pdf",
+                                        'concluido')
+        caminhos.append(salvar_artefato(job, documento, 'pdf', f"{item['matricula']}.pdf",
+                                        item['assinado']).caminho)
+    return job, caminhos
+
+def _envelhecer(caminhos):
+    """Último uso em ordem: o primeiro caminho é o menos usado."""
+    agora = time.time()
+    for idade, caminho in enumerate(reversed(caminhos), start=1):
+        os.utime(caminho, (agora - idade * 3600, agora - idade * 3600))
+
+def test_remover_expirados_apaga_so_os_jobs_vencidos(app, corpus):
+    with app.app_context():
+        vencido, caminhos_vencido = _criar_job(corpus, 'job_vencido', 1)
+        vigente, caminhos_vigente = _criar_job(corpus, 'job_vigente', 1)
+        vencido.expira_em = datetime.now(timezone.utc) - timedelta(minutes=1)
+        db.session.commit()
+
+        assert remover_expirados(app.config['STORAGE_DIR']) == 1
+
+        assert not os.path.exists(os.path.join(app.config['STORAGE_DIR'], 'job_vencido'))
+        assert Artefato.query.filter_by(job_id='job_vencido').count() == 0
+        job = db.session.get(Job, 'job_vencido')
+        assert job.status == 'expirado' and job.expira_em is None
+        assert all(os.path.exists(caminho) for caminho in caminhos_vigente)
+        assert Artefato.query.filter_by(job_id='job_vigente').count() == len(corpus)
+
+        # Uma segunda rodada não encontra o mesmo job de novo
+        assert remover_expirados(app.config['STORAGE_DIR']) == 0
+
+    resposta = app.test_client().get('/api/jobs/job_vencido/archive')
+    assert resposta.status_code == 410
+
+def test_job_sem_prazo_nunca_expira(app, corpus):
+    with app.app_context():
+        job, caminhos = _criar_job(corpus, 'job_sem_prazo', 0)
+        assert job.expira_em is None
+        assert remover_expirados(app.config['STORAGE_DIR']) == 0
+        assert all(os.path.exists(caminho) for caminho in caminhos)
+
+def test_aplicar_cota_remove_os_menos_usados(app, corpus):
+    with app.app_context():
+        _, caminhos = _criar_job(corpus, 'job_cota', 0)
+        _envelhecer(caminhos)
+        tamanhos = [os.path.getsize(caminho) for caminho in caminhos]
+        total = sum(tamanhos)
+
+        # Abaixo da cota nada sai
+        assert aplicar_cota(app.config['STORAGE_DIR'], total) == (total, 0)
+
+        # Um pouco acima do uso: sai só o menos usado (o total fica abaixo de 90% da cota)
+        em_uso, removidos = aplicar_cota(app.config['STORAGE_DIR'], int(total * 0.95))
+        assert (em_uso, removidos) == (total - tamanhos[0], 1)
+        assert not os.path.exists(caminhos[0])
+        assert Artefato.query.filter_by(caminho=caminhos[0]).count() == 0
+        assert Artefato.query.filter_by(job_id='job_cota').count() == len(corpus) - 1
+
+def test_marcar_uso_renova_a_ordem_lru(app, corpus):
+    with app.app_context():
+        _, caminhos = _criar_job(corpus, 'job_lru_teste', 0)
+        _envelhecer(caminhos)
+        # O menos usado é baixado de novo: o próximo da fila passa a ser o segundo
+        marcar_uso(caminhos[0])
+        total = sum(os.path.getsize(caminho) for caminho in caminhos)
+
+        _, removidos = aplicar_cota(app.config['STORAGE_DIR'], int(total * 0.95))
+        assert removidos == 1
+        assert os.path.exists(caminhos[0])
+        assert not os.path.exists(caminhos[1])
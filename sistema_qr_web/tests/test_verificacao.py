@@ -0,0 +1,40 @@
+import hashlib
+
+import pytest
+
+from src.services.verificacao import interpretar_amostra, deve_verificar
+
+@pytest.mark.parametrize('valor, esperado', [
+    ('all', 1.0), ('TODOS', 1.0), ('true', 1.0),
+    ('none', 0.0), ('nenhum', 0.0), ('false', 0.0),
+    ('0.25', 0.25), (' 0.5 ', 0.5), (0.1, 0.1),
+    # Fora do intervalo é limitado a [0, 1]
+    ('2', 1.0), ('-1', 0.0),
+])
+def test_interpretar_amostra(valor, esperado):
+    assert interpretar_amostra(valor) == esperado
+
+@pytest.mark.parametrize('valor', [None, ''])
+def test_interpretar_amostra_sem_valor_usa_o_padrao(valor):
+    assert interpretar_amostra(valor, padrao=0.3) == 0.3
+
+def test_interpretar_amostra_invalida():
+    with pytest.raises(ValueError):
+        interpretar_amostra('metade')
+
+def _hashes(quantidade):
+    return [hashlib.sha256(str(indice).encode()).hexdigest() for indice in range(quantidade)]
+
+def test_deve_verificar_nos_extremos():
+    hashes = _hashes(50)
+    assert all(deve_verificar(input_hash, 1.0) for input_hash in hashes)
+    assert not any(deve_verificar(input_hash, 0.0) for input_hash in hashes)
+
+def test_deve_verificar_amostra_proporcional_e_deterministica():
+    hashes = _hashes(4000)
+    amostra = [input_hash for input_hash in hashes if deve_verificar(input_hash, 0.25)]
+    assert abs(len(amostra) / len(hashes) - 0.25) < 0.03
+    # Reprocessar o lote verifica os mesmos documentos
+    assert amostra == [input_hash for input_hash in hashes if deve_verificar(input_hash, 0.25)]
+    # Uma amostra maior contém a menor
+    assert set(amostra) <= {input_hash for input_hash in hashes if deve_verificar(input_hash, 0.5)}
@@ -5,15 +5,16 @@ Script de teste para verificar extração de nomes e matching
 
 import sys
 import os
-sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'sistema_qr_web', 'src'))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'sistema_qr_web'))
 
-from routes.pdf_qr import extrair_nome_do_pdf, limpar_nome_arquivo, normalizar_para_matching
+# Módulo leve: o matching de nomes não importa PyMuPDF/OpenCV
+from src.services.nomes import limpar_nome_arquivo, normalizar_para_matching
 
 def testar_extrair_nome():
     print("=== TESTE DE EXTRAÇÃO DE NOMES ===")
     
     # Testa com PDF de exemplo (se existir)
-    pdf_path = r"c:\Users\pique\OneDrive\Área de Trabalho\qr\Alicia_Araujo.pdf"
+    pdf_path = sys.argv[1] if len(sys.argv) > 1 else r"c:\Users\pique\OneDrive\Área de Trabalho\qr\Alicia_Araujo.pdf"
     
     if os.path.exists(pdf_path):
         print(f"Testando com PDF: {pdf_path}")
@@ -21,6 +22,8 @@ def testar_extrair_nome():
         with open(pdf_path, 'rb') as f:
             pdf_bytes = f.read()
         
+        # A extração precisa do PyMuPDF: só é importada quando há PDF para testar
+        from src.routes.pdf_qr import extrair_nome_do_pdf
         nome_extraido = extrair_nome_do_pdf(pdf_bytes)
         print(f"Nome extraído: '{nome_extraido}'")
         